@@ -0,0 +1,23 @@
+-- Prediction log written by the ML service (models/prediction_store.py)
+-- Point PREDICTION_SINK at a Postgres-compatible connection string to enable it
+
+-- ===================================================================
+-- ML PREDICTION LOG
+-- ===================================================================
+create table if not exists public.ml_prediction_log (
+  id bigserial not null,
+  created_at timestamp with time zone not null,
+  input_hash character varying(64) not null,
+  model_version character varying(64) null,
+  latency_ms double precision null,
+  endpoint character varying(50) null,
+  dominant text null,
+  confidence double precision null,
+  calculation_method character varying(50) null,
+  outputs jsonb null,
+  constraint ml_prediction_log_pkey primary key (id)
+) TABLESPACE pg_default;
+
+create index IF not exists idx_ml_prediction_log_created_at on public.ml_prediction_log using btree (created_at) TABLESPACE pg_default;
+
+create index IF not exists idx_ml_prediction_log_input_hash on public.ml_prediction_log using btree (input_hash) TABLESPACE pg_default;
@@ -0,0 +1,68 @@
+# models/bench_build_dataframe.py
+"""
+Benchmark train.build_dataframe against the previous row-by-row implementation.
+
+Usage:
+  python bench_build_dataframe.py                          # 1k, 100k, 1M rows
+  python bench_build_dataframe.py --sizes 1000 50000 --legacy-max 100000
+  python bench_build_dataframe.py --report bench_build_dataframe.json
+
+Rows are synthetic questionnaire records shaped like the questionnaire_answers
+export (20 answers per row, scores, mental_health_score). Build time is wall
+clock of an untraced call; peak memory is the tracemalloc peak of a second,
+traced call, so the input rows are not counted. Also checks the two builders agree.
+"""
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from train import build_dataframe
+from build_dataframe_reference import legacy_build_dataframe, same_output, synthetic_rows
+
+def measure(fn: Callable, rows: List[Dict[str, Any]], memory: bool = True) -> Tuple[Any, Dict[str, float]]:
+    """Time an untraced call, then (optionally) repeat it under tracemalloc for the peak"""
+    started = time.perf_counter()
+    out = fn(rows)
+    stats = {"seconds": round(time.perf_counter() - started, 3)}
+    if memory:
+        tracemalloc.start()
+        fn(rows)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats["peak_mb"] = round(peak / 1024 / 1024, 1)
+    return out, stats
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark the training dataset builder")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    p.add_argument("--legacy-max", type=int, default=1000000,
+                   help="Skip the previous implementation above this many rows")
+    p.add_argument("--no-memory", action="store_true", help="Skip the (slow) tracemalloc pass")
+    p.add_argument("--report", type=str, default=None)
+    args = p.parse_args(argv)
+
+    results = []
+    for n in args.sizes:
+        rows = synthetic_rows(n)
+        out, new = measure(build_dataframe, rows, not args.no_memory)
+        entry: Dict[str, Any] = {"rows": n, "vectorized": new}
+        if n <= args.legacy_max:
+            ref, old = measure(legacy_build_dataframe, rows, not args.no_memory)
+            entry["previous"] = old
+            entry["speedup"] = round(old["seconds"] / new["seconds"], 2) if new["seconds"] else None
+            entry["identical"] = same_output(out, ref)
+        results.append(entry)
+        print(json.dumps(entry))
+        del rows, out
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"Report written to {args.report}")
+    return 0 if all(r.get("identical", True) for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# models/bench_categorical.py
+"""
+Benchmark the train_csv.py pipeline with one-hot vs native categorical handling.
+
+Usage:
+  python bench_categorical.py                                   # prakriti_training_dataset.csv
+  python bench_categorical.py --csv prakriti_training_dataset_synthetic.csv --repeats 5
+  python bench_categorical.py --n-estimators 200 --report bench_categorical.json
+
+Both variants train the same LGBMClassifier on the same split. Reported per
+variant: median training time, serialized pipeline size, booster size,
+encoded width, test accuracy, and predict_proba latency for a single row and
+for a batch. Latency goes through the whole pipeline, so it includes the
+sklearn transform step.
+"""
+import sys
+import json
+import time
+import pickle
+import argparse
+from typing import Any, Dict, List
+
+import numpy as np
+
+from training_telemetry import latency_ms
+from train_csv import CATEGORICAL_MODES, build_pipeline, load_and_prepare_data
+
+def bench_variant(categorical: str, X_train, y_train, X_test, y_test, params: Dict[str, Any],
+                  repeats: int = 3, latency_repeats: int = 200, batch_size: int = 256) -> Dict[str, Any]:
+    fit_seconds: List[float] = []
+    for _ in range(repeats):
+        pipeline, _, fit_params = build_pipeline(X_train, categorical, params)
+        started = time.perf_counter()
+        pipeline.fit(X_train, y_train, **fit_params)
+        fit_seconds.append(time.perf_counter() - started)
+    row = X_test.iloc[:1]
+    batch = X_test.iloc[:batch_size]
+    booster = pipeline.named_steps['classifier'].booster_
+    return {
+        "categorical": categorical,
+        "train_seconds": round(float(np.median(fit_seconds)), 4),
+        "accuracy": round(float((pipeline.predict(X_test) == y_test.to_numpy()).mean()), 6),
+        "encoded_features": int(pipeline.named_steps['preprocessor'].transform(row).shape[1]),
+        "pipeline_bytes": len(pickle.dumps(pipeline, protocol=pickle.HIGHEST_PROTOCOL)),
+        "booster_bytes": len(booster.model_to_string().encode("utf-8")),
+        "num_trees": int(booster.num_trees()),
+        "single_row_latency_ms": latency_ms(lambda: pipeline.predict_proba(row), latency_repeats),
+        "batch_latency_ms": {**latency_ms(lambda: pipeline.predict_proba(batch), max(10, latency_repeats // 10)),
+                             "batch_size": int(len(batch))},
+    }
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="One-hot vs native categorical LightGBM pipeline")
+    p.add_argument("--csv", type=str, default="prakriti_training_dataset.csv")
+    p.add_argument("--n-estimators", type=int, default=100)
+    p.add_argument("--repeats", type=int, default=3, help="Training runs per variant (median reported)")
+    p.add_argument("--latency-repeats", type=int, default=200)
+    p.add_argument("--report", type=str, default=None, help="Write results as JSON")
+    args = p.parse_args(argv)
+
+    from sklearn.model_selection import train_test_split
+    X, y, features = load_and_prepare_data(args.csv)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    params = {"n_estimators": args.n_estimators, "verbose": -1}
+    print(f"Dataset: {len(X)} rows x {len(features)} features ({args.csv})")
+
+    results = []
+    for categorical in CATEGORICAL_MODES:
+        r = bench_variant(categorical, X_train, y_train, X_test, y_test, params, args.repeats, args.latency_repeats)
+        results.append(r)
+        print(f"{categorical:>7}: train {r['train_seconds']:.3f}s  acc {r['accuracy']:.4f}  "
+              f"width {r['encoded_features']}  size {r['pipeline_bytes']:,}B  "
+              f"row p50/p99 {r['single_row_latency_ms']['p50']}/{r['single_row_latency_ms']['p99']}ms  "
+              f"batch({r['batch_latency_ms']['batch_size']}) p50 {r['batch_latency_ms']['p50']}ms")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump({"csv": args.csv, "n_rows": int(len(X)), "params": params, "results": results}, fh, indent=2)
+        print(f"Report written to {args.report}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# models/bench_execution_policy.py
+"""
+Throughput and tail latency of concurrent inference under different
+execution policies (see execution_policy.py).
+
+A LightGBM pipeline (train_csv.fit_pipeline) is trained on a synthetic
+prakriti dataset, then `--clients` threads send closed-loop requests of
+`--batch-rows` rows each for `--seconds` per policy. A policy is
+CONCURRENCYxTHREADS (predictions at once x native threads per prediction);
+"unbounded" runs every request at once with full-width pools, the
+oversubscribed default. Latency includes the wait for a slot.
+
+Usage:
+  python bench_execution_policy.py                                 # unbounded, 1xN, Nx1 and N/2x2 for N CPUs
+  python bench_execution_policy.py --policies unbounded 4x1 2x2 1x4 --clients 16 --batch-rows 64
+  python bench_execution_policy.py --rows 50000 --seconds 10 --report policy_bench.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from execution_policy import ExecutionPolicy, available_cpus
+
+def default_policies(cpus: int) -> List[str]:
+    out = ["unbounded", f"1x{cpus}", f"{cpus}x1"]
+    if cpus >= 4:
+        out.append(f"{cpus // 2}x2")
+    return list(dict.fromkeys(out))
+
+def parse_policy(text: str, clients: int, cpus: int) -> Tuple[int, int]:
+    """(concurrency, threads per request)"""
+    if text == "unbounded":
+        return clients, cpus
+    concurrency, _, threads = text.partition("x")
+    return int(concurrency), int(threads)
+
+def build_model(rows: int, seed: int = 42):
+    import pandas as pd
+    import train_csv
+    from make_synthetic_prakriti_csv import iter_chunks
+    frame = pd.concat(list(iter_chunks(rows, chunk_rows=rows, seed=seed)), ignore_index=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        X, y, _ = train_csv.prepare_frame(frame)
+        fitted = train_csv.fit_pipeline(X, y, "onehot", {"n_estimators": 200, "verbose": -1})
+    return fitted["pipeline"], X
+
+def run_policy(model: Any, X: Any, concurrency: int, threads: int, clients: int, batch_rows: int,
+               seconds: float) -> Dict[str, Any]:
+    policy = ExecutionPolicy(threads_per_request=threads, concurrency=concurrency).apply()
+    policy.configure_model(model)
+    batches = [X.iloc[i:i + batch_rows] for i in range(0, max(1, len(X) - batch_rows), batch_rows)][:64]
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+    stop = threading.Event()
+
+    def client(i: int):
+        n = i
+        while not stop.is_set():
+            started = time.perf_counter()
+            policy.run(model.predict_proba, batches[n % len(batches)])
+            latencies[i].append((time.perf_counter() - started) * 1000)
+            n += clients
+
+    policy.run(model.predict_proba, batches[0])  # warm up
+    threads_ = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads_:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads_:
+        t.join()
+    elapsed = time.perf_counter() - started
+    policy.restore()
+    all_ms = np.concatenate([np.asarray(l) for l in latencies if l]) if any(latencies) else np.zeros(1)
+    stats = policy.describe()["requests"]
+    return {
+        "concurrency": concurrency,
+        "threads_per_request": threads,
+        "requests": int(len(all_ms)),
+        "requests_per_second": round(len(all_ms) / elapsed, 1),
+        "rows_per_second": round(len(all_ms) * batch_rows / elapsed, 1),
+        "latency_ms": {"p50": round(float(np.percentile(all_ms, 50)), 3),
+                       "p99": round(float(np.percentile(all_ms, 99)), 3),
+                       "max": round(float(all_ms.max()), 3)},
+        "queue_wait_ms": stats["queue_wait_ms"],
+    }
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Compare inference execution policies")
+    p.add_argument("--policies", nargs="+", default=None, help="e.g. unbounded 4x1 2x2 1x4")
+    p.add_argument("--clients", type=int, default=None, help="Concurrent client threads (default: 2 x CPUs)")
+    p.add_argument("--batch-rows", type=int, default=32, help="Rows per request")
+    p.add_argument("--rows", type=int, default=20000, help="Training rows of the benchmark model")
+    p.add_argument("--seconds", type=float, default=5.0, help="Duration per policy")
+    p.add_argument("--report", type=str, default=None, help="Write the results as JSON")
+    args = p.parse_args(argv)
+
+    cpus = len(available_cpus())
+    clients = args.clients or 2 * cpus
+    policies = args.policies or default_policies(cpus)
+    model, X = build_model(args.rows)
+    print(f"{cpus} CPUs, {clients} clients, {args.batch_rows} rows per request, {args.seconds}s per policy")
+    results: Dict[str, Any] = {}
+    for name in policies:
+        concurrency, threads = parse_policy(name, clients, cpus)
+        r = run_policy(model, X, concurrency, threads, clients, args.batch_rows, args.seconds)
+        results[name] = r
+        print(f"{name:>10}  concurrency {concurrency:>3} x {threads:>2} threads: {r['requests_per_second']:>8} req/s  "
+              f"p50 {r['latency_ms']['p50']:>8} ms  p99 {r['latency_ms']['p99']:>8} ms")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump({"cpus": cpus, "clients": clients, "batch_rows": args.batch_rows,
+                       "seconds": args.seconds, "policies": results}, fh, indent=2)
+        print(f"Report written to {args.report}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# models/bench_learning_curve.py
+"""
+Learning-curve benchmark: training cost and accuracy as the dataset grows.
+
+For each size (default 1k, 10k, 100k, 1M, 10M rows) a synthetic prakriti
+dataset is generated with make_synthetic_prakriti_csv (seeded, tunable
+signal) and trained by both trainers:
+
+  lgbm   train_csv.py path: prepare_frame + the LightGBM pipeline (fit_pipeline)
+  xgb    train.py path: the rows as train.py --csv reads them (rows_from_frame),
+         build_dataframe, then XGBClassifier (train.train_model)
+
+Every (trainer, size) point runs in a fresh spawned process, so its peak RSS
+(VmHWM of that process) is the real cost of loading + cleaning + training at
+that size and nothing else. Recorded per point: fit seconds, per-stage times
+(from the trainers' telemetry), peak RSS, model size, single-row and batch
+inference latency, and held-out accuracy.
+
+A trainer whose fit exceeds --max-fit-seconds (or that fails, e.g. out of
+memory) is not run at larger sizes; the report says so. The report also
+fits a log-log slope per trainer (time/memory ~ rows^k) for capacity
+planning, and --baseline compares against an earlier report and exits with
+status 1 when a point got slower / bigger by more than --tolerance.
+
+Usage:
+  python bench_learning_curve.py                                  # 1k..10M, report to bench_learning_curve.json
+  python bench_learning_curve.py --sizes 1000 10000 100000 --trainers lgbm
+  python bench_learning_curve.py --signal 0.5 --plots bench_plots/   # PNGs need matplotlib
+  python bench_learning_curve.py --baseline last_release.json --tolerance 0.25
+"""
+import os
+import sys
+import json
+import math
+import time
+import pickle
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000, 10000000]
+TRAINERS = ("lgbm", "xgb")
+# metrics compared against a baseline; higher is worse for all of them
+REGRESSION_METRICS = ("fit_seconds", "peak_rss_mb", "model_bytes", "single_row_p50_ms")
+
+# -----------------------
+# one benchmark point (runs in its own process)
+# -----------------------
+def run_point(trainer: str, data_path: str, n_estimators: int = 100, latency_repeats: int = 100) -> Dict[str, Any]:
+    import io
+    import contextlib
+    import pandas as pd
+    from training_telemetry import inference_latency, peak_rss_mb, reset_peak_rss
+    import train_csv
+
+    reset_peak_rss()
+    started = time.perf_counter()
+    frame = pd.read_parquet(data_path)
+    if trainer == "lgbm":
+        with contextlib.redirect_stdout(io.StringIO()):
+            X, y, _ = train_csv.prepare_frame(frame)
+    elif trainer == "xgb":
+        import train
+        # what load_rows_from_csv hands to build_dataframe: every cell a string
+        rows = train.rows_from_frame(frame.astype(str))
+        with contextlib.redirect_stdout(io.StringIO()):
+            X, y, _, _ = train.build_dataframe(rows)
+        del rows
+    else:
+        raise ValueError(f"Unknown trainer {trainer}")
+    del frame
+    load_seconds = time.perf_counter() - started
+
+    if trainer == "lgbm":
+        X = X.copy()
+        for col in X.columns:
+            if X[col].dtype == object:
+                X[col] = X[col].astype("category")
+        with contextlib.redirect_stdout(io.StringIO()):
+            fitted = train_csv.fit_pipeline(X, y, "onehot", {"n_estimators": n_estimators, "verbose": -1})
+        model, accuracy, telemetry = fitted["pipeline"], fitted["accuracy"], fitted["telemetry"]
+        latency = inference_latency(model.predict_proba, X, latency_repeats)
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model, _, _, report = train.train_model(X, y, "prakriti", dtype=np.float32,
+                                                    params={"n_estimators": n_estimators},
+                                                    latency_repeats=latency_repeats)
+        accuracy, telemetry = report["accuracy"], report["telemetry"]
+        latency = telemetry["inference_latency"]
+
+    stages = {name: s["seconds"] for name, s in telemetry["stages"].items()}
+    return {
+        "trainer": trainer,
+        "rows": int(len(X)),
+        "accuracy": round(float(accuracy), 6),
+        "fit_seconds": stages.get("fit"),
+        "load_seconds": round(load_seconds, 4),
+        "stage_seconds": stages,
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "model_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "single_row_p50_ms": latency["single_row_ms"]["p50"],
+        "single_row_p99_ms": latency["single_row_ms"]["p99"],
+        "batch_per_row_p50_ms": latency["batch_ms"]["per_row_p50"],
+        "counts": telemetry.get("counts", {}),
+    }
+
+def run_isolated(trainer: str, data_path: str, n_estimators: int, latency_repeats: int,
+                 in_process: bool = False) -> Dict[str, Any]:
+    if in_process:
+        return run_point(trainer, data_path, n_estimators, latency_repeats)
+    # spawn: the child does not inherit (and count) the parent's memory
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_point, trainer, data_path, n_estimators, latency_repeats).result()
+
+# -----------------------
+# analysis
+# -----------------------
+def scaling_exponent(points: List[Dict[str, Any]], metric: str) -> Optional[float]:
+    """Slope k of log(metric) ~ k * log(rows) over the successful points"""
+    xs = [math.log(p["rows"]) for p in points if p.get(metric)]
+    ys = [math.log(p[metric]) for p in points if p.get(metric)]
+    if len(set(xs)) < 2:
+        return None
+    return round(float(np.polyfit(xs, ys, 1)[0]), 3)
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out = {}
+    for trainer in sorted({r["trainer"] for r in results}):
+        ok = [r for r in results if r["trainer"] == trainer and not r.get("error") and not r.get("skipped")]
+        if not ok:
+            continue
+        largest = max(ok, key=lambda r: r["rows"])
+        out[trainer] = {
+            "fit_seconds_exponent": scaling_exponent(ok, "fit_seconds"),
+            "peak_rss_exponent": scaling_exponent(ok, "peak_rss_mb"),
+            "largest_rows": largest["rows"],
+            "fit_seconds_per_million_rows": round(largest["fit_seconds"] / largest["rows"] * 1e6, 3),
+            "accuracy_by_rows": {str(r["rows"]): r["accuracy"] for r in ok},
+        }
+    return out
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+                        tolerance: float = 0.25) -> List[Dict[str, Any]]:
+    """Points whose metrics grew by more than `tolerance` relative to the baseline report"""
+    before = {(r["trainer"], r["rows"]): r for r in baseline.get("results", []) if not r.get("error")}
+    regressions = []
+    for r in results:
+        old = before.get((r["trainer"], r["rows"]))
+        if not old or r.get("error") or r.get("skipped"):
+            continue
+        for metric in REGRESSION_METRICS:
+            if old.get(metric) and r.get(metric) and r[metric] > old[metric] * (1 + tolerance):
+                regressions.append({"trainer": r["trainer"], "rows": r["rows"], "metric": metric,
+                                    "baseline": old[metric], "current": r[metric],
+                                    "ratio": round(r[metric] / old[metric], 3)})
+        if old.get("accuracy") is not None and r["accuracy"] < old["accuracy"] - 0.02:
+            regressions.append({"trainer": r["trainer"], "rows": r["rows"], "metric": "accuracy",
+                                "baseline": old["accuracy"], "current": r["accuracy"]})
+    return regressions
+
+def write_plots(results: List[Dict[str, Any]], out_dir: str) -> List[str]:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except Exception:
+        print("matplotlib not installed; skipping plots (pip install matplotlib)")
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    panels = [("fit_seconds", "fit time (s)"), ("peak_rss_mb", "peak RSS (MB)"),
+              ("accuracy", "held-out accuracy"), ("single_row_p50_ms", "single-row p50 latency (ms)"),
+              ("model_bytes", "model size (bytes)")]
+    for metric, label in panels:
+        fig, ax = plt.subplots(figsize=(6, 4))
+        for trainer in sorted({r["trainer"] for r in results}):
+            pts = sorted((r["rows"], r[metric]) for r in results
+                         if r["trainer"] == trainer and r.get(metric) is not None)
+            if pts:
+                ax.plot(*zip(*pts), marker="o", label=trainer)
+        ax.set_xscale("log")
+        if metric != "accuracy":
+            ax.set_yscale("log")
+        ax.set_xlabel("training rows")
+        ax.set_ylabel(label)
+        ax.grid(True, which="both", alpha=0.3)
+        ax.legend()
+        path = os.path.join(out_dir, f"learning_curve_{metric}.png")
+        fig.tight_layout()
+        fig.savefig(path, dpi=120)
+        plt.close(fig)
+        written.append(path)
+    return written
+
+def environment() -> Dict[str, Any]:
+    from stage_cache import library_versions
+    mem_total = None
+    try:
+        with open("/proc/meminfo", "r") as fh:
+            mem_total = round(int(fh.readline().split()[1]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "mem_total_mb": mem_total,
+            "libraries": library_versions("numpy", "pandas", "sklearn", "lightgbm", "xgboost")}
+
+# -----------------------
+# main
+# -----------------------
+def run_benchmark(sizes: List[int], trainers: List[str], signal: float = 0.3, seed: int = 42,
+                  n_estimators: int = 100, latency_repeats: int = 100, max_fit_seconds: float = 600.0,
+                  work_dir: Optional[str] = None, in_process: bool = False) -> List[Dict[str, Any]]:
+    from make_synthetic_prakriti_csv import write_dataset
+    results: List[Dict[str, Any]] = []
+    stopped: Dict[str, str] = {}
+    with tempfile.TemporaryDirectory(prefix="learning_curve_", dir=work_dir) as tmp:
+        for rows in sorted(sizes):
+            active = [t for t in trainers if t not in stopped]
+            for t in trainers:
+                if t in stopped:
+                    results.append({"trainer": t, "rows": rows, "skipped": stopped[t]})
+            if not active:
+                continue
+            data_path = os.path.join(tmp, f"synthetic_{rows}.parquet")
+            data = write_dataset(data_path, rows, chunk_rows=min(rows, 500000), seed=seed, signal=signal)
+            print(f"{rows:>10,} rows: generated in {data['seconds']}s ({data['bytes']:,} bytes parquet)")
+            for trainer in active:
+                try:
+                    r = run_isolated(trainer, data_path, n_estimators, latency_repeats, in_process)
+                except Exception as e:  # includes a worker killed by the OOM killer
+                    r = {"trainer": trainer, "rows": rows, "error": f"{type(e).__name__}: {e}"}
+                    stopped[trainer] = f"failed at {rows} rows"
+                    print(f"{'':>10}  {trainer}: FAILED {r['error']}")
+                    results.append(r)
+                    continue
+                results.append(r)
+                print(f"{'':>10}  {trainer}: fit {r['fit_seconds']:.3f}s  total {r['total_seconds']:.2f}s  "
+                      f"peak {r['peak_rss_mb']} MB  model {r['model_bytes']:,}B  acc {r['accuracy']:.4f}  "
+                      f"row p50 {r['single_row_p50_ms']}ms")
+                if r["fit_seconds"] and r["fit_seconds"] > max_fit_seconds:
+                    stopped[trainer] = f"fit took {r['fit_seconds']:.0f}s at {rows} rows (> --max-fit-seconds)"
+            os.remove(data_path)
+    return results
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Training time / memory / accuracy learning curve")
+    p.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    p.add_argument("--trainers", nargs="+", choices=TRAINERS, default=list(TRAINERS))
+    p.add_argument("--signal", type=float, default=0.3, help="Answer/label signal of the synthetic data")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--n-estimators", type=int, default=100)
+    p.add_argument("--latency-repeats", type=int, default=100)
+    p.add_argument("--max-fit-seconds", type=float, default=600.0,
+                   help="Stop growing a trainer once one fit takes longer than this")
+    p.add_argument("--work-dir", type=str, default=None, help="Where the generated datasets go (default: temp)")
+    p.add_argument("--in-process", action="store_true",
+                   help="Run points in this process (faster; peak RSS then includes earlier points)")
+    p.add_argument("--report", type=str, default="bench_learning_curve.json")
+    p.add_argument("--plots", type=str, default=None, help="Directory for PNG plots (needs matplotlib)")
+    p.add_argument("--baseline", type=str, default=None, help="Earlier report to check for regressions")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative growth vs the baseline")
+    args = p.parse_args(argv)
+
+    started = time.perf_counter()
+    results = run_benchmark(args.sizes, args.trainers, args.signal, args.seed, args.n_estimators,
+                            args.latency_repeats, args.max_fit_seconds, args.work_dir, args.in_process)
+    report: Dict[str, Any] = {
+        "environment": environment(),
+        "settings": {"sizes": sorted(args.sizes), "trainers": args.trainers, "signal": args.signal,
+                     "seed": args.seed, "n_estimators": args.n_estimators, "isolated": not args.in_process},
+        "results": results,
+        "scaling": summarize(results),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare_to_baseline(results, json.load(fh), args.tolerance)
+        report["regressions"] = regressions
+        for reg in regressions:
+            print(f"REGRESSION {reg['trainer']} @ {reg['rows']} rows: {reg['metric']} "
+                  f"{reg['baseline']} -> {reg['current']}")
+        exit_code = 1 if regressions else 0
+    if args.plots:
+        report["plots"] = write_plots(results, args.plots)
+    with open(args.report, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    for trainer, s in report["scaling"].items():
+        print(f"{trainer}: fit ~ rows^{s['fit_seconds_exponent']}, peak RSS ~ rows^{s['peak_rss_exponent']}, "
+              f"{s['fit_seconds_per_million_rows']}s per 1M rows at {s['largest_rows']:,} rows")
+    print(f"Report written to {args.report}")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# models/build_dataframe_reference.py
+"""
+Reference pieces for checking train.build_dataframe, shared by
+test_train_build.py and bench_build_dataframe.py:
+
+  legacy_build_dataframe  the previous row-by-row implementation
+  synthetic_rows          questionnaire_answers-shaped records
+  same_output             compares two builders on what training consumes
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from train import encode_dataframe, normalize_answers_row
+
+DOSHAS = ("vata", "pitta", "kapha")
+
+# -----------------------
+# previous implementation (reference)
+# -----------------------
+def legacy_build_dataframe(rows: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, Optional[pd.Series], Optional[pd.Series], Dict[str, Any]]:
+    question_set = set()
+    for r in rows:
+        normalized = normalize_answers_row(r.get("answers"))
+        for it in normalized:
+            question_set.add(it["questionId"])
+        # also recognize q_* columns
+        for k in r.keys():
+            if isinstance(k, str) and (k.startswith("q_") or k.startswith("question_") or k.startswith("q")):
+                question_set.add(k)
+
+    features = sorted(list(question_set))
+    records: List[Dict[str, Any]] = []
+    prak_labels: List[Optional[str]] = []
+    ment_labels: List[Optional[str]] = []
+
+    for r in rows:
+        row_vals: Dict[str, Any] = {f: 0 for f in features}
+        normalized = normalize_answers_row(r.get("answers"))
+        for it in normalized:
+            q = it["questionId"]
+            v = it.get("value")
+            if isinstance(v, (int, float, bool)):
+                row_vals[q] = float(v)
+            else:
+                try:
+                    row_vals[q] = float(v)
+                except Exception:
+                    row_vals[q] = str(v)
+
+        # copy q_* style columns directly if present
+        for f in features:
+            if (f not in row_vals or row_vals[f] == 0) and f in r and r[f] not in (None, ""):
+                v = r[f]
+                try:
+                    row_vals[f] = float(v)
+                except Exception:
+                    row_vals[f] = str(v)
+
+        # labels extraction (many shapes supported)
+        dominant = None
+        if "prakriti_label" in r and r["prakriti_label"]:
+            dominant = r["prakriti_label"]
+        if "dominant" in r and r["dominant"]:
+            dominant = dominant or r["dominant"]
+        scores = r.get("scores")
+        if isinstance(scores, dict) and not dominant:
+            dominant = scores.get("dominant")
+            pct = scores.get("percent")
+            if not dominant and isinstance(pct, dict):
+                try:
+                    dominant = max(pct.items(), key=lambda x: x[1])[0]
+                except Exception:
+                    dominant = dominant
+
+        mlabel = None
+        if "mental_label" in r and r["mental_label"]:
+            mlabel = r["mental_label"]
+        if "mental_health_level" in r and r["mental_health_level"]:
+            mlabel = mlabel or r["mental_health_level"]
+        mh = r.get("mental_health_score")
+        if isinstance(mh, dict) and not mlabel:
+            mlabel = mh.get("level") or mh.get("label")
+        # numeric fallback
+        if not mlabel:
+            try:
+                if isinstance(mh, (int, float)):
+                    if mh < 40: mlabel = "red"
+                    elif mh < 70: mlabel = "yellow"
+                    else: mlabel = "green"
+                else:
+                    mhf = float(mh) if mh not in (None, "") else None
+                    if mhf is not None:
+                        if mhf < 40: mlabel = "red"
+                        elif mhf < 70: mlabel = "yellow"
+                        else: mlabel = "green"
+            except Exception:
+                pass
+
+        records.append(row_vals)
+        prak_labels.append(dominant)
+        ment_labels.append(mlabel)
+
+    if len(records) == 0:
+        raise ValueError("No data rows found.")
+
+    df = pd.DataFrame(records, columns=features)
+    y_prak = pd.Series(prak_labels) if any(x is not None for x in prak_labels) else None
+    y_ment = pd.Series(ment_labels) if any(x is not None for x in ment_labels) else None
+
+    # keep rows where at least one of the labels exists
+    keep_idx = []
+    for i in range(len(records)):
+        has_prak = (y_prak is not None and pd.notna(y_prak.iloc[i]) and str(y_prak.iloc[i]).strip() not in ("", "None"))
+        has_ment = (y_ment is not None and pd.notna(y_ment.iloc[i]) and str(y_ment.iloc[i]).strip() not in ("", "None"))
+        if has_prak or has_ment:
+            keep_idx.append(i)
+
+    if len(keep_idx) == 0:
+        raise ValueError("No rows contain any target labels (prakriti or mental).")
+
+    df = df.iloc[keep_idx].reset_index(drop=True)
+    if y_prak is not None:
+        y_prak = y_prak.iloc[keep_idx].reset_index(drop=True)
+    if y_ment is not None:
+        y_ment = y_ment.iloc[keep_idx].reset_index(drop=True)
+
+    meta: Dict[str, Any] = {"features": features, "n_rows_before": len(records), "n_rows_after": len(df)}
+    return df, y_prak, y_ment, meta
+
+# -----------------------
+# synthetic rows
+# -----------------------
+def synthetic_rows(n: int, n_questions: int = 20, seed: int = 0) -> List[Dict[str, Any]]:
+    """Answer and score dicts are shared between rows so 1M-row inputs fit in memory"""
+    rng = np.random.default_rng(seed)
+    options = rng.integers(0, 3, size=(n, n_questions))
+    numeric = rng.random((n, n_questions)) < 0.2
+    mh = rng.integers(0, 100, size=n)
+    unlabeled = rng.random(n) < 0.05
+    pool: Dict[Tuple[int, int, bool], Dict[str, Any]] = {}
+    for q in range(n_questions):
+        for o in range(3):
+            for num in (False, True):
+                item = {"questionId": f"q{q + 1}", "optionId": f"q{q + 1}_{'abc'[o]}",
+                        "trait": DOSHAS[o], "weight": 1}
+                if num:
+                    item["value"] = o + 1
+                pool[(q, o, num)] = item
+    score_pool: Dict[Tuple[int, ...], Dict[str, Any]] = {}
+    rows: List[Dict[str, Any]] = []
+    for i in range(n):
+        answers = [pool[(q, int(options[i, q]), bool(numeric[i, q]))] for q in range(n_questions)]
+        counts = tuple(np.bincount(options[i], minlength=3).tolist())
+        if counts not in score_pool:
+            score_pool[counts] = {"percent": {d: round(100.0 * c / n_questions, 1) for d, c in zip(DOSHAS, counts)}}
+        rows.append({
+            "id": str(i),
+            "answers": answers,
+            "scores": None if unlabeled[i] else score_pool[counts],
+            "mental_health_score": None if unlabeled[i] else int(mh[i]),
+            "created_at": "2025-01-01T00:00:00Z",
+        })
+    return rows
+
+def same_output(a, b) -> bool:
+    """Compare builders on what training consumes: encoded features, labels, meta"""
+    df_a, yp_a, ym_a, meta_a = a
+    df_b, yp_b, ym_b, meta_b = b
+    if meta_a != meta_b or list(df_a.columns) != list(df_b.columns):
+        return False
+    enc_a, _ = encode_dataframe(df_a)
+    enc_b, _ = encode_dataframe(df_b)
+    for ya, yb in ((yp_a, yp_b), (ym_a, ym_b)):
+        if (ya is None) != (yb is None) or (ya is not None and not ya.equals(yb)):
+            return False
+    return enc_a.equals(enc_b)
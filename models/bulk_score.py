@@ -0,0 +1,283 @@
+# models/bulk_score.py
+"""
+Offline bulk scoring of stored questionnaires (no HTTP round-trips).
+
+Usage:
+  python bulk_score.py --input answers.jsonl --output rescored/
+  python bulk_score.py --input export.csv --output rescored/ --workers 8 --chunk-size 5000
+  python bulk_score.py --input export.csv --output rescored/ --resume
+
+Input:
+  - JSONL: one object per line with an "answers" list (and optionally "id")
+  - CSV:   an "answers" column holding the answers JSON (and optionally "id")
+
+Output:
+  A directory of Parquet part files (one per input chunk) plus a checkpoint
+  file. Read it back with pd.read_parquet(<output dir>). If pyarrow is not
+  installed, parts are written as CSV instead.
+
+Notes:
+  - Each worker process loads the model once (pool initializer) and writes its
+    own part file, so the parent only reads chunks and records progress.
+  - An interrupted run resumes from the checkpoint with --resume; chunks that
+    already have a part file are skipped. The checkpoint keeps row / error
+    counts per chunk, so a chunk whose part file went missing is re-scored
+    without being counted twice.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except Exception:
+    PARQUET_AVAILABLE = False
+
+CHECKPOINT_NAME = "_checkpoint.json"
+
+RESULT_COLUMNS = [
+    "id", "dominant", "vata", "pitta", "kapha", "confidence",
+    "calculation_method", "ml_predicted", "ml_confidence", "model_version", "error"
+]
+
+# -----------------------
+# input readers
+# -----------------------
+def detect_format(path: str) -> str:
+    lower = path.lower()
+    if lower.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    if lower.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"Unsupported input format (expected .csv or .jsonl): {path}")
+
+def iter_chunks(path: str, fmt: str, chunk_size: int, id_col: str = "id",
+                answers_col: str = "answers") -> Iterator[Tuple[int, List[Tuple[Any, Any]]]]:
+    """
+    Yield (chunk_index, [(row_id, raw_answers), ...]).
+    Raw answers are left unparsed (JSON string or line) so parsing happens in the workers.
+    """
+    if fmt == "jsonl":
+        with open(path, "r", encoding="utf-8") as fh:
+            offset = 0
+            for idx in itertools.count():
+                lines = list(itertools.islice(fh, chunk_size))
+                if not lines:
+                    break
+                yield idx, [(offset + i, line) for i, line in enumerate(lines)]
+                offset += len(lines)
+        return
+
+    offset = 0
+    reader = pd.read_csv(path, dtype=str, chunksize=chunk_size, keep_default_na=False)
+    for idx, df in enumerate(reader):
+        if answers_col not in df.columns:
+            raise KeyError(f"CSV has no '{answers_col}' column. Columns: {list(df.columns)}")
+        ids = df[id_col].tolist() if id_col in df.columns else list(range(offset, offset + len(df)))
+        yield idx, list(zip(ids, df[answers_col].tolist()))
+        offset += len(df)
+
+# -----------------------
+# worker side
+# -----------------------
+def _init_worker(quiet: bool = True):
+    """Load the model once per worker process"""
+    if quiet:
+        # predict_from_answers logs every call; that would dominate bulk runtime
+        sys.stdout = open(os.devnull, "w")
+    import inference_updated as inference
+    inference.load_model()
+    inference.get_model_version()
+
+def _parse_record(raw: Any, fmt: str, id_col: str, answers_col: str) -> Tuple[Any, Any]:
+    """Return (id override or None, answers list)"""
+    if fmt == "jsonl":
+        obj = json.loads(raw)
+        if isinstance(obj, list):
+            return None, obj
+        answers = obj.get(answers_col)
+        if isinstance(answers, str):
+            answers = json.loads(answers)
+        return obj.get(id_col), answers
+    if isinstance(raw, str):
+        return None, json.loads(raw) if raw.strip() else []
+    return None, raw
+
+def score_records(records: List[Tuple[Any, Any]], fmt: str, id_col: str = "id",
+                  answers_col: str = "answers") -> pd.DataFrame:
+    import inference_updated as inference
+    version = inference.get_model_version()
+    out: List[Dict[str, Any]] = []
+    for row_id, raw in records:
+        row: Dict[str, Any] = {c: None for c in RESULT_COLUMNS}
+        row["id"] = str(row_id)
+        row["model_version"] = version
+        try:
+            rid, answers = _parse_record(raw, fmt, id_col, answers_col)
+            if rid is not None:
+                row["id"] = str(rid)
+            if not answers:
+                raise ValueError("no answers")
+            result = inference.predict_from_answers(answers)
+            prak = result.get("prakriti", {})
+            ml = prak.get("ml_prediction") or {}
+            row.update({
+                "dominant": prak.get("dominant"),
+                "vata": prak.get("vata"),
+                "pitta": prak.get("pitta"),
+                "kapha": prak.get("kapha"),
+                "confidence": result.get("confidence"),
+                "calculation_method": (result.get("features_used") or {}).get("calculation_method"),
+                "ml_predicted": None if ml.get("predicted") is None else str(ml.get("predicted")),
+                "ml_confidence": ml.get("confidence"),
+            })
+        except Exception as e:
+            row["error"] = str(e)
+        out.append(row)
+    df = pd.DataFrame(out, columns=RESULT_COLUMNS)
+    for col in ("vata", "pitta", "kapha", "confidence", "ml_confidence"):
+        df[col] = df[col].astype(float)
+    return df
+
+def part_path(output_dir: str, chunk_idx: int) -> str:
+    ext = "parquet" if PARQUET_AVAILABLE else "csv"
+    return os.path.join(output_dir, f"part-{chunk_idx:06d}.{ext}")
+
+def _score_chunk(chunk_idx: int, records: List[Tuple[Any, Any]], fmt: str, output_dir: str,
+                 id_col: str, answers_col: str) -> Tuple[int, int, int]:
+    df = score_records(records, fmt, id_col, answers_col)
+    path = part_path(output_dir, chunk_idx)
+    # dot-prefixed temp names are ignored by Parquet dataset readers
+    tmp = os.path.join(output_dir, "." + os.path.basename(path) + ".tmp")
+    if PARQUET_AVAILABLE:
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)  # atomic: a part file either exists completely or not at all
+    return chunk_idx, len(df), int(df["error"].notna().sum())
+
+def read_results(output_dir: str) -> pd.DataFrame:
+    """Load all part files of a finished (or partial) run into one DataFrame"""
+    parts = sorted(f for f in os.listdir(output_dir) if f.startswith("part-"))
+    if not parts:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    read = pd.read_parquet if parts[0].endswith(".parquet") else pd.read_csv
+    return pd.concat([read(os.path.join(output_dir, f)) for f in parts], ignore_index=True)
+
+# -----------------------
+# checkpointing
+# -----------------------
+def _input_fingerprint(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": int(st.st_mtime)}
+
+def load_checkpoint(output_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(output_dir, CHECKPOINT_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+def save_checkpoint(output_dir: str, checkpoint: Dict[str, Any]):
+    """Write the checkpoint; completed/rows/errors are derived from the per-chunk counts"""
+    chunks = checkpoint.setdefault("chunks", {})
+    checkpoint["completed"] = sorted(int(i) for i in chunks)
+    checkpoint["rows"] = sum(c["rows"] for c in chunks.values())
+    checkpoint["errors"] = sum(c["errors"] for c in chunks.values())
+    path = os.path.join(output_dir, CHECKPOINT_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(checkpoint, fh, indent=2)
+    os.replace(tmp, path)
+
+# -----------------------
+# driver
+# -----------------------
+def run(input_path: str, output_dir: str, workers: int = 0, chunk_size: int = 5000,
+        resume: bool = False, id_col: str = "id", answers_col: str = "answers") -> Dict[str, Any]:
+    fmt = detect_format(input_path)
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+
+    fingerprint = _input_fingerprint(input_path)
+    checkpoint = load_checkpoint(output_dir)
+    if checkpoint and not resume:
+        raise SystemExit(f"{output_dir} already has a checkpoint. Use --resume or pick a new output dir.")
+    if checkpoint:
+        if checkpoint.get("input") != fingerprint or checkpoint.get("chunk_size") != chunk_size:
+            raise SystemExit("Checkpoint was written for a different input file or chunk size; cannot resume.")
+        # a chunk whose part file went missing is scored again, so drop its counts first
+        checkpoint["chunks"] = {i: c for i, c in checkpoint.get("chunks", {}).items()
+                                if os.path.exists(part_path(output_dir, int(i)))}
+        save_checkpoint(output_dir, checkpoint)
+        print(f"Resuming: {len(checkpoint['chunks'])} chunks already scored")
+    else:
+        checkpoint = {"input": fingerprint, "chunk_size": chunk_size, "format": fmt, "chunks": {}}
+        save_checkpoint(output_dir, checkpoint)
+
+    completed = set(checkpoint["completed"])
+    if not PARQUET_AVAILABLE:
+        print("⚠️ pyarrow not installed, writing CSV parts instead of Parquet")
+
+    started = time.perf_counter()
+    scored_rows = 0
+    max_in_flight = workers * 2  # keeps memory bounded regardless of input size
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = set()
+        for chunk_idx, records in iter_chunks(input_path, fmt, chunk_size, id_col, answers_col):
+            if chunk_idx in completed:
+                continue
+            pending.add(pool.submit(_score_chunk, chunk_idx, records, fmt, output_dir, id_col, answers_col))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                scored_rows += _record_done(done, checkpoint, output_dir)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            scored_rows += _record_done(done, checkpoint, output_dir)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "output": output_dir,
+        "chunks": len(checkpoint["completed"]),
+        "rows_total": checkpoint["rows"],
+        "rows_this_run": scored_rows,
+        "errors": checkpoint["errors"],
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(scored_rows / elapsed, 1) if elapsed > 0 else None,
+    }
+    print(f"✅ Bulk scoring finished: {json.dumps(summary)}")
+    return summary
+
+def _record_done(done, checkpoint: Dict[str, Any], output_dir: str) -> int:
+    rows = 0
+    for fut in done:
+        chunk_idx, n_rows, n_errors = fut.result()
+        checkpoint["chunks"][str(chunk_idx)] = {"rows": n_rows, "errors": n_errors}
+        rows += n_rows
+    save_checkpoint(output_dir, checkpoint)
+    return rows
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Re-score stored questionnaires offline")
+    p.add_argument("--input", required=True, help="CSV or JSONL file of questionnaires")
+    p.add_argument("--output", required=True, help="Output directory for part files")
+    p.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores)")
+    p.add_argument("--chunk-size", type=int, default=5000)
+    p.add_argument("--resume", action="store_true", help="Continue an interrupted run")
+    p.add_argument("--id-col", type=str, default="id")
+    p.add_argument("--answers-col", type=str, default="answers")
+    args = p.parse_args(argv)
+    return run(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+               resume=args.resume, id_col=args.id_col, answers_col=args.answers_col)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# models/category_encoding.py
+"""
+Integer category codes for LightGBM's native categorical splits.
+
+CategoryCodeEncoder is the "native" alternative to the OneHotEncoder
+ColumnTransformer in train_csv.py: every categorical column stays a single
+column holding the position of its value in a sorted vocabulary, so the
+booster sees one feature per question instead of one per answer option.
+Missing and unseen values become NaN, which LightGBM routes as missing.
+Other columns pass through unchanged, in the original column order.
+
+It lives in its own module so pickled pipelines load without importing the
+training script.
+
+Usage:
+  enc = CategoryCodeEncoder().fit(X)
+  codes = enc.transform(X)               # float32 array
+  enc.categorical_indices_               # -> LGBMClassifier.fit(categorical_feature=...)
+  enc.vocabularies_                      # {column: [category, ...]}
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+def _column_values(X, columns: List[str]) -> Dict[str, np.ndarray]:
+    """{column: object array}; plain arrays are taken to be in fit column order"""
+    if isinstance(X, pd.DataFrame):
+        return {c: X[c].to_numpy(dtype=object) for c in columns}
+    arr = np.asarray(X, dtype=object).reshape(-1, len(columns))
+    return {c: arr[:, i] for i, c in enumerate(columns)}
+
+def _as_text(s: pd.Series) -> pd.Series:
+    """Categories compare as strings; missing stays missing"""
+    text = s.astype(str).astype(object)
+    text[s.isna().to_numpy()] = None
+    return text
+
+class CategoryCodeEncoder(BaseEstimator, TransformerMixin):
+    """Replace categorical columns by vocabulary codes (float32, NaN = missing/unseen)"""
+
+    def __init__(self, columns: Optional[List[str]] = None):
+        self.columns = columns
+
+    def fit(self, X, y=None):
+        if not isinstance(X, pd.DataFrame):
+            raise TypeError("CategoryCodeEncoder.fit needs a DataFrame (column names are part of the vocabulary)")
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        if self.columns is None:
+            categorical = X.select_dtypes(include=["object", "category"]).columns.tolist()
+        else:
+            categorical = list(self.columns)
+        self.vocabularies_: Dict[str, List[str]] = {}
+        for col in categorical:
+            values = _as_text(X[col]).dropna().unique()
+            self.vocabularies_[col] = sorted(values.tolist())
+        names = list(self.feature_names_in_)
+        self.categorical_indices_ = [names.index(c) for c in categorical]
+        return self
+
+    @classmethod
+    def from_vocabularies(cls, features: List[str], vocabularies: Dict[str, List[str]]) -> "CategoryCodeEncoder":
+        """Fitted encoder from known vocabularies (e.g. collected over a file too large to load)"""
+        enc = cls(columns=[c for c in features if c in vocabularies])
+        enc.feature_names_in_ = np.asarray(features, dtype=object)
+        enc.vocabularies_ = {c: list(vocabularies[c]) for c in enc.columns}
+        enc.categorical_indices_ = [i for i, c in enumerate(features) if c in vocabularies]
+        return enc
+
+    def _encode(self, col: str, values: np.ndarray) -> np.ndarray:
+        index = self._indexes.get(col)
+        if index is None:
+            index = self._indexes[col] = pd.Index(self.vocabularies_[col], dtype=object)
+        codes = index.get_indexer(values)
+        # cells that are not already strings (numbers typed in at serving time) get a second lookup as text
+        retry = np.flatnonzero(codes < 0)
+        if len(retry):
+            text = _as_text(pd.Series(values[retry], dtype=object)).to_numpy()
+            codes[retry] = index.get_indexer(text)
+        return np.where(codes < 0, np.nan, codes)
+
+    def transform(self, X) -> np.ndarray:
+        names = list(self.feature_names_in_)
+        if not hasattr(self, "_indexes"):
+            self._indexes: Dict[str, pd.Index] = {}
+        columns = _column_values(X, names)
+        out = np.empty((len(columns[names[0]]) if names else 0, len(names)), dtype=np.float32)
+        for i, col in enumerate(names):
+            if col in self.vocabularies_:
+                out[:, i] = self._encode(col, columns[col])
+            else:
+                out[:, i] = pd.to_numeric(columns[col], errors="coerce")
+        return out
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return np.asarray(self.feature_names_in_, dtype=object)
@@ -0,0 +1,325 @@
+# models/drift_monitor.py
+"""
+Online drift monitoring of incoming questionnaire features.
+
+train_csv.py saves a reference profile (per-feature bin edges / category
+proportions and the label distribution) next to the model. At serving time a
+DriftMonitor keeps fixed-size count vectors for the same bins, updated once per
+prediction, and reports the Population Stability Index (PSI) of live traffic
+against the reference.
+
+Memory is bounded by the reference profile: unseen categories fall into a
+single "__other__" bucket, and counts are halved every `decay_every`
+observations so the live window tracks recent traffic.
+
+Usage (build a profile without retraining):
+  python drift_monitor.py --csv prakriti_training_dataset.csv [--model-dir ./models_out]
+"""
+import os
+import json
+import math
+import bisect
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+PROFILE_FILENAME = "prakriti_reference_profile.json"
+OTHER_BUCKET = "__other__"
+PSI_EPSILON = 1e-4
+
+# -----------------------
+# reference profile (training time)
+# -----------------------
+def _proportions(counts: List[float]) -> List[float]:
+    total = float(sum(counts))
+    if total <= 0:
+        return [1.0 / len(counts)] * len(counts) if counts else []
+    return [c / total for c in counts]
+
+def build_reference_profile(X, y, question_mapping: Optional[Dict[str, str]] = None,
+                            n_bins: int = 10, max_categories: int = 50) -> Dict[str, Any]:
+    """
+    Summarize a training frame into a compact profile.
+    Numeric columns get quantile bin edges; string columns get their most frequent
+    categories (up to max_categories) plus an "__other__" bucket.
+    """
+    import pandas as pd
+
+    features: Dict[str, Any] = {}
+    for col in X.columns:
+        series = X[col]
+        numeric = pd.to_numeric(series, errors="coerce")
+        if pd.api.types.is_numeric_dtype(series) or (numeric.notna().mean() > 0.95 and series.notna().any()):
+            values = numeric.dropna().to_numpy(dtype=float)
+            if len(values) == 0:
+                continue
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])).tolist()
+            counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+            features[col] = {
+                "type": "numeric",
+                "edges": [float(e) for e in edges],
+                "proportions": _proportions(counts.tolist()),
+            }
+        else:
+            vc = series.dropna().astype(str).value_counts()
+            top = vc.iloc[:max_categories]
+            other = int(vc.iloc[max_categories:].sum())
+            features[col] = {
+                "type": "categorical",
+                "categories": [str(c) for c in top.index],
+                "proportions": _proportions([int(c) for c in top.tolist()] + [other]),
+            }
+
+    label_counts = y.dropna().astype(str).value_counts()
+    return {
+        "features": features,
+        "prediction_classes": {
+            "classes": [str(c) for c in label_counts.index],
+            "proportions": _proportions([int(c) for c in label_counts.tolist()]),
+        },
+        "question_mapping": question_mapping or {},
+        "n_rows": int(len(X)),
+    }
+
+def update_reference_profile(profile: Dict[str, Any], X, y) -> Dict[str, Any]:
+    """
+    Fold new training rows into an existing profile without revisiting the old
+    ones: bin edges and categories stay fixed, proportions become the row-weighted
+    mix of the old profile and the new rows' counts.
+    """
+    import pandas as pd
+
+    n_old, n_new = int(profile.get("n_rows") or 0), int(len(X))
+
+    def mix(old: List[float], new_counts: List[float]) -> List[float]:
+        return _proportions([p * n_old + c for p, c in zip(old, new_counts)])
+
+    features: Dict[str, Any] = {}
+    for name, spec in profile.get("features", {}).items():
+        spec = dict(spec)
+        if name in X.columns:
+            if spec["type"] == "numeric":
+                values = pd.to_numeric(X[name], errors="coerce").dropna().to_numpy(dtype=float)
+                counts = np.bincount(np.searchsorted(spec["edges"], values, side="right"),
+                                     minlength=len(spec["edges"]) + 1)
+            else:
+                index = {c: i for i, c in enumerate(spec["categories"])}
+                codes = [index.get(v, len(index)) for v in X[name].dropna().astype(str)]
+                counts = np.bincount(np.asarray(codes, dtype=int), minlength=len(index) + 1)
+            spec["proportions"] = mix(spec["proportions"], counts.tolist())
+        features[name] = spec
+
+    classes = list(profile.get("prediction_classes", {}).get("classes", []))
+    old = list(profile.get("prediction_classes", {}).get("proportions", []))
+    label_counts = y.dropna().astype(str).value_counts()
+    for label in label_counts.index:
+        if label not in classes:
+            classes.append(str(label))
+            old.append(0.0)
+    class_counts = [int(label_counts.get(c, 0)) for c in classes]
+    return {**profile, "features": features,
+            "prediction_classes": {"classes": classes, "proportions": mix(old, class_counts)},
+            "n_rows": n_old + n_new}
+
+def save_reference_profile(profile: Dict[str, Any], model_dir: str) -> str:
+    path = os.path.join(model_dir, PROFILE_FILENAME)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(profile, fh, indent=2)
+    return path
+
+def load_reference_profile(model_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(model_dir, PROFILE_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+def psi(expected: List[float], actual_counts: List[float]) -> float:
+    """Population Stability Index of observed counts against reference proportions"""
+    actual = _proportions(actual_counts)
+    score = 0.0
+    for e, a in zip(expected, actual):
+        e = max(e, PSI_EPSILON)
+        a = max(a, PSI_EPSILON)
+        score += (a - e) * math.log(a / e)
+    return score
+
+def features_from_answers(answers: Any, question_mapping: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Map live /predict answers onto training feature columns.
+    The first answer for each mapped feature wins (several question IDs share a column).
+    """
+    out: Dict[str, Any] = {}
+    if isinstance(answers, dict):
+        answers = [{"questionId": k, "value": v} for k, v in answers.items()]
+    for answer in answers or []:
+        if not isinstance(answer, dict):
+            continue
+        qid = answer.get("questionId")
+        feature = question_mapping.get(qid) if qid is not None else None
+        if feature is None and isinstance(qid, str) and qid.startswith("q_"):
+            feature = qid
+        if feature is None or feature in out:
+            continue
+        value = answer.get("value", answer.get("text"))
+        if value is not None:
+            out[feature] = value
+    return out
+
+# -----------------------
+# live monitor (serving time)
+# -----------------------
+class DriftMonitor:
+    """Fixed-memory streaming histograms compared against a reference profile"""
+
+    def __init__(self, profile: Dict[str, Any], alert_threshold: float = 0.25,
+                 min_samples: int = 200, decay_every: int = 10000):
+        self.profile = profile
+        self.alert_threshold = alert_threshold
+        self.min_samples = min_samples
+        self.decay_every = decay_every
+        self.question_mapping: Dict[str, str] = profile.get("question_mapping") or {}
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[float]] = {}
+        self._seen: Dict[str, int] = {}
+        self._category_index: Dict[str, Dict[str, int]] = {}
+        for name, spec in profile.get("features", {}).items():
+            if spec["type"] == "numeric":
+                self._counts[name] = [0.0] * (len(spec["edges"]) + 1)
+            else:
+                self._category_index[name] = {c: i for i, c in enumerate(spec["categories"])}
+                self._counts[name] = [0.0] * (len(spec["categories"]) + 1)
+            self._seen[name] = 0
+        classes = profile.get("prediction_classes", {}).get("classes", [])
+        self._class_index = {c: i for i, c in enumerate(classes)}
+        self._class_counts = [0.0] * (len(classes) + 1)
+        self._predictions_seen = 0
+        self._alerting = False
+        self._alert_callbacks: List[Callable[[Dict[str, Any]], None]] = []
+
+    def on_alert(self, callback: Callable[[Dict[str, Any]], None]):
+        """Register a callback fired once each time drift crosses the alert threshold"""
+        self._alert_callbacks.append(callback)
+
+    def _bucket(self, name: str, value: Any) -> Optional[int]:
+        spec = self.profile["features"][name]
+        if spec["type"] == "numeric":
+            try:
+                return bisect.bisect_right(spec["edges"], float(value))
+            except (TypeError, ValueError):
+                return None
+        index = self._category_index[name]
+        return index.get(str(value), len(index))
+
+    def observe(self, features: Dict[str, Any], predicted_class: Optional[str] = None):
+        """Record one request. Cost is a few dict lookups and list increments."""
+        with self._lock:
+            for name, value in features.items():
+                counts = self._counts.get(name)
+                if counts is None:
+                    continue
+                bucket = self._bucket(name, value)
+                if bucket is None:
+                    continue
+                counts[bucket] += 1.0
+                self._seen[name] += 1
+                if self.decay_every and self._seen[name] % self.decay_every == 0:
+                    self._counts[name] = [c * 0.5 for c in counts]
+            if predicted_class is not None:
+                self._class_counts[self._class_index.get(str(predicted_class), len(self._class_index))] += 1.0
+                self._predictions_seen += 1
+                if self.decay_every and self._predictions_seen % self.decay_every == 0:
+                    self._class_counts = [c * 0.5 for c in self._class_counts]
+        self._maybe_alert()
+
+    def observe_answers(self, answers: Any, predicted_class: Optional[str] = None):
+        self.observe(features_from_answers(answers, self.question_mapping), predicted_class)
+
+    def scores(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {k: list(v) for k, v in self._counts.items()}
+            seen = dict(self._seen)
+            class_counts = list(self._class_counts)
+            predictions_seen = self._predictions_seen
+
+        feature_scores: Dict[str, Any] = {}
+        for name, spec in self.profile.get("features", {}).items():
+            expected = list(spec["proportions"])
+            if spec["type"] == "numeric":
+                labels = [f"<{spec['edges'][0]}"] if spec["edges"] else ["all"]
+                labels += [f">={e}" for e in spec["edges"]]
+            else:
+                labels = spec["categories"] + [OTHER_BUCKET]
+            if seen[name] == 0:
+                feature_scores[name] = {"psi": None, "observations": 0}
+                continue
+            feature_scores[name] = {
+                "psi": round(psi(expected, counts[name]), 6),
+                "observations": seen[name],
+                "live_proportions": dict(zip(labels, [round(p, 4) for p in _proportions(counts[name])])),
+            }
+
+        class_spec = self.profile.get("prediction_classes", {})
+        class_expected = list(class_spec.get("proportions", [])) + [0.0]
+        prediction_psi = round(psi(class_expected, class_counts), 6) if predictions_seen else None
+
+        scored = [v["psi"] for v in feature_scores.values()
+                  if v["psi"] is not None and v["observations"] >= self.min_samples]
+        max_psi = max(scored) if scored else None
+        drifted = sorted(k for k, v in feature_scores.items()
+                         if v["psi"] is not None and v["observations"] >= self.min_samples
+                         and v["psi"] >= self.alert_threshold)
+        if prediction_psi is not None and predictions_seen >= self.min_samples and prediction_psi >= self.alert_threshold:
+            drifted.append("prediction_classes")
+        return {
+            "features": feature_scores,
+            "prediction_classes": {
+                "psi": prediction_psi,
+                "observations": predictions_seen,
+                "live_proportions": dict(zip(class_spec.get("classes", []) + [OTHER_BUCKET],
+                                             [round(p, 4) for p in _proportions(class_counts)])),
+            },
+            "max_feature_psi": max_psi,
+            "alert_threshold": self.alert_threshold,
+            "min_samples": self.min_samples,
+            "drifted": drifted,
+            "alert": bool(drifted),
+        }
+
+    def _maybe_alert(self):
+        if not self._alert_callbacks:
+            return
+        # cheap pre-check so most requests never compute PSI
+        if self._predictions_seen < self.min_samples or self._predictions_seen % 50 != 0:
+            return
+        report = self.scores()
+        if report["alert"] and not self._alerting:
+            self._alerting = True
+            for cb in self._alert_callbacks:
+                try:
+                    cb(report)
+                except Exception as e:
+                    print(f"⚠️ Drift alert callback failed: {e}")
+        elif not report["alert"]:
+            self._alerting = False
+
+    def reset(self):
+        with self._lock:
+            for name in self._counts:
+                self._counts[name] = [0.0] * len(self._counts[name])
+                self._seen[name] = 0
+            self._class_counts = [0.0] * len(self._class_counts)
+            self._predictions_seen = 0
+            self._alerting = False
+
+if __name__ == "__main__":
+    import argparse
+    from train_csv import load_and_prepare_data, QUESTION_MAPPING
+
+    p = argparse.ArgumentParser(description="Build the drift reference profile from a training CSV")
+    p.add_argument("--csv", type=str, default="prakriti_training_dataset.csv")
+    p.add_argument("--model-dir", type=str, default=os.getenv("MODEL_DIR", "./models_out"))
+    args = p.parse_args()
+    X, y, _ = load_and_prepare_data(args.csv)
+    print(f"Saved reference profile: {save_reference_profile(build_reference_profile(X, y, QUESTION_MAPPING), args.model_dir)}")
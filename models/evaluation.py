@@ -0,0 +1,218 @@
+# models/evaluation.py
+"""
+Parallel k-fold evaluation for the prakriti / mental models.
+
+A single 80/20 split on a few hundred rows is noisy, so the training scripts
+can instead report stratified k-fold (optionally repeated) cross-validation.
+
+Several tasks (e.g. the prakriti and mental models of train.py) are evaluated
+in one process pool: each task's encoded X / y is written once as .npy and
+memory-mapped read-only by the workers, and every (task, repeat, fold) is an
+independent job. Nothing is re-encoded per fold, except for a task given with
+a `preprocessor`: its raw frame is pickled once per worker instead, and a clone
+of the preprocessor is fit on each fold's training rows only, as the full
+Pipeline would be, so test-fold categories never reach the encoding.
+
+Per fold: accuracy, macro F1, log loss, confusion matrix, fit/predict time.
+Per task: mean / std / min / max of each metric and the summed confusion matrix.
+
+Usage:
+  python train.py --csv export.csv --cv-folds 5 --cv-repeats 2
+  python train_csv.py --cv-folds 5
+
+  tasks = {"prakriti": eval_task(X, y, classes, {"trainer": "xgb", "params": {...}})}
+  results = cross_validate(tasks, n_splits=5, repeats=1, workers=0)
+"""
+import os
+import json
+import time
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SCALAR_METRICS = ("accuracy", "f1_macro", "log_loss", "fit_seconds", "predict_seconds")
+
+def eval_task(X: Any, y: np.ndarray, classes: List[str], model: Dict[str, Any],
+              preprocessor: Any = None, **meta) -> Dict[str, Any]:
+    """
+    Encoded features, integer labels (index into classes) and the model to evaluate:
+    model = {"trainer": "xgb"|"lgbm", "params": {...}, "cat_idx": [...] (lgbm native categorical)}
+    With an (unfitted) sklearn `preprocessor`, X is the raw frame and is encoded per fold.
+    """
+    return {"X": X, "y": y, "classes": classes, "model": model, "preprocessor": preprocessor, "meta": meta}
+
+def encode_labels(y) -> Tuple[np.ndarray, List[str]]:
+    classes, codes = np.unique(np.asarray(y).astype(str), return_inverse=True)
+    return codes.astype(np.int32), classes.tolist()
+
+def fold_indices(y: np.ndarray, n_splits: int = 5, repeats: int = 1,
+                 seed: int = 42) -> List[Tuple[int, int, np.ndarray, np.ndarray]]:
+    """[(repeat, fold, train_idx, test_idx)]; stratified unless a class has fewer than n_splits rows"""
+    from sklearn.model_selection import KFold, StratifiedKFold
+    stratified = np.bincount(y).min(initial=len(y)) >= n_splits
+    folds = []
+    for r in range(repeats):
+        splitter = (StratifiedKFold if stratified else KFold)(n_splits=n_splits, shuffle=True, random_state=seed + r)
+        for f, (train, test) in enumerate(splitter.split(np.zeros(len(y)), y)):
+            folds.append((r, f, train.astype(np.int64), test.astype(np.int64)))
+    return folds
+
+# -----------------------
+# worker side
+# -----------------------
+_DATA: Dict[str, Any] = {}
+_TASKS: Dict[str, Dict[str, Any]] = {}
+_THREADS = 1
+
+def _init_worker(data_dir: str, threads: int):
+    """Memory-map every task's dataset once per worker process"""
+    global _THREADS
+    _THREADS = threads
+    with open(os.path.join(data_dir, "tasks.json"), "r", encoding="utf-8") as fh:
+        _TASKS.update(json.load(fh))
+    for name, task in _TASKS.items():
+        if task.get("preprocessor"):
+            with open(os.path.join(data_dir, f"{name}_raw.pkl"), "rb") as fh:
+                _DATA[f"{name}_X"], _DATA[f"{name}_preprocessor"] = pickle.load(fh)
+        else:
+            _DATA[f"{name}_X"] = np.load(os.path.join(data_dir, f"{name}_X.npy"), mmap_mode="r")
+        _DATA[f"{name}_y"] = np.load(os.path.join(data_dir, f"{name}_y.npy"), mmap_mode="r")
+
+def make_model(spec: Dict[str, Any], threads: int = 1, n_classes: int = 3):
+    params = dict(spec.get("params") or {})
+    if spec["trainer"] == "xgb":
+        from xgboost import XGBClassifier
+        return XGBClassifier(eval_metric="mlogloss", n_jobs=threads, **params)
+    import lightgbm as lgb
+    params.setdefault("verbose", -1)
+    if n_classes > 2:
+        params.setdefault("objective", "multiclass")
+    return lgb.LGBMClassifier(random_state=42, n_jobs=threads, **params)
+
+def _encode_fold(preprocessor: Any, X: Any, train_idx: np.ndarray, test_idx: np.ndarray):
+    """Fit a clone of the preprocessor on the training rows only; dense float32 outputs"""
+    from sklearn.base import clone
+    pre = clone(preprocessor)
+    out = []
+    for encoded in (pre.fit_transform(X.iloc[train_idx]), pre.transform(X.iloc[test_idx])):
+        if hasattr(encoded, "toarray"):
+            encoded = encoded.toarray()
+        out.append(np.asarray(encoded, dtype=np.float32))
+    return out
+
+def run_fold(task: str, repeat: int, fold: int, train_idx: np.ndarray, test_idx: np.ndarray) -> Dict[str, Any]:
+    from sklearn.metrics import confusion_matrix, f1_score, log_loss
+    spec = _TASKS[task]["model"]
+    n_classes = len(_TASKS[task]["classes"])
+    result: Dict[str, Any] = {"task": task, "repeat": repeat, "fold": fold,
+                              "n_train": int(len(train_idx)), "n_test": int(len(test_idx))}
+    try:
+        X, y = _DATA[f"{task}_X"], _DATA[f"{task}_y"]
+        y_train, y_test = y[train_idx], y[test_idx]
+        if _TASKS[task].get("preprocessor"):
+            X_train, X_test = _encode_fold(_DATA[f"{task}_preprocessor"], X, train_idx, test_idx)
+        else:
+            X_train, X_test = X[train_idx], X[test_idx]
+        # a fold may miss a rare class: train on contiguous local labels, map columns back afterwards
+        seen, y_local = np.unique(y_train, return_inverse=True)
+        model = make_model(spec, _THREADS, len(seen))
+        fit_kwargs = {"categorical_feature": spec["cat_idx"]} if spec.get("cat_idx") else {}
+        started = time.perf_counter()
+        model.fit(X_train, y_local, **fit_kwargs)
+        fit_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        proba_seen = model.predict_proba(X_test)
+        predict_seconds = time.perf_counter() - started
+        proba = np.zeros((len(test_idx), n_classes))
+        proba[:, seen[np.asarray(model.classes_, dtype=int)]] = proba_seen
+        y_pred = proba.argmax(axis=1)
+        labels = list(range(n_classes))
+        result.update({
+            "accuracy": round(float((y_pred == y_test).mean()), 6),
+            "f1_macro": round(float(f1_score(y_test, y_pred, labels=labels, average="macro", zero_division=0)), 6),
+            "log_loss": round(float(log_loss(y_test, np.clip(proba, 1e-15, 1), labels=labels)), 6),
+            "confusion_matrix": confusion_matrix(y_test, y_pred, labels=labels).tolist(),
+            "fit_seconds": round(fit_seconds, 4),
+            "predict_seconds": round(predict_seconds, 5),
+        })
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+# -----------------------
+# driver
+# -----------------------
+def aggregate(folds: List[Dict[str, Any]], classes: List[str]) -> Dict[str, Any]:
+    ok = [f for f in folds if "error" not in f]
+    summary: Dict[str, Any] = {"n_folds": len(folds), "n_failed": len(folds) - len(ok)}
+    for metric in SCALAR_METRICS:
+        values = np.array([f[metric] for f in ok], dtype=float)
+        if len(values):
+            summary[metric] = {"mean": round(float(values.mean()), 6), "std": round(float(values.std()), 6),
+                               "min": round(float(values.min()), 6), "max": round(float(values.max()), 6)}
+    matrix = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for f in ok:
+        matrix += np.asarray(f["confusion_matrix"], dtype=np.int64)
+    summary["confusion_matrix"] = {"labels": classes, "matrix": matrix.tolist()}
+    return summary
+
+def cross_validate(tasks: Dict[str, Dict[str, Any]], n_splits: int = 5, repeats: int = 1, seed: int = 42,
+                   workers: int = 0, data_dir: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Evaluate every task with (repeated) k-fold CV in one process pool.
+    Returns {task: {"scheme", "summary", "folds", "wall_seconds"}}.
+    """
+    jobs = []
+    for name, task in tasks.items():
+        for repeat, fold, train, test in fold_indices(task["y"], n_splits, repeats, seed):
+            jobs.append((name, repeat, fold, train, test))
+    if not jobs:
+        return {}
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    started = time.perf_counter()
+    results: Dict[str, List[Dict[str, Any]]] = {name: [] for name in tasks}
+    with tempfile.TemporaryDirectory(prefix="cv_", dir=data_dir) as tmp:
+        layout = {}
+        for name, task in tasks.items():
+            if task.get("preprocessor") is not None:
+                with open(os.path.join(tmp, f"{name}_raw.pkl"), "wb") as fh:
+                    pickle.dump((task["X"], task["preprocessor"]), fh, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                np.save(os.path.join(tmp, f"{name}_X.npy"), np.ascontiguousarray(task["X"], dtype=np.float32))
+            np.save(os.path.join(tmp, f"{name}_y.npy"), np.asarray(task["y"], dtype=np.int32))
+            layout[name] = {"classes": task["classes"], "model": task["model"],
+                            "preprocessor": task.get("preprocessor") is not None}
+        with open(os.path.join(tmp, "tasks.json"), "w", encoding="utf-8") as fh:
+            json.dump(layout, fh)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tmp, threads)) as pool:
+            futures = [pool.submit(run_fold, *job) for job in jobs]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results[res["task"]].append(res)
+    wall = time.perf_counter() - started
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, task in tasks.items():
+        folds = sorted(results[name], key=lambda f: (f["repeat"], f["fold"]))
+        summary = aggregate(folds, task["classes"])
+        out[name] = {
+            "scheme": {"n_splits": n_splits, "repeats": repeats, "seed": seed,
+                       "stratified": bool(np.bincount(task["y"]).min(initial=len(task["y"])) >= n_splits)},
+            "model": task["model"],
+            **task["meta"],
+            "summary": summary,
+            "folds": folds,
+            "wall_seconds": round(wall, 3),
+            "workers": workers,
+            "threads_per_worker": threads,
+        }
+        acc = summary.get("accuracy")
+        if acc:
+            print(f"CV {name}: accuracy {acc['mean']:.4f} ± {acc['std']:.4f} over {summary['n_folds']} folds"
+                  + (f" ({summary['n_failed']} failed)" if summary["n_failed"] else ""))
+    return out
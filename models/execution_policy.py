@@ -0,0 +1,240 @@
+# models/execution_policy.py
+"""
+CPU execution policy for inference: how this worker's cores are split
+between concurrent requests and the native thread pools inside each one.
+
+Without a policy every LightGBM / XGBoost / BLAS call may start a pool as
+wide as the machine, in every concurrent request of every worker, so
+workers x requests x cores threads fight over the cores and tail latency
+grows. The policy partitions instead:
+
+  cores_per_worker     usable CPUs (affinity mask) // ML_WORKERS
+  threads_per_request  native threads per prediction (ML_THREADS_PER_REQUEST, default 1)
+  concurrency          predictions running at once in this worker
+                       (ML_INFERENCE_CONCURRENCY, default cores_per_worker // threads_per_request)
+
+apply() caps the BLAS/OpenMP pools already loaded in this process
+(threadpoolctl), so call it once the model is loaded; configure_model() sets
+n_jobs on the model itself, which is what LightGBM and XGBoost use per
+predict call. The process environment (OMP_NUM_THREADS etc.) is left alone:
+child processes, e.g. the retraining job, start with the full thread pools.
+
+run() executes a prediction inside a concurrency slot, granted in arrival
+order so no request starves behind later ones; a request waiting longer
+than ML_QUEUE_TIMEOUT_MS for a slot raises Overloaded (HTTP 503) instead of
+queueing without bound. With ML_WORKER_INDEX set (e.g. by the process
+manager) and ML_PIN_CPUS=1 the worker is also pinned to its own slice of
+cores.
+
+describe() reports the effective configuration, the native pools actually
+loaded and queue-wait / run-time percentiles (GET /monitor/execution).
+bench_execution_policy.py compares policies.
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from tracing import span
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+class Overloaded(RuntimeError):
+    """No concurrency slot became free within the queue timeout"""
+
+def available_cpus() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return list(range(os.cpu_count() or 1))
+
+def _percentiles(samples) -> Dict[str, Optional[float]]:
+    values = np.fromiter(samples, dtype=float)
+    if not len(values):
+        return {"p50": None, "p99": None, "max": None}
+    return {"p50": round(float(np.percentile(values, 50)), 3),
+            "p99": round(float(np.percentile(values, 99)), 3),
+            "max": round(float(values.max()), 3)}
+
+class FairSlots:
+    """Counting semaphore that admits waiters in arrival order (threading.Semaphore can starve one)"""
+
+    def __init__(self, slots: int):
+        self.free = slots
+        self._cond = threading.Condition()
+        self._waiters: deque = deque()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            if self.free > 0 and not self._waiters:
+                self.free -= 1
+                return True
+            ticket = object()
+            self._waiters.append(ticket)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not (self.free > 0 and self._waiters[0] is ticket):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(ticket)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+            self._waiters.popleft()
+            self.free -= 1
+            self._cond.notify_all()
+            return True
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def release(self):
+        with self._cond:
+            self.free += 1
+            self._cond.notify_all()
+
+class ExecutionPolicy:
+    def __init__(self, workers: int = 1, threads_per_request: int = 1, concurrency: Optional[int] = None,
+                 cpus: Optional[List[int]] = None, worker_index: Optional[int] = None, pin: bool = False,
+                 queue_timeout_ms: Optional[float] = None, window: int = 2048):
+        self.cpus = list(cpus) if cpus is not None else available_cpus()
+        self.workers = max(1, workers)
+        self.cores_per_worker = max(1, len(self.cpus) // self.workers)
+        self.threads_per_request = max(1, threads_per_request)
+        self.concurrency = max(1, concurrency or self.cores_per_worker // self.threads_per_request)
+        self.worker_index = worker_index
+        self.pin = pin
+        self.queue_timeout_ms = queue_timeout_ms
+        self._slots = FairSlots(self.concurrency)
+        self._lock = threading.Lock()
+        self._limits = None
+        self._waits: deque = deque(maxlen=window)
+        self._runs: deque = deque(maxlen=window)
+        self.pinned_cpus: Optional[List[int]] = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    # -----------------------
+    # configuration
+    # -----------------------
+    def worker_cpus(self) -> Optional[List[int]]:
+        """This worker's slice of the CPUs (needs worker_index)"""
+        if self.worker_index is None:
+            return None
+        start = (self.worker_index % self.workers) * self.cores_per_worker
+        return self.cpus[start:start + self.cores_per_worker]
+
+    def apply(self) -> "ExecutionPolicy":
+        """Cap the native thread pools loaded in this process; call once at startup, after loading the model"""
+        try:
+            from threadpoolctl import threadpool_limits
+            self._limits = threadpool_limits(limits=self.threads_per_request)
+        except Exception as e:  # threadpoolctl missing: the model n_jobs still applies
+            print(f"⚠️ Could not cap native thread pools: {e}")
+        if self.pin and self.worker_cpus():
+            try:
+                os.sched_setaffinity(0, self.worker_cpus())
+                self.pinned_cpus = self.worker_cpus()
+            except (AttributeError, OSError) as e:
+                print(f"⚠️ Could not pin worker to CPUs {self.worker_cpus()}: {e}")
+        return self
+
+    def restore(self):
+        if self._limits is not None:
+            self._limits.restore_original_limits()
+            self._limits = None
+
+    def configure_model(self, model: Any, threads: Optional[int] = None) -> Optional[int]:
+        """Set the per-predict thread count on a model (last step of a Pipeline); returns it"""
+        threads = threads or self.threads_per_request
+        est = model.steps[-1][1] if hasattr(model, "steps") else model
+        if est is None or not hasattr(est, "get_params"):
+            return None
+        params = est.get_params()
+        if "n_jobs" in params:
+            est.set_params(n_jobs=threads)
+        elif "num_threads" in params:
+            est.set_params(num_threads=threads)
+        else:
+            return None
+        if hasattr(est, "get_booster"):  # XGBoost predicts with the booster's nthread
+            try:
+                est.get_booster().set_param({"nthread": threads})
+            except Exception:
+                pass
+        return threads
+
+    # -----------------------
+    # request path
+    # -----------------------
+    def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call fn in a concurrency slot (blocking; use from a worker thread)"""
+        queued = time.perf_counter()
+        timeout = self.queue_timeout_ms / 1000 if self.queue_timeout_ms else None
+        with span("queue_wait", concurrency=self.concurrency):
+            acquired = self._slots.acquire(timeout=timeout)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"No inference slot free within {self.queue_timeout_ms} ms "
+                             f"(concurrency {self.concurrency})")
+        started = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self._waits.append((started - queued) * 1000)
+                self._runs.append((finished - started) * 1000)
+            self._slots.release()
+
+    def saturation(self) -> float:
+        """(running + queued predictions) / concurrency; >= 1 means every slot is taken"""
+        return (self.in_flight + self._slots.waiting) / self.concurrency
+
+    def describe(self, model: Any = None) -> Dict[str, Any]:
+        from training_telemetry import model_thread_count, thread_counts
+        with self._lock:
+            waits, runs = list(self._waits), list(self._runs)
+            counters = {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight,
+                        "completed": self.completed, "rejected": self.rejected}
+        return {
+            "policy": {
+                "cpus": len(self.cpus),
+                "workers": self.workers,
+                "cores_per_worker": self.cores_per_worker,
+                "threads_per_request": self.threads_per_request,
+                "concurrency": self.concurrency,
+                "max_native_threads": self.concurrency * self.threads_per_request,
+                "queue_timeout_ms": self.queue_timeout_ms,
+                "worker_index": self.worker_index,
+                "pinned_cpus": self.pinned_cpus,
+            },
+            "env": {var: os.environ.get(var) for var in THREAD_ENV_VARS},
+            "threads": thread_counts(model_thread_count(model) if model is not None else None),
+            "requests": {**counters, "queue_wait_ms": _percentiles(waits), "run_ms": _percentiles(runs)},
+        }
+
+def policy_from_env() -> ExecutionPolicy:
+    workers = int(os.getenv("ML_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+    concurrency = os.getenv("ML_INFERENCE_CONCURRENCY")
+    worker_index = os.getenv("ML_WORKER_INDEX")
+    timeout = os.getenv("ML_QUEUE_TIMEOUT_MS")
+    return ExecutionPolicy(
+        workers=workers,
+        threads_per_request=int(os.getenv("ML_THREADS_PER_REQUEST", "1")),
+        concurrency=int(concurrency) if concurrency else None,
+        worker_index=int(worker_index) if worker_index else None,
+        pin=os.getenv("ML_PIN_CPUS", "").lower() in ("1", "true", "yes"),
+        queue_timeout_ms=float(timeout) if timeout else None,
+    )
@@ -0,0 +1,440 @@
+# models/hparam_search.py
+"""
+Hyperparameter search for the XGBoost (train.py) and LightGBM (train_csv.py) models.
+
+Usage:
+  python hparam_search.py --trainer lgbm --csv prakriti_training_dataset.csv
+  python hparam_search.py --trainer xgb --csv questionnaire_export.csv --target mental
+  python hparam_search.py --trainer lgbm --space random --trials 40 --workers 4
+  python hparam_search.py --trainer xgb --csv export.csv --space-json space.json --output leaderboard.json
+  python hparam_search.py --trainer lgbm --select-cheapest --tolerance 0.01 --cost p99
+
+The dataset is loaded, encoded and split (train / validation / test) once in
+the parent and written as .npy files. Worker processes memory-map them
+read-only in the pool initializer, so every trial reads the same pages instead
+of receiving a pickled copy. Each trial trains on the train split, early-stops
+on the validation split and is scored on the test split.
+
+The leaderboard records test accuracy, training time, best iteration,
+serialized model size, single-row latency and batch latency (on already
+encoded rows, model only) so models can be picked on quality and speed.
+
+The "categorical" parameter selects how questionnaire columns reach the model:
+  ordinal   vocabulary codes as plain numbers (what train.py does)
+  onehot    one indicator column per category (what train_csv.py does)
+  native    vocabulary codes declared categorical to the booster
+
+Every run also reports the accuracy / inference-cost Pareto front and the
+cheapest trial within --tolerance of the best accuracy. --select-cheapest
+searches the cost-oriented space (tree count, depth, leaves, categorical
+handling) by default. Only categorical handling the trainer's training script
+can deploy is selected: ordinal for xgb (train.py), onehot/native for lgbm
+(train_csv.py). train.py / train_csv.py --params-from <leaderboard.json>
+retrains with the selected configuration.
+
+--space-json takes {"param": [values, ...] or {"low": a, "high": b, "log": bool,
+"int": bool}}. Grid mode evaluates the product of the value lists. Random mode
+draws --trials configurations: ranges are sampled continuously (log-uniform
+with "log"), lists by uniform choice; a space of lists only is sampled as
+distinct grid points. Without --space-json, random mode searches RANDOM_SPACES.
+
+The objective and evaluation metric follow the number of classes (binary or
+multiclass), as in train_out_of_core.booster_params.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import argparse
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from training_telemetry import latency_ms
+
+DEFAULT_SPACES: Dict[str, Dict[str, List[Any]]] = {
+    "xgb": {
+        "n_estimators": [400],
+        "max_depth": [2, 4, 6],
+        "learning_rate": [0.05, 0.1, 0.3],
+        "subsample": [0.8, 1.0],
+        "min_child_weight": [1, 5],
+    },
+    "lgbm": {
+        "n_estimators": [400],
+        "num_leaves": [7, 15, 31],
+        "learning_rate": [0.05, 0.1, 0.3],
+        "min_child_samples": [5, 20],
+        "colsample_bytree": [0.8, 1.0],
+    },
+}
+
+# random mode: continuous ranges around DEFAULT_SPACES
+RANDOM_SPACES: Dict[str, Dict[str, Any]] = {
+    "xgb": {
+        "n_estimators": [400],
+        "max_depth": {"low": 2, "high": 8, "int": True},
+        "learning_rate": {"low": 0.02, "high": 0.3, "log": True},
+        "subsample": {"low": 0.6, "high": 1.0},
+        "min_child_weight": {"low": 1, "high": 10, "log": True},
+    },
+    "lgbm": {
+        "n_estimators": [400],
+        "num_leaves": {"low": 4, "high": 63, "int": True, "log": True},
+        "learning_rate": {"low": 0.02, "high": 0.3, "log": True},
+        "min_child_samples": {"low": 5, "high": 50, "int": True},
+        "colsample_bytree": {"low": 0.6, "high": 1.0},
+    },
+}
+
+# candidate space for --select-cheapest: sizes and categorical handling that change inference cost
+COST_SPACES: Dict[str, Dict[str, List[Any]]] = {
+    "xgb": {
+        "n_estimators": [25, 50, 100, 200],
+        "max_depth": [2, 3, 4, 6],
+        # train.py writes ordinal vocabularies only
+        "categorical": ["ordinal"],
+    },
+    "lgbm": {
+        "n_estimators": [25, 50, 100, 200],
+        "num_leaves": [4, 8, 16, 31],
+        "categorical": ["onehot", "native"],
+    },
+}
+
+# how each trainer encodes categories today, and what its training script can retrain with
+DEFAULT_CATEGORICAL = {"xgb": "ordinal", "lgbm": "onehot"}
+DEPLOYABLE_CATEGORICAL = {"xgb": ("ordinal",), "lgbm": ("onehot", "native")}
+COST_KEYS = ("p99", "batch", "size")
+
+SPLITS = ("train", "valid", "test")
+
+def _sample_range(spec: Dict[str, Any], rng: random.Random) -> Any:
+    low, high = float(spec["low"]), float(spec["high"])
+    if spec.get("log"):
+        value = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+    else:
+        value = rng.uniform(low, high)
+    return int(round(value)) if spec.get("int") else round(value, 6)
+
+def expand_space(space: Dict[str, Any], mode: str = "grid", n_trials: int = 20,
+                 seed: int = 42) -> List[Dict[str, Any]]:
+    keys = sorted(space)
+    ranges = [k for k in keys if isinstance(space[k], dict)]
+    if not ranges:
+        grid = [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+        if mode == "grid" or n_trials >= len(grid):
+            return grid
+        return random.Random(seed).sample(grid, n_trials)
+    if mode == "grid":
+        raise ValueError(f"Grid mode needs value lists; {ranges} are ranges (use --space random)")
+    rng = random.Random(seed)
+    return [{k: _sample_range(space[k], rng) if k in ranges else rng.choice(space[k]) for k in keys}
+            for _ in range(n_trials)]
+
+# -----------------------
+# dataset (built once, in the parent)
+# -----------------------
+def prepare_xgb_dataset(csv_path: str, target: str = "prakriti") -> Tuple[np.ndarray, List[int], np.ndarray, List[str], List[str]]:
+    """
+    Questionnaire export -> train.py features as float32 vocabulary codes.
+    Returns (X, categorical column indices, encoded labels, feature names, classes).
+    """
+    from train import build_dataframe, encode_dataframe, load_rows_from_csv
+    df, y_prak, y_ment, meta = build_dataframe(load_rows_from_csv(csv_path))
+    y = y_prak if target == "prakriti" else y_ment
+    if y is None:
+        raise SystemExit(f"No {target} labels in {csv_path}")
+    labeled = (y.notna() & y.astype(str).str.strip().ne("None")).to_numpy()
+    X, vocab = encode_dataframe(df[labeled].reset_index(drop=True), dtype=np.float32)
+    cat_idx = [i for i, c in enumerate(X.columns) if c in vocab]
+    classes, y_enc = np.unique(y[labeled].astype(str).to_numpy(), return_inverse=True)
+    return X.to_numpy(), cat_idx, y_enc.astype(np.int32), list(X.columns), classes.tolist()
+
+def prepare_lgbm_dataset(csv_path: str) -> Tuple[np.ndarray, List[int], np.ndarray, List[str], List[str]]:
+    """Prakriti CSV -> train_csv.py features, categorical columns as codes (missing = NaN)"""
+    from train_csv import load_and_prepare_data
+    X, y, _ = load_and_prepare_data(csv_path)
+    cols, cat_idx = [], []
+    for i, c in enumerate(X.columns):
+        if X[c].dtype == object or str(X[c].dtype) == "category":
+            codes = X[c].astype("category").cat.codes.to_numpy().astype(np.float32)
+            codes[codes < 0] = np.nan
+            cols.append(codes)
+            cat_idx.append(i)
+        else:
+            cols.append(X[c].to_numpy(dtype=np.float32))
+    classes, y_enc = np.unique(y.astype(str).to_numpy(), return_inverse=True)
+    return np.column_stack(cols), cat_idx, y_enc.astype(np.int32), list(X.columns), classes.tolist()
+
+def encode_variant(X: np.ndarray, cat_idx: List[int], kind: str) -> np.ndarray:
+    """ordinal/native keep the codes; onehot expands categorical columns like train_csv's pipeline"""
+    if kind in ("ordinal", "native") or not cat_idx:
+        return X
+    if kind != "onehot":
+        raise ValueError(f"Unknown categorical handling: {kind}")
+    from sklearn.preprocessing import OneHotEncoder
+    numeric = [i for i in range(X.shape[1]) if i not in cat_idx]
+    onehot = OneHotEncoder(handle_unknown="ignore", sparse_output=False).fit_transform(X[:, cat_idx])
+    return np.hstack([onehot, X[:, numeric]]).astype(np.float32)
+
+def split_indices(y: np.ndarray, valid_size: float = 0.2, test_size: float = 0.2,
+                  seed: int = 42) -> Dict[str, np.ndarray]:
+    from sklearn.model_selection import train_test_split
+    idx = np.arange(len(y))
+
+    def stratify(labels: np.ndarray) -> Optional[np.ndarray]:
+        return labels if np.bincount(labels).min(initial=len(labels)) >= 2 else None
+
+    rest, test = train_test_split(idx, test_size=test_size, random_state=seed, stratify=stratify(y))
+    train, valid = train_test_split(rest, test_size=valid_size / (1 - test_size), random_state=seed,
+                                    stratify=stratify(y[rest]))
+    return {"train": train, "valid": valid, "test": test}
+
+def write_shared_dataset(data_dir: str, X: np.ndarray, cat_idx: List[int], y: np.ndarray,
+                         splits: Dict[str, np.ndarray], variants: List[str]) -> Dict[str, Any]:
+    """One contiguous X file per (encoding, split), ready for np.load(mmap_mode='r')"""
+    os.makedirs(data_dir, exist_ok=True)
+    widths = {}
+    for kind in variants:
+        X_kind = encode_variant(X, cat_idx, kind)
+        widths[kind] = int(X_kind.shape[1])
+        for name in SPLITS:
+            np.save(os.path.join(data_dir, f"X_{kind}_{name}.npy"),
+                    np.ascontiguousarray(X_kind[splits[name]], dtype=np.float32))
+    for name in SPLITS:
+        np.save(os.path.join(data_dir, f"y_{name}.npy"), y[splits[name]])
+    with open(os.path.join(data_dir, "layout.json"), "w", encoding="utf-8") as fh:
+        json.dump({"variants": variants, "cat_idx": cat_idx, "n_features": int(X.shape[1]),
+                   "n_classes": int(len(np.unique(y)))}, fh)
+    return {"encoded_widths": widths, **{f"n_{name}": int(len(splits[name])) for name in SPLITS}}
+
+# -----------------------
+# worker side
+# -----------------------
+_DATA: Dict[str, np.ndarray] = {}
+_LAYOUT: Dict[str, Any] = {}
+_THREADS = 1
+
+def _init_worker(data_dir: str, threads: int):
+    """Memory-map the shared dataset once per worker process"""
+    global _THREADS
+    _THREADS = threads
+    with open(os.path.join(data_dir, "layout.json"), "r", encoding="utf-8") as fh:
+        _LAYOUT.update(json.load(fh))
+    for name in SPLITS:
+        _DATA[f"y_{name}"] = np.load(os.path.join(data_dir, f"y_{name}.npy"), mmap_mode="r")
+        for kind in _LAYOUT["variants"]:
+            _DATA[f"X_{kind}_{name}"] = np.load(os.path.join(data_dir, f"X_{kind}_{name}.npy"), mmap_mode="r")
+
+def build_model(trainer: str, params: Dict[str, Any], early_stopping_rounds: int, threads: int,
+                native_cat: Optional[List[int]] = None, n_features: int = 0, n_classes: int = 3):
+    multiclass = n_classes > 2
+    if trainer == "xgb":
+        from xgboost import XGBClassifier
+        extra: Dict[str, Any] = {}
+        if native_cat:
+            extra = {"enable_categorical": True,
+                     "feature_types": ["c" if i in native_cat else "q" for i in range(n_features)]}
+        return XGBClassifier(eval_metric="mlogloss" if multiclass else "logloss", tree_method="hist", n_jobs=threads,
+                             early_stopping_rounds=early_stopping_rounds, **extra, **params)
+    import lightgbm as lgb
+    return lgb.LGBMClassifier(objective="multiclass" if multiclass else "binary", n_jobs=threads, verbose=-1,
+                              random_state=42, **params)
+
+def fit_model(trainer: str, model, X_train, y_train, X_valid, y_valid, early_stopping_rounds: int,
+              native_cat: Optional[List[int]] = None):
+    if trainer == "xgb":
+        model.fit(X_train, y_train, eval_set=[(X_valid, y_valid)], verbose=False)
+        return int(model.best_iteration) + 1
+    import lightgbm as lgb
+    model.fit(X_train, y_train, eval_set=[(X_valid, y_valid)],
+              categorical_feature=native_cat if native_cat else "auto",
+              callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+    return int(model.best_iteration_ or model.n_estimators)
+
+def run_trial(trial_id: int, trainer: str, params: Dict[str, Any], early_stopping_rounds: int = 20,
+              latency_repeats: int = 200, batch_size: int = 256) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"trial": trial_id, "params": params}
+    model_params = dict(params)
+    kind = model_params.pop("categorical", DEFAULT_CATEGORICAL[trainer])
+    try:
+        X_train, X_valid, X_test = (_DATA[f"X_{kind}_{name}"] for name in SPLITS)
+        y_train, y_valid, y_test = (_DATA[f"y_{name}"] for name in SPLITS)
+        native_cat = _LAYOUT["cat_idx"] if kind == "native" else None
+        model = build_model(trainer, model_params, early_stopping_rounds, _THREADS, native_cat, X_train.shape[1],
+                            _LAYOUT.get("n_classes", 3))
+        started = time.perf_counter()
+        best_iteration = fit_model(trainer, model, X_train, y_train, X_valid, y_valid, early_stopping_rounds, native_cat)
+        train_seconds = time.perf_counter() - started
+        accuracy = float((model.predict(X_test) == y_test).mean())
+        row = np.array(X_test[:1])
+        batch = np.array(X_test[:batch_size])
+        batch_latency = latency_ms(lambda: model.predict_proba(batch), max(10, latency_repeats // 10))
+        result.update({
+            "accuracy": round(accuracy, 6),
+            "train_seconds": round(train_seconds, 4),
+            "best_iteration": best_iteration,
+            "model_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+            "single_row_latency_ms": latency_ms(lambda: model.predict_proba(row), latency_repeats),
+            "batch_latency_ms": {**batch_latency, "batch_size": int(len(batch)),
+                                 "per_row_p50": round(batch_latency["p50"] / max(1, len(batch)), 5)},
+        })
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+# -----------------------
+# driver
+# -----------------------
+def rank(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Best accuracy first; ties go to the faster model"""
+    ok = [r for r in results if "error" not in r]
+    ok.sort(key=lambda r: (-r["accuracy"], r["single_row_latency_ms"]["p50"]))
+    return ok + [r for r in results if "error" in r]
+
+def inference_cost(result: Dict[str, Any], cost: str = "p99") -> float:
+    """p99 = single-row p99 ms, batch = per-row ms in a batch, size = serialized bytes"""
+    if cost == "p99":
+        return float(result["single_row_latency_ms"]["p99"])
+    if cost == "batch":
+        return float(result["batch_latency_ms"]["per_row_p50"])
+    if cost == "size":
+        return float(result["model_bytes"])
+    raise ValueError(f"Unknown cost: {cost}")
+
+def pareto_front(results: List[Dict[str, Any]], cost: str = "p99") -> List[Dict[str, Any]]:
+    """Trials no other trial beats on both accuracy and cost, cheapest first"""
+    ok = sorted((r for r in results if "error" not in r),
+                key=lambda r: (inference_cost(r, cost), -r["accuracy"], r["model_bytes"]))
+    front: List[Dict[str, Any]] = []
+    for r in ok:
+        # walking up the cost axis, a trial stays on the front only if it is strictly more accurate
+        if not front or r["accuracy"] > front[-1]["accuracy"]:
+            front.append(r)
+    return front
+
+def select_cheapest(results: List[Dict[str, Any]], tolerance: float = 0.01,
+                    cost: str = "p99", trainer: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Cheapest trial whose accuracy is within `tolerance` of the best one. With
+    `trainer`, only trials whose categorical handling its training script can
+    deploy are considered.
+    """
+    ok = [r for r in results if "error" not in r]
+    if trainer:
+        ok = [r for r in ok
+              if r["params"].get("categorical", DEFAULT_CATEGORICAL[trainer]) in DEPLOYABLE_CATEGORICAL[trainer]]
+    if not ok:
+        return None
+    floor = max(r["accuracy"] for r in ok) - tolerance
+    eligible = [r for r in ok if r["accuracy"] >= floor - 1e-12]
+    return min(eligible, key=lambda r: (inference_cost(r, cost), r["model_bytes"], -r["accuracy"]))
+
+def search(trainer: str, X: np.ndarray, y: np.ndarray, trials: List[Dict[str, Any]], workers: int = 0,
+           early_stopping_rounds: int = 20, latency_repeats: int = 200, seed: int = 42,
+           data_dir: Optional[str] = None, cat_idx: Optional[List[int]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    workers = workers or min(len(trials), os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    splits = split_indices(y, seed=seed)
+    variants = sorted({t.get("categorical", DEFAULT_CATEGORICAL[trainer]) for t in trials})
+    with tempfile.TemporaryDirectory(prefix="hparam_", dir=data_dir) as tmp:
+        sizes = write_shared_dataset(tmp, X, list(cat_idx or []), y, splits, variants)
+        results: List[Dict[str, Any]] = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tmp, threads)) as pool:
+            futures = [pool.submit(run_trial, i, trainer, params, early_stopping_rounds, latency_repeats)
+                       for i, params in enumerate(trials)]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results.append(res)
+                status = res.get("error") or f"acc={res['accuracy']:.4f} p50={res['single_row_latency_ms']['p50']}ms"
+                print(f"[{len(results)}/{len(trials)}] trial {res['trial']} {res['params']} -> {status}")
+    info = {"workers": workers, "threads_per_worker": threads, **sizes}
+    return rank(results), info
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Hyperparameter search for the prakriti/mental models")
+    p.add_argument("--trainer", choices=["xgb", "lgbm"], default="lgbm")
+    p.add_argument("--csv", type=str, default="prakriti_training_dataset.csv",
+                   help="lgbm: prakriti training CSV; xgb: questionnaire export CSV")
+    p.add_argument("--target", choices=["prakriti", "mental"], default="prakriti", help="xgb only")
+    p.add_argument("--space", choices=["grid", "random"], default="grid")
+    p.add_argument("--space-json", type=str, default=None, help="JSON file: {param: [values, ...]}")
+    p.add_argument("--trials", type=int, default=20, help="Random mode: number of sampled configurations")
+    p.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per CPU)")
+    p.add_argument("--early-stopping-rounds", type=int, default=20)
+    p.add_argument("--latency-repeats", type=int, default=200)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--select-cheapest", action="store_true",
+                   help="Search the inference-cost space and mark the cheapest model within --tolerance")
+    p.add_argument("--tolerance", type=float, default=0.01, help="Accuracy allowed below the best trial")
+    p.add_argument("--cost", choices=list(COST_KEYS), default="p99",
+                   help="p99 single-row latency, per-row batch latency or model size")
+    p.add_argument("--output", type=str, default=None,
+                   help="Leaderboard JSON (default: <MODEL_DIR>/<trainer>_hparam_leaderboard.json)")
+    args = p.parse_args(argv)
+
+    if args.select_cheapest:
+        space = COST_SPACES[args.trainer]
+    else:
+        space = (RANDOM_SPACES if args.space == "random" else DEFAULT_SPACES)[args.trainer]
+    if args.space_json:
+        with open(args.space_json, "r", encoding="utf-8") as fh:
+            space = json.load(fh)
+    trials = expand_space(space, args.space, args.trials, args.seed)
+
+    started = time.perf_counter()
+    if args.trainer == "xgb":
+        X, cat_idx, y, features, classes = prepare_xgb_dataset(args.csv, args.target)
+    else:
+        X, cat_idx, y, features, classes = prepare_lgbm_dataset(args.csv)
+    prep_seconds = time.perf_counter() - started
+    print(f"Dataset: {X.shape[0]} rows x {X.shape[1]} features, classes={classes} ({prep_seconds:.2f}s to prepare)")
+    print(f"Evaluating {len(trials)} {args.space} trials for {args.trainer}")
+
+    leaderboard, info = search(args.trainer, X, y, trials, args.workers, args.early_stopping_rounds,
+                               args.latency_repeats, args.seed, cat_idx=cat_idx)
+    front = pareto_front(leaderboard, args.cost)
+    selected = select_cheapest(leaderboard, args.tolerance, args.cost, args.trainer)
+    report = {
+        "trainer": args.trainer,
+        "target": args.target if args.trainer == "xgb" else "prakriti",
+        "csv": args.csv,
+        "space": space,
+        "mode": args.space,
+        "n_rows": int(X.shape[0]),
+        "n_features": int(X.shape[1]),
+        "classes": classes,
+        "prepare_seconds": round(prep_seconds, 3),
+        "search_seconds": round(time.perf_counter() - started - prep_seconds, 3),
+        **info,
+        "best": leaderboard[0] if leaderboard and "error" not in leaderboard[0] else None,
+        "selection": {"cost": args.cost, "tolerance": args.tolerance},
+        "selected": selected,
+        "pareto_front": [{"trial": r["trial"], "params": r["params"], "accuracy": r["accuracy"],
+                          "cost": inference_cost(r, args.cost)} for r in front],
+        "leaderboard": leaderboard,
+    }
+    output = args.output or os.path.join(os.getenv("MODEL_DIR", "./models_out"), f"{args.trainer}_hparam_leaderboard.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Leaderboard written to {output}")
+    if report["best"]:
+        b = report["best"]
+        print(f"Best: {b['params']} accuracy={b['accuracy']:.4f} "
+              f"p50={b['single_row_latency_ms']['p50']}ms size={b['model_bytes']}B")
+    if selected:
+        print(f"Selected ({args.cost}, tolerance {args.tolerance}): {selected['params']} "
+              f"accuracy={selected['accuracy']:.4f} p99={selected['single_row_latency_ms']['p99']}ms "
+              f"batch/row={selected['batch_latency_ms']['per_row_p50']}ms size={selected['model_bytes']}B")
+    return 0 if report["best"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# models/incremental.py
+"""
+Helpers for incremental (warm-start) training shared by train.py and train_csv.py.
+
+A model's manifest records the data watermark it was trained up to:
+  - "rows": number of rows consumed (positional, for append-only CSVs)
+  - "column"/"value": max timestamp seen, when the data has created_at/updated_at
+
+An incremental run trains only on rows past the watermark and continues
+boosting from the existing booster. A full rebuild is forced periodically
+(every `full_rebuild_every` incremental runs) or when the new data is a large
+fraction of the total, to keep the ensemble from drifting on small batches.
+
+replace_booster() is the one place that hands a continued booster back to
+its sklearn wrapper; see its docstring.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+WATERMARK_COLUMNS = ("updated_at", "created_at", "completed_at")
+
+# library versions replace_booster() has been verified against (test_incremental.py checks them)
+BOOSTER_SWAP_VERIFIED = {"lightgbm": ("4.3.",), "xgboost": ("2.1.",)}
+
+def compute_watermark(df: pd.DataFrame) -> Dict[str, Any]:
+    watermark: Dict[str, Any] = {"rows": int(len(df))}
+    for col in WATERMARK_COLUMNS:
+        if col in df.columns:
+            ts = pd.to_datetime(df[col], errors="coerce", utc=True)
+            if ts.notna().any():
+                watermark["column"] = col
+                watermark["value"] = ts.max().isoformat()
+                break
+    return watermark
+
+def new_rows_mask(df: pd.DataFrame, watermark: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Boolean mask of rows not covered by the watermark"""
+    if not watermark:
+        return np.ones(len(df), dtype=bool)
+    col = watermark.get("column")
+    if col and col in df.columns and watermark.get("value"):
+        ts = pd.to_datetime(df[col], errors="coerce", utc=True)
+        return (ts > pd.Timestamp(watermark["value"])).fillna(False).to_numpy()
+    mask = np.zeros(len(df), dtype=bool)
+    mask[int(watermark.get("rows", 0)):] = True
+    return mask
+
+def should_full_rebuild(manifest: Optional[Dict[str, Any]], n_new: int, n_total: int,
+                        full_rebuild_every: int = 10, max_incremental_fraction: float = 0.5) -> Tuple[bool, str]:
+    if not manifest:
+        return True, "no previous manifest"
+    runs = int(manifest.get("incremental_runs_since_full", 0))
+    if full_rebuild_every and runs + 1 >= full_rebuild_every:
+        return True, f"periodic full rebuild after {runs} incremental runs"
+    if n_total and n_new / n_total > max_incremental_fraction:
+        return True, f"new rows are {n_new / n_total:.0%} of the dataset"
+    return False, "incremental"
+
+def next_manifest(previous: Optional[Dict[str, Any]], mode: str, watermark: Dict[str, Any],
+                  n_rows_trained: int, reason: str = "", **extra: Any) -> Dict[str, Any]:
+    runs = 0 if mode == "full" else int((previous or {}).get("incremental_runs_since_full", 0)) + 1
+    manifest = {
+        "training_mode": mode,
+        "reason": reason,
+        "data_watermark": watermark,
+        "rows_trained_this_run": int(n_rows_trained),
+        "incremental_runs_since_full": runs,
+        "last_full_rebuild_at": (previous or {}).get("last_full_rebuild_at") if mode != "full"
+                                else datetime.now(timezone.utc).isoformat(),
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+    }
+    manifest.update(extra)
+    return manifest
+
+def replace_booster(estimator: Any, booster: Any) -> Any:
+    """
+    Make a fitted LGBMClassifier / XGBClassifier predict with `booster`, a
+    continuation (lgb.train init_model / xgb.train xgb_model) of its own booster
+    with the same classes and features.
+
+    Neither wrapper can adopt a booster through a public API: refitting with
+    init_model / xgb_model re-derives the classes from the new rows, which
+    breaks on small batches that miss a class. So this sets the private
+    _Booster attribute both wrappers predict with, and checks that the public
+    accessor now returns it. BOOSTER_SWAP_VERIFIED lists the versions tested.
+    """
+    estimator._Booster = booster
+    current = estimator.booster_ if hasattr(type(estimator), "booster_") else estimator.get_booster()
+    if current is not booster:
+        raise RuntimeError(f"{type(estimator).__name__} did not adopt the continued booster; "
+                           "re-verify incremental.replace_booster for this library version")
+    return estimator
@@ -1,11 +1,10 @@
 # models/inference.py
 import os
-import json
-import joblib
 import numpy as np
 import pandas as pd
 from typing import Dict, Any, List, Optional, Tuple
 import traceback
+from model_bundle import load_model_and_meta
 
 import numpy as np
 
@@ -32,7 +31,7 @@ def convert_numpy_types(obj):
     return obj
 
 def load_model() -> Tuple[Any, Dict]:
-    """Load the trained model and metadata"""
+    """Load the trained model and metadata (prakriti.bundle, else the legacy joblib + JSON files)"""
     global _model, _metadata
     
     if _model is not None and _metadata is not None:
@@ -40,23 +39,14 @@ def load_model() -> Tuple[Any, Dict]:
     
     try:
         models_dir = os.path.join(os.path.dirname(__file__), 'models_out')
-        model_path = os.path.join(models_dir, 'prakriti_model.joblib')
-        meta_path = os.path.join(models_dir, 'prakriti_meta.json')
-        
-        if not os.path.exists(model_path):
-            print(f"⚠️ Model file not found at {model_path}")
-            # Return a dummy model for development
-            return None, {"features": [], "categorical_features": []}
-        
-        _model = joblib.load(model_path)
-        
-        if os.path.exists(meta_path):
-            with open(meta_path, 'r') as f:
-                _metadata = json.load(f)
-        else:
-            _metadata = {"features": [], "categorical_features": []}
+        _model, _metadata, _ = load_model_and_meta(models_dir, 'prakriti')
+        _metadata = _metadata or {"features": [], "categorical_features": []}
         
         return _model, _metadata
+    except FileNotFoundError as e:
+        print(f"⚠️ {e}")
+        # Return a dummy model for development
+        return None, {"features": [], "categorical_features": []}
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         return None, {"features": [], "categorical_features": []}
@@ -1,15 +1,22 @@
 # models/inference.py
 import os
-import json
-import joblib
+import threading
 import numpy as np
-import pandas as pd
 from typing import Dict, Any, List, Optional, Tuple
 import traceback
+from model_bundle import load_model_and_meta, model_version, open_model
+from tracing import mark, span
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "models_out")
+BUNDLE_PATH = os.path.join(MODEL_DIR, "prakriti.bundle")
 
 # Cache for model
 _model = None
 _metadata = None
+_model_version = None
+# The served bundle stays open (memory-mapped): its other components decode only when asked for
+_bundle = None
+_load_lock = threading.Lock()
 
 def convert_numpy_types(obj):
     """Convert numpy types to Python native types"""
@@ -30,33 +37,54 @@ def convert_numpy_types(obj):
     return obj
 
 def load_model() -> Tuple[Any, Dict[str, Any]]:
-    """Load the ML model and metadata"""
-    global _model, _metadata
+    """Load the ML model and metadata (prakriti.bundle, else the legacy joblib + JSON files)"""
+    global _model, _metadata, _model_version, _bundle
     try:
         if _model is None or _metadata is None:
-            model_dir = os.path.join(os.path.dirname(__file__), "models_out")
-            model_path = os.path.join(model_dir, "prakriti_model.joblib")
-            meta_path = os.path.join(model_dir, "prakriti_meta.json")
-            
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file not found: {model_path}")
-            
-            _model = joblib.load(model_path)
-            
-            if os.path.exists(meta_path):
-                with open(meta_path, 'r') as f:
-                    _metadata = json.load(f)
-            else:
-                _metadata = {}
+            with _load_lock:
+                if _model is None or _metadata is None:
+                    model, metadata, version, bundle = open_model(MODEL_DIR, "prakriti")
+                    _bundle, _model_version, _metadata, _model = bundle, version, metadata, model
         
         return _model, _metadata
     except Exception as e:
         print(f"Error loading model: {e}")
         raise
 
-def predict_from_answers(answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+def get_component(name: str, default: Any = None) -> Any:
+    """Another component of the served bundle (e.g. "label_encoder"), decoded on first use"""
+    load_model()
+    return _bundle.get(name, default) if _bundle is not None else default
+
+def unload_model():
+    """Drop the cached model and close its bundle; the next load_model() reads the current files"""
+    global _model, _metadata, _model_version, _bundle
+    with _load_lock:
+        bundle, _bundle = _bundle, None
+        _model = _metadata = _model_version = None
+    if bundle is not None:
+        bundle.close()
+
+def load_model_from(model_dir: str) -> Tuple[Any, Dict[str, Any]]:
+    """Load a model and metadata from another directory (e.g. a candidate) without touching the cache"""
+    model, metadata, _ = load_model_and_meta(model_dir, "prakriti")
+    return model, metadata
+
+def get_model_version() -> str:
+    """Bundle id (or content hash of a legacy model file), used to tag scored results"""
+    global _model_version
+    if _model_version is None:
+        version = model_version(MODEL_DIR, "prakriti")
+        if version == "none":
+            return version
+        _model_version = version
+    return _model_version
+
+def predict_from_answers(answers: List[Dict[str, Any]], model: Any = None,
+                         metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    Predict Prakriti from questionnaire answers using ML model and traditional scoring
+    Predict Prakriti from questionnaire answers using ML model and traditional scoring.
+    Uses the cached serving model unless an explicit model/metadata pair is given.
     """
     try:
         print(f"📊 Processing prediction request with {len(answers)} answers")
@@ -69,7 +97,10 @@ def predict_from_answers(answers: List[Dict[str, Any]]) -> Dict[str, Any]:
         }
         
         # Load the model and metadata
-        model, metadata = load_model()
+        if model is None:
+            with span("cache_lookup", cached=_model is not None):
+                model, metadata = load_model()
+        metadata = metadata or {}
         model_features = metadata.get('features', [])
         
         # Calculate traditional scores
@@ -95,26 +126,29 @@ def predict_from_answers(answers: List[Dict[str, Any]]) -> Dict[str, Any]:
         try:
             if model is not None and answers:
                 # Convert answers to feature vector
-                feature_vector = {}
-                
-                for answer in answers:
-                    feature_name = answer.get('trait', '').lower()
-                    if feature_name in model_features:
-                        feature_vector[feature_name] = float(answer.get('weight', 0.5))
-                
-                if feature_vector:
+                with span("feature_prep", features=len(model_features)) as prep:
+                    feature_vector = {}
+                    
+                    for answer in answers:
+                        feature_name = answer.get('trait', '').lower()
+                        if feature_name in model_features:
+                            feature_vector[feature_name] = float(answer.get('weight', 0.5))
+                    
                     # Create feature array
                     X = np.array([[
                         feature_vector.get(feature, 0.0) 
                         for feature in model_features
-                    ]])
-                    
+                    ]]) if feature_vector else None
+                    prep.set(matched=len(feature_vector))
+                
+                if X is not None:
                     # Get prediction and probabilities
-                    predicted_class = model.predict(X)[0]
+                    with span("model_predict"):
+                        predicted_class = model.predict(X)[0]
+                        probabilities = model.predict_proba(X)[0] if hasattr(model, 'predict_proba') else None
                     
                     # Get probabilities if model supports it
-                    if hasattr(model, 'predict_proba'):
-                        probabilities = model.predict_proba(X)[0]
+                    if probabilities is not None:
                         confidence = max(probabilities)
                         
                         # Create probability dictionary with dosha names
@@ -142,11 +176,12 @@ def predict_from_answers(answers: List[Dict[str, Any]]) -> Dict[str, Any]:
         except Exception as ml_error:
             print(f"⚠️ ML prediction failed, using traditional calculation: {ml_error}")
             # Use traditional calculation as fallback
-            ml_prediction = {
-                'predicted': dominant,
-                'confidence': 0.85,  # High confidence for traditional method
-                'probabilities': prakriti_scores
-            }
+            with span("fallback", reason=type(ml_error).__name__):
+                ml_prediction = {
+                    'predicted': dominant,
+                    'confidence': 0.85,  # High confidence for traditional method
+                    'probabilities': prakriti_scores
+                }
         
         # Ensure consistent data structure
         normalized_scores = {
@@ -177,6 +212,7 @@ def predict_from_answers(answers: List[Dict[str, Any]]) -> Dict[str, Any]:
     except Exception as e:
         print(f"Error in prediction: {traceback.format_exc()}")
         # Return a safe default response
+        mark("fallback", reason=type(e).__name__, default_response=True)
         return {
             'prakriti': {
                 'vata': 0.33,
@@ -1,12 +1,24 @@
 # models/main.py
 import os
+import time
 import traceback
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 from inference_updated import predict_from_answers
 import inference_updated as inference
+from drift_monitor import DriftMonitor, load_reference_profile
+from prediction_store import PredictionRecorder, recorder_from_env
+import traffic_capture
+from shadow_scoring import ShadowScorer, scorer_from_env
+from retrain_scheduler import RetrainScheduler, scheduler_from_env
+from execution_policy import Overloaded, policy_from_env
+from tracing import Tracer, span, tracer_from_env
+from memory_diagnostics import diagnostics_from_env
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -42,6 +54,109 @@ async def log_requests(request: Request, call_next):
     print(f"   Response: {response.status_code}")
     return response
 
+# Per-request tracing (TRACE_SAMPLE_RATE, TRACE_EXPORTER); request ids come from the Node API's x-request-id
+try:
+    tracer = tracer_from_env()
+except ValueError as ex:
+    print(f"⚠️ Trace export disabled, keeping traces in memory only: {ex}")
+    tracer = Tracer(sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.01")))
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with tracer.request(f"{request.method} {request.url.path}", request.headers) as trace:
+        response = await call_next(request)
+        trace.attrs["status_code"] = response.status_code
+    response.headers["x-request-id"] = trace.request_id
+    response.headers["x-trace-id"] = trace.trace_id
+    return response
+
+# Cores split between concurrent predictions and their native thread pools (ML_WORKERS,
+# ML_THREADS_PER_REQUEST, ML_INFERENCE_CONCURRENCY, ML_QUEUE_TIMEOUT_MS)
+execution_policy = policy_from_env()
+
+# Allocation tracing / RSS sampling, off until an admin starts it (MEMORY_SAMPLE_SECONDS starts the sampler)
+memory_diagnostics = diagnostics_from_env()
+
+# Drift monitor (enabled when a reference profile exists next to the model)
+drift_monitor: Optional[DriftMonitor] = None
+
+def init_drift_monitor():
+    global drift_monitor
+    profile = load_reference_profile(inference.MODEL_DIR)
+    if profile is None:
+        drift_monitor = None
+        print("⚠️ No drift reference profile found; drift monitoring disabled")
+        return
+    drift_monitor = DriftMonitor(
+        profile,
+        alert_threshold=float(os.getenv("DRIFT_ALERT_PSI", "0.25")),
+        min_samples=int(os.getenv("DRIFT_MIN_SAMPLES", "200")),
+    )
+    drift_monitor.on_alert(lambda report: print(
+        f"🚨 Feature drift detected ({', '.join(report['drifted'])}); consider retraining"
+    ))
+
+def observe_drift(answers: Any, result: Optional[Dict[str, Any]]):
+    if drift_monitor is None or not result:
+        return
+    try:
+        drift_monitor.observe_answers(answers, result.get("prakriti", {}).get("dominant"))
+    except Exception as e:
+        print(f"⚠️ Drift monitor update failed: {e}")
+
+# Write-behind prediction log (enabled with PREDICTION_SINK)
+prediction_recorder: Optional[PredictionRecorder] = None
+# Version tag of the served model, cached when it is (re)loaded so the request path does no lookups
+served_model_version = "none"
+
+def record_prediction(answers: Any, result: Optional[Dict[str, Any]], latency_ms: float, endpoint: str):
+    if prediction_recorder is None or not result:
+        return
+    prediction_recorder.record(answers, result, served_model_version, latency_ms, endpoint)
+
+# Traffic capture for replay testing (enabled with TRAFFIC_CAPTURE_DIR)
+traffic_recorder: Optional[traffic_capture.TrafficRecorder] = None
+
+def capture_traffic(request: Request, arrived_at: float, endpoint: str, payload: Any,
+                    status: int, latency_ms: float, response: Any):
+    if traffic_recorder is None or request.headers.get("x-replay"):
+        return
+    traffic_recorder.capture(arrived_at, endpoint, payload, status, latency_ms, response)
+
+# Shadow scoring of a candidate model (enabled with SHADOW_MODEL_DIR)
+shadow_scorer: Optional[ShadowScorer] = None
+
+# Background retraining (RETRAIN_SCHEDULE / RETRAIN_NEW_LABELS / RETRAIN_DRIFT_PSI); /retrain shares its guard
+retrain_scheduler: Optional[RetrainScheduler] = None
+
+def reload_model(job: Optional[Dict[str, Any]] = None):
+    """Swap in the freshly trained model and restart drift monitoring against its profile"""
+    global served_model_version
+    inference.unload_model()
+    model, _ = inference.load_model()
+    served_model_version = inference.get_model_version()
+    execution_policy.configure_model(model)
+    init_drift_monitor()
+    print("✅ Model retrained and reloaded successfully")
+
+def get_retrain_scheduler() -> RetrainScheduler:
+    global retrain_scheduler
+    if retrain_scheduler is None:
+        retrain_scheduler = scheduler_from_env(
+            inference.MODEL_DIR,
+            drift_source=lambda: drift_monitor.scores() if drift_monitor is not None else None,
+            on_success=reload_model,
+            drift_reset=lambda: drift_monitor.reset() if drift_monitor is not None else None,
+        )
+    return retrain_scheduler
+
+def require_admin(request: Request):
+    ML_ADMIN_KEY = os.getenv("ML_ADMIN_KEY")
+    if ML_ADMIN_KEY:
+        header_key = request.headers.get("x-ml-admin-key")
+        if header_key != ML_ADMIN_KEY:
+            raise HTTPException(status_code=403, detail="Forbidden: Invalid admin key")
+
 class PredictRequest(BaseModel):
     answers: Any
 
@@ -58,11 +173,62 @@ class HealthResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Load models on startup"""
+    global served_model_version
+    tracer.start()
     try:
-        inference.load_model()
+        model, _ = inference.load_model()
+        served_model_version = inference.get_model_version()
+        execution_policy.configure_model(model)
         print("✅ SwasthyaSync ML models loaded successfully")
     except Exception as ex:
         print(f"⚠️ Model load warning: {ex}")
+    # after the model load, so the OpenMP/BLAS pools it brought in are the ones capped
+    execution_policy.apply()
+    init_drift_monitor()
+
+    global prediction_recorder
+    try:
+        prediction_recorder = recorder_from_env()
+        if prediction_recorder is not None:
+            print(f"✅ Prediction log enabled: {os.getenv('PREDICTION_SINK')}")
+    except Exception as ex:
+        print(f"⚠️ Prediction log disabled: {ex}")
+
+    global traffic_recorder
+    traffic_recorder = traffic_capture.recorder_from_env()
+    if traffic_recorder is not None:
+        print(f"✅ Traffic capture enabled: {os.getenv('TRAFFIC_CAPTURE_DIR')}")
+
+    global shadow_scorer
+    try:
+        shadow_scorer = scorer_from_env(saturation=execution_policy.saturation)
+        if shadow_scorer is not None:
+            execution_policy.configure_model(shadow_scorer.model, threads=1)
+            print(f"✅ Shadow scoring enabled for candidate: {os.getenv('SHADOW_MODEL_DIR')}")
+    except Exception as ex:
+        print(f"⚠️ Shadow scoring disabled: {ex}")
+
+    try:
+        scheduler = get_retrain_scheduler()
+        if scheduler.has_triggers():
+            scheduler.start()
+            print(f"✅ Retrain scheduler started (next scheduled run: {scheduler.status()['next_scheduled_run']})")
+    except Exception as ex:
+        print(f"⚠️ Retrain scheduler disabled: {ex}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered prediction records before exit"""
+    if prediction_recorder is not None:
+        prediction_recorder.stop()
+    if traffic_recorder is not None:
+        traffic_recorder.stop()
+    if shadow_scorer is not None:
+        shadow_scorer.stop()
+    if retrain_scheduler is not None:
+        retrain_scheduler.stop()
+    tracer.stop()
+    memory_diagnostics.stop()
 
 @app.get("/", response_model=Dict[str, str])
 async def root():
@@ -93,7 +259,7 @@ async def health_check():
         )
 
 @app.post("/predict", response_model=PredictResponse)
-async def predict_prakriti(req: PredictRequest):
+async def predict_prakriti(req: PredictRequest, request: Request):
     """
     Predict Prakriti constitution from questionnaire answers
     
@@ -109,6 +275,24 @@ async def predict_prakriti(req: PredictRequest):
         ]
     }
     """
+    arrived_at = time.time()
+    started = time.perf_counter()
+    status, result = 500, None
+    try:
+        result = await _predict_prakriti(req)
+        status = 200
+        if shadow_scorer is not None:
+            shadow_scorer.submit(req.answers, result)
+        with span("serialize"):
+            return JSONResponse(content=jsonable_encoder(PredictResponse(**result)))
+    except HTTPException as he:
+        status = he.status_code
+        raise
+    finally:
+        capture_traffic(request, arrived_at, "/predict", {"answers": req.answers}, status,
+                        (time.perf_counter() - started) * 1000, result)
+
+async def _predict_prakriti(req: PredictRequest):
     try:
         # Log the prediction request and answers for debugging
         print(f"📊 Processing prediction request with {len(req.answers) if req.answers else 0} answers")
@@ -117,18 +301,27 @@ async def predict_prakriti(req: PredictRequest):
             print(f"  {idx + 1}. Trait: {answer.get('trait', 'N/A')}, Weight: {answer.get('weight', 'N/A')}")
         
         # Validate input
-        if not req.answers:
-            raise HTTPException(status_code=400, detail="Answers are required")
+        with span("validate", answers=len(req.answers) if req.answers else 0):
+            if not req.answers:
+                raise HTTPException(status_code=400, detail="Answers are required")
         
-        # Make prediction
-        result = predict_from_answers(req.answers)
+        # Make prediction (off the event loop, in one of the policy's concurrency slots)
+        started = time.perf_counter()
+        with span("inference"):
+            result = await run_in_threadpool(execution_policy.run, predict_from_answers, req.answers)
+        latency_ms = (time.perf_counter() - started) * 1000
         
         if not result:
             raise HTTPException(status_code=500, detail="Prediction failed")
         
+        with span("record"):
+            observe_drift(req.answers, result)
+            record_prediction(req.answers, result, latency_ms, "/predict")
         print(f"✅ Prediction successful: {result.get('prakriti', {}).get('dominant', 'unknown')}")
         return result
         
+    except Overloaded as oe:
+        raise HTTPException(status_code=503, detail=str(oe))
     except FileNotFoundError as fe:
         print(f"❌ Model file not found: {fe}")
         raise HTTPException(
@@ -150,45 +343,60 @@ async def retrain_model(request: Request):
     """
     Retrain the ML model (protected endpoint)
     Include header: x-ml-admin-key with your admin key
+    Query: ?mode=full (default) or ?mode=incremental (warm start on rows added since the last model)
+           &force=true retrains even when data, settings and code are unchanged
+           &wait=false starts the job in the background and returns 202
+    Training runs in a child process; only one job runs per node (409 while one is running).
     """
-    # Check admin key if provided
-    ML_ADMIN_KEY = os.getenv("ML_ADMIN_KEY")
-    if ML_ADMIN_KEY:
-        header_key = request.headers.get("x-ml-admin-key")
-        if header_key != ML_ADMIN_KEY:
-            raise HTTPException(status_code=403, detail="Forbidden: Invalid admin key")
+    require_admin(request)
     
-    try:
-        # Import training module
-        from train_csv import train_model
-        
-        # Retrain
-        print("🔄 Starting model retraining...")
-        pipeline, metadata = train_model()
-        
-        # Clear cached models and reload
-        inference._model = None
-        inference._metadata = None
-        inference.load_model()
-        
-        print("✅ Model retrained and reloaded successfully")
+    mode = request.query_params.get("mode", "full")
+    if mode not in ("incremental", "full"):
+        raise HTTPException(status_code=400, detail="mode must be 'incremental' or 'full'")
+    force = request.query_params.get("force", "false").lower() in ("1", "true", "yes")
+    wait = request.query_params.get("wait", "true").lower() not in ("0", "false", "no")
+    scheduler = get_retrain_scheduler()
+    
+    if not wait:
+        job = scheduler.submit("manual", "POST /retrain", mode, force)
+        if job["status"] == "busy":
+            raise HTTPException(status_code=409, detail="A retraining job is already running")
+        return JSONResponse(status_code=202, content={"status": "started", "status_url": "/retrain/status"})
+    
+    job = await run_in_threadpool(scheduler.run, "manual", "POST /retrain", mode, force)
+    if job["status"] == "busy":
+        raise HTTPException(status_code=409, detail="A retraining job is already running")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Training failed: {job.get('error')}")
+    
+    result = job.get("result") or {}
+    if result.get("status") == "no_new_data":
         return {
-            "status": "success",
-            "message": "Model retrained successfully",
-            "model_accuracy": metadata.get("accuracy", "N/A")
+            "status": "no_change",
+            "message": "No new rows since the last model; existing model kept",
+            "manifest": result.get("manifest")
         }
-        
-    except ImportError as ie:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Training module not available: {str(ie)}"
-        )
-    except Exception as e:
-        print(f"Training error: {traceback.format_exc()}")
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Training failed: {str(e)}"
-        )
+    if result.get("status") == "no_change":
+        return {
+            "status": "no_change",
+            "message": "Data, parameters and code unchanged since the last full training; existing model kept",
+            "training_key": result.get("training_key"),
+            "manifest": result.get("manifest")
+        }
+    return {
+        "status": "success",
+        "message": "Model retrained successfully",
+        "model_accuracy": result.get("accuracy") or "N/A",
+        "training_mode": result.get("training_mode"),
+        "manifest": result.get("manifest"),
+        "job": {"id": job["id"], "duration_seconds": job["duration_seconds"]}
+    }
+
+@app.get("/retrain/status")
+async def retrain_status(request: Request):
+    """Running job, trigger state and the bounded history of retraining jobs"""
+    require_admin(request)
+    return get_retrain_scheduler().status()
 
 @app.get("/model/info")
 async def model_info():
@@ -206,9 +414,115 @@ async def model_info():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not load model info: {str(e)}")
 
+@app.get("/monitor/drift")
+async def drift_report():
+    """Drift scores (PSI) of live inputs and predictions against the training profile"""
+    if drift_monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring disabled: no reference profile found")
+    return drift_monitor.scores()
+
+@app.get("/monitor/prediction-log")
+async def prediction_log_stats():
+    """Buffer depth, written and dropped counts of the write-behind prediction log"""
+    if prediction_recorder is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_recorder.stats()}
+
+@app.get("/monitor/execution")
+async def execution_stats():
+    """Effective core/thread partitioning, loaded native thread pools and inference queue stats"""
+    return execution_policy.describe(inference._model)
+
+@app.get("/monitor/traces")
+async def recent_traces(request_id: Optional[str] = None, order: str = "recent", limit: int = 20):
+    """
+    Sampled request traces kept in memory, with per-stage durations
+    Query: ?request_id=<x-request-id or trace id>, or ?order=slowest&limit=10
+    """
+    if request_id:
+        traces = tracer.find(request_id)
+    elif order == "slowest":
+        traces = tracer.slowest(limit)
+    else:
+        traces = tracer.recent(limit)
+    return {**tracer.stats(), "stages": tracer.stage_summary(), "traces": traces}
+
+@app.get("/monitor/memory")
+async def memory_status(request: Request, top: int = 0, group_by: str = "lineno"):
+    """
+    RSS, traced heap and approximate model / cache sizes of this worker (admin)
+    Query: ?top=20 adds the largest live allocation sites (needs tracing), &group_by=lineno|filename|traceback
+    """
+    require_admin(request)
+    objects = {
+        "model": inference._model,
+        "model_metadata": inference._metadata,
+        "shadow_model": shadow_scorer.model if shadow_scorer is not None else None,
+        "drift_monitor": drift_monitor,
+        "prediction_recorder": prediction_recorder,
+        "traffic_recorder": traffic_recorder,
+        "traces": tracer,
+    }
+    report = {**memory_diagnostics.status(),
+              "sizes": await run_in_threadpool(memory_diagnostics.sizes, objects, ["model", "shadow_model"])}
+    if top:
+        try:
+            report["top"] = await run_in_threadpool(memory_diagnostics.top, top, group_by)
+        except (RuntimeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return report
+
+@app.post("/monitor/memory/start")
+async def memory_start(request: Request, frames: Optional[int] = None, sample_seconds: Optional[float] = None):
+    """Start allocation tracing (slows allocation-heavy code) and optionally RSS sampling (admin)"""
+    require_admin(request)
+    return memory_diagnostics.start(frames=frames, sample_seconds=sample_seconds)
+
+@app.post("/monitor/memory/stop")
+async def memory_stop(request: Request):
+    """Stop allocation tracing and sampling and release the snapshots (admin)"""
+    require_admin(request)
+    return memory_diagnostics.stop()
+
+@app.post("/monitor/memory/snapshot")
+async def memory_snapshot(request: Request, label: Optional[str] = None):
+    """Keep a labelled allocation snapshot to diff against later (admin)"""
+    require_admin(request)
+    try:
+        return await run_in_threadpool(memory_diagnostics.snapshot, label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/monitor/memory/diff")
+async def memory_diff(request: Request, base: str = "start", target: Optional[str] = None,
+                      limit: int = 20, group_by: str = "lineno"):
+    """Allocation sites that grew from snapshot `base` to `target` (default: now) (admin)"""
+    require_admin(request)
+    try:
+        return await run_in_threadpool(memory_diagnostics.diff, base, target, limit, group_by)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/monitor/memory/samples")
+async def memory_samples(request: Request, limit: Optional[int] = None):
+    """Periodic RSS / traced-heap samples (admin; start with sample_seconds or MEMORY_SAMPLE_SECONDS)"""
+    require_admin(request)
+    return {"sampling_seconds": memory_diagnostics.sample_seconds, "samples": memory_diagnostics.samples(limit)}
+
+@app.get("/shadow/stats")
+async def shadow_stats():
+    """Agreement, probability deltas and latency of the shadow candidate model"""
+    if shadow_scorer is None:
+        raise HTTPException(status_code=404, detail="Shadow scoring disabled: set SHADOW_MODEL_DIR")
+    return shadow_scorer.stats()
+
 @app.post("/predict/batch")
-async def predict_batch(requests: List[PredictRequest]):
+async def predict_batch(requests: List[PredictRequest], request: Request):
     """Batch prediction endpoint for multiple questionnaires"""
+    arrived_at = time.time()
+    batch_started = time.perf_counter()
     if len(requests) > 50:  # Limit batch size
         raise HTTPException(status_code=400, detail="Batch size too large (max 50)")
     
@@ -217,17 +531,28 @@ async def predict_batch(requests: List[PredictRequest]):
     
     for i, req in enumerate(requests):
         try:
-            result = predict_from_answers(req.answers)
+            started = time.perf_counter()
+            with span("inference", index=i):
+                result = await run_in_threadpool(execution_policy.run, predict_from_answers, req.answers)
+            latency_ms = (time.perf_counter() - started) * 1000
+            with span("record", index=i):
+                observe_drift(req.answers, result)
+                record_prediction(req.answers, result, latency_ms, "/predict/batch")
             results.append({"index": i, "result": result})
+        except Overloaded as oe:
+            raise HTTPException(status_code=503, detail=str(oe))
         except Exception as e:
             errors.append({"index": i, "error": str(e)})
     
-    return {
+    response = {
         "successful_predictions": len(results),
         "failed_predictions": len(errors),
         "results": results,
         "errors": errors
     }
+    capture_traffic(request, arrived_at, "/predict/batch", [{"answers": r.answers} for r in requests],
+                    200, (time.perf_counter() - batch_started) * 1000, response)
+    return response
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -1,46 +1,159 @@
 # make_synthetic_prakriti_csv.py
+"""
+Synthetic prakriti training data, vectorized and streamed in chunks.
+
+Every questionnaire option list below is ordered vata, pitta, kapha. A row's
+label is drawn from the class balance; each answer then takes the label's
+option with probability `signal` and a uniformly random option otherwise:
+
+  signal 0    answers carry no information about the label
+  signal 1    every answer is the label's option
+  default 0.3 learnable but noisy (a few answers disagree with the label)
+
+Rows are generated and written one chunk at a time (CSV appended, Parquet
+through a pyarrow ParquetWriter), so millions of rows need only one chunk in
+memory. Output is reproducible for a given seed and chunk size. CSV is
+written by pandas with minimal quoting like the committed datasets
+(pyarrow's CSV writer quotes every field, which train_csv.py would take for
+a legacy quote-wrapped file); Parquet is ~3x faster to write and ~10x smaller.
+
+Usage:
+  python make_synthetic_prakriti_csv.py                        # 500 rows -> prakriti_training_dataset_synthetic.csv
+  python make_synthetic_prakriti_csv.py --rows 5000000 --out big.parquet --signal 0.4
+  python make_synthetic_prakriti_csv.py --rows 100000 --balance 0.5,0.3,0.2 --seed 7
+"""
+import os
+import sys
+import time
+import argparse
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import numpy as np
 import pandas as pd
-import random
-
-n = 500
-genders = ['male','female','other']
-physiques = ['Lean, thin frame', 'Moderate, muscular frame', 'Broad, heavy frame']
-skins = ['Dry, rough, thin', 'Sensitive, oily, warm', 'Thick, oily, cool']
-hair = ['Dry, thin, black', 'Fine, soft, premature graying', 'Thick, oily, lustrous']
-appetite = ['Irregular, variable','Strong, sharp, unbearable','Slow but steady']
-thirst = ['Scanty', 'Moderate', 'High']
-sleep = ['Light, interrupted','Sound, moderate duration','Heavy, prolonged']
-body_temp = ['Hands and feet are often cold','Feel warm, prefer cool environments','Adaptable, but dislike cold, damp weather']
-temperament = ['Enthusiastic, lively, imaginative','Intelligent, sharp, goal-oriented','Calm, steady, loving']
-stress_response = ['Become anxious and worried','Become irritable and angry','Withdraw and become quiet']
-
-rows = []
-for i in range(n):
-    row = {
-        'user_id': f'user_{i}',
-        'first_name': f'First{i}',
-        'last_name': f'Last{i}',
-        'age': random.randint(18,70),
-        'gender': random.choice(genders),
-        'q_physique': random.choice(physiques),
-        'q_skin': random.choice(skins),
-        'q_hair': random.choice(hair),
-        'q_appetite': random.choice(appetite),
-        'q_thirst': random.choice(thirst),
-        'q_sleep': random.choice(sleep),
-        'q_body_temp': random.choice(body_temp),
-        'q_temperament': random.choice(temperament),
-        'q_stress_response': random.choice(stress_response),
-    }
-    # heuristic mapping to a label by sampling weighted random
-    weights = {
-        'vata': random.random(),
-        'pitta': random.random(),
-        'kapha': random.random()
+
+LABELS = ['vata', 'pitta', 'kapha']
+genders = ['male', 'female', 'other']
+# option lists are ordered vata, pitta, kapha
+QUESTIONS = {
+    'q_physique': ['Lean, thin frame', 'Moderate, muscular frame', 'Broad, heavy frame'],
+    'q_skin': ['Dry, rough, thin', 'Sensitive, oily, warm', 'Thick, oily, cool'],
+    'q_hair': ['Dry, thin, black', 'Fine, soft, premature graying', 'Thick, oily, lustrous'],
+    'q_appetite': ['Irregular, variable', 'Strong, sharp, unbearable', 'Slow but steady'],
+    'q_thirst': ['Scanty', 'Moderate', 'High'],
+    'q_sleep': ['Light, interrupted', 'Sound, moderate duration', 'Heavy, prolonged'],
+    'q_body_temp': ['Hands and feet are often cold', 'Feel warm, prefer cool environments',
+                    'Adaptable, but dislike cold, damp weather'],
+    'q_temperament': ['Enthusiastic, lively, imaginative', 'Intelligent, sharp, goal-oriented',
+                      'Calm, steady, loving'],
+    'q_stress_response': ['Become anxious and worried', 'Become irritable and angry', 'Withdraw and become quiet'],
+}
+COLUMNS = ['user_id', 'first_name', 'last_name', 'age', 'gender', *QUESTIONS, 'prakriti_label']
+
+def parse_balance(text: Optional[str]) -> np.ndarray:
+    """"0.5,0.3,0.2" or "vata=0.5,pitta=0.3,kapha=0.2" -> probabilities in LABELS order"""
+    if not text:
+        return np.full(len(LABELS), 1.0 / len(LABELS))
+    parts = [p.strip() for p in text.split(",") if p.strip()]
+    if all("=" in p for p in parts):
+        named = {k.strip(): float(v) for k, v in (p.split("=", 1) for p in parts)}
+        unknown = set(named) - set(LABELS)
+        if unknown:
+            raise ValueError(f"Unknown classes in balance: {sorted(unknown)}")
+        weights = np.array([named.get(label, 0.0) for label in LABELS])
+    else:
+        weights = np.array([float(p) for p in parts])
+    if len(weights) != len(LABELS) or (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError(f"Balance needs {len(LABELS)} non-negative weights, got {text!r}")
+    return weights / weights.sum()
+
+def _prefixed(prefix: str, start: int, n: int) -> np.ndarray:
+    # a comprehension beats np.char.add here by ~7x
+    return np.array([f"{prefix}{i}" for i in range(start, start + n)], dtype=object)
+
+def generate_chunk(rng: np.random.Generator, start: int, n: int, signal: float = 0.3,
+                   balance: Optional[Sequence[float]] = None) -> pd.DataFrame:
+    """Rows start..start+n-1 of the dataset"""
+    balance = parse_balance(None) if balance is None else np.asarray(balance, dtype=float)
+    label = rng.choice(len(LABELS), size=n, p=balance)
+    data: Dict[str, Any] = {
+        'user_id': _prefixed('user_', start, n),
+        'first_name': _prefixed('First', start, n),
+        'last_name': _prefixed('Last', start, n),
+        'age': rng.integers(18, 71, size=n),
+        'gender': np.take(np.array(genders, dtype=object), rng.integers(0, len(genders), size=n)),
     }
-    row['prakriti_label'] = max(weights, key=weights.get)
-    rows.append(row)
+    for col, options in QUESTIONS.items():
+        informative = rng.random(n) < signal
+        answer = np.where(informative, label, rng.integers(0, len(options), size=n))
+        data[col] = np.take(np.array(options, dtype=object), answer)
+    data['prakriti_label'] = np.take(np.array(LABELS, dtype=object), label)
+    return pd.DataFrame(data, columns=COLUMNS)
+
+def iter_chunks(rows: int, chunk_rows: int = 100000, seed: int = 42, signal: float = 0.3,
+                balance: Optional[Sequence[float]] = None) -> Iterator[pd.DataFrame]:
+    # one independent stream per chunk, derived from the seed
+    streams = np.random.SeedSequence(seed).spawn(max(1, -(-rows // chunk_rows)))
+    for i, start in enumerate(range(0, rows, chunk_rows)):
+        yield generate_chunk(np.random.default_rng(streams[i]), start, min(chunk_rows, rows - start),
+                             signal, balance)
+
+def write_dataset(path: str, rows: int, chunk_rows: int = 100000, seed: int = 42, signal: float = 0.3,
+                  balance: Optional[Sequence[float]] = None, fmt: Optional[str] = None) -> Dict[str, Any]:
+    """Stream the dataset to CSV or Parquet (by extension unless fmt is given); returns a summary"""
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    started = time.perf_counter()
+    tmp = path + ".tmp"
+    counts = np.zeros(len(LABELS), dtype=np.int64)
+    writer = None
+    try:
+        for i, chunk in enumerate(iter_chunks(rows, chunk_rows, seed, signal, balance)):
+            counts += chunk['prakriti_label'].value_counts().reindex(LABELS, fill_value=0).to_numpy()
+            if fmt == "parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(tmp, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        if writer is not None:
+            writer.close()
+            writer = None
+        if rows == 0 and fmt == "csv":
+            pd.DataFrame(columns=COLUMNS).to_csv(tmp, index=False)
+        elif rows == 0:
+            pd.DataFrame(columns=COLUMNS).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    seconds = time.perf_counter() - started
+    return {"path": path, "format": fmt, "rows": rows, "seed": seed, "signal": signal,
+            "class_counts": dict(zip(LABELS, counts.tolist())), "bytes": os.path.getsize(path),
+            "seconds": round(seconds, 3), "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None}
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Generate a synthetic prakriti training dataset")
+    p.add_argument("--rows", type=int, default=500)
+    p.add_argument("--out", type=str, default="prakriti_training_dataset_synthetic.csv")
+    p.add_argument("--format", choices=["csv", "parquet"], default=None, help="Default: from the --out extension")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--signal", type=float, default=0.3,
+                   help="Probability that an answer matches the label's dosha (0 = no signal, 1 = perfect)")
+    p.add_argument("--balance", type=str, default=None,
+                   help="Class weights vata,pitta,kapha, e.g. 0.5,0.3,0.2 or vata=0.5,pitta=0.3,kapha=0.2")
+    p.add_argument("--chunk-rows", type=int, default=100000)
+    args = p.parse_args(argv)
+    if not 0.0 <= args.signal <= 1.0:
+        p.error("--signal must be between 0 and 1")
+    summary = write_dataset(args.out, args.rows, args.chunk_rows, args.seed, args.signal,
+                            parse_balance(args.balance), args.format)
+    print(f"Saved synthetic {summary['format'].upper()} (n={args.rows}) to {args.out}: "
+          f"{summary['class_counts']}, {summary['rows_per_second']} rows/s")
+    return 0
 
-df = pd.DataFrame(rows)
-df.to_csv('prakriti_training_dataset_synthetic.csv', index=False)
-print("Saved synthetic CSV (n=%d)" % n)
+if __name__ == "__main__":
+    sys.exit(main())
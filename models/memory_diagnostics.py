@@ -0,0 +1,299 @@
+# models/memory_diagnostics.py
+"""
+Admin-controlled memory diagnostics for long-running ML workers: where RSS
+growth comes from.
+
+  start()      begin allocation tracing (tracemalloc, `frames` deep) and,
+               optionally, a background RSS / traced-heap sampler
+  snapshot()   keep a labelled tracemalloc snapshot (bounded; oldest dropped,
+               except the 'start' baseline)
+  diff()       top allocation sites that grew between two snapshots (or now)
+  top()        top allocation sites of the live heap
+  sizes()      approximate size of the served model and in-process caches
+  samples()    the periodic RSS / heap series
+  stop()       stop tracing and sampling and free the snapshots
+
+Nothing runs until start() (or MEMORY_SAMPLE_SECONDS for the sampler alone):
+while disabled there is no tracemalloc hook, no thread and no per-request
+work, so serving pays nothing. tracemalloc itself slows allocation-heavy
+code noticeably, which is why it is never on by default. State is per
+process; with several uvicorn workers each worker reports its own.
+
+Served by main.py under /monitor/memory (x-ml-admin-key).
+
+Env:
+  MEMORY_SAMPLE_SECONDS    start the RSS sampler at startup with this interval (unset/0 = off)
+  MEMORY_SAMPLE_WINDOW     samples kept (default 720)
+  MEMORY_TRACE_FRAMES      default traceback depth of allocation sites (default 10)
+  MEMORY_MAX_SNAPSHOTS     labelled snapshots kept (default 8)
+"""
+import gc
+import os
+import sys
+import time
+import pickle
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from training_telemetry import peak_rss_mb, rss_mb
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# allocations made by the diagnostics themselves
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# -----------------------
+# sizes
+# -----------------------
+def deep_sizeof(obj: Any, max_objects: int = 200000) -> int:
+    """
+    Approximate bytes reachable from obj: sys.getsizeof over containers and
+    instance dicts, numpy buffers by nbytes. Native memory (e.g. a LightGBM or
+    XGBoost booster) is invisible here; see serialized_size.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < max_objects:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        if isinstance(o, np.ndarray):
+            total += sys.getsizeof(o) + (o.nbytes if o.base is None else 0)
+            continue
+        try:
+            total += sys.getsizeof(o)
+        except TypeError:
+            continue
+        if isinstance(o, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        elif hasattr(o, "__dict__") and not isinstance(o, type):
+            stack.append(vars(o))
+    return total
+
+def serialized_size(obj: Any) -> Optional[int]:
+    """Pickled size, which includes native model state that deep_sizeof misses"""
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return round(n / (1024 * 1024), 3) if n is not None else None
+
+# -----------------------
+# diagnostics
+# -----------------------
+class MemoryDiagnostics:
+    def __init__(self, frames: int = 10, max_snapshots: int = 8, sample_window: int = 720):
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self.samples_kept: deque = deque(maxlen=sample_window)
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.sample_seconds: Optional[float] = None
+        self.started_tracing = False  # True when we (not someone else) started tracemalloc
+        self.tracing_since: Optional[str] = None
+
+    # -----------------------
+    # control
+    # -----------------------
+    def start(self, frames: Optional[int] = None, sample_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Start allocation tracing (and the sampler when sample_seconds is given); takes a 'start' snapshot"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.frames)
+            self.started_tracing = True
+            self.tracing_since = datetime.now(timezone.utc).isoformat()
+        if "start" not in self._snapshots:
+            self.snapshot("start")
+        if sample_seconds:
+            self.start_sampler(sample_seconds)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop tracing and sampling; snapshots are released"""
+        self.stop_sampler()
+        if tracemalloc.is_tracing() and self.started_tracing:
+            tracemalloc.stop()
+        self.started_tracing = False
+        self.tracing_since = None
+        with self._lock:
+            self._snapshots.clear()
+        return self.status()
+
+    def start_sampler(self, interval: float):
+        self.stop_sampler()
+        self.sample_seconds = max(0.1, float(interval))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+
+    def stop_sampler(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.sample_seconds = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.sample_seconds)
+
+    # -----------------------
+    # measurements
+    # -----------------------
+    def sample(self) -> Dict[str, Any]:
+        traced, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        record = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "rss_mb": rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+            "traced_mb": _mb(traced),
+            "traced_peak_mb": _mb(traced_peak),
+            "gc_objects": len(gc.get_objects()),
+            "threads": threading.active_count(),
+        }
+        self.samples_kept.append(record)
+        return record
+
+    def samples(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        out = list(self.samples_kept)
+        return out[-limit:] if limit else out
+
+    def _take(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Allocation tracing is off; start it first")
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    def snapshot(self, label: Optional[str] = None) -> Dict[str, Any]:
+        """Keep a labelled snapshot for later diffs (the oldest is dropped past max_snapshots)"""
+        snap = self._take()
+        label = label or f"snapshot-{int(time.time())}"
+        entry = {"label": label, "at": datetime.now(timezone.utc).isoformat(), "rss_mb": rss_mb(), "snapshot": snap}
+        with self._lock:
+            self._snapshots.pop(label, None)
+            self._snapshots[label] = entry
+            while len(self._snapshots) > max(2, self.max_snapshots):  # the 'start' baseline is kept
+                oldest = next(k for k in self._snapshots if k != "start")
+                del self._snapshots[oldest]
+        return self._describe(entry)
+
+    @staticmethod
+    def _describe(entry: Dict[str, Any]) -> Dict[str, Any]:
+        stats = entry["snapshot"].statistics("filename")
+        return {"label": entry["label"], "at": entry["at"], "rss_mb": entry["rss_mb"],
+                "traced_mb": _mb(sum(s.size for s in stats)), "blocks": sum(s.count for s in stats)}
+
+    def snapshots(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._describe(e) for e in self._snapshots.values()]
+
+    def _get(self, label: str) -> Dict[str, Any]:
+        with self._lock:
+            if label not in self._snapshots:
+                raise KeyError(f"Unknown snapshot {label!r} (have: {list(self._snapshots)})")
+            return self._snapshots[label]
+
+    @staticmethod
+    def _site(stat: Any, group_by: str) -> str:
+        frames = stat.traceback if group_by == "traceback" else stat.traceback[:1]
+        if group_by == "filename":
+            return frames[0].filename
+        return " <- ".join(f"{f.filename}:{f.lineno}" for f in frames)
+
+    def top(self, limit: int = 20, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """Largest allocation sites of the live heap"""
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {GROUP_BY}")
+        return [{"site": self._site(s, group_by), "size_kb": round(s.size / 1024, 1), "blocks": s.count}
+                for s in self._take().statistics(group_by)[:limit]]
+
+    def diff(self, base: str = "start", target: Optional[str] = None, limit: int = 20,
+             group_by: str = "lineno") -> Dict[str, Any]:
+        """Allocation sites ordered by growth from snapshot `base` to `target` (default: now)"""
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {GROUP_BY}")
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Allocation tracing is off; start it first")
+        old = self._get(base)
+        new = self._get(target) if target else {"label": "now", "at": datetime.now(timezone.utc).isoformat(),
+                                                 "rss_mb": rss_mb(), "snapshot": self._take()}
+        stats = new["snapshot"].compare_to(old["snapshot"], group_by)
+        return {
+            "base": {k: old[k] for k in ("label", "at", "rss_mb")},
+            "target": {k: new[k] for k in ("label", "at", "rss_mb")},
+            "rss_delta_mb": round(new["rss_mb"] - old["rss_mb"], 1)
+                            if new["rss_mb"] is not None and old["rss_mb"] is not None else None,
+            "traced_delta_kb": round(sum(s.size_diff for s in stats) / 1024, 1),
+            "top": [{"site": self._site(s, group_by), "size_delta_kb": round(s.size_diff / 1024, 1),
+                     "size_kb": round(s.size / 1024, 1), "blocks_delta": s.count_diff}
+                    for s in stats[:limit]],
+        }
+
+    @staticmethod
+    def sizes(objects: Dict[str, Any], serialized: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Approximate in-process size of named objects (models, caches, buffers);
+        names in `serialized` also get their pickled size (models keep most of
+        their state in native memory).
+        """
+        serialized = serialized or []
+        out = {}
+        for name, obj in objects.items():
+            if obj is None:
+                continue
+            entry = {"type": type(obj).__name__, "approx_mb": _mb(deep_sizeof(obj))}
+            if hasattr(obj, "__len__") and not isinstance(obj, (str, bytes)):
+                try:
+                    entry["items"] = len(obj)
+                except TypeError:
+                    pass
+            if name in serialized:
+                entry["serialized_mb"] = _mb(serialized_size(obj))
+            out[name] = entry
+        return out
+
+    def status(self) -> Dict[str, Any]:
+        traced, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "tracing_since": self.tracing_since,
+            "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+            "sampling_seconds": self.sample_seconds,
+            "samples": len(self.samples_kept),
+            "snapshots": [s["label"] for s in self.snapshots()],
+            "rss_mb": rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+            "traced_mb": _mb(traced),
+            "traced_peak_mb": _mb(traced_peak),
+        }
+
+def diagnostics_from_env() -> MemoryDiagnostics:
+    diagnostics = MemoryDiagnostics(
+        frames=int(os.getenv("MEMORY_TRACE_FRAMES", "10")),
+        max_snapshots=int(os.getenv("MEMORY_MAX_SNAPSHOTS", "8")),
+        sample_window=int(os.getenv("MEMORY_SAMPLE_WINDOW", "720")),
+    )
+    interval = float(os.getenv("MEMORY_SAMPLE_SECONDS", "0") or 0)
+    if interval > 0:
+        diagnostics.start_sampler(interval)
+    return diagnostics
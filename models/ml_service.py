@@ -1,9 +1,10 @@
 # ml_service.py
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import os, joblib, json
+import os
 import pandas as pd
 from typing import Any, Dict, List
+from model_bundle import load_model_and_meta
 
 MODEL_DIR = os.getenv("MODEL_DIR", "./models_out")
 PRAKRITI_MODEL = os.path.join(MODEL_DIR, "prakriti_model.joblib")
@@ -28,14 +29,8 @@ def load_artifacts():
     global _model, _metadata
     if _model is not None and _metadata is not None:
         return
-    if not os.path.exists(PRAKRITI_MODEL):
-        raise FileNotFoundError(f"Model not found: {PRAKRITI_MODEL}")
-    _model = joblib.load(PRAKRITI_MODEL)
-    if os.path.exists(METADATA):
-        with open(METADATA, "r", encoding="utf-8") as fh:
-            _metadata = json.load(fh)
-    else:
-        _metadata = {}
+    # prakriti.bundle first, then the legacy prakriti_model.joblib + feature_columns.json
+    _model, _metadata, _ = load_model_and_meta(MODEL_DIR, "prakriti", legacy_meta_files=(os.path.basename(METADATA),))
 
 @app.get("/health")
 def health():
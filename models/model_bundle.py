@@ -0,0 +1,530 @@
+# models/model_bundle.py
+"""
+Single-file, versioned model bundle: <basename>.bundle
+
+Replaces the per-trainer layouts (train.py's model/vocab/label-encoder/meta
+files, train_csv.py's prakriti_model.joblib + feature_columns.json) with one
+file the loaders read first:
+
+  8-byte magic, u32 format version, u32 reserved, u64 manifest length
+  manifest (JSON): meta, and per component its kind, offset, size, sha256
+  component blobs, each aligned to 64 bytes
+
+Component kinds (inferred from the object when saving):
+  xgboost        XGBoost sklearn model in its native UBJSON format (split
+                 thresholds and leaf values are float32 in that format), zlib
+  label_encoder  LabelEncoder classes as JSON; rebuilt on load, nothing pickled
+  json           vocabularies, lists, dicts; zlib
+  array          numpy array, raw and uncompressed so it loads zero-copy from
+                 the memory map; float64 is stored as float32
+  lgbm_arrays    LightGBM classifier or Pipeline ending in one, for serving:
+                 the trees as a float32 node array (tree_arrays.py, zero-copy)
+                 followed by the preceding pipeline steps (joblib); loads as
+                 the same Pipeline with a TreeArrayClassifier last, without
+                 parsing LightGBM's text model. Cannot be retrained, so
+                 model_components() stores the LightGBM pipeline next to it
+                 as "estimator"
+  joblib         anything else (e.g. the sklearn/LightGBM Pipeline); zlib
+
+The "model" component itself is stored uncompressed: inflating it cost more
+at load than the smaller file saved (RAW_COMPONENTS).
+
+The file is memory-mapped on open and only the manifest is parsed; each
+component is checksummed and decoded on first access. open_model() leaves the
+bundle open so the serving process decodes the model alone and every other
+component (e.g. the label encoder) only if something asks for it; close the
+bundle when the model is replaced. The bundle id (a
+hash of the component checksums and meta) doubles as the model version without
+re-hashing the model file. Bundles are written to a temp file and renamed
+into place; a process still serving a replaced bundle keeps its mapping.
+
+Usage:
+  python model_bundle.py inspect models_out/prakriti.bundle
+  python model_bundle.py convert --model-dir models_out --basename prakriti   # legacy files -> bundle
+  python model_bundle.py bench --model-dir models_out --basename prakriti     # size and load time vs legacy
+"""
+import io
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import hashlib
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"SWMBNDL\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+ALIGN = 64
+BUNDLE_SUFFIX = ".bundle"
+ZLIB_LEVEL = 6
+# components written without compression because they are decoded on every model load
+RAW_COMPONENTS = ("model",)
+
+def bundle_path(model_dir: str, basename: str) -> str:
+    return os.path.join(model_dir, f"{basename}{BUNDLE_SUFFIX}")
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+# -----------------------
+# component codecs
+# -----------------------
+def _dump_xgboost(model: Any) -> Tuple[bytes, Dict[str, Any]]:
+    # save_model (not save_raw) keeps the sklearn attributes (n_classes_, classes) in the file
+    fd, tmp = tempfile.mkstemp(suffix=".ubj")
+    os.close(fd)
+    try:
+        model.save_model(tmp)
+        with open(tmp, "rb") as fh:
+            data = fh.read()
+    finally:
+        os.remove(tmp)
+    return data, {"class": type(model).__name__}
+
+def _load_xgboost(data: memoryview, entry: Dict[str, Any]) -> Any:
+    import xgboost as xgb
+    model = getattr(xgb, entry["class"])()
+    model.load_model(bytearray(data))
+    return model
+
+def _dump_label_encoder(encoder: Any) -> Tuple[bytes, Dict[str, Any]]:
+    classes = np.asarray(encoder.classes_)
+    return json.dumps(classes.tolist()).encode("utf-8"), {"dtype": classes.dtype.str}
+
+def _load_label_encoder(data: memoryview, entry: Dict[str, Any]) -> Any:
+    from sklearn.preprocessing import LabelEncoder
+    encoder = LabelEncoder()
+    encoder.classes_ = np.array(json.loads(bytes(data)), dtype=entry["dtype"])
+    return encoder
+
+def _dump_json(obj: Any) -> Tuple[bytes, Dict[str, Any]]:
+    return json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8"), {}
+
+def _load_json(data: memoryview, entry: Dict[str, Any]) -> Any:
+    return json.loads(bytes(data))
+
+def _dump_joblib(obj: Any) -> Tuple[bytes, Dict[str, Any]]:
+    import joblib
+    buf = io.BytesIO()
+    joblib.dump(obj, buf)
+    return buf.getvalue(), {"class": type(obj).__name__}
+
+def _load_joblib(data: memoryview, entry: Dict[str, Any]) -> Any:
+    import joblib
+    return joblib.load(io.BytesIO(data))
+
+def _dump_array(arr: np.ndarray) -> Tuple[bytes, Dict[str, Any]]:
+    arr = np.asarray(arr)
+    if arr.dtype == np.float64:
+        arr = arr.astype(np.float32)
+    if arr.dtype.hasobject:
+        raise TypeError("object arrays cannot be stored as an array component")
+    arr = np.ascontiguousarray(arr)
+    # dtype_to_descr keeps the field layout of structured (record) arrays
+    return arr.tobytes(), {"dtype": np.lib.format.dtype_to_descr(arr.dtype), "shape": list(arr.shape)}
+
+def _load_array(data: memoryview, entry: Dict[str, Any]) -> np.ndarray:
+    # a read-only view of the memory map: no copy, pages are read on first touch
+    dtype = np.lib.format.descr_to_dtype(_descr(entry["dtype"]))
+    return np.frombuffer(data, dtype=dtype).reshape(entry["shape"])
+
+def _descr(d: Any) -> Any:
+    # JSON turns the (name, type) pairs of a record descr into lists
+    return [tuple(f) for f in d] if isinstance(d, list) else d
+
+def _dump_lgbm_arrays(model: Any) -> Tuple[bytes, Dict[str, Any]]:
+    from tree_arrays import forest_arrays
+    steps = list(getattr(model, "steps", [("classifier", model)]))
+    name, classifier = steps[-1]
+    nodes, forest = forest_arrays(classifier)
+    node_bytes, node_entry = _dump_array(nodes)
+    data = node_bytes
+    if len(steps) > 1:
+        data += _dump_joblib(steps[:-1])[0]
+    return data, {"class": type(model).__name__, "final_step": name, "forest": forest,
+                  "nodes": {**node_entry, "size": len(node_bytes)}}
+
+def _load_lgbm_arrays(data: memoryview, entry: Dict[str, Any]) -> Any:
+    from tree_arrays import TreeArrayClassifier
+    size = entry["nodes"]["size"]
+    classifier = TreeArrayClassifier(_load_array(data[:size], entry["nodes"]), entry["forest"])
+    if entry["class"] != "Pipeline":
+        return classifier
+    from sklearn.pipeline import Pipeline
+    return Pipeline(_load_joblib(data[size:], entry) + [(entry["final_step"], classifier)])
+
+CODECS: Dict[str, Tuple[Callable[[Any], Tuple[bytes, Dict[str, Any]]], Callable[[memoryview, Dict[str, Any]], Any], bool]] = {
+    # kind: (dump, load, compressed)
+    "xgboost": (_dump_xgboost, _load_xgboost, True),
+    "label_encoder": (_dump_label_encoder, _load_label_encoder, False),
+    "json": (_dump_json, _load_json, True),
+    "joblib": (_dump_joblib, _load_joblib, True),
+    "array": (_dump_array, _load_array, False),
+    "lgbm_arrays": (_dump_lgbm_arrays, _load_lgbm_arrays, False),
+}
+
+def component_kind(obj: Any) -> str:
+    if isinstance(obj, np.ndarray):
+        return "array"
+    if isinstance(obj, (dict, list, str, int, float, bool)) or obj is None:
+        return "json"
+    module = type(obj).__module__
+    if module.startswith("xgboost") and hasattr(obj, "save_model"):
+        return "xgboost"
+    if type(obj).__name__ == "LabelEncoder" and hasattr(obj, "classes_"):
+        return "label_encoder"
+    return "joblib"
+
+def model_components(model: Any) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    (components, kinds) to bundle a trained model: a LightGBM classifier (or a
+    Pipeline ending in one) is served from its tree arrays ("model") and kept
+    whole for retraining ("estimator"); other models are stored as they are
+    """
+    from tree_arrays import UnsupportedForest, forest_arrays
+    final = model.steps[-1][1] if hasattr(model, "steps") else model
+    if type(final).__module__.startswith("lightgbm"):
+        try:
+            forest_arrays(final)
+        except UnsupportedForest:
+            return {"model": model}, {}
+        return {"model": model, "estimator": model}, {"model": "lgbm_arrays"}
+    return {"model": model}, {}
+
+# -----------------------
+# writing
+# -----------------------
+def write_bundle(path: str, components: Dict[str, Any], meta: Optional[Dict[str, Any]] = None,
+                 kinds: Optional[Dict[str, str]] = None, compress: bool = True,
+                 raw: Iterable[str] = RAW_COMPONENTS) -> Dict[str, Any]:
+    """Encode components into one bundle file (atomically); returns the manifest"""
+    blobs: List[bytes] = []
+    entries: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, obj in components.items():
+        kind = (kinds or {}).get(name) or component_kind(obj)
+        dump, _, compressible = CODECS[kind]
+        data, extra = dump(obj)
+        raw_bytes = len(data)
+        codec = None
+        if compress and compressible and name not in raw:
+            data, codec = zlib.compress(data, ZLIB_LEVEL), "zlib"
+        offset = _aligned(offset)
+        entries[name] = {"kind": kind, "offset": offset, "size": len(data), "raw_size": raw_bytes,
+                         "compression": codec, "sha256": hashlib.sha256(data).hexdigest(), **extra}
+        blobs.append(data)
+        offset += len(data)
+
+    meta_json = json.dumps(meta or {}, sort_keys=True, default=str)
+    bundle_id = hashlib.sha256(("".join(e["sha256"] for e in entries.values()) + meta_json).encode()).hexdigest()
+    manifest = {
+        "format": "swasthya-model-bundle",
+        "format_version": FORMAT_VERSION,
+        "bundle_id": bundle_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "meta": meta or {},
+        "components": entries,
+    }
+    header = json.dumps(manifest, separators=(",", ":"), default=str).encode("utf-8")
+    data_start = _aligned(HEADER.size + len(header))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(header)))
+            fh.write(header)
+            for (name, entry), blob in zip(entries.items(), blobs):
+                fh.write(b"\0" * (data_start + entry["offset"] - fh.tell()))
+                fh.write(blob)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    manifest["bytes"] = os.path.getsize(path)
+    return manifest
+
+# -----------------------
+# reading
+# -----------------------
+class BundleError(ValueError):
+    pass
+
+class ModelBundle:
+    """Memory-mapped bundle; components are verified and decoded lazily, once"""
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        self.verify = verify
+        started = time.perf_counter()
+        self._fh = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, header_len = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise BundleError(f"{path} is not a model bundle")
+            if version > FORMAT_VERSION:
+                raise BundleError(f"{path} has bundle format {version}; this code reads up to {FORMAT_VERSION}")
+            self.manifest: Dict[str, Any] = json.loads(self._mm[HEADER.size:HEADER.size + header_len])
+        except Exception:
+            self._fh.close()
+            raise
+        self._data_start = _aligned(HEADER.size + header_len)
+        self._cache: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.timings: Dict[str, float] = {"open": round((time.perf_counter() - started) * 1000, 3)}
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.manifest.get("meta") or {}
+
+    @property
+    def version(self) -> str:
+        return self.manifest["bundle_id"][:12]
+
+    def names(self) -> List[str]:
+        return list(self.manifest["components"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.manifest["components"]
+
+    def _payload(self, name: str) -> memoryview:
+        entry = self.manifest["components"][name]
+        start = self._data_start + entry["offset"]
+        view = memoryview(self._mm)[start:start + entry["size"]]
+        if len(view) != entry["size"]:
+            raise BundleError(f"{self.path}: component {name} is truncated")
+        if self.verify and hashlib.sha256(view).hexdigest() != entry["sha256"]:
+            raise BundleError(f"{self.path}: checksum mismatch for component {name}")
+        if entry.get("compression") == "zlib":
+            return memoryview(zlib.decompress(view))
+        return view
+
+    def get(self, name: str, default: Any = None) -> Any:
+        if name not in self:
+            return default
+        with self._lock:
+            if name not in self._cache:
+                started = time.perf_counter()
+                entry = self.manifest["components"][name]
+                self._cache[name] = CODECS[entry["kind"]][1](self._payload(name), entry)
+                self.timings[name] = round((time.perf_counter() - started) * 1000, 3)
+            return self._cache[name]
+
+    def verify_all(self) -> bool:
+        """Checksum every component without decoding any"""
+        for name in self.names():
+            entry = self.manifest["components"][name]
+            start = self._data_start + entry["offset"]
+            if hashlib.sha256(memoryview(self._mm)[start:start + entry["size"]]).hexdigest() != entry["sha256"]:
+                return False
+        return True
+
+    def close(self):
+        self._cache.clear()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # zero-copy arrays still reference the map; it is released with them
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_bundle(model_dir: str, basename: str, verify: bool = True) -> Optional[ModelBundle]:
+    path = bundle_path(model_dir, basename)
+    return ModelBundle(path, verify) if os.path.exists(path) else None
+
+def read_bundle_meta(model_dir: str, basename: str) -> Optional[Dict[str, Any]]:
+    """Just the meta (manifest) of a bundle, or None"""
+    bundle = open_bundle(model_dir, basename, verify=False)
+    if bundle is None:
+        return None
+    with bundle:
+        return bundle.meta
+
+def remove_files(paths: Iterable[str]) -> List[str]:
+    """Delete artifact files a bundle supersedes; returns the ones removed"""
+    removed = []
+    for p in paths:
+        if os.path.exists(p):
+            os.remove(p)
+            removed.append(p)
+    return removed
+
+# -----------------------
+# serving-model loading (bundle first, legacy files as fallback)
+# -----------------------
+LEGACY_META_FILES = ("{basename}_meta.json", "feature_columns.json")
+
+def open_model(model_dir: str, basename: str = "prakriti", legacy_meta_files: Iterable[str] = LEGACY_META_FILES
+               ) -> Tuple[Any, Dict[str, Any], str, Optional[ModelBundle]]:
+    """
+    (model, meta, version, bundle) from <basename>.bundle, else from
+    <basename>_model.joblib + its meta JSON (bundle None). The bundle is left
+    open for lazy access to its other components; the caller closes it.
+    """
+    bundle = open_bundle(model_dir, basename)
+    if bundle is not None:
+        try:
+            return bundle.get("model"), bundle.meta, bundle.version, bundle
+        except Exception:
+            bundle.close()
+            raise
+    return (*_load_legacy(model_dir, basename, legacy_meta_files), None)
+
+def load_model_and_meta(model_dir: str, basename: str = "prakriti",
+                        legacy_meta_files: Iterable[str] = LEGACY_META_FILES) -> Tuple[Any, Dict[str, Any], str]:
+    """(model, meta, version) from <basename>.bundle, else from <basename>_model.joblib + its meta JSON"""
+    model, meta, version, bundle = open_model(model_dir, basename, legacy_meta_files)
+    if bundle is not None:
+        bundle.close()
+    return model, meta, version
+
+def _load_legacy(model_dir: str, basename: str, legacy_meta_files: Iterable[str]) -> Tuple[Any, Dict[str, Any], str]:
+    import joblib
+    model_path = os.path.join(model_dir, f"{basename}_model.joblib")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found: {bundle_path(model_dir, basename)} or {model_path}")
+    meta: Dict[str, Any] = {}
+    for pattern in legacy_meta_files:
+        meta_path = os.path.join(model_dir, pattern.format(basename=basename))
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            break
+    return joblib.load(model_path), meta, file_version(model_path)
+
+def file_version(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+def model_version(model_dir: str, basename: str = "prakriti") -> str:
+    """Bundle id, or the content hash of the legacy model file; "none" without a model"""
+    bundle = open_bundle(model_dir, basename, verify=False)
+    if bundle is not None:
+        with bundle:
+            return bundle.version
+    model_path = os.path.join(model_dir, f"{basename}_model.joblib")
+    return file_version(model_path) if os.path.exists(model_path) else "none"
+
+# -----------------------
+# CLI
+# -----------------------
+def legacy_components(model_dir: str, basename: str) -> Tuple[Dict[str, Any], Dict[str, Any], List[str]]:
+    """Components, meta and file paths of a legacy train.py / train_csv.py artifact set"""
+    import joblib
+    paths = {"model": os.path.join(model_dir, f"{basename}_model.joblib"),
+             "encoders": os.path.join(model_dir, f"{basename}_feature_vocab.json"),
+             "legacy_encoders": os.path.join(model_dir, f"{basename}_feature_encoders.joblib"),
+             "label_encoder": os.path.join(model_dir, f"{basename}_label_encoder.joblib")}
+    components: Dict[str, Any] = {"model": joblib.load(paths["model"])}
+    if os.path.exists(paths["encoders"]):
+        with open(paths["encoders"], "r", encoding="utf-8") as fh:
+            components["encoders"] = json.load(fh)
+    elif os.path.exists(paths["legacy_encoders"]):
+        components["encoders"] = {col: [str(c) for c in enc.classes_]
+                                  for col, enc in joblib.load(paths["legacy_encoders"]).items()}
+    if os.path.exists(paths["label_encoder"]):
+        components["label_encoder"] = joblib.load(paths["label_encoder"])
+    meta: Dict[str, Any] = {}
+    used = [p for p in paths.values() if os.path.exists(p)]
+    for pattern in LEGACY_META_FILES:
+        meta_path = os.path.join(model_dir, pattern.format(basename=basename))
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            used.append(meta_path)
+            break
+    return components, meta, used
+
+def _best_ms(fn: Callable[[], Any], repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(float(np.median(samples)), 3)
+
+def bench(model_dir: str, basename: str, repeats: int = 20) -> Dict[str, Any]:
+    """Size and load time (model + meta + version, as serving does) of the legacy layout vs a bundle"""
+    import joblib
+    components, meta, legacy_paths = legacy_components(model_dir, basename)
+    model_parts, kinds = model_components(components.pop("model"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = bundle_path(tmp, basename)
+        manifest = write_bundle(path, {**model_parts, **components}, meta, kinds)
+
+        def legacy_load():
+            model_path = os.path.join(model_dir, f"{basename}_model.joblib")
+            model = joblib.load(model_path) if os.path.exists(model_path) else None
+            for p in legacy_paths[1:]:
+                if os.path.exists(p) and p.endswith(".json"):
+                    with open(p, "r", encoding="utf-8") as fh:
+                        json.load(fh)
+            return model, file_version(model_path)
+
+        def bundle_load():
+            with ModelBundle(path) as b:
+                return b.get("model"), b.meta, b.version
+
+        return {
+            "legacy_files": len(legacy_paths),
+            "legacy_bytes": sum(os.path.getsize(p) for p in legacy_paths),
+            "bundle_bytes": manifest["bytes"],
+            "components": {n: {k: e[k] for k in ("kind", "size", "raw_size", "compression")}
+                           for n, e in manifest["components"].items()},
+            "legacy_load_ms": _best_ms(legacy_load, repeats),
+            "bundle_load_ms": _best_ms(bundle_load, repeats),
+            "bundle_open_ms": _best_ms(lambda: ModelBundle(path).close(), repeats),
+        }
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Inspect, create and benchmark model bundles")
+    sub = p.add_subparsers(dest="command", required=True)
+    ins = sub.add_parser("inspect", help="Print a bundle's manifest and verify its checksums")
+    ins.add_argument("path")
+    for name in ("convert", "bench"):
+        sp = sub.add_parser(name)
+        sp.add_argument("--model-dir", default=os.getenv("MODEL_DIR", "./models_out"))
+        sp.add_argument("--basename", default="prakriti")
+    sub.choices["convert"].add_argument("--remove-legacy", action="store_true",
+                                        help="Delete the legacy files once the bundle is written")
+    sub.choices["bench"].add_argument("--repeats", type=int, default=20)
+    args = p.parse_args(argv)
+
+    if args.command == "inspect":
+        with ModelBundle(args.path) as b:
+            print(json.dumps({**b.manifest, "checksums_ok": b.verify_all()}, indent=2))
+            return 0 if b.verify_all() else 1
+    if args.command == "convert":
+        components, meta, used = legacy_components(args.model_dir, args.basename)
+        model_parts, kinds = model_components(components.pop("model"))
+        manifest = write_bundle(bundle_path(args.model_dir, args.basename), {**model_parts, **components}, meta, kinds)
+        print(f"Wrote {bundle_path(args.model_dir, args.basename)} ({manifest['bytes']:,} bytes, "
+              f"from {sum(os.path.getsize(p) for p in used):,} bytes in {len(used)} files)")
+        if args.remove_legacy:
+            print(f"Removed {remove_files(used)}")
+        return 0
+    print(json.dumps(bench(args.model_dir, args.basename, args.repeats), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
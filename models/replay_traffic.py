@@ -0,0 +1,178 @@
+# models/replay_traffic.py
+"""
+Replay captured /predict traffic against a running build of the ML service.
+
+Usage:
+  python replay_traffic.py --capture ./capture --target http://127.0.0.1:8000
+  python replay_traffic.py --capture ./capture --speed 4          # 4x the recorded rate
+  python replay_traffic.py --capture ./capture --speed max --concurrency 32
+  python replay_traffic.py --capture a.jsonl.gz b.jsonl.gz --report replay_report.json
+
+Requests keep their recorded spacing divided by --speed (or are sent back to
+back with --speed max). Each response is compared with the recorded summary
+(dominant dosha, scores, confidence) and latencies are reported side by side.
+Recorded latencies are server-side handler times; replayed latencies are
+client round trips, so compare replays of two builds rather than a replay
+against its own recording when the difference matters.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from traffic_capture import load_capture, summarize_response
+
+SCORE_FIELDS = ("vata", "pitta", "kapha", "confidence")
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "max": round(ordered[-1], 3)}
+
+def send(target: str, record: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    data = json.dumps(record["payload"]).encode("utf-8")
+    req = urllib.request.Request(
+        target.rstrip("/") + record["endpoint"], data=data, method="POST",
+        headers={"Content-Type": "application/json", "x-replay": "1"},
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = json.loads(resp.read().decode("utf-8"))
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        body, status = None, e.code
+    except Exception as e:
+        return {"status": None, "latency_ms": (time.perf_counter() - started) * 1000, "error": str(e)}
+    return {
+        "status": status,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "response": summarize_response(record["endpoint"], body) if body is not None else None,
+    }
+
+def _prediction_diff(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]], tolerance: float) -> List[str]:
+    if old is None or new is None:
+        return [] if old == new else ["missing response"]
+    diffs = []
+    if old.get("dominant") != new.get("dominant"):
+        diffs.append(f"dominant {old.get('dominant')} -> {new.get('dominant')}")
+    for f in SCORE_FIELDS:
+        a, b = old.get(f), new.get(f)
+        if a is None or b is None:
+            if a != b:
+                diffs.append(f"{f} {a} -> {b}")
+        elif abs(float(a) - float(b)) > tolerance:
+            diffs.append(f"{f} {a} -> {b}")
+    return diffs
+
+def compare(record: Dict[str, Any], outcome: Dict[str, Any], tolerance: float) -> List[str]:
+    if outcome.get("error"):
+        return [f"request failed: {outcome['error']}"]
+    if outcome["status"] != record.get("status"):
+        return [f"status {record.get('status')} -> {outcome['status']}"]
+    old, new = record.get("response"), outcome.get("response")
+    if record["endpoint"] != "/predict/batch" or old is None or new is None:
+        return _prediction_diff(old, new, tolerance)
+    diffs = []
+    for idx in sorted(set(old["results"]) | set(new["results"]), key=int):
+        for d in _prediction_diff(old["results"].get(idx), new["results"].get(idx), tolerance):
+            diffs.append(f"[{idx}] {d}")
+    if sorted(old["errors"]) != sorted(new["errors"]):
+        diffs.append(f"errors {old['errors']} -> {new['errors']}")
+    return diffs
+
+def replay(records: List[Dict[str, Any]], target: str, speed: Optional[float] = 1.0,
+           concurrency: int = 16, timeout: float = 30.0, tolerance: float = 1e-6,
+           max_examples: int = 20) -> Dict[str, Any]:
+    """speed=None replays at maximum rate"""
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    lock = threading.Lock()
+
+    def run_one(i: int):
+        out = send(target, records[i], timeout)
+        with lock:
+            outcomes[i] = out
+
+    started = time.perf_counter()
+    t0 = records[0]["t"] if records else 0.0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, rec in enumerate(records):
+            if speed:
+                delay = (rec["t"] - t0) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(run_one, i)
+    elapsed = time.perf_counter() - started
+
+    mismatches, examples = 0, []
+    by_endpoint: Dict[str, Dict[str, List[float]]] = {}
+    for rec, out in zip(records, outcomes):
+        lat = by_endpoint.setdefault(rec["endpoint"], {"recorded": [], "replayed": []})
+        lat["recorded"].append(float(rec.get("latency_ms") or 0.0))
+        if out and out.get("latency_ms") is not None and not out.get("error"):
+            lat["replayed"].append(out["latency_ms"])
+        diffs = compare(rec, out or {"error": "not sent"}, tolerance)
+        if diffs:
+            mismatches += 1
+            if len(examples) < max_examples:
+                examples.append({"t": rec["t"], "endpoint": rec["endpoint"], "diffs": diffs})
+
+    return {
+        "target": target,
+        "speed": speed or "max",
+        "requests": len(records),
+        "wall_seconds": round(elapsed, 3),
+        "achieved_rps": round(len(records) / elapsed, 2) if elapsed > 0 else None,
+        "matching": len(records) - mismatches,
+        "mismatches": mismatches,
+        "match_rate": round((len(records) - mismatches) / len(records), 6) if records else None,
+        "latency_ms": {
+            ep: {"recorded_server": percentiles(v["recorded"]), "replayed_round_trip": percentiles(v["replayed"])}
+            for ep, v in by_endpoint.items()
+        },
+        "mismatch_examples": examples,
+    }
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Replay captured ML inference traffic")
+    p.add_argument("--capture", nargs="+", required=True, help="Capture directory or files")
+    p.add_argument("--target", type=str, default="http://127.0.0.1:8000")
+    p.add_argument("--speed", type=str, default="1", help="Replay rate multiplier, or 'max'")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--tolerance", type=float, default=1e-6, help="Allowed absolute score difference")
+    p.add_argument("--limit", type=int, default=0, help="Replay only the first N requests")
+    p.add_argument("--report", type=str, default=None, help="Write the JSON report here")
+    args = p.parse_args(argv)
+
+    speed = None if args.speed.lower() == "max" else float(args.speed)
+    records = load_capture(args.capture)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        raise SystemExit("No captured requests found.")
+    rate = "maximum speed" if speed is None else f"{speed:g}x"
+    print(f"Replaying {len(records)} requests against {args.target} at {rate}")
+    report = replay(records, args.target, speed=speed, concurrency=args.concurrency,
+                    timeout=args.timeout, tolerance=args.tolerance)
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        print(f"Report written to {args.report}")
+    print(text)
+    return 0 if report["mismatches"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,461 @@
+# models/retrain_scheduler.py
+"""
+Background retraining for the ML service, off the request path.
+
+A RetrainScheduler thread checks its triggers every RETRAIN_CHECK_SECONDS
+and starts a training job when one fires:
+
+  schedule    cron expression (minute hour day-of-month month day-of-week),
+              e.g. "0 3 * * *" for 03:00 every day; runs missed while a job
+              was busy are coalesced into one
+  new labels  at least RETRAIN_NEW_LABELS labeled rows past the current
+              model's data watermark (counted from the training CSV in a
+              child process, only when the CSV or the model changed)
+  drift       the drift monitor's max feature PSI (or prediction-class PSI)
+              reaches RETRAIN_DRIFT_PSI; drift jobs run in RETRAIN_DRIFT_MODE
+              (default full, which also rebuilds the reference profile) and
+              drift cannot fire again until the monitor has seen
+              `min_samples` new predictions after the last job
+
+Jobs are single-flight: an in-process lock plus an exclusive fcntl lock on
+RETRAIN_LOCK_FILE, so at most one training process runs per node even with
+several uvicorn workers. A trigger that fires while a job is running (here
+or in another worker) is skipped, not queued. /retrain goes through the same
+guard and answers 409 when busy.
+
+Training runs in a spawned child process (train_csv.train_model), so its CPU
+and memory never compete with request handling inside the server process and
+are returned to the OS when it exits. After a successful job the
+`on_success` callback reloads the model; after a drift job that did not
+reload (e.g. "no_change"), `drift_reset` clears the monitor's window. The last RETRAIN_HISTORY job results
+(trigger, duration, status, accuracy / error) are kept for /retrain/status.
+
+Env:
+  RETRAIN_SCHEDULE="0 3 * * *"  RETRAIN_NEW_LABELS=500  RETRAIN_DRIFT_PSI=0.25
+  RETRAIN_CHECK_SECONDS=60  RETRAIN_COOLDOWN_SECONDS=900  RETRAIN_MODE=incremental
+  RETRAIN_DRIFT_MODE=full
+  RETRAIN_CSV=prakriti_training_dataset.csv  RETRAIN_LOCK_FILE=<MODEL_DIR>/.retrain.lock
+  RETRAIN_HISTORY=50
+Unset triggers are disabled; with none set the scheduler is not started.
+"""
+import io
+import os
+import time
+import uuid
+import contextlib
+import threading
+import traceback
+import multiprocessing
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: the in-process lock still applies
+    fcntl = None
+
+# -----------------------
+# cron schedule
+# -----------------------
+CRON_FIELDS = [("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 6)]
+
+def _parse_cron_field(text: str, lo: int, hi: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in text.split(","):
+        rng, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if rng == "*":
+            start, end = lo, hi
+        elif "-" in rng:
+            start, end = (int(v) for v in rng.split("-", 1))
+        else:
+            start = int(rng)
+            end = hi if step_text else start
+        if step < 1 or start < lo or end > hi or start > end:
+            raise ValueError(f"Cron field {text!r} out of range {lo}-{hi}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    """Five-field cron expression (* , - / supported; Sunday is 0 or 7), evaluated in UTC"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {expression!r}")
+        self.expression = expression
+        parsed = [_parse_cron_field(f, lo, hi) for f, (_, lo, hi) in zip(fields[:4], CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months = parsed
+        self.weekdays = {v % 7 for v in _parse_cron_field(fields[4], 0, 7)}
+        # cron semantics: when both day fields are restricted, either may match
+        self._day_or = fields[2] != "*" and fields[4] != "*"
+
+    def matches(self, dt: datetime) -> bool:
+        if dt.minute not in self.minutes or dt.hour not in self.hours or dt.month not in self.months:
+            return False
+        day_ok, weekday_ok = dt.day in self.days, (dt.weekday() + 1) % 7 in self.weekdays
+        return (day_ok or weekday_ok) if self._day_or else (day_ok and weekday_ok)
+
+    def next_after(self, dt: datetime) -> datetime:
+        """First matching minute strictly after dt"""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(366 * 24 * 60):
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if self.matches(candidate):
+                return candidate
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            else:
+                candidate += timedelta(minutes=1)
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+# -----------------------
+# triggers
+# -----------------------
+def count_new_labels(csv_path: str, model_dir: str) -> int:
+    """Labeled rows in the training CSV past the current model's watermark (runs in the child process)"""
+    import json
+    from incremental import new_rows_mask
+    from model_bundle import read_bundle_meta
+    from train_csv import read_csv_frame, prepare_frame
+
+    meta = read_bundle_meta(model_dir, "prakriti")
+    legacy_meta_path = os.path.join(model_dir, "feature_columns.json")
+    if meta is None and os.path.exists(legacy_meta_path):
+        with open(legacy_meta_path, "r") as fh:
+            meta = json.load(fh)
+    watermark = ((meta or {}).get("manifest") or {}).get("data_watermark")
+    frame = read_csv_frame(csv_path)
+    if (watermark or {}).get("frame") == "raw":
+        frame = frame[new_rows_mask(frame, watermark)]
+        if not len(frame):
+            return 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        labels = prepare_frame(frame)[1]  # rows with a usable label
+    if (watermark or {}).get("frame") != "raw":
+        # older models counted cleaned rows, so their watermark places labeled rows only
+        labels = labels[new_rows_mask(labels.to_frame(), watermark)]
+    return int(len(labels))
+
+def csv_label_counter(csv_path: str, model_dir: str) -> Callable[[], int]:
+    """
+    Counter of labeled rows in the training CSV past the current model's watermark.
+    The CSV is only re-read when its size or mtime (or the model's metadata) changes,
+    and then in a spawned child so parsing it costs the serving process nothing.
+    """
+    from model_bundle import bundle_path
+
+    meta_path = bundle_path(model_dir, "prakriti")
+    legacy_meta_path = os.path.join(model_dir, "feature_columns.json")
+    cache: Dict[str, Any] = {"key": None, "count": 0}
+
+    def _stat(path: str):
+        try:
+            st = os.stat(path)
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def count() -> int:
+        key = (_stat(csv_path), _stat(meta_path) or _stat(legacy_meta_path))
+        if key == cache["key"]:
+            return cache["count"]
+        if key[0] is None:
+            return 0
+        cache.update(key=key, count=run_in_child(count_new_labels, csv_path, model_dir))
+        return cache["count"]
+
+    return count
+
+# -----------------------
+# training job (child process)
+# -----------------------
+def run_training_job(mode: str = "incremental", force: bool = False, csv_path: Optional[str] = None) -> Dict[str, Any]:
+    """Runs in the child process; returns a JSON-safe summary"""
+    from train_csv import train_model
+    kwargs = {"csv_path": csv_path} if csv_path else {}
+    _, metadata = train_model(incremental=(mode == "incremental"), force=force, **kwargs)
+    manifest = metadata.get("manifest") or {}
+    return {
+        "status": metadata.get("status", "success"),
+        "accuracy": metadata.get("accuracy"),
+        "training_mode": manifest.get("training_mode"),
+        "training_key": metadata.get("training_key"),
+        "manifest": manifest,
+    }
+
+def run_in_child(fn: Callable[..., Any], *args: Any) -> Any:
+    # spawn: a fresh interpreter, not a fork of the serving process and its threads
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+# -----------------------
+# single-flight guard
+# -----------------------
+class SingleFlight:
+    """One holder per process (threading.Lock) and per node (fcntl lock on a file)"""
+
+    def __init__(self, lock_path: Optional[str] = None):
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def acquire(self) -> bool:
+        if not self._lock.acquire(blocking=False):
+            return False
+        if self.lock_path and fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+                fh = open(self.lock_path, "a+")
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    fh.close()
+                    self._lock.release()
+                    return False
+                fh.seek(0)
+                fh.truncate()
+                fh.write(f"{os.getpid()}\n")
+                fh.flush()
+                self._fh = fh
+            except OSError:
+                self._lock.release()
+                raise
+        return True
+
+    def release(self):
+        if self._fh is not None:
+            try:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            finally:
+                self._fh.close()
+                self._fh = None
+        self._lock.release()
+
+    def held(self) -> bool:
+        return self._lock.locked()
+
+# -----------------------
+# scheduler
+# -----------------------
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+class RetrainScheduler:
+    def __init__(self, schedule: Optional[str] = None, new_labels_threshold: int = 0,
+                 label_counter: Optional[Callable[[], int]] = None, drift_threshold: Optional[float] = None,
+                 drift_source: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+                 mode: str = "incremental", drift_mode: str = "full", csv_path: Optional[str] = None,
+                 lock_path: Optional[str] = None, check_seconds: float = 60.0, cooldown_seconds: float = 900.0,
+                 history_size: int = 50, runner: Optional[Callable[[str, bool], Dict[str, Any]]] = None,
+                 on_success: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 drift_reset: Optional[Callable[[], None]] = None):
+        self.schedule = CronSchedule(schedule) if schedule else None
+        self.new_labels_threshold = new_labels_threshold
+        self.label_counter = label_counter
+        self.drift_threshold = drift_threshold
+        self.drift_source = drift_source
+        self.mode = mode
+        self.drift_mode = drift_mode
+        self.check_seconds = check_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.runner = runner or (lambda mode, force: run_in_child(run_training_job, mode, force, csv_path))
+        self.on_success = on_success
+        self.drift_reset = drift_reset
+        self.guard = SingleFlight(lock_path)
+        self.history: deque = deque(maxlen=history_size)
+        self.current: Optional[Dict[str, Any]] = None
+        self.skipped_busy = 0
+        self.last_label_count: Optional[int] = None
+        self.last_drift_psi: Optional[float] = None
+        self.drift_observations_since_job: Optional[int] = None
+        self._drift_mark = 0  # monitor observations when the last job finished
+        self.last_finished: Optional[float] = None
+        self._next_cron = self.schedule.next_after(datetime.now(timezone.utc)) if self.schedule else None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def has_triggers(self) -> bool:
+        return bool(self.schedule or (self.new_labels_threshold > 0 and self.label_counter)
+                    or (self.drift_threshold is not None and self.drift_source))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="retrain-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        # a running child process is left to finish; the lock is released when it does
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"⚠️ Retrain scheduler check failed: {e}")
+
+    # -----------------------
+    # triggers
+    # -----------------------
+    def _drift_psi(self, report: Dict[str, Any]) -> Optional[float]:
+        values = [report.get("max_feature_psi")]
+        prediction = report.get("prediction_classes") or {}
+        if (prediction.get("observations") or 0) >= (report.get("min_samples") or 0):
+            values.append(prediction.get("psi"))
+        values = [v for v in values if v is not None]
+        return max(values) if values else None
+
+    @staticmethod
+    def _drift_observations(report: Optional[Dict[str, Any]]) -> int:
+        return int(((report or {}).get("prediction_classes") or {}).get("observations") or 0)
+
+    def _mark_drift(self):
+        """Drift only counts traffic observed after this point"""
+        if self.drift_source is None:
+            return
+        try:
+            self._drift_mark = self._drift_observations(self.drift_source())
+        except Exception as e:
+            print(f"⚠️ Could not read drift monitor after retrain: {e}")
+
+    def due_trigger(self, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """The first trigger that fires now, or None. Cheap checks first."""
+        now = now or datetime.now(timezone.utc)
+        if self._next_cron is not None and now >= self._next_cron:
+            scheduled_for = self._next_cron
+            self._next_cron = self.schedule.next_after(now)
+            return {"trigger": "schedule", "reason": f"scheduled run {scheduled_for.isoformat()}"}
+        if self.last_finished and time.time() - self.last_finished < self.cooldown_seconds:
+            return None
+        if self.drift_threshold is not None and self.drift_source is not None:
+            report = self.drift_source()
+            self.last_drift_psi = self._drift_psi(report) if report else None
+            seen = self._drift_observations(report)
+            # fewer observations than at the mark: the monitor was replaced or reset since
+            self.drift_observations_since_job = seen - self._drift_mark if seen >= self._drift_mark else seen
+            enough = self.drift_observations_since_job >= ((report or {}).get("min_samples") or 0)
+            if enough and self.last_drift_psi is not None and self.last_drift_psi >= self.drift_threshold:
+                return {"trigger": "drift", "mode": self.drift_mode,
+                        "reason": f"drift PSI {self.last_drift_psi:.3f} >= {self.drift_threshold}"}
+        if self.new_labels_threshold > 0 and self.label_counter is not None:
+            self.last_label_count = self.label_counter()
+            if self.last_label_count >= self.new_labels_threshold:
+                return {"trigger": "new_labels",
+                        "reason": f"{self.last_label_count} new labeled rows >= {self.new_labels_threshold}"}
+        return None
+
+    def tick(self, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        if self.guard.held():
+            self.skipped_busy += 1
+            return None
+        due = self.due_trigger(now)
+        if due is None:
+            return None
+        return self.run(due["trigger"], due["reason"], due.get("mode"))
+
+    # -----------------------
+    # jobs
+    # -----------------------
+    def run(self, trigger: str, reason: str = "", mode: Optional[str] = None,
+            force: bool = False) -> Dict[str, Any]:
+        """Run one job now in the calling thread; returns the job, status "busy" if one is already running"""
+        mode = mode or self.mode
+        if not self.guard.acquire():
+            self.skipped_busy += 1
+            return {"status": "busy", "trigger": trigger, "running": self.current}
+        job: Dict[str, Any] = {"id": uuid.uuid4().hex[:12], "trigger": trigger, "reason": reason, "mode": mode,
+                               "force": force, "status": "running", "started_at": _iso(time.time())}
+        started = time.perf_counter()
+        self.current = job
+        print(f"🔄 Retraining ({mode}, {trigger}): {reason}")
+        try:
+            job["result"] = self.runner(mode, force)
+            job["status"] = "no_change" if job["result"].get("status") in ("no_change", "no_new_data") else "success"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = f"{type(e).__name__}: {e}"
+            print(f"❌ Retrain job {job['id']} failed: {traceback.format_exc()}")
+        finally:
+            job["duration_seconds"] = round(time.perf_counter() - started, 3)
+            job["finished_at"] = _iso(time.time())
+            self.last_finished = time.time()
+            self.current = None
+            self.history.append(job)
+            self.guard.release()
+        if job["status"] == "success" and self.on_success is not None:
+            try:
+                self.on_success(job)
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = f"reload failed: {e}"
+                print(f"❌ Model reload after retrain failed: {e}")
+        elif trigger == "drift" and self.drift_reset is not None:
+            # the model was not replaced: judge drift on traffic after this job only
+            try:
+                self.drift_reset()
+            except Exception as e:
+                print(f"⚠️ Drift monitor reset failed: {e}")
+        self._mark_drift()
+        print(f"✅ Retrain job {job['id']} {job['status']} in {job['duration_seconds']}s")
+        return job
+
+    def submit(self, trigger: str, reason: str = "", mode: Optional[str] = None,
+               force: bool = False) -> Dict[str, Any]:
+        """Start a job on a background thread; returns immediately"""
+        if self.guard.held():
+            self.skipped_busy += 1
+            return {"status": "busy", "trigger": trigger, "running": self.current}
+        threading.Thread(target=self.run, args=(trigger, reason, mode, force),
+                         name="retrain-job", daemon=True).start()
+        return {"status": "started", "trigger": trigger}
+
+    def status(self) -> Dict[str, Any]:
+        durations = [j["duration_seconds"] for j in self.history if j["status"] != "failed"]
+        return {
+            "running": self.current,
+            "schedule": self.schedule.expression if self.schedule else None,
+            "next_scheduled_run": self._next_cron.isoformat() if self._next_cron else None,
+            "new_labels_threshold": self.new_labels_threshold or None,
+            "new_labels": self.last_label_count,
+            "drift_threshold": self.drift_threshold,
+            "drift_psi": self.last_drift_psi,
+            "drift_mode": self.drift_mode,
+            "drift_observations_since_job": self.drift_observations_since_job,
+            "cooldown_seconds": self.cooldown_seconds,
+            "skipped_busy": self.skipped_busy,
+            "jobs": len(self.history),
+            "mean_duration_seconds": round(sum(durations) / len(durations), 3) if durations else None,
+            "history": list(reversed(self.history)),
+        }
+
+def scheduler_from_env(model_dir: str, drift_source=None, on_success=None, drift_reset=None) -> RetrainScheduler:
+    """Scheduler configured from RETRAIN_* env (start() it only when has_triggers())"""
+    schedule = os.getenv("RETRAIN_SCHEDULE") or None
+    new_labels = int(os.getenv("RETRAIN_NEW_LABELS", "0"))
+    drift = os.getenv("RETRAIN_DRIFT_PSI")
+    csv_path = os.getenv("RETRAIN_CSV", "prakriti_training_dataset.csv")
+    return RetrainScheduler(
+        schedule=schedule,
+        new_labels_threshold=new_labels,
+        label_counter=csv_label_counter(csv_path, model_dir) if new_labels else None,
+        drift_threshold=float(drift) if drift else None,
+        drift_source=drift_source,
+        mode=os.getenv("RETRAIN_MODE", "incremental"),
+        drift_mode=os.getenv("RETRAIN_DRIFT_MODE", "full"),
+        csv_path=csv_path,
+        lock_path=os.getenv("RETRAIN_LOCK_FILE", os.path.join(model_dir, ".retrain.lock")),
+        check_seconds=float(os.getenv("RETRAIN_CHECK_SECONDS", "60")),
+        cooldown_seconds=float(os.getenv("RETRAIN_COOLDOWN_SECONDS", "900")),
+        history_size=int(os.getenv("RETRAIN_HISTORY", "50")),
+        on_success=on_success,
+        drift_reset=drift_reset,
+    )
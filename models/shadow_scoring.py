@@ -0,0 +1,167 @@
+# models/shadow_scoring.py
+"""
+Shadow scoring of a candidate model on live /predict traffic.
+
+After the primary response is computed, its inputs and result are offered to
+a bounded queue. A small pool of background threads scores them with the
+candidate model and aggregates agreement with the primary prediction,
+per-dosha probability deltas and the candidate's latency distribution.
+
+Shadow work is best effort: when the queue is full or the node is busy the
+item is dropped and counted, never queued behind live traffic. Busy means
+the shadow backlog is deeper than SHADOW_MAX_QUEUE_DEPTH (the candidate is
+not keeping up), or the primary inference slots are saturated: main.py
+passes ExecutionPolicy.saturation, (running + queued predictions) /
+concurrency, and items are dropped at or above SHADOW_MAX_SATURATION.
+
+Enable with SHADOW_MODEL_DIR pointing at a directory containing a candidate
+prakriti.bundle (or a legacy prakriti_model.joblib and prakriti_meta.json).
+"""
+import os
+import time
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+import inference_updated as inference
+
+DOSHAS = ("vata", "pitta", "kapha")
+
+def prediction_probabilities(result: Dict[str, Any]) -> Dict[str, float]:
+    """Model probabilities when the ML path ran, otherwise the normalized trait scores"""
+    prakriti = (result or {}).get("prakriti") or {}
+    ml = prakriti.get("ml_prediction") or {}
+    probs = ml.get("probabilities") or prakriti
+    return {d: float(probs.get(d) or 0.0) for d in DOSHAS}
+
+def predicted_class(result: Dict[str, Any]) -> Optional[str]:
+    prakriti = (result or {}).get("prakriti") or {}
+    ml = prakriti.get("ml_prediction") or {}
+    return str(ml.get("predicted") or prakriti.get("dominant") or "") or None
+
+class ShadowScorer:
+    def __init__(self, model: Any, metadata: Dict[str, Any], model_dir: str = "", workers: int = 1,
+                 queue_size: int = 256, max_queue_depth: Optional[int] = None,
+                 saturation: Optional[Callable[[], float]] = None, max_saturation: float = 1.0,
+                 latency_window: int = 2048):
+        self.model = model
+        self.metadata = metadata
+        self.model_dir = model_dir
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else max(1, queue_size // 4)
+        self.saturation = saturation
+        self.max_saturation = max_saturation
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._threads: List[threading.Thread] = []
+        self.reset()
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._run, name=f"shadow-scorer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def reset(self):
+        with self._lock:
+            self.offered = 0
+            self.scored = 0
+            self.agreed = 0
+            self.errors = 0
+            self.dropped_busy = 0
+            self.dropped_full = 0
+            self._delta_sum = {d: 0.0 for d in DOSHAS}
+            self._delta_max = 0.0
+            self._latencies.clear()
+
+    def _busy(self) -> bool:
+        if self._queue.qsize() >= self.max_queue_depth:
+            return True
+        return self.saturation is not None and self.saturation() >= self.max_saturation
+
+    def submit(self, answers: Any, primary_result: Dict[str, Any]) -> bool:
+        """Offer one live request to the candidate. Never blocks."""
+        self.offered += 1
+        if self._busy():
+            self.dropped_busy += 1
+            return False
+        try:
+            self._queue.put_nowait((answers, primary_result))
+            return True
+        except queue.Full:
+            self.dropped_full += 1
+            return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                answers, primary = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            try:
+                candidate = inference.predict_from_answers(answers, model=self.model, metadata=self.metadata)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                continue
+            latency_ms = (time.perf_counter() - started) * 1000
+            p_primary = prediction_probabilities(primary)
+            p_candidate = prediction_probabilities(candidate)
+            with self._lock:
+                self.scored += 1
+                if predicted_class(primary) == predicted_class(candidate):
+                    self.agreed += 1
+                for d in DOSHAS:
+                    delta = abs(p_candidate[d] - p_primary[d])
+                    self._delta_sum[d] += delta
+                    self._delta_max = max(self._delta_max, delta)
+                self._latencies.append(latency_ms)
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2.0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=float)
+            scored = self.scored
+            return {
+                "candidate_model_dir": self.model_dir,
+                "offered": self.offered,
+                "scored": scored,
+                "queued": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "dropped_busy": self.dropped_busy,
+                "dropped_queue_full": self.dropped_full,
+                "errors": self.errors,
+                "agreement_rate": round(self.agreed / scored, 6) if scored else None,
+                "mean_abs_probability_delta": {
+                    d: round(self._delta_sum[d] / scored, 6) if scored else None for d in DOSHAS
+                },
+                "max_abs_probability_delta": round(self._delta_max, 6) if scored else None,
+                "candidate_latency_ms": {
+                    "window": len(latencies),
+                    "p50": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                    "p95": round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+                    "p99": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+                    "max": round(float(latencies.max()), 3) if len(latencies) else None,
+                },
+            }
+
+def scorer_from_env(saturation: Optional[Callable[[], float]] = None) -> Optional[ShadowScorer]:
+    model_dir = os.getenv("SHADOW_MODEL_DIR")
+    if not model_dir:
+        return None
+    model, metadata = inference.load_model_from(model_dir)
+    return ShadowScorer(
+        model, metadata, model_dir=model_dir,
+        workers=int(os.getenv("SHADOW_WORKERS", "1")),
+        queue_size=int(os.getenv("SHADOW_QUEUE_SIZE", "256")),
+        max_queue_depth=int(os.getenv("SHADOW_MAX_QUEUE_DEPTH", "0")) or None,
+        saturation=saturation,
+        max_saturation=float(os.getenv("SHADOW_MAX_SATURATION", "1.0")),
+    )
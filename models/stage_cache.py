@@ -0,0 +1,139 @@
+# models/stage_cache.py
+"""
+Content-addressed cache for training pipeline stages.
+
+A stage (dataframe build, fit, cross-validation, reference profile, ...) is
+identified by a key: the blake2b hash of everything its output depends on,
+i.e. the hash of its input data, its parameters, library versions and the
+source of the modules that implement it. Outputs are stored with joblib under
+STAGE_CACHE_DIR/<stage>/<key>.joblib (atomic write), so a stage whose inputs
+did not change is loaded instead of recomputed.
+
+The trainers also record the fit key in the model metadata ("training_key").
+A full retrain whose key matches the deployed model returns it unchanged
+with status "no_change".
+
+Usage:
+  cache = StageCache()
+  key = stage_key("fit", data_hash, params, code_fingerprint(__file__))
+  model = cache.run("fit", key, lambda: fit(...))
+  cache.log            # {"fit": {"key": ..., "hit": True, "seconds": 0.01}}
+
+Env:
+  STAGE_CACHE_DIR   default ./.stage_cache
+  STAGE_CACHE_KEEP  entries kept per stage (default 5, oldest removed first)
+"""
+import os
+import json
+import time
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+import joblib
+
+STAGE_CACHE_DIR = os.getenv("STAGE_CACHE_DIR", "./.stage_cache")
+STAGE_CACHE_KEEP = int(os.getenv("STAGE_CACHE_KEEP", "5"))
+# bump to invalidate every entry (e.g. if the stored layout changes)
+CACHE_VERSION = 1
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+def stage_key(stage: str, *parts: Any) -> str:
+    """Hash of the stage name and all inputs that determine its output"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(_canonical([CACHE_VERSION, stage, list(parts)]).encode("utf-8"))
+    return digest.hexdigest()
+
+def file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 22), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def rows_digest(rows: List[Dict[str, Any]]) -> str:
+    """Order-sensitive hash of fetched records (e.g. Supabase rows)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for r in rows:
+        digest.update(_canonical(r).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def code_fingerprint(*paths: str) -> str:
+    """Hash of source files, so editing a stage's code invalidates its entries"""
+    digest = hashlib.blake2b(digest_size=16)
+    for p in sorted(os.path.abspath(p) for p in paths):
+        digest.update(os.path.basename(p).encode("utf-8"))
+        digest.update(file_digest(p).encode("ascii") if os.path.exists(p) else b"missing")
+    return digest.hexdigest()
+
+def library_versions(*names: str) -> Dict[str, str]:
+    out = {}
+    for name in names:
+        try:
+            out[name] = __import__(name).__version__
+        except Exception:
+            out[name] = "unavailable"
+    return out
+
+class StageCache:
+    """Load-or-compute store for stage outputs; `log` records hits and timings of this run"""
+
+    def __init__(self, root: Optional[str] = None, enabled: bool = True, keep: Optional[int] = None,
+                 refresh: bool = False):
+        self.root = root or STAGE_CACHE_DIR
+        self.enabled = enabled
+        self.refresh = refresh  # recompute every stage but still store the results
+        self.keep = STAGE_CACHE_KEEP if keep is None else keep
+        self.log: Dict[str, Dict[str, Any]] = {}
+
+    def path(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, f"{key}.joblib")
+
+    def get(self, stage: str, key: str, default: Any = None) -> Any:
+        path = self.path(stage, key)
+        if not (self.enabled and not self.refresh and os.path.exists(path)):
+            return default
+        try:
+            value = joblib.load(path)
+        except Exception as e:
+            print(f"Ignoring unreadable stage cache entry {path}: {e}")
+            return default
+        os.utime(path)  # keep recently used entries out of pruning
+        return value
+
+    def put(self, stage: str, key: str, value: Any):
+        if not self.enabled:
+            return
+        path = self.path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        joblib.dump(value, tmp)
+        os.replace(tmp, path)
+        self.prune(stage)
+
+    def run(self, stage: str, key: str, fn: Callable[[], Any]) -> Any:
+        """Return the cached output of `stage` for `key`, computing and storing it on a miss"""
+        started = time.perf_counter()
+        missing = object()
+        value = self.get(stage, key, missing)
+        hit = value is not missing
+        if not hit:
+            value = fn()
+            self.put(stage, key, value)
+        self.log[stage] = {"key": key, "hit": hit, "seconds": round(time.perf_counter() - started, 4)}
+        print(f"Stage {stage}: {'cached' if hit else 'computed'} ({self.log[stage]['seconds']}s)")
+        return value
+
+    def prune(self, stage: str):
+        folder = os.path.join(self.root, stage)
+        if self.keep <= 0 or not os.path.isdir(folder):
+            return
+        entries = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".joblib")]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for stale in entries[self.keep:]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
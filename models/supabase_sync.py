@@ -0,0 +1,336 @@
+# models/supabase_sync.py
+"""
+Incremental sync of questionnaire_answers from Supabase into a local Parquet cache.
+
+train.py used to fetch `select('*').limit(2000)` on every run, so it
+re-downloaded the same rows each time and silently dropped everything past
+the limit. This module pages through the table with PostgREST's REST API
+instead:
+
+  - keyset pagination on (updated_at, id): each page asks for rows after the
+    last (updated_at, id) it saw, so a page costs the same no matter how deep
+    it is (no OFFSET) and rows cannot be skipped or duplicated between pages
+  - the uuid space is split into shards (id ranges) that are paged
+    independently and fetched concurrently; at most `max_connections`
+    requests are in flight (one worker thread per connection)
+  - fetched rows are appended to CACHE_DIR/<table>/part-*.parquet; a row that
+    changed upstream is appended again and the newest copy wins on load
+  - sync_state.json keeps the high-water mark (largest (updated_at, id)
+    synced). It is only advanced when every shard finished, so a failed run
+    is simply repeated. The next run asks for rows with updated_at >= mark
+    minus `lookback_seconds`, which re-reads rows committed late by
+    concurrent transactions; duplicates are dropped on load
+  - rows with a NULL updated_at cannot be ordered by the keyset; they are
+    paged by id on every run (the column defaults to now(), so there are
+    normally none)
+
+Deletes are not seen by an incremental sync; run with --full to rebuild the
+cache from scratch. Columns are stored as text (JSON for objects, numbers and
+booleans, like a CSV export) and read back with train.rows_from_frame.
+
+Usage:
+  python supabase_sync.py                       # sync into ./.supabase_cache
+  python supabase_sync.py --full --shards 16 --max-connections 8
+  python train.py                               # trains from the synced cache
+
+  sync = SupabaseSync(url, key)                 # transport=httpx.MockTransport(...) in tests
+  report = sync.sync()
+  frame = sync.load_frame()
+
+Env:
+  SUPABASE_URL, SUPABASE_KEY (or SUPABASE_SERVICE_ROLE_KEY / SUPABASE_ANON_KEY)
+  SUPABASE_SYNC_DIR   cache directory (default ./.supabase_cache)
+"""
+import os
+import sys
+import json
+import glob
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import pandas as pd
+
+SUPABASE_SYNC_DIR = os.getenv("SUPABASE_SYNC_DIR", "./.supabase_cache")
+DEFAULT_TABLE = "questionnaire_answers"
+STATE_FILE = "sync_state.json"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def shard_bounds(n_shards: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """[lo, hi) uuid ranges splitting the id space evenly; None = unbounded"""
+    n_shards = max(1, n_shards)
+    edges = [str(uuid.UUID(int=(i << 128) // n_shards)) for i in range(1, n_shards)]
+    return list(zip([None] + edges, edges + [None]))
+
+def _parse_ts(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def _later(a: Optional[Dict[str, str]], b: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    if not a or not b:
+        return a or b
+    return b if (_parse_ts(b["updated_at"]), b["id"]) > (_parse_ts(a["updated_at"]), a["id"]) else a
+
+def _as_text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+class SupabaseSync:
+    """Keyset-paginated, sharded sync of one table into a Parquet cache"""
+
+    def __init__(self, url: str, key: str, cache_dir: Optional[str] = None, table: str = DEFAULT_TABLE,
+                 page_size: int = 1000, shards: int = 8, max_connections: int = 4,
+                 lookback_seconds: float = 60.0, rows_per_part: int = 50000, compact_after: int = 32,
+                 retries: int = 3, timeout: float = 30.0, transport: Optional[httpx.BaseTransport] = None):
+        self.table = table
+        self.cache_dir = os.path.join(cache_dir or SUPABASE_SYNC_DIR, table)
+        self.page_size = page_size
+        self.shards = shards
+        self.max_connections = max(1, max_connections)
+        self.lookback_seconds = lookback_seconds
+        self.rows_per_part = rows_per_part
+        self.compact_after = compact_after
+        self.retries = retries
+        self.client = httpx.Client(
+            base_url=url.rstrip("/") + "/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}", "Accept": "application/json"},
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            timeout=timeout, transport=transport)
+        self._lock = threading.Lock()
+        self._part_seq = 0
+        self._requests = 0
+
+    def close(self):
+        self.client.close()
+
+    # -----------------------
+    # state
+    # -----------------------
+    def load_state(self) -> Dict[str, Any]:
+        path = os.path.join(self.cache_dir, STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def _save_state(self, state: Dict[str, Any]):
+        path = os.path.join(self.cache_dir, STATE_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(state, fh, indent=2)
+        os.replace(tmp, path)
+
+    def parts(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.cache_dir, "part-*.parquet")))
+
+    # -----------------------
+    # fetching
+    # -----------------------
+    def _get(self, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.client.get(f"/{self.table}", params=params)
+                with self._lock:
+                    self._requests += 1
+                if resp.status_code not in RETRY_STATUS:
+                    resp.raise_for_status()
+                    return resp.json()
+                error: Exception = httpx.HTTPStatusError(f"HTTP {resp.status_code}", request=resp.request,
+                                                         response=resp)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.retries:
+                raise RuntimeError(f"Supabase sync request failed after {attempt + 1} attempts: {error}")
+            time.sleep(min(8.0, 0.5 * 2 ** attempt))
+        return []
+
+    def _page_params(self, bounds: Tuple[Optional[str], Optional[str]], cursor: Optional[Dict[str, str]],
+                     since: Optional[str], nulls: bool) -> List[Tuple[str, str]]:
+        lo, hi = bounds
+        params = [("select", "*"), ("limit", str(self.page_size))]
+        if lo:
+            params.append(("id", f"gte.{lo}"))
+        if hi:
+            params.append(("id", f"lt.{hi}"))
+        if nulls:
+            params += [("updated_at", "is.null"), ("order", "id.asc")]
+            if cursor:
+                params.append(("id", f"gt.{cursor['id']}"))
+            return params
+        # NULLs sort last in Postgres and would break the cursor; the second pass pages them
+        params += [("updated_at", "not.is.null"), ("order", "updated_at.asc,id.asc")]
+        if cursor:
+            ts, last_id = cursor["updated_at"], cursor["id"]
+            params.append(("or", f'(updated_at.gt."{ts}",and(updated_at.eq."{ts}",id.gt.{last_id}))'))
+        elif since:
+            params.append(("updated_at", f"gte.{since}"))
+        return params
+
+    def _write_part(self, rows: List[Dict[str, Any]], run: int) -> str:
+        with self._lock:
+            self._part_seq += 1
+            seq = self._part_seq
+        columns = sorted({k for r in rows for k in r})
+        frame = pd.DataFrame([{c: _as_text(r.get(c)) for c in columns} for r in rows], columns=columns,
+                             dtype=object)
+        path = os.path.join(self.cache_dir, f"part-{run:06d}-{seq:05d}.parquet")
+        tmp = path + ".tmp"
+        frame.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return path
+
+    def _sync_shard(self, bounds: Tuple[Optional[str], Optional[str]], since: Optional[str],
+                    start: Optional[Dict[str, str]], run: int) -> Dict[str, Any]:
+        out = {"rows": 0, "pages": 0, "high_water": None}
+        buffer: List[Dict[str, Any]] = []
+        for nulls in (False, True):
+            cursor = None if nulls else start
+            while True:
+                page = self._get(self._page_params(bounds, cursor, since, nulls))
+                out["pages"] += 1
+                if page:
+                    buffer.extend(page)
+                    out["rows"] += len(page)
+                    last = page[-1]
+                    cursor = {"updated_at": last.get("updated_at"), "id": last["id"]}
+                    if not nulls:
+                        out["high_water"] = _later(out["high_water"], cursor)
+                if len(buffer) >= self.rows_per_part:
+                    self._write_part(buffer, run)
+                    buffer = []
+                if len(page) < self.page_size:
+                    break
+        if buffer:
+            self._write_part(buffer, run)
+        return out
+
+    def sync(self, full: bool = False) -> Dict[str, Any]:
+        """Fetch rows changed since the high-water mark (everything if `full`) into the cache"""
+        started = time.perf_counter()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        state = {} if full else self.load_state()
+        if full:
+            for path in self.parts():
+                os.remove(path)
+        high_water = state.get("high_water")
+        # resume strictly after the mark, or from `lookback_seconds` before it
+        since, start = None, None
+        if high_water and self.lookback_seconds > 0:
+            since = (_parse_ts(high_water["updated_at"]) - timedelta(seconds=self.lookback_seconds)).isoformat()
+        elif high_water:
+            start = high_water
+        run = int(state.get("runs", 0)) + 1
+        self._requests = 0
+
+        bounds = shard_bounds(self.shards)
+        with ThreadPoolExecutor(max_workers=min(self.max_connections, len(bounds))) as pool:
+            results = list(pool.map(lambda b: self._sync_shard(b, since, start, run), bounds))
+
+        for r in results:
+            high_water = _later(high_water, r["high_water"])
+        fetched = sum(r["rows"] for r in results)
+        state = {
+            "table": self.table,
+            "high_water": high_water,
+            "runs": run,
+            "last_sync_at": datetime.now(timezone.utc).isoformat(),
+            "last_sync_rows": fetched,
+            "last_full_sync_at": datetime.now(timezone.utc).isoformat() if full or run == 1
+                                 else state.get("last_full_sync_at"),
+        }
+        self._save_state(state)
+        if len(self.parts()) > self.compact_after:
+            self.compact()
+        report = {
+            "mode": "incremental" if since or start else "full",
+            "since": since or (start or {}).get("updated_at"),
+            "rows_fetched": fetched,
+            "pages": sum(r["pages"] for r in results),
+            "requests": self._requests,
+            "shards": len(bounds),
+            "max_connections": self.max_connections,
+            "high_water": high_water,
+            "parts": len(self.parts()),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        print(f"Synced {fetched} {self.table} rows ({report['mode']}) in {report['pages']} pages, "
+              f"{report['seconds']}s")
+        return report
+
+    # -----------------------
+    # cache
+    # -----------------------
+    def load_frame(self) -> pd.DataFrame:
+        """Cached rows as strings ("" = missing), newest copy of each id; feed to train.rows_from_frame"""
+        parts = self.parts()
+        if not parts:
+            return pd.DataFrame()
+        frame = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+        frame = frame.drop_duplicates("id", keep="last")
+        # (updated_at, id) order, independent of how rows were spread over parts
+        order = pd.DataFrame({"id": frame["id"]})
+        if "updated_at" in frame.columns:
+            order["ts"] = pd.to_datetime(frame["updated_at"], errors="coerce", utc=True, format="ISO8601")
+        frame = frame.loc[order.sort_values([c for c in ("ts", "id") if c in order], na_position="first").index]
+        return frame.reset_index(drop=True).astype(object).fillna("")
+
+    def compact(self) -> str:
+        """Rewrite all parts as one deduplicated part"""
+        parts = self.parts()
+        frame = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True).drop_duplicates("id", keep="last")
+        run = int(self.load_state().get("runs", 0))
+        path = os.path.join(self.cache_dir, f"part-{run:06d}-00000.parquet")
+        tmp = path + ".tmp"
+        frame.to_parquet(tmp, index=False)
+        for p in parts:
+            os.remove(p)
+        os.replace(tmp, path)
+        return path
+
+def sync_from_env(cache_dir: Optional[str] = None, full: bool = False, url: Optional[str] = None,
+                  key: Optional[str] = None, **kwargs: Any) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    url = url or os.getenv("SUPABASE_URL")
+    key = key or os.getenv("SUPABASE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+    if not (url and key):
+        raise RuntimeError("SUPABASE_URL and a Supabase key are required to sync")
+    sync = SupabaseSync(url, key, cache_dir=cache_dir, **kwargs)
+    try:
+        report = sync.sync(full=full)
+        return report, sync.load_frame()
+    finally:
+        sync.close()
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Sync questionnaire_answers from Supabase into a local Parquet cache")
+    p.add_argument("--cache-dir", type=str, default=SUPABASE_SYNC_DIR)
+    p.add_argument("--table", type=str, default=DEFAULT_TABLE)
+    p.add_argument("--page-size", type=int, default=1000)
+    p.add_argument("--shards", type=int, default=8, help="uuid ranges paged independently")
+    p.add_argument("--max-connections", type=int, default=4, help="Requests in flight at once")
+    p.add_argument("--lookback-seconds", type=float, default=60.0,
+                   help="Re-read this much before the high-water mark to catch late commits")
+    p.add_argument("--full", action="store_true", help="Drop the cache and fetch every row")
+    p.add_argument("--supabase-url", type=str, default=None)
+    p.add_argument("--supabase-key", type=str, default=None)
+    args = p.parse_args(argv)
+    try:
+        load_dotenv = __import__("dotenv").load_dotenv
+        load_dotenv()
+    except Exception:
+        pass
+    report, frame = sync_from_env(args.cache_dir, args.full, args.supabase_url, args.supabase_key,
+                                  table=args.table, page_size=args.page_size, shards=args.shards,
+                                  max_connections=args.max_connections, lookback_seconds=args.lookback_seconds)
+    report["cached_rows"] = len(frame)
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+import bench_learning_curve
+
+def test_learning_curve_report_and_baseline_check(tmp_path):
+    report_path = tmp_path / "curve.json"
+    argv = ["--sizes", "300", "600", "--n-estimators", "10", "--latency-repeats", "5", "--in-process",
+            "--work-dir", str(tmp_path), "--report", str(report_path)]
+    assert bench_learning_curve.main(argv) == 0
+    report = json.loads(report_path.read_text())
+    points = {(r["trainer"], r["rows"]): r for r in report["results"]}
+    assert set(points) == {(t, n) for t in ("lgbm", "xgb") for n in (300, 600)}
+    for r in points.values():
+        assert 0 < r["accuracy"] <= 1 and r["fit_seconds"] > 0 and r["model_bytes"] > 0
+        assert r["single_row_p50_ms"] > 0 and "fit" in r["stage_seconds"]
+    assert report["scaling"]["lgbm"]["fit_seconds_exponent"] is not None
+    assert report["environment"]["libraries"]["lightgbm"]
+
+    # a baseline that was 10x faster flags every fit as a regression
+    baseline = {"results": [{**r, "fit_seconds": r["fit_seconds"] / 10} for r in report["results"]]}
+    regressions = bench_learning_curve.compare_to_baseline(report["results"], baseline, tolerance=0.25)
+    assert {(r["trainer"], r["rows"]) for r in regressions if r["metric"] == "fit_seconds"} == set(points)
+    assert bench_learning_curve.compare_to_baseline(report["results"], report, tolerance=0.25) == []
+
+def test_slow_trainer_stops_growing(tmp_path):
+    results = bench_learning_curve.run_benchmark([200, 400], ["lgbm"], n_estimators=5, latency_repeats=2,
+                                                 max_fit_seconds=0.0, work_dir=str(tmp_path), in_process=True)
+    assert "fit_seconds" in results[0] and results[1]["skipped"].startswith("fit took")
+
+def test_write_plots(tmp_path):
+    pytest.importorskip("matplotlib")
+    results = [{"trainer": t, "rows": n, "fit_seconds": n / 1000, "peak_rss_mb": 100.0 + n / 100,
+                "accuracy": 0.8, "single_row_p50_ms": 0.5, "model_bytes": 1000 + n}
+               for t in ("lgbm", "xgb") for n in (300, 600)]
+    results.append({"trainer": "xgb", "rows": 1200, "skipped": "fit took 1s at 600 rows"})
+    written = bench_learning_curve.write_plots(results, str(tmp_path / "plots"))
+    assert len(written) == 5
+    for path in written:
+        with open(path, "rb") as fh:
+            assert fh.read(8) == b"\x89PNG\r\n\x1a\n"
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pandas as pd
+
+import bulk_score
+
+ANSWERS = [
+    [{"questionId": "q1", "trait": "vata", "weight": 1}, {"questionId": "q2", "trait": "vata", "weight": 1}],
+    [{"questionId": "q1", "trait": "pitta", "weight": 1}],
+    [{"questionId": "q1", "trait": "kapha", "weight": 1}, {"questionId": "q2", "trait": "kapha", "weight": 0.5}],
+]
+
+def _write_jsonl(path, n):
+    with open(path, "w") as fh:
+        for i in range(n):
+            fh.write(json.dumps({"id": f"row-{i}", "answers": ANSWERS[i % len(ANSWERS)]}) + "\n")
+
+def test_bulk_score_jsonl(tmp_path):
+    src = tmp_path / "answers.jsonl"
+    out = tmp_path / "out"
+    _write_jsonl(src, 7)
+    summary = bulk_score.run(str(src), str(out), workers=1, chunk_size=3)
+    assert summary["rows_total"] == 7
+    assert summary["chunks"] == 3
+    df = bulk_score.read_results(str(out))
+    assert len(df) == 7
+    assert df.set_index("id").loc["row-1", "dominant"] == "pitta"
+
+def test_bulk_score_resume_skips_completed_chunks(tmp_path):
+    src = tmp_path / "answers.jsonl"
+    out = tmp_path / "out"
+    _write_jsonl(src, 6)
+    bulk_score.run(str(src), str(out), workers=1, chunk_size=2)
+    # simulate an interruption after the first chunk
+    checkpoint = bulk_score.load_checkpoint(str(out))
+    checkpoint["chunks"] = {"0": checkpoint["chunks"]["0"]}
+    bulk_score.save_checkpoint(str(out), checkpoint)
+    os.remove(bulk_score.part_path(str(out), 2))
+    summary = bulk_score.run(str(src), str(out), workers=1, chunk_size=2, resume=True)
+    assert summary["rows_this_run"] == 4
+    assert summary["rows_total"] == 6
+
+def test_bulk_score_resume_rescores_missing_part_once(tmp_path):
+    src = tmp_path / "answers.jsonl"
+    out = tmp_path / "out"
+    _write_jsonl(src, 6)
+    bulk_score.run(str(src), str(out), workers=1, chunk_size=2)
+    # checkpoint lists chunk 1 as done but its part file is gone
+    os.remove(bulk_score.part_path(str(out), 1))
+    summary = bulk_score.run(str(src), str(out), workers=1, chunk_size=2, resume=True)
+    assert summary["rows_this_run"] == 2
+    assert summary["rows_total"] == 6 and summary["chunks"] == 3
+    assert bulk_score.load_checkpoint(str(out))["completed"] == [0, 1, 2]
+    assert len(bulk_score.read_results(str(out))) == 6
+
+def test_score_records_reports_bad_rows():
+    df = bulk_score.score_records([(0, "not json")], "csv")
+    assert df.loc[0, "error"]
+    assert isinstance(df, pd.DataFrame)
@@ -0,0 +1,100 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import train_csv
+from category_encoding import CategoryCodeEncoder
+from drift_monitor import load_reference_profile
+
+def test_codes_follow_sorted_vocabulary():
+    X = pd.DataFrame({"age": [30, 41, 25], "skin": pd.Series(["oily", "dry", None], dtype="category"),
+                      "level": ["1", "2.5", "x"]})
+    enc = pickle.loads(pickle.dumps(CategoryCodeEncoder().fit(X)))
+    assert enc.vocabularies_ == {"skin": ["dry", "oily"], "level": ["1", "2.5", "x"]}
+    assert enc.categorical_indices_ == [1, 2]
+
+    new = pd.DataFrame({"age": [50, 60], "skin": ["dry", "unseen"], "level": [2.5, None]})
+    out = enc.transform(new)
+    assert out.dtype == np.float32
+    assert out[0].tolist() == [50.0, 0.0, 1.0]
+    assert out[1, 0] == 60.0 and np.isnan(out[1, 1]) and np.isnan(out[1, 2])
+    # plain arrays are read in fit column order
+    np.testing.assert_array_equal(enc.transform(new.to_numpy(dtype=object)), out)
+
+def _write_csv(path, n, seed):
+    rng = np.random.default_rng(seed)
+    doshas = np.array(["vata", "pitta", "kapha"])
+    label = rng.integers(0, 3, n)
+    pct = np.full((n, 3), 20)
+    pct[np.arange(n), label] = 60
+    pd.DataFrame({
+        "age": rng.integers(18, 70, n),
+        "q_skin": np.where(rng.random(n) < 0.8, np.array(["dry", "oily", "warm"])[label], "mixed"),
+        "q_sleep": rng.choice(["light", "deep", "moderate"], n),
+        "percent_vata": [f"{p}%" for p in pct[:, 0]],
+        "percent_pitta": [f"{p}%" for p in pct[:, 1]],
+        "percent_kapha": [f"{p}%" for p in pct[:, 2]],
+    }).to_csv(path, index=False)
+    return doshas[label]
+
+def test_native_pipeline_trains_and_continues_incrementally(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_csv, "MODEL_DIR", str(tmp_path / "models"))
+    monkeypatch.setattr(train_csv, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "models").mkdir()
+    csv_path = tmp_path / "data.csv"
+    _write_csv(csv_path, 600, seed=0)
+
+    pipeline, meta = train_csv.train_model(str(csv_path), categorical="native",
+                                           params={"n_estimators": 20, "verbose": -1})
+    assert meta["categorical_encoding"] == "native"
+    assert meta["category_vocabularies"]["q_skin"] == ["dry", "mixed", "oily", "warm"]
+    booster = pipeline.named_steps["classifier"].booster_
+    assert any(t["tree_structure"].get("decision_type") == "==" for t in booster.dump_model()["tree_info"])
+
+    # appended rows continue boosting with the same categorical features
+    extra = tmp_path / "extra.csv"
+    _write_csv(extra, 300, seed=1)
+    with open(csv_path, "a") as fh:
+        fh.write("".join(open(extra).readlines()[1:]))
+    pipeline, meta = train_csv.train_model(str(csv_path), incremental=True, incremental_rounds=5)
+    assert meta["manifest"]["training_mode"] == "incremental"
+    # the drift reference now covers the appended rows too
+    assert load_reference_profile(str(tmp_path / "models"))["n_rows"] == 900
+    new_trees = pipeline.named_steps["classifier"].booster_.dump_model()["tree_info"][-15:]
+    assert any(t["tree_structure"].get("decision_type") == "==" for t in new_trees)
+
+def test_incremental_watermark_uses_raw_timestamps_and_skips_unlabeled_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_csv, "MODEL_DIR", str(tmp_path / "models"))
+    monkeypatch.setattr(train_csv, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "models").mkdir()
+    csv_path = tmp_path / "data.csv"
+
+    def frame(n, seed, start):
+        rng = np.random.default_rng(seed)
+        label = pd.Series(np.array(["vata", "pitta", "kapha"])[rng.integers(0, 3, n)], dtype=object)
+        label[rng.random(n) < 0.1] = None
+        return pd.DataFrame({
+            "created_at": pd.date_range(start, periods=n, freq="min").astype(str),
+            "age": rng.integers(18, 70, n),
+            "q_skin": label.map({"vata": "dry", "pitta": "warm", "kapha": "oily"}).fillna("mixed"),
+            "prakriti_label": label,
+        })
+
+    first = frame(600, 0, "2026-01-01")
+    first.to_csv(csv_path, index=False)
+    train_csv.train_model(str(csv_path), params={"n_estimators": 10, "verbose": -1})
+    watermark = train_csv.load_previous_meta()["manifest"]["data_watermark"]
+    assert watermark["column"] == "created_at" and watermark["rows"] == 600
+
+    # no rows past the raw watermark: unlabeled rows in the old data do not shift it
+    _, meta = train_csv.train_model(str(csv_path), incremental=True, incremental_rounds=3)
+    assert meta["status"] == "no_new_data"
+
+    second = frame(200, 1, "2026-02-01")
+    pd.concat([second, first]).to_csv(csv_path, index=False)
+    _, meta = train_csv.train_model(str(csv_path), incremental=True, incremental_rounds=3)
+    assert meta["manifest"]["training_mode"] == "incremental"
+    assert meta["manifest"]["rows_trained_this_run"] == int(second["prakriti_label"].notna().sum())
+    assert load_reference_profile(str(tmp_path / "models"))["n_rows"] == int(
+        first["prakriti_label"].notna().sum() + second["prakriti_label"].notna().sum())
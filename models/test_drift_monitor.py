@@ -0,0 +1,45 @@
+import pandas as pd
+
+from drift_monitor import DriftMonitor, build_reference_profile, features_from_answers
+
+def _profile():
+    X = pd.DataFrame({
+        "age": list(range(20, 70)) * 4,
+        "q_skin": ["dry", "oily", "warm", "dry"] * 50,
+    })
+    y = pd.Series(["vata", "pitta", "kapha", "vata"] * 50)
+    return build_reference_profile(X, y, {"q2": "q_skin"}, n_bins=5)
+
+def test_profile_shapes():
+    profile = _profile()
+    assert profile["features"]["age"]["type"] == "numeric"
+    assert len(profile["features"]["age"]["proportions"]) == len(profile["features"]["age"]["edges"]) + 1
+    assert profile["features"]["q_skin"]["categories"][0] == "dry"
+    assert abs(sum(profile["prediction_classes"]["proportions"]) - 1.0) < 1e-9
+
+def test_matching_traffic_has_low_psi():
+    monitor = DriftMonitor(_profile(), min_samples=10)
+    for i in range(200):
+        monitor.observe({"age": 20 + i % 50, "q_skin": ["dry", "oily", "warm", "dry"][i % 4]},
+                        ["vata", "pitta", "kapha", "vata"][i % 4])
+    report = monitor.scores()
+    assert report["features"]["q_skin"]["psi"] < 0.01
+    assert report["features"]["age"]["psi"] < 0.05
+    assert not report["alert"]
+
+def test_shifted_traffic_alerts():
+    monitor = DriftMonitor(_profile(), min_samples=10)
+    fired = []
+    monitor.on_alert(fired.append)
+    for i in range(300):
+        monitor.observe({"age": 90, "q_skin": "something new"}, "kapha")
+    report = monitor.scores()
+    assert report["alert"]
+    assert "q_skin" in report["drifted"] and "age" in report["drifted"]
+    assert report["features"]["q_skin"]["live_proportions"]["__other__"] == 1.0
+    assert len(fired) == 1
+
+def test_features_from_answers_uses_first_mapped_answer():
+    answers = [{"questionId": "q2", "value": "dry"}, {"questionId": "q2", "value": "oily"},
+               {"questionId": "q99", "value": "x"}]
+    assert features_from_answers(answers, {"q2": "q_skin"}) == {"q_skin": "dry"}
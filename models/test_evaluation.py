@@ -0,0 +1,60 @@
+import numpy as np
+
+from evaluation import cross_validate, encode_labels, eval_task, fold_indices
+
+def test_fold_indices_cover_every_row_once_per_repeat():
+    y = np.array([0] * 10 + [1] * 6 + [2] * 4)
+    folds = fold_indices(y, n_splits=4, repeats=2, seed=0)
+    assert len(folds) == 8
+    for r in (0, 1):
+        tests = np.concatenate([test for rep, _, _, test in folds if rep == r])
+        assert sorted(tests.tolist()) == list(range(20))
+    # stratified: every test fold holds exactly one row of the 4-row class
+    assert all(np.sum(y[test] == 2) == 1 for _, _, _, test in folds)
+    # a class with fewer rows than folds falls back to plain KFold
+    assert len(fold_indices(np.array([0] * 9 + [1]), n_splits=3)) == 3
+
+def test_cross_validate_evaluates_tasks_together(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.random((120, 3)).astype(np.float32)
+    y, classes = encode_labels(np.where(X[:, 0] < 0.5, "vata", "kapha"))
+    # the mental task has a class rare enough that some training folds miss it
+    y_rare = (X[:, 1] * 2).astype(np.int32)
+    y_rare[:2] = 2
+    tasks = {
+        "prakriti": eval_task(X, y, classes, {"trainer": "lgbm", "params": {"n_estimators": 20}}),
+        "mental": eval_task(X, y_rare, ["a", "b", "c"], {"trainer": "xgb", "params": {"n_estimators": 10}},
+                            note="rare"),
+    }
+    out = cross_validate(tasks, n_splits=3, repeats=2, workers=1, data_dir=str(tmp_path))
+    assert set(out) == {"prakriti", "mental"}
+    prak = out["prakriti"]
+    assert prak["scheme"]["stratified"] and len(prak["folds"]) == 6
+    assert prak["summary"]["accuracy"]["mean"] > 0.9
+    assert np.sum(prak["summary"]["confusion_matrix"]["matrix"]) == 240
+    assert [(f["repeat"], f["fold"]) for f in prak["folds"]][:3] == [(0, 0), (0, 1), (0, 2)]
+
+    mental = out["mental"]
+    assert mental["note"] == "rare" and not mental["scheme"]["stratified"]
+    assert mental["summary"]["n_failed"] == 0
+    assert np.array(mental["summary"]["confusion_matrix"]["matrix"]).shape == (3, 3)
+
+def test_preprocessor_is_fit_on_training_rows_only(tmp_path):
+    import pandas as pd
+    from sklearn.preprocessing import OneHotEncoder
+    from evaluation import _encode_fold
+
+    X = pd.DataFrame({"skin": ["dry"] * 40 + ["oily"] * 40 + ["rare"]})
+    encoder = OneHotEncoder(handle_unknown="ignore")
+    train, test = np.arange(80), np.array([80, 0])
+    X_train, X_test = _encode_fold(encoder, X, train, test)
+    # the category seen only in the test fold gets no column and encodes as all zeros
+    assert X_train.shape == (80, 2) and X_test.dtype == np.float32
+    assert X_test.tolist() == [[0.0, 0.0], [1.0, 0.0]]
+    assert not hasattr(encoder, "categories_")
+
+    y, classes = encode_labels(X["skin"].map({"dry": "vata", "oily": "kapha", "rare": "kapha"}))
+    task = eval_task(X, y, classes, {"trainer": "lgbm", "params": {"n_estimators": 10, "min_child_samples": 5}},
+                     preprocessor=encoder)
+    out = cross_validate({"prakriti": task}, n_splits=3, workers=1, data_dir=str(tmp_path))["prakriti"]
+    assert out["summary"]["n_failed"] == 0 and out["summary"]["accuracy"]["mean"] > 0.9
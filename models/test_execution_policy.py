@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from execution_policy import THREAD_ENV_VARS, ExecutionPolicy, FairSlots, Overloaded
+
+def test_partitioning_and_model_threads():
+    policy = ExecutionPolicy(workers=2, threads_per_request=2, cpus=list(range(8)), worker_index=1)
+    assert policy.cores_per_worker == 4 and policy.concurrency == 2 and policy.worker_cpus() == [4, 5, 6, 7]
+    assert ExecutionPolicy(workers=4, cpus=[0, 1]).concurrency == 1
+
+    model = xgb.XGBClassifier(n_estimators=2, n_jobs=8).fit(np.eye(3), [0, 1, 2])
+    assert policy.configure_model(model) == 2 and model.get_params()["n_jobs"] == 2
+    described = policy.describe(model)
+    assert described["policy"]["max_native_threads"] == 4 and described["threads"]["model_threads"] == 2
+
+def test_concurrency_cap_fifo_and_timeout():
+    policy = ExecutionPolicy(concurrency=2, cpus=[0])
+    seen = []
+
+    def work():
+        seen.append(policy.in_flight)
+        time.sleep(0.01)
+
+    threads = [threading.Thread(target=policy.run, args=(work,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(seen) <= 2 and policy.completed == 8 and policy.describe()["requests"]["queue_wait_ms"]["p99"] > 0
+
+    slots = FairSlots(1)
+    assert slots.acquire()
+    order = []
+    waiters = [threading.Thread(target=lambda i=i: (slots.acquire(), order.append(i), slots.release()))
+               for i in range(5)]
+    for t in waiters:
+        t.start()
+        time.sleep(0.01)  # queue them in a known order
+    slots.release()
+    for t in waiters:
+        t.join()
+    assert order == [0, 1, 2, 3, 4]
+
+    busy = ExecutionPolicy(concurrency=1, cpus=[0], queue_timeout_ms=20)
+    blocker = threading.Thread(target=busy.run, args=(time.sleep, 0.3))
+    blocker.start()
+    time.sleep(0.05)
+    with pytest.raises(Overloaded):
+        busy.run(lambda: None)
+    blocker.join()
+    assert busy.rejected == 1 and busy.run(lambda: 5) == 5
+
+def test_apply_leaves_the_environment_of_child_processes_alone(monkeypatch):
+    for var in THREAD_ENV_VARS:
+        monkeypatch.delenv(var, raising=False)
+    policy = ExecutionPolicy(threads_per_request=1, cpus=[0, 1]).apply()
+    try:
+        # a spawned retraining job inherits os.environ; it must not be capped to one thread
+        assert not any(var in os.environ for var in THREAD_ENV_VARS)
+        assert all(v is None for v in policy.describe()["env"].values())
+    finally:
+        policy.restore()
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+
+import train
+from hparam_search import encode_variant, expand_space, pareto_front, search, select_cheapest
+
+def test_expand_space_grid_and_random():
+    space = {"a": [1, 2, 3], "b": ["x", "y"]}
+    grid = expand_space(space, "grid")
+    assert len(grid) == 6 and {"a": 3, "b": "y"} in grid
+    sampled = expand_space(space, "random", n_trials=4, seed=1)
+    assert len(sampled) == 4 and sampled == expand_space(space, "random", n_trials=4, seed=1)
+    assert all(s in grid for s in sampled)
+    ranged = expand_space({"lr": {"low": 0.01, "high": 0.3, "log": True}, "leaves": {"low": 4, "high": 64, "int": True},
+                           "b": ["x", "y"]}, "random", n_trials=30, seed=3)
+    assert len(ranged) == 30 and len({t["lr"] for t in ranged}) == 30
+    assert all(0.01 <= t["lr"] <= 0.3 and isinstance(t["leaves"], int) and 4 <= t["leaves"] <= 64 for t in ranged)
+
+def test_search_ranks_trials(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 4)).astype(np.float32)
+    y = (X[:, 0] * 3).astype(np.int32)
+    # num_leaves=0 is rejected by LightGBM: the trial is reported as an error, not raised
+    trials = [{"n_estimators": 50, "num_leaves": 3}, {"n_estimators": 50, "num_leaves": 7}, {"num_leaves": 0}]
+    board, info = search("lgbm", X, y, trials, workers=1, early_stopping_rounds=5, latency_repeats=5,
+                         data_dir=str(tmp_path))
+    assert info["n_train"] + info["n_valid"] + info["n_test"] == 300
+    assert [("error" in r) for r in board] == [False, False, True]
+    assert board[0]["accuracy"] >= board[1]["accuracy"]
+    for r in board[:2]:
+        assert r["model_bytes"] > 0 and r["best_iteration"] >= 1
+        assert r["single_row_latency_ms"]["p50"] > 0
+
+def _trial(i, acc, p99, size, per_row=0.01):
+    return {"trial": i, "params": {}, "accuracy": acc, "model_bytes": size,
+            "single_row_latency_ms": {"p50": p99 / 2, "p99": p99},
+            "batch_latency_ms": {"p50": per_row * 100, "p99": per_row * 100, "per_row_p50": per_row}}
+
+def test_pareto_front_and_cheapest_selection():
+    results = [_trial(0, 0.90, 5.0, 900), _trial(1, 0.89, 1.0, 300), _trial(2, 0.80, 0.5, 100),
+               _trial(3, 0.85, 2.0, 200), _trial(4, 0.70, 3.0, 50), {"trial": 5, "params": {}, "error": "x"}]
+    assert [r["trial"] for r in pareto_front(results, "p99")] == [2, 1, 0]
+    assert [r["trial"] for r in pareto_front(results, "size")] == [4, 2, 3, 1, 0]
+    assert select_cheapest(results, tolerance=0.01, cost="p99")["trial"] == 1
+    assert select_cheapest(results, tolerance=0.0, cost="p99")["trial"] == 0
+    assert select_cheapest(results, tolerance=0.1, cost="size")["trial"] == 2
+    assert select_cheapest([{"trial": 0, "error": "x"}]) is None
+
+def test_categorical_variants(tmp_path):
+    rng = np.random.default_rng(1)
+    cats = rng.integers(0, 4, 300)
+    X = np.column_stack([cats, rng.random(300)]).astype(np.float32)
+    y = (cats % 3).astype(np.int32)
+    assert encode_variant(X, [0], "onehot").shape == (300, 5)
+    trials = [{"n_estimators": 20, "max_depth": 2, "categorical": kind} for kind in ("ordinal", "onehot", "native")]
+    board, info = search("xgb", X, y, trials, workers=1, early_stopping_rounds=5, latency_repeats=5,
+                         data_dir=str(tmp_path), cat_idx=[0])
+    assert info["encoded_widths"] == {"native": 2, "onehot": 5, "ordinal": 2}
+    assert all("error" not in r for r in board)
+    assert all(r["batch_latency_ms"]["batch_size"] == 60 for r in board)
+    native = next(r for r in board if r["params"]["categorical"] == "native")
+    assert native["accuracy"] == 1.0
+
+    # the selection must be one train.py --params-from can retrain
+    selected = select_cheapest(board, tolerance=1.0, cost="size", trainer="xgb")
+    assert selected["params"]["categorical"] == "ordinal"
+    path = tmp_path / "xgb_hparam_leaderboard.json"
+    path.write_text(json.dumps({"trainer": "xgb", "target": "prakriti", "best": board[0], "selected": selected}))
+    target, params = train.load_selected_params(str(path))
+    assert target == "prakriti" and params["max_depth"] == 2 and "categorical" not in params
+
+def test_binary_target_uses_binary_objective(tmp_path):
+    rng = np.random.default_rng(2)
+    X = rng.random((200, 3)).astype(np.float32)
+    y = (X[:, 0] > 0.5).astype(np.int32)
+    for trainer, params in (("lgbm", {"n_estimators": 20, "num_leaves": 4}), ("xgb", {"n_estimators": 20, "max_depth": 2})):
+        board, _ = search(trainer, X, y, [params], workers=1, early_stopping_rounds=5, latency_repeats=5,
+                          data_dir=str(tmp_path))
+        assert "error" not in board[0] and board[0]["accuracy"] > 0.9
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from incremental import (BOOSTER_SWAP_VERIFIED, compute_watermark, new_rows_mask, next_manifest,
+                         replace_booster, should_full_rebuild)
+
+def test_positional_watermark_selects_appended_rows():
+    df = pd.DataFrame({"a": range(5)})
+    mask = new_rows_mask(df, {"rows": 3})
+    assert mask.tolist() == [False, False, False, True, True]
+
+def test_timestamp_watermark_selects_newer_rows():
+    df = pd.DataFrame({"created_at": ["2025-01-01T00:00:00Z", "2025-02-01T00:00:00Z", None]})
+    watermark = compute_watermark(df.iloc[:1])
+    assert watermark["column"] == "created_at"
+    assert new_rows_mask(df, watermark).tolist() == [False, True, False]
+
+def test_full_rebuild_policy():
+    assert should_full_rebuild(None, 10, 100)[0]
+    manifest = next_manifest(None, "full", {"rows": 100}, 100)
+    assert not should_full_rebuild(manifest, 10, 110, full_rebuild_every=3)[0]
+    assert should_full_rebuild(manifest, 90, 190, max_incremental_fraction=0.3)[0]
+    for _ in range(2):
+        manifest = next_manifest(manifest, "incremental", {"rows": 110}, 10)
+    assert manifest["incremental_runs_since_full"] == 2
+    assert should_full_rebuild(manifest, 10, 120, full_rebuild_every=3)[0]
+    assert np.all(new_rows_mask(pd.DataFrame({"a": [1]}), None))
+
+def test_replace_booster_on_verified_versions():
+    import lightgbm as lgb
+    import xgboost as xgb
+    installed = {"lightgbm": lgb.__version__, "xgboost": xgb.__version__}
+    for lib, versions in BOOSTER_SWAP_VERIFIED.items():
+        # a dependency bump must re-verify the private _Booster swap before it ships
+        assert installed[lib].startswith(versions), f"re-verify replace_booster for {lib} {installed[lib]}"
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(120, 4))
+    y = (X[:, 0] > 0).astype(int) + (X[:, 1] > 0.5).astype(int)
+    X_new, y_new = X[:60], np.where(y[:60] == 2, 1, y[:60])  # a batch missing one class
+
+    clf = lgb.LGBMClassifier(n_estimators=5, verbose=-1).fit(X, y)
+    params = {k: v for k, v in clf.booster_.params.items() if k not in ("num_iterations", "n_estimators")}
+    booster = lgb.train(params, lgb.Dataset(X_new, label=y_new), num_boost_round=3,
+                        init_model=clf.booster_, keep_training_booster=True)
+    assert replace_booster(clf, booster).booster_ is booster
+    assert booster.current_iteration() == 8
+    np.testing.assert_allclose(clf.predict_proba(X), booster.predict(X))
+
+    model = xgb.XGBClassifier(n_estimators=5).fit(X, y)
+    params = {**model.get_xgb_params(), "num_class": 3}
+    booster = xgb.train({k: v for k, v in params.items() if v is not None}, xgb.DMatrix(X_new, label=y_new),
+                        num_boost_round=3, xgb_model=model.get_booster())
+    assert replace_booster(model, booster).get_booster() is booster
+    np.testing.assert_allclose(model.predict_proba(X), booster.predict(xgb.DMatrix(X)), rtol=1e-6)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from make_synthetic_prakriti_csv import COLUMNS, LABELS, QUESTIONS, iter_chunks, parse_balance, write_dataset
+
+def test_signal_and_balance_control_the_labels():
+    perfect = next(iter_chunks(300, 300, signal=1.0))
+    label_idx = perfect["prakriti_label"].map(LABELS.index)
+    for col, options in QUESTIONS.items():
+        assert (perfect[col].map(options.index) == label_idx).all()
+
+    noisy = next(iter_chunks(30000, 30000, signal=0.0, balance=parse_balance("vata=0.6,pitta=0.3,kapha=0.1")))
+    share = noisy["prakriti_label"].value_counts(normalize=True)
+    assert abs(share["vata"] - 0.6) < 0.02 and abs(share["kapha"] - 0.1) < 0.02
+    # no signal: answers are independent of the label
+    agree = (noisy["q_skin"].map(QUESTIONS["q_skin"].index) == noisy["prakriti_label"].map(LABELS.index)).mean()
+    assert abs(agree - 1 / 3) < 0.02
+
+    with pytest.raises(ValueError):
+        parse_balance("0.5,0.5")
+
+def test_streamed_output_is_seeded_and_matches_across_formats(tmp_path):
+    csv = write_dataset(str(tmp_path / "a.csv"), 2500, chunk_rows=1000, seed=3)
+    again = write_dataset(str(tmp_path / "b.csv"), 2500, chunk_rows=1000, seed=3)
+    parquet = write_dataset(str(tmp_path / "a.parquet"), 2500, chunk_rows=1000, seed=3)
+    assert csv["class_counts"] == again["class_counts"] == parquet["class_counts"]
+    assert sum(csv["class_counts"].values()) == 2500
+
+    a = pd.read_csv(tmp_path / "a.csv")
+    assert list(a.columns) == COLUMNS and a["user_id"].iloc[-1] == "user_2499"
+    assert (tmp_path / "a.csv").read_bytes() == (tmp_path / "b.csv").read_bytes()
+    pd.testing.assert_frame_equal(a, pd.read_parquet(tmp_path / "a.parquet"), check_dtype=False)
+    assert not list(tmp_path.glob("*.tmp"))
+    assert np.all(a["age"].between(18, 70))
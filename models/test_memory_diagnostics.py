@@ -0,0 +1,51 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from memory_diagnostics import MemoryDiagnostics, deep_sizeof, serialized_size
+
+_leak = []
+
+def _grow(n):
+    for _ in range(n):
+        _leak.append(bytearray(10000))
+
+def test_disabled_by_default():
+    diagnostics = MemoryDiagnostics()
+    status = diagnostics.status()
+    assert not status["tracing"] and status["sampling_seconds"] is None and diagnostics._thread is None
+    assert status["rss_mb"] is None or status["rss_mb"] > 0
+
+def test_snapshot_diff_points_at_the_growing_site():
+    diagnostics = MemoryDiagnostics(frames=5, max_snapshots=3)
+    try:
+        assert diagnostics.start()["tracing"]
+        _grow(200)
+        diagnostics.snapshot("after")
+        diff = diagnostics.diff("start", "after", limit=5)
+        assert "test_memory_diagnostics.py" in diff["top"][0]["site"]
+        assert diff["top"][0]["size_delta_kb"] > 1500 and diff["traced_delta_kb"] > 1500
+        assert any("test_memory_diagnostics.py" in s["site"] for s in diagnostics.top(10, "filename"))
+        for i in range(4):
+            diagnostics.snapshot(f"s{i}")
+        assert [s["label"] for s in diagnostics.snapshots()] == ["start", "s2", "s3"]
+    finally:
+        _leak.clear()
+        status = diagnostics.stop()
+    assert not status["tracing"] and status["snapshots"] == [] and not tracemalloc.is_tracing()
+
+def test_sampler_series_and_sizes():
+    diagnostics = MemoryDiagnostics(sample_window=3)
+    diagnostics.start_sampler(0.1)
+    time.sleep(0.5)
+    diagnostics.stop_sampler()
+    samples = diagnostics.samples()
+    assert len(samples) == 3 and all(s["traced_mb"] is None and s["threads"] >= 1 for s in samples)
+    assert diagnostics._thread is None
+
+    cache = {"a": np.zeros(100000), "b": [np.zeros(1000)] * 3}
+    assert deep_sizeof(cache) >= 808000
+    sizes = MemoryDiagnostics.sizes({"cache": cache, "missing": None}, serialized=["cache"])
+    assert set(sizes) == {"cache"} and sizes["cache"]["items"] == 2
+    assert sizes["cache"]["serialized_mb"] >= 0.76 and serialized_size(lambda: 0) is None
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.preprocessing import LabelEncoder
+
+from model_bundle import (BundleError, ModelBundle, load_model_and_meta, model_components, model_version,
+                          open_model, write_bundle)
+from train import load_previous_artifacts, load_previous_meta
+
+def test_bundle_roundtrip_lazy_components_and_checksums(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = rng.random((200, 4)), rng.integers(0, 3, 200)
+    model = xgb.XGBClassifier(n_estimators=5, max_depth=3).fit(X, y)
+    labels = LabelEncoder().fit(["kapha", "pitta", "vata"])
+    path = str(tmp_path / "prakriti.bundle")
+    manifest = write_bundle(path, {"model": model, "encoders": {"q_skin": ["dry", "oily"]},
+                                   "label_encoder": labels, "edges": np.linspace(0, 1, 11)},
+                            meta={"features": ["a", "b", "c", "d"], "manifest": {"training_mode": "full"}})
+    kinds = {n: e["kind"] for n, e in manifest["components"].items()}
+    assert kinds == {"model": "xgboost", "encoders": "json", "label_encoder": "label_encoder", "edges": "array"}
+    assert all(e["offset"] % 64 == 0 for e in manifest["components"].values())
+
+    with ModelBundle(path) as bundle:
+        assert bundle.meta["features"] == ["a", "b", "c", "d"] and set(bundle.timings) == {"open"}
+        np.testing.assert_allclose(bundle.get("model").predict_proba(X), model.predict_proba(X), rtol=1e-6)
+        assert "model" in bundle.timings and "label_encoder" not in bundle.timings
+        assert list(bundle.get("label_encoder").inverse_transform([2, 0])) == ["vata", "kapha"]
+        edges = bundle.get("edges")
+        assert edges.dtype == np.float32 and not edges.flags.writeable and edges[-1] == 1.0
+        assert bundle.verify_all() and bundle.version == manifest["bundle_id"][:12]
+
+    # flip one byte inside the model blob: caught on access
+    with ModelBundle(path) as bundle:
+        entry = bundle.manifest["components"]["model"]
+        at = bundle._data_start + entry["offset"] + entry["size"] // 2
+    with open(path, "r+b") as fh:
+        fh.seek(at)
+        byte = fh.read(1)
+        fh.seek(at)
+        fh.write(bytes([byte[0] ^ 0xFF]))
+    with ModelBundle(path) as bundle:
+        assert not bundle.verify_all() and bundle.get("encoders") == {"q_skin": ["dry", "oily"]}
+        with pytest.raises(BundleError):
+            bundle.get("model")
+
+def test_loaders_prefer_the_bundle_and_fall_back_to_legacy_files(tmp_path):
+    import joblib
+    import json
+    model = xgb.XGBClassifier(n_estimators=3).fit(np.eye(3), [0, 1, 2])
+    joblib.dump(model, tmp_path / "prakriti_model.joblib")
+    with open(tmp_path / "prakriti_meta.json", "w") as fh:
+        json.dump({"features": ["legacy"]}, fh)
+    loaded, meta, version = load_model_and_meta(str(tmp_path))
+    assert meta == {"features": ["legacy"]} and version == model_version(str(tmp_path)) != "none"
+
+    write_bundle(str(tmp_path / "prakriti.bundle"), {"model": model}, {"features": ["bundle"], "training_key": "k"})
+    loaded, meta, version = load_model_and_meta(str(tmp_path))
+    assert meta["features"] == ["bundle"] and version == model_version(str(tmp_path))
+    assert load_previous_meta("prakriti", str(tmp_path))["training_key"] == "k"
+    assert load_previous_artifacts("prakriti", str(tmp_path))[0].n_classes_ == 3
+
+def test_served_bundle_stays_open_and_decodes_components_on_demand(tmp_path, monkeypatch):
+    import inference_updated
+    model = xgb.XGBClassifier(n_estimators=3).fit(np.eye(3), [0, 1, 2])
+    labels = LabelEncoder().fit(["kapha", "pitta", "vata"])
+    manifest = write_bundle(str(tmp_path / "prakriti.bundle"), {"model": model, "label_encoder": labels},
+                            {"features": ["a"]})
+    assert manifest["components"]["model"]["compression"] is None
+
+    monkeypatch.setattr(inference_updated, "MODEL_DIR", str(tmp_path))
+    inference_updated.unload_model()
+    try:
+        loaded, meta = inference_updated.load_model()
+        bundle = inference_updated._bundle
+        assert meta == {"features": ["a"]} and inference_updated.get_model_version() == bundle.version
+        assert "model" in bundle.timings and "label_encoder" not in bundle.timings
+        assert list(inference_updated.get_component("label_encoder").classes_) == ["kapha", "pitta", "vata"]
+        assert inference_updated.get_component("missing", "default") == "default"
+    finally:
+        inference_updated.unload_model()
+    assert inference_updated._bundle is None and bundle._fh.closed
+
+def test_lightgbm_pipeline_is_served_from_tree_arrays(tmp_path):
+    import lightgbm as lgb
+    import pandas as pd
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+    from tree_arrays import TreeArrayClassifier
+    rng = np.random.default_rng(3)
+    X = pd.DataFrame({"age": rng.integers(18, 70, 300), "q_skin": rng.choice(["dry", "oily", "warm"], 300)})
+    y = np.array(["vata", "pitta", "kapha"])[(X["q_skin"].map({"dry": 0, "oily": 1, "warm": 2}) + (X["age"] > 50)) % 3]
+    pipeline = Pipeline([("preprocessor", ColumnTransformer([("cat", OneHotEncoder(handle_unknown="ignore"), ["q_skin"])],
+                                                            remainder="passthrough")),
+                         ("classifier", lgb.LGBMClassifier(n_estimators=20, verbose=-1))]).fit(X, y)
+    components, kinds = model_components(pipeline)
+    manifest = write_bundle(str(tmp_path / "prakriti.bundle"), components, {"model_type": "prakriti_lgbm"}, kinds)
+    assert {n: e["kind"] for n, e in manifest["components"].items()} == {"model": "lgbm_arrays", "estimator": "joblib"}
+    assert manifest["components"]["model"]["compression"] is None
+
+    model, meta, version, bundle = open_model(str(tmp_path))
+    try:
+        classifier = model.named_steps["classifier"]
+        assert isinstance(classifier, TreeArrayClassifier) and "estimator" not in bundle.timings
+        # the node array is a read-only view of the memory map
+        assert not classifier.nodes.flags.writeable and not classifier.nodes.flags.owndata
+        np.testing.assert_allclose(model.predict_proba(X), pipeline.predict_proba(X), atol=1e-6)
+        assert (model.predict(X.iloc[:1]) == pipeline.predict(X.iloc[:1])).all()
+        retrainable = bundle.get("estimator")
+        assert retrainable.named_steps["classifier"].booster_.num_trees() == 60
+    finally:
+        bundle.close()
+
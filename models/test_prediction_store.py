@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+from prediction_store import (
+    ParquetSink, PredictionRecorder, SQLiteSink, WriteBehindBuffer, input_hash, sink_from_url
+)
+
+RESULT = {"prakriti": {"dominant": "vata"}, "confidence": 0.7,
+          "features_used": {"calculation_method": "traditional"}}
+
+def test_input_hash_ignores_key_order():
+    assert input_hash([{"a": 1, "b": 2}]) == input_hash([{"b": 2, "a": 1}])
+
+def test_recorder_flushes_to_sqlite_on_stop(tmp_path):
+    db = tmp_path / "predictions.db"
+    recorder = PredictionRecorder(SQLiteSink(str(db)), batch_size=4, flush_interval=0.05).start()
+    for i in range(10):
+        assert recorder.record([{"trait": "vata", "weight": i}], RESULT, "abc123", 1.5)
+    recorder.stop()
+    rows = sqlite3.connect(db).execute(
+        "SELECT model_version, dominant, latency_ms FROM ml_prediction_log").fetchall()
+    assert len(rows) == 10
+    assert rows[0] == ("abc123", "vata", 1.5)
+    assert recorder.stats()["written"] == 10
+
+def test_buffer_is_bounded_and_drops_when_full():
+    release = threading.Event()
+
+    class SlowSink:
+        def __init__(self):
+            self.records = []
+        def write_batch(self, records):
+            release.wait(5)
+            self.records.extend(records)
+        def close(self):
+            pass
+
+    sink = SlowSink()
+    buf = WriteBehindBuffer(sink, max_size=3, batch_size=1, flush_interval=0.01).start()
+    results = [buf.put(i) for i in range(20)]
+    assert not all(results)
+    assert buf.stats()["dropped"] > 0
+    release.set()
+    buf.stop()
+    assert len(sink.records) == buf.stats()["written"] == 20 - buf.stats()["dropped"]
+
+def test_parquet_sink(tmp_path):
+    sink = sink_from_url(f"parquet://{tmp_path}")
+    assert isinstance(sink, ParquetSink)
+    recorder = PredictionRecorder(sink, batch_size=2).start()
+    for _ in range(3):
+        recorder.record([{"trait": "kapha"}], RESULT, "v1", 2.0)
+    recorder.stop()
+    df = pd.read_parquet(tmp_path)
+    assert len(df) == 3
+    assert set(df["model_version"]) == {"v1"}
@@ -0,0 +1,151 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import model_bundle
+from retrain_scheduler import (CronSchedule, RetrainScheduler, SingleFlight, count_new_labels, csv_label_counter,
+                               run_in_child, run_training_job)
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+def test_cron_schedule():
+    nightly = CronSchedule("30 3 * * *")
+    assert nightly.next_after(_utc(2024, 1, 1, 3, 30)) == _utc(2024, 1, 2, 3, 30)
+    assert nightly.next_after(_utc(2024, 1, 1, 1, 0)) == _utc(2024, 1, 1, 3, 30)
+    weekdays = CronSchedule("*/15 9-17 * * 1-5")
+    assert weekdays.next_after(_utc(2024, 1, 5, 17, 50)) == _utc(2024, 1, 8, 9, 0)  # Friday -> Monday
+    assert CronSchedule("0 0 1 */3 *").next_after(_utc(2024, 2, 10)) == _utc(2024, 4, 1)
+    assert CronSchedule("0 12 * * 7").matches(_utc(2024, 1, 7, 12, 0))  # Sunday as 7
+
+def test_triggers_single_flight_and_bounded_history(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def runner(mode, force):
+        calls.append(mode)
+        release.wait(5)
+        return {"status": "success", "accuracy": 0.9}
+
+    labels = {"n": 0}
+    drift = {"max_feature_psi": 0.05}
+    reloaded = []
+    lock_path = str(tmp_path / "retrain.lock")
+    scheduler = RetrainScheduler(new_labels_threshold=100, label_counter=lambda: labels["n"],
+                                 drift_threshold=0.2, drift_source=lambda: drift, lock_path=lock_path,
+                                 cooldown_seconds=0, history_size=3, runner=runner, on_success=reloaded.append)
+    assert scheduler.tick() is None and not calls
+
+    labels["n"] = 150
+    worker = threading.Thread(target=scheduler.tick)
+    worker.start()
+    while scheduler.current is None:
+        pass
+    # a second job (here, from another uvicorn worker via the file lock) is refused, not queued
+    assert scheduler.run("manual")["status"] == "busy"
+    other_process = SingleFlight(lock_path)
+    assert not other_process.acquire()
+    release.set()
+    worker.join()
+    assert other_process.acquire()
+    assert scheduler.run("manual")["status"] == "busy"
+    other_process.release()
+
+    job = scheduler.history[-1]
+    assert job["trigger"] == "new_labels" and job["status"] == "success" and reloaded == [job]
+    labels["n"] = 0
+    drift["max_feature_psi"] = 0.4
+    assert scheduler.tick()["trigger"] == "drift"
+    for _ in range(3):
+        scheduler.run("manual")
+    status = scheduler.status()
+    assert status["jobs"] == 3 and [j["trigger"] for j in status["history"]] == ["manual"] * 3
+    assert status["skipped_busy"] == 2 and calls == ["incremental", "full"] + ["incremental"] * 3
+
+def test_drift_waits_for_new_observations_after_a_job(tmp_path):
+    calls, resets = [], []
+    report = {"max_feature_psi": 0.5, "min_samples": 100, "prediction_classes": {"observations": 150}}
+
+    def runner(mode, force):
+        calls.append(mode)
+        return {"status": "no_change"}
+
+    def reset():
+        resets.append(report["prediction_classes"]["observations"])
+        report["prediction_classes"]["observations"] = 0
+
+    scheduler = RetrainScheduler(drift_threshold=0.25, drift_source=lambda: report, cooldown_seconds=0,
+                                 runner=runner, drift_reset=reset, lock_path=str(tmp_path / "lock"))
+    job = scheduler.tick()
+    assert job["trigger"] == "drift" and job["mode"] == "full" and job["status"] == "no_change"
+    # nothing reloaded the model, so the window was cleared instead of re-firing every check
+    assert resets == [150] and scheduler.tick() is None
+    report["prediction_classes"]["observations"] = 99
+    assert scheduler.tick() is None and scheduler.status()["drift_observations_since_job"] == 99
+    report["prediction_classes"]["observations"] = 100
+    assert scheduler.tick()["trigger"] == "drift" and calls == ["full", "full"]
+
+    # without a reset hook the count is taken from where the last job left the monitor
+    scheduler = RetrainScheduler(drift_threshold=0.25, drift_source=lambda: report, cooldown_seconds=0,
+                                 runner=runner, lock_path=str(tmp_path / "lock"))
+    scheduler.run("manual")
+    assert scheduler.tick() is None
+    report["prediction_classes"]["observations"] = 200
+    assert scheduler.tick()["trigger"] == "drift"
+
+def test_failed_job_is_recorded(tmp_path):
+    def runner(mode, force):
+        raise RuntimeError("boom")
+    scheduler = RetrainScheduler(runner=runner, lock_path=str(tmp_path / "lock"))
+    job = scheduler.run("manual", mode="full")
+    assert job["status"] == "failed" and "boom" in job["error"] and job["mode"] == "full"
+    assert scheduler.guard.acquire()
+
+def test_child_process_job_and_label_counter(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path / "model"))
+    monkeypatch.setenv("DATASET_CACHE_DIR", str(tmp_path / "dataset_cache"))
+    monkeypatch.setenv("STAGE_CACHE_DIR", str(tmp_path / "stages"))
+    rng = np.random.default_rng(0)
+    label = rng.integers(0, 3, 90)
+    pct = np.full((90, 3), 20)
+    pct[np.arange(90), label] = 60
+    csv_path = tmp_path / "data.csv"
+    frame = pd.DataFrame({"age": rng.integers(18, 70, 90), "q_skin": np.array(["dry", "oily", "warm"])[label],
+                          "percent_vata": pct[:, 0], "percent_pitta": pct[:, 1], "percent_kapha": pct[:, 2]})
+    frame.iloc[:60].to_csv(csv_path, index=False)
+
+    counter = csv_label_counter(str(csv_path), str(tmp_path / "model"))
+    assert counter() == 60
+    result = run_in_child(run_training_job, "full", False, str(csv_path))
+    assert result["status"] == "success" and result["training_mode"] == "full"
+    assert counter() == 0
+    frame.to_csv(csv_path, index=False)
+    assert counter() == 30
+
+def test_label_counter_ignores_unlabeled_rows(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path / "model"))
+    monkeypatch.setenv("DATASET_CACHE_DIR", str(tmp_path / "dataset_cache"))
+    monkeypatch.setenv("STAGE_CACHE_DIR", str(tmp_path / "stages"))
+    rng = np.random.default_rng(1)
+    label = pd.Series(np.array(["vata", "pitta", "kapha"])[rng.integers(0, 3, 120)], dtype=object)
+    label[::6] = None
+    frame = pd.DataFrame({"age": rng.integers(18, 70, 120),
+                          "q_skin": label.map({"vata": "dry", "pitta": "warm", "kapha": "oily"}).fillna("mixed"),
+                          "prakriti_label": label})
+    csv_path = tmp_path / "data.csv"
+    frame.iloc[:90].to_csv(csv_path, index=False)
+
+    counter = csv_label_counter(str(csv_path), str(tmp_path / "model"))
+    assert counter() == 75
+    assert run_in_child(run_training_job, "full", False, str(csv_path))["status"] == "success"
+    # the 15 unlabeled rows in the trained data do not shift the boundary
+    assert counter() == 0
+    frame.to_csv(csv_path, index=False)
+    assert counter() == 25
+
+    # models trained before the raw watermark recorded a count of labeled rows
+    monkeypatch.setattr(model_bundle, "read_bundle_meta",
+                        lambda *a: {"manifest": {"data_watermark": {"rows": 75}}})
+    assert count_new_labels(str(csv_path), str(tmp_path / "model")) == 25
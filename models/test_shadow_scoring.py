@@ -0,0 +1,39 @@
+import time
+
+import inference_updated as inference
+from shadow_scoring import ShadowScorer
+
+ANSWERS = [{"trait": "vata", "weight": 1}, {"trait": "pitta", "weight": 0.2}]
+
+def _wait_for(scorer, n, timeout=5.0):
+    deadline = time.time() + timeout
+    while scorer.stats()["scored"] < n and time.time() < deadline:
+        time.sleep(0.01)
+
+def test_identical_candidate_agrees():
+    model, metadata = inference.load_model()
+    scorer = ShadowScorer(model, metadata)
+    primary = inference.predict_from_answers(ANSWERS)
+    for _ in range(3):
+        assert scorer.submit(ANSWERS, primary)
+    _wait_for(scorer, 3)
+    stats = scorer.stats()
+    scorer.stop()
+    assert stats["scored"] == 3
+    assert stats["agreement_rate"] == 1.0
+    assert stats["max_abs_probability_delta"] == 0.0
+    assert stats["candidate_latency_ms"]["p99"] is not None
+
+def test_drops_instead_of_queueing_when_busy():
+    model, metadata = inference.load_model()
+    load = {"saturation": 1.5}
+    scorer = ShadowScorer(model, metadata, workers=1, max_queue_depth=2, saturation=lambda: load["saturation"])
+    assert not scorer.submit(ANSWERS, {})
+    scorer.stop()
+    # primary slots free again, but the candidate's backlog is at its limit
+    load["saturation"] = 0.5
+    assert scorer.submit(ANSWERS, {}) and scorer.submit(ANSWERS, {})
+    assert not scorer.submit(ANSWERS, {})
+    stats = scorer.stats()
+    assert stats["dropped_busy"] == 2
+    assert stats["scored"] == 0 and stats["queued"] == 2
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import stage_cache
+import train_csv
+from stage_cache import StageCache, stage_key
+
+def test_stage_cache_hits_misses_and_pruning(tmp_path):
+    assert stage_key("fit", {"a": 1, "b": 2}) == stage_key("fit", {"b": 2, "a": 1})
+    assert stage_key("fit", {"a": 1}) != stage_key("cv", {"a": 1})
+
+    cache = StageCache(str(tmp_path), keep=2)
+    calls = []
+    compute = lambda: calls.append(1) or {"value": len(calls)}
+    assert cache.run("fit", "k1", compute) == {"value": 1}
+    assert cache.run("fit", "k1", compute) == {"value": 1} and len(calls) == 1
+    assert cache.log["fit"]["hit"] is True
+
+    # refresh recomputes and overwrites; disabled never touches disk
+    assert StageCache(str(tmp_path), refresh=True).run("fit", "k1", compute) == {"value": 2}
+    assert StageCache(str(tmp_path)).get("fit", "k1") == {"value": 2}
+    StageCache(str(tmp_path / "off"), enabled=False).run("fit", "k1", compute)
+    assert not os.path.exists(tmp_path / "off")
+
+    for key in ("k2", "k3"):
+        cache.run("fit", key, compute)
+    assert len(os.listdir(tmp_path / "fit")) == 2
+
+def test_identical_retrain_is_no_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_csv, "MODEL_DIR", str(tmp_path / "models"))
+    monkeypatch.setattr(train_csv, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(stage_cache, "STAGE_CACHE_DIR", str(tmp_path / "stages"))
+    (tmp_path / "models").mkdir()
+    rng = np.random.default_rng(0)
+    label = rng.integers(0, 3, 90)
+    pct = np.full((90, 3), 20)
+    pct[np.arange(90), label] = 60
+    csv_path = tmp_path / "data.csv"
+    pd.DataFrame({"age": rng.integers(18, 70, 90),
+                  "q_skin": np.array(["dry", "oily", "warm"])[label],
+                  "percent_vata": pct[:, 0], "percent_pitta": pct[:, 1], "percent_kapha": pct[:, 2]}
+                 ).to_csv(csv_path, index=False)
+    params = {"n_estimators": 10, "verbose": -1}
+
+    _, meta = train_csv.train_model(str(csv_path), params=params)
+    assert "status" not in meta and meta["training_key"]
+    model_path = tmp_path / "models" / "prakriti.bundle"
+    written = model_path.stat().st_mtime_ns
+
+    _, meta2 = train_csv.train_model(str(csv_path), params=params)
+    assert meta2["status"] == "no_change" and meta2["training_key"] == meta["training_key"]
+    assert model_path.stat().st_mtime_ns == written
+
+    # other settings retrain; returning to the first ones reuses the cached fit
+    _, meta3 = train_csv.train_model(str(csv_path), params={**params, "n_estimators": 5})
+    assert "status" not in meta3 and meta3["training_key"] != meta["training_key"]
+    _, meta4 = train_csv.train_model(str(csv_path), params=params)
+    assert meta4["training_key"] == meta["training_key"]
+    assert meta4["manifest"]["boosting_rounds_total"] == 10
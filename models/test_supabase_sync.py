@@ -0,0 +1,145 @@
+import re
+import argparse
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from supabase_sync import SupabaseSync, shard_bounds
+import train
+from train import build_dataframe, rows_from_frame
+
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+class FakePostgrest:
+    """Stand-in for /rest/v1/<table>: the filters, ordering and limit the sync sends"""
+
+    def __init__(self, rows):
+        self.rows = {r["id"]: r for r in rows}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _match(self, row, params):
+        ts = row["updated_at"] and datetime.fromisoformat(row["updated_at"])
+        for key, value in params:
+            op, _, arg = value.partition(".")
+            if key == "id" and not {"gte": row["id"] >= arg, "lt": row["id"] < arg, "gt": row["id"] > arg}[op]:
+                return False
+            if key == "updated_at" and value == "is.null" and ts is not None:
+                return False
+            if key == "updated_at" and value == "not.is.null" and ts is None:
+                return False
+            if key == "updated_at" and op == "gte" and (ts is None or ts < datetime.fromisoformat(arg)):
+                return False
+            if key == "or":
+                m = re.fullmatch(r'\(updated_at\.gt\."(.+)",and\(updated_at\.eq\."(.+)",id\.gt\.(.+)\)\)', value)
+                after = datetime.fromisoformat(m.group(1))
+                if ts is None or not (ts > after or (ts == after and row["id"] > m.group(3))):
+                    return False
+        return True
+
+    def __call__(self, request):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.002)
+        params = list(request.url.params.multi_items())
+        self.requests.append(params)
+        assert request.headers["apikey"] == "key" and request.url.path == "/rest/v1/questionnaire_answers"
+        rows = [r for r in self.rows.values() if self._match(r, params)]
+        if dict(params)["order"] == "id.asc":
+            rows.sort(key=lambda r: r["id"])
+        else:
+            rows.sort(key=lambda r: (datetime.fromisoformat(r["updated_at"]), r["id"]))
+        with self.lock:
+            self.in_flight -= 1
+        return httpx.Response(200, json=rows[:int(dict(params)["limit"])])
+
+def _row(i, minutes, updated=None):
+    return {"id": str(uuid.UUID(int=(i * 0x9E3779B97F4A7C15 << 64) % (1 << 128))),
+            "questionnaire_type": "prakriti", "answers": [{"questionId": "q1", "value": "dry"}],
+            "scores": {"percent": {"vata": 60, "pitta": 20, "kapha": 20}}, "confidence_score": 0.8,
+            "updated_at": None if updated == "null" else (BASE + timedelta(minutes=minutes)).isoformat()}
+
+def test_shard_bounds_cover_the_uuid_space():
+    bounds = shard_bounds(4)
+    assert bounds[0][0] is None and bounds[-1][1] is None
+    assert [hi for _, hi in bounds[:-1]] == [lo for lo, _ in bounds[1:]]
+    assert bounds[1][0] == "40000000-0000-0000-0000-000000000000"
+
+def test_incremental_sync_pages_shards_and_tracks_high_water(tmp_path):
+    # several rows share an updated_at so pages split ties on id
+    rows = [_row(i, i // 3) for i in range(250)] + [_row(900, 0, updated="null")]
+    server = FakePostgrest(rows)
+    sync = SupabaseSync("http://supabase.test", "key", cache_dir=str(tmp_path), page_size=20, shards=4,
+                        max_connections=2, lookback_seconds=0, transport=httpx.MockTransport(server))
+
+    report = sync.sync()
+    assert report["mode"] == "full" and report["rows_fetched"] == 251
+    assert server.max_in_flight <= 2
+    frame = sync.load_frame()
+    assert len(frame) == 251 and frame["id"].is_unique
+    assert sync.load_state()["high_water"]["updated_at"] == (BASE + timedelta(minutes=83)).isoformat()
+
+    # later run: two rows change, three are added; only those (and the NULL row) come back
+    for i in (5, 100):
+        server.rows[_row(i, 0)["id"]]["updated_at"] = (BASE + timedelta(minutes=200)).isoformat()
+        server.rows[_row(i, 0)["id"]]["confidence_score"] = 0.1
+    for i in range(250, 253):
+        server.rows[_row(i, 0)["id"]] = _row(i, 300)
+    report = sync.sync()
+    assert report["mode"] == "incremental" and report["rows_fetched"] == 6
+    frame = sync.load_frame()
+    assert len(frame) == 254
+    assert frame.set_index("id").loc[_row(5, 0)["id"], "confidence_score"] == "0.1"
+    assert frame["id"].iloc[-1] in {_row(i, 0)["id"] for i in range(250, 253)}
+
+    # the cache reads back as training rows
+    train_rows = rows_from_frame(frame)
+    assert train_rows[0]["scores"] == {"percent": {"vata": 60, "pitta": 20, "kapha": 20}}
+    df, y_prak, _, _ = build_dataframe(train_rows)
+    assert len(df) == 254 and set(y_prak.dropna()) == {"vata"}
+
+    sync.compact()
+    assert len(sync.parts()) == 1 and len(sync.load_frame()) == 254
+    sync.close()
+
+class _FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.limits = []
+
+    def from_(self, table):
+        return self
+
+    def select(self, columns):
+        return self
+
+    def limit(self, n):
+        self.limits.append(n)
+        return self
+
+    def execute(self):
+        return {"data": self.rows[:self.limits[-1]]}
+
+def test_failed_sync_falls_back_to_the_capped_fetch(monkeypatch):
+    def broken_sync(*args, **kwargs):
+        raise RuntimeError("sync down")
+    client = _FakeClient([_row(i, i) for i in range(5)])
+    monkeypatch.setattr(train, "sync_from_env", broken_sync)
+    monkeypatch.setattr(train, "create_client", lambda url, key: client)
+    args = argparse.Namespace(csv=None, no_sync=False, sync_dir="unused", full_sync=False, limit=3)
+
+    rows, report = train.load_training_rows(args, "http://supabase.test", "key")
+    assert len(rows) == 3 and client.limits[-1] == 3
+    assert report == {"error": "sync down", "fallback": "capped_fetch"}
+
+    client.rows = []
+    monkeypatch.setattr(train, "load_training_rows", lambda *a: ([], report))
+    with pytest.raises(SystemExit, match="sync down"):
+        train.main(["--supabase-url", "http://supabase.test", "--supabase-key", "key"])
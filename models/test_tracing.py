@@ -0,0 +1,77 @@
+import json
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+import tracing
+from tracing import JsonlTraceSink, Tracer, mark, parse_traceparent, span
+from execution_policy import ExecutionPolicy
+
+def test_traceparent_and_request_id_propagation():
+    tp = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert parse_traceparent(tp) == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+    assert parse_traceparent("00-zz-00f067aa0ba902b7-01") == (None, None, None)
+    assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") == (None, None, None)
+
+    tracer = Tracer(sample_rate=0.0)
+    # upstream sampled flag wins over a zero rate; the upstream span becomes the root's parent
+    with tracer.request("POST /predict", {"traceparent": tp, "x-request-id": "req-1"}) as trace:
+        with span("validate"):
+            pass
+    assert trace.sampled and trace.request_id == "req-1"
+    record = tracer.find("req-1")[0]
+    assert record["trace_id"] == "4bf92f3577b34da6a3ce929d0e0e4736" and record["parent_id"] == "00f067aa0ba902b7"
+    assert record["spans"][0]["parent_id"] == record["span_id"]
+
+    with tracer.request("POST /predict", {"x-request-id": "req-2"}) as trace:
+        assert span("validate") is tracing.NOOP_SPAN
+        mark("fallback")
+    assert not trace.sampled and trace.request_id == "req-2" and tracer.find("req-2") == []
+    assert tracer.stats()["requests"] == 2 and tracer.stats()["sampled"] == 1
+
+def test_spans_follow_the_request_into_the_threadpool():
+    tracer = Tracer(sample_rate=1.0)
+    policy = ExecutionPolicy(concurrency=1)
+
+    def predict(x):
+        with span("model_predict", rows=x) as s:
+            s.set(done=True)
+        mark("fallback", reason="test")
+        return x
+
+    async def handle():
+        with tracer.request("POST /predict") as trace:
+            with span("inference"):
+                await run_in_threadpool(policy.run, predict, 3)
+            try:
+                with span("serialize"):
+                    raise ValueError("bad")
+            except ValueError:
+                pass
+        return trace
+
+    trace = asyncio.run(handle())
+    spans = {s["name"]: s for s in tracer.recent(1)[0]["spans"]}
+    assert set(spans) == {"inference", "queue_wait", "model_predict", "fallback", "serialize"}
+    assert spans["inference"]["parent_id"] == trace.root_id
+    assert spans["queue_wait"]["parent_id"] == spans["inference"]["span_id"]
+    assert spans["model_predict"]["parent_id"] == spans["inference"]["span_id"]
+    assert spans["model_predict"]["attrs"] == {"rows": 3, "done": True}
+    assert spans["serialize"]["error"] == "ValueError: bad"
+    assert tracing.current_trace() is None
+    assert set(tracer.stage_summary()) == set(spans)
+
+def test_file_export_is_batched_and_bounded(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=1.0, sink=JsonlTraceSink(str(path)), recent=3, max_spans=2, buffer_size=5)
+    for i in range(7):
+        with tracer.request("GET /health", {"x-request-id": f"r{i}"}):
+            for _ in range(3):
+                with span("stage"):
+                    pass
+    assert [r["request_id"] for r in tracer.recent()] == ["r6", "r5", "r4"]
+    assert tracer.stats()["export"]["dropped"] == 2
+    tracer.stop()
+    lines = [json.loads(l) for l in path.read_text().splitlines()]
+    assert [r["request_id"] for r in lines] == [f"r{i}" for i in range(5)]
+    assert all(len(r["spans"]) == 2 and r["dropped_spans"] == 1 for r in lines)
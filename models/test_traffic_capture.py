@@ -0,0 +1,28 @@
+from traffic_capture import TrafficRecorder, anonymize_answers, load_capture
+from replay_traffic import compare
+
+RESULT = {"prakriti": {"dominant": "vata", "vata": 0.6, "pitta": 0.2, "kapha": 0.2},
+          "confidence": 0.6, "features_used": {"calculation_method": "traditional"}}
+
+def test_anonymize_keeps_model_fields_only():
+    answers = [{"questionId": "q1", "trait": "vata", "weight": 1, "text": "free text", "userId": "u1"}]
+    assert anonymize_answers(answers) == [{"questionId": "q1", "trait": "vata", "weight": 1}]
+
+def test_capture_round_trip_and_rotation(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path), max_bytes=300, max_files=2).start()
+    for i in range(10):
+        recorder.capture(1000.0 + i, "/predict", {"answers": [{"trait": "vata", "weight": i}]}, 200, 1.0, RESULT)
+    recorder.stop()
+    assert len(list(tmp_path.glob("capture-*.jsonl.gz"))) <= 2
+    records = load_capture([str(tmp_path)])
+    assert records and records == sorted(records, key=lambda r: r["t"])
+    assert records[-1]["payload"] == {"answers": [{"trait": "vata", "weight": 9}]}
+    assert records[-1]["response"]["dominant"] == "vata"
+
+def test_compare_flags_changed_prediction():
+    record = {"endpoint": "/predict", "status": 200,
+              "response": {"dominant": "vata", "vata": 0.6, "pitta": 0.2, "kapha": 0.2, "confidence": 0.6}}
+    same = {"status": 200, "response": dict(record["response"])}
+    changed = {"status": 200, "response": dict(record["response"], dominant="pitta", confidence=0.4)}
+    assert compare(record, same, 1e-6) == []
+    assert len(compare(record, changed, 1e-6)) == 2
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from build_dataframe_reference import legacy_build_dataframe, same_output, synthetic_rows
+from train import apply_encoders, build_dataframe, encode_dataframe, load_rows_from_csv
+
+EDGE_ROWS = [
+    # duplicate question (last answer wins), numeric and string values, None value
+    {"answers": [{"questionId": "q1", "value": 2}, {"questionId": "q1", "optionId": "q1_b"},
+                 {"questionId": "q2", "value": None}, {"id": "q3", "answer": "3"}],
+     "prakriti_label": "vata", "mental_health_score": "55"},
+    # dict-shaped answers, q* column filling a zero cell, score-derived labels
+    {"answers": {"q1": {"value": 0}, "q4": "x"}, "q1": "7", "q_extra": "yes",
+     "scores": {"percent": {"vata": 10, "pitta": 70, "kapha": 20}},
+     "mental_health_score": {"level": "yellow"}},
+    # no labels at all: dropped
+    {"answers": [{"questionId": "q2", "value": 1.5}], "mental_health_score": "n/a"},
+    # dominant fallback, numeric band, NaN score counts as green
+    {"answers": [{"questionId": "q5", "weight": 2}], "dominant": "kapha", "mental_health_score": 12},
+    {"answers": None, "scores": {"dominant": "pitta"}, "mental_health_score": float("nan")},
+]
+
+def test_matches_previous_builder_on_edge_cases():
+    new = build_dataframe(EDGE_ROWS)
+    old = legacy_build_dataframe(EDGE_ROWS)
+    assert same_output(new, old)
+    pd.testing.assert_frame_equal(new[0], old[0])
+    assert new[1].tolist() == ["vata", "pitta", "kapha", "pitta"]
+    assert new[2].tolist() == ["yellow", "yellow", "red", "green"]
+
+def test_matches_previous_builder_across_chunks():
+    rows = synthetic_rows(700, seed=3)
+    new = build_dataframe(rows, chunk_size=128)
+    old = legacy_build_dataframe(rows)
+    assert same_output(new, old)
+    pd.testing.assert_frame_equal(new[0], old[0])
+
+def test_load_rows_from_csv_parses_json_columns(tmp_path):
+    answers = [{"questionId": "q1", "value": 1}]
+    df = pd.DataFrame({
+        "id": ["a", "b", "c"],
+        "answers": [json.dumps(answers), "", "not json"],
+        "scores": [json.dumps({"dominant": "vata"}), "1,2", ""],
+    })
+    path = tmp_path / "rows.csv"
+    df.to_csv(path, index=False)
+    rows = load_rows_from_csv(str(path))
+    assert rows[0] == {"id": "a", "answers": answers, "scores": {"dominant": "vata"}}
+    assert rows[1] == {"id": "b", "answers": None, "scores": "1,2"}
+    assert rows[2] == {"id": "c", "answers": "not json", "scores": None}
+
+def _label_encode_reference(df):
+    from sklearn.preprocessing import LabelEncoder
+    out, classes = df.copy(), {}
+    for col in out.columns:
+        if out[col].apply(lambda x: isinstance(x, (int, float, np.integer, np.floating))).all():
+            out[col] = out[col].astype(float).fillna(0.0)
+            continue
+        le = LabelEncoder().fit(out[col].fillna("___nan___").astype(str))
+        out[col] = le.transform(out[col].fillna("___nan___").astype(str)).astype(float)
+        classes[col] = list(le.classes_)
+    return out, classes
+
+def test_encode_dataframe_matches_label_encoding():
+    df = pd.DataFrame({
+        "num": [1, 2.5, float("nan"), 0],
+        "flags": pd.Series([True, 1, 0, False], dtype=object),
+        "mixed": pd.Series([0, 0.0, "b", None], dtype=object),
+        "text": ["b", "a", "c", "a"],
+        "unset": [0, 0, 0, 0],
+    })
+    expected, classes = _label_encode_reference(df)
+    encoded, vocab = encode_dataframe(df)
+    pd.testing.assert_frame_equal(encoded, expected)
+    assert vocab == classes
+    assert vocab["mixed"] == ["0", "0.0", "___nan___", "b"]
+
+    encoded32, _ = encode_dataframe(df, dtype=np.float32)
+    assert (encoded32.dtypes == np.float32).all()
+
+    # vocabularies re-encode new rows; unseen categories become NaN
+    again = apply_encoders(pd.DataFrame({"text": ["c", "z"], "mixed": ["b", 0]}), vocab, list(df.columns))
+    assert again["text"].tolist()[0] == 2.0 and np.isnan(again["text"].tolist()[1])
+    assert again["mixed"].tolist() == [3.0, 0.0]
@@ -0,0 +1,38 @@
+import pandas as pd
+
+import train_csv
+
+ROWS = (
+    "age,gender,q_physique,q_skin,percent_vata,percent_pitta,percent_kapha\n"
+    "30,male,thin,dry,60%,20%,20%\n"
+    "41,female,heavy,oily,10%,30%,60%\n"
+    "25,male,medium,warm,20%,50%,30%\n"
+)
+
+def test_cached_load_matches_fresh_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_csv, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text(ROWS)
+
+    X, y, feats = train_csv.load_and_prepare_data(str(csv_path))
+    assert feats == ["age", "gender", "q_physique", "q_skin"]
+    assert y.tolist() == ["vata", "kapha", "pitta"]
+    assert str(X["q_skin"].dtype) == "category"
+    assert len(list((tmp_path / "cache").glob("prakriti_dataset_*"))) == 1
+
+    X2, y2, feats2 = train_csv.load_and_prepare_data(str(csv_path))
+    pd.testing.assert_frame_equal(X, X2)
+    assert y2.tolist() == y.tolist() and feats2 == feats
+
+    # changed contents produce a new cache entry
+    csv_path.write_text(ROWS.replace("60%,20%,20%", "10%,20%,70%"))
+    _, y3, _ = train_csv.load_and_prepare_data(str(csv_path))
+    assert y3.tolist()[0] == "kapha"
+
+def test_quote_wrapped_file_uses_legacy_cleaning(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_csv, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    csv_path = tmp_path / "wrapped.csv"
+    csv_path.write_text('"' + ROWS.strip() + '"\n')
+    X, y, feats = train_csv.load_and_prepare_data(str(csv_path), use_cache=False)
+    assert "age" in feats
+    assert y.tolist() == ["vata", "kapha", "pitta"]
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from train_out_of_core import BinaryRowSequence, load_out_of_core_model, main
+
+def _write_dataset(path, n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    label = rng.integers(0, 3, n)
+    pct = np.full((n, 3), 20)
+    pct[np.arange(n), label] = 60
+    frame = pd.DataFrame({"age": rng.integers(18, 70, n),
+                          "q_skin": np.array(["dry", "oily", "soft"])[label],
+                          "q_sleep": rng.choice(["light", "sound", "deep"], n),
+                          "percent_vata": pct[:, 0], "percent_pitta": pct[:, 1], "percent_kapha": pct[:, 2]})
+    if str(path).endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return frame
+
+def test_binary_row_sequence_reads_rows_and_slices(tmp_path):
+    data = np.arange(20, dtype=np.float32).reshape(5, 4)
+    data.tofile(tmp_path / "X")
+    seq = BinaryRowSequence(str(tmp_path / "X"), 4, batch_size=2)
+    assert len(seq) == 5
+    np.testing.assert_array_equal(seq[1], data[1])
+    np.testing.assert_array_equal(seq[-1], data[4])
+    np.testing.assert_array_equal(seq[1:4], data[1:4])
+    assert seq[0:5:2].shape == (3, 4)
+    seq.close()
+
+def test_chunked_csv_and_parquet_train_the_same_model(tmp_path):
+    reports = {}
+    for ext in ("csv", "parquet"):
+        path = tmp_path / f"data.{ext}"
+        frame = _write_dataset(path)
+        out = tmp_path / ext
+        main(["--input", str(path), "--model-dir", str(out), "--chunk-rows", "700",
+              "--rounds", "30", "--batch-rows", "256", "--work-dir", str(tmp_path)])
+        booster, encoder, meta = load_out_of_core_model(str(out))
+        assert meta["categorical_features"] == ["q_skin", "q_sleep"]
+        assert meta["category_vocabularies"]["q_skin"] == ["dry", "oily", "soft"]
+        proba = booster.predict(encoder.transform(frame.drop(columns=["percent_vata", "percent_pitta", "percent_kapha"])))
+        assert proba.shape == (3000, 3)
+        reports[ext] = pd.read_json(out / "prakriti_ooc_training_report.json", typ="series")
+
+    for report in reports.values():
+        assert report["n_rows"] == 3000 and report["n_valid"] == 300
+        assert report["valid_accuracy"] > 0.95
+        assert set(report["stages"]) == {"scan", "encode", "bin", "train", "evaluate"}
+        assert report["stages"]["train"]["peak_rss_mb"] > 0
+    assert reports["csv"]["boosting_rounds"] == reports["parquet"]["boosting_rounds"]
+    # spill files are cleaned up
+    assert not [d for d in os.listdir(tmp_path) if d.startswith("ooc_")]
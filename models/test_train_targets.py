@@ -0,0 +1,44 @@
+import json
+import os
+
+import numpy as np
+
+from build_dataframe_reference import synthetic_rows
+from model_bundle import ModelBundle
+from train import build_dataframe, train_targets
+
+def test_targets_train_concurrently_and_save_atomically(tmp_path):
+    rows = synthetic_rows(120, seed=5)
+    df, y_prak, y_ment, meta = build_dataframe(rows)
+    labels = {"prakriti": y_prak, "mental": y_ment, "empty": None}
+    watermark = {"rows": len(rows)}
+    extra = {"mental": {"cross_validation": {"summary": {}}}}
+
+    artifacts, report = train_targets(df, labels, meta, str(tmp_path), watermark, np.float32,
+                                      model_params={"prakriti": {"n_estimators": 5}}, extra_reports=extra,
+                                      workers=2)
+    assert set(artifacts) == {"prakriti", "mental"}
+    assert report["mode"] == "processes" and report["workers"] == 2
+    for name in ("prakriti", "mental"):
+        entry = report["models"][name]
+        assert entry["rows"] == len(df) and entry["finished_after_seconds"] >= entry["train_seconds"] > 0
+        assert all(os.path.exists(p) for p in artifacts[name].values())
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+    with open(artifacts["mental"]["report"]) as fh:
+        mental_report = json.load(fh)
+    assert "cross_validation" in mental_report
+    stages = mental_report["telemetry"]["stages"]
+    assert {"encode", "split", "fit", "evaluate", "save"} <= set(stages)
+    assert mental_report["telemetry"]["artifact_bytes"]["bundle"] > 0
+    assert report["models"]["mental"]["single_row_p50_ms"] > 0
+    with ModelBundle(artifacts["prakriti"]["bundle"]) as bundle:
+        assert bundle.meta["manifest"]["boosting_rounds_total"] == 5
+        assert set(bundle.names()) == {"model", "encoders", "label_encoder"}
+
+    # one worker trains the same targets in-process
+    _, sequential = train_targets(df, labels, meta, str(tmp_path), watermark, workers=1)
+    assert sequential["mode"] == "sequential" and set(sequential["models"]) == {"prakriti", "mental"}
+    # same clock in both modes: the second model finishes after both trainings, counted from run start
+    first, second = sorted(sequential["models"].values(), key=lambda m: m["finished_after_seconds"])
+    assert second["finished_after_seconds"] >= first["train_seconds"] + second["train_seconds"]
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import stage_cache
+import train_csv
+from training_telemetry import TrainingTelemetry, inference_latency
+
+def test_stages_record_time_memory_and_repeats(tmp_path):
+    telemetry = TrainingTelemetry()
+    with telemetry.stage("load") as stage:
+        stage["source"] = "csv"
+        block = np.ones(20_000_000)  # ~150 MB, visible in the stage peak
+        del block
+    with telemetry.stage("fit"):
+        pass
+    with telemetry.stage("fit"):
+        pass
+    load = telemetry.stages["load"]
+    assert load["source"] == "csv" and load["seconds"] > 0
+    if load["peak_scope"] == "stage":
+        assert load["peak_rss_mb"] - load["rss_mb"] > 100
+        assert telemetry.stages["fit"]["peak_rss_mb"] < load["peak_rss_mb"]
+    assert telemetry.stages["fit"]["calls"] == 2
+
+    other = TrainingTelemetry()
+    other.merge({"stages": {"encode": {"seconds": 1.0, "peak_rss_mb": 1.0}}, "counts": {"rows": 10}}, cached=True)
+    artifact = tmp_path / "model.bin"
+    artifact.write_bytes(b"x" * 123)
+    report = other.report(artifacts={"model": str(artifact), "missing": str(tmp_path / "nope")}, model_threads=2)
+    assert report["stages"]["encode"]["cached"] and report["stage_seconds_total"] == 0
+    assert report["artifact_bytes"] == {"model": 123} and report["counts"] == {"rows": 10}
+    assert report["threads"]["model_threads"] == 2
+
+    latency = inference_latency(lambda X: X.sum(axis=1), np.ones((10, 3)), repeats=10, batch_size=4)
+    assert latency["batch_ms"]["batch_size"] == 4 and latency["single_row_ms"]["p99"] >= latency["single_row_ms"]["p50"]
+
+def test_training_report_carries_telemetry(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_csv, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(train_csv, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(stage_cache, "STAGE_CACHE_DIR", str(tmp_path / "stages"))
+    rng = np.random.default_rng(0)
+    label = rng.integers(0, 3, 90)
+    pct = np.full((90, 3), 20)
+    pct[np.arange(90), label] = 60
+    csv_path = tmp_path / "data.csv"
+    pd.DataFrame({"age": rng.integers(18, 70, 90), "q_skin": np.array(["dry", "oily", "warm"])[label],
+                  "percent_vata": pct[:, 0], "percent_pitta": pct[:, 1], "percent_kapha": pct[:, 2]}
+                 ).to_csv(csv_path, index=False)
+
+    train_csv.train_model(str(csv_path), params={"n_estimators": 10, "verbose": -1})
+    with open(tmp_path / "training_report.json") as fh:
+        telemetry = json.load(fh)["telemetry"]
+    assert list(telemetry["stages"]) == ["load", "clean", "split", "encode", "fit", "evaluate", "profile", "save"]
+    assert telemetry["counts"]["train_rows"] == 72 and telemetry["counts"]["encoded_features"] > 2
+    assert telemetry["artifact_bytes"]["bundle"] > 0 and telemetry["threads"]["cpu_count"] >= 1
+    assert telemetry["inference_latency"]["single_row_ms"]["p50"] > 0
@@ -0,0 +1,47 @@
+import numpy as np
+import lightgbm as lgb
+import pytest
+
+from tree_arrays import NODE_DTYPE, TreeArrayClassifier, UnsupportedForest, forest_arrays
+
+def _data(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.integers(0, 6, n).astype(float), rng.normal(size=n),
+                         rng.integers(0, 4, n).astype(float), rng.normal(size=n)])
+    y = (X[:, 0].astype(int) + (X[:, 1] > 0)) % 3
+    X[rng.random(n) < 0.1, 1] = np.nan
+    X[rng.random(n) < 0.1, 0] = np.nan
+    X[rng.random(n) < 0.1, 3] = 0.0
+    return X, y
+
+@pytest.mark.parametrize("categorical", [[], [0, 2]])
+@pytest.mark.parametrize("binary", [False, True])
+def test_array_predictions_match_lightgbm(categorical, binary):
+    X, y = _data()
+    y = (y == 1).astype(int) if binary else y
+    clf = lgb.LGBMClassifier(n_estimators=30, num_leaves=15, min_child_samples=5, min_data_per_group=5,
+                             cat_smooth=1, verbose=-1).fit(X, y, categorical_feature=categorical or "auto")
+    nodes, header = forest_arrays(clf)
+    assert nodes.dtype == NODE_DTYPE and nodes.dtype.itemsize == 17
+    assert bool(header["category_sets"]) == bool(categorical)
+    arrays = TreeArrayClassifier(nodes, header)
+
+    # unseen, negative, fractional and infinite codes, and values next to zero
+    X[:5, 0] = [7, -1, -0.5, 2.7, np.inf]
+    X[5:8, 3] = [1e-40, -1e-40, np.nan]
+    np.testing.assert_allclose(arrays.predict_proba(X), clf.predict_proba(X), atol=1e-6)
+    assert (arrays.predict(X) == clf.predict(X)).all()
+    assert list(arrays.classes_) == list(clf.classes_)
+    with pytest.raises(ValueError):
+        arrays.predict_proba(X[:, :3])
+
+def test_early_stopped_model_uses_best_iteration_and_unsupported_objectives_raise():
+    X, y = _data(seed=1)
+    clf = lgb.LGBMClassifier(n_estimators=200, verbose=-1)
+    clf.fit(X[:1000], y[:1000], eval_set=[(X[1000:], y[1000:])], callbacks=[lgb.early_stopping(3, verbose=False)])
+    nodes, header = forest_arrays(clf)
+    assert len(header["roots"]) == clf.best_iteration_ * 3
+    np.testing.assert_allclose(TreeArrayClassifier(nodes, header).predict_proba(X), clf.predict_proba(X), atol=1e-6)
+
+    with pytest.raises(UnsupportedForest):
+        forest_arrays(lgb.LGBMRegressor(n_estimators=3, verbose=-1).fit(X, y.astype(float)))
@@ -0,0 +1,331 @@
+# models/tracing.py
+"""
+Lightweight per-request tracing: which stage a particular slow request
+spent its time in (validation, queue wait, model lookup, feature prep,
+model predict, fallback, serialization).
+
+main.py opens one trace per HTTP request with Tracer.request(). The trace
+id comes from a W3C `traceparent` header when present, the request id from
+`x-request-id` (sent by the Node API), otherwise both are generated; the
+request id is echoed back in the response headers either way. Code on the
+request path marks stages with the module-level span():
+
+    with tracing.span("model_predict", rows=len(X)):
+        ...
+
+Spans nest through contextvars, so they follow the request into the
+threadpool that runs predictions. A request is sampled with probability
+TRACE_SAMPLE_RATE (or always, when the upstream traceparent says sampled);
+for unsampled requests span() is a shared no-op after one contextvar read,
+so the overhead is bounded by the sampling rate.
+
+A finished trace (root timing, status and its spans) is kept in a bounded
+in-memory ring (GET /monitor/traces) and, with a file exporter, queued to a
+WriteBehindBuffer that appends JSON lines in batches off the request path:
+
+  TRACE_EXPORTER         memory (default) or file:///path/to/traces.jsonl
+  TRACE_SAMPLE_RATE      fraction of requests traced (default 0.01)
+  TRACE_RECENT           traces kept in memory (default 200)
+  TRACE_BUFFER_SIZE      export queue size; traces beyond it are dropped (default 10000)
+  TRACE_FLUSH_SECONDS    export batch interval (default 2.0)
+  TRACE_FILE_MAX_MB      rotate the JSONL file to <path>.1 beyond this size (default 50)
+"""
+import os
+import json
+import time
+import uuid
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from prediction_store import WriteBehindBuffer
+
+MAX_REQUEST_ID_LENGTH = 128
+
+# -----------------------
+# request-local state
+# -----------------------
+class Trace:
+    """Spans of one sampled request, collected until the request finishes"""
+
+    __slots__ = ("trace_id", "request_id", "root_id", "parent_id", "name", "started_at", "t0",
+                 "duration_ms", "attrs", "spans", "dropped", "max_spans", "sampled", "_lock")
+
+    def __init__(self, trace_id: str, request_id: str, name: str, sampled: bool,
+                 parent_id: Optional[str] = None, max_spans: int = 512):
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.root_id = _new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attrs: Dict[str, Any] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.max_spans = max_spans
+        self.sampled = sampled
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(record)
+            else:
+                self.dropped += 1
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.root_id}-{'01' if self.sampled else '00'}"
+
+    def to_record(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            "span_id": self.root_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "started_at": datetime.fromtimestamp(self.started_at, tz=timezone.utc).isoformat(),
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": spans,
+            "dropped_spans": self.dropped,
+        }
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[Optional[str]] = ContextVar("trace_parent_span", default=None)
+
+def _new_span_id() -> str:
+    return os.urandom(8).hex()
+
+def current_trace() -> Optional[Trace]:
+    """The sampled trace of the running request, if any"""
+    return _trace.get()
+
+class Span:
+    __slots__ = ("trace", "name", "attrs", "span_id", "parent_id", "_token", "_start")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.parent_id = _parent.get() or self.trace.root_id
+        self.span_id = _new_span_id()
+        self._token = _parent.set(self.span_id)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        end = time.perf_counter()
+        _parent.reset(self._token)
+        record = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round((self._start - self.trace.t0) * 1000, 3),
+            "duration_ms": round((end - self._start) * 1000, 3),
+            "attrs": self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.trace.add(record)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+def span(name: str, **attrs: Any):
+    """Time a stage of the current request (no-op outside a sampled trace)"""
+    trace = _trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return Span(trace, name, attrs)
+
+def mark(name: str, **attrs: Any):
+    """Record a zero-length span (an event such as a fallback) in the current trace"""
+    trace = _trace.get()
+    if trace is not None:
+        with Span(trace, name, attrs):
+            pass
+
+# -----------------------
+# propagation
+# -----------------------
+def parse_traceparent(value: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+    """(trace_id, parent span id, sampled) from a W3C traceparent header; Nones when invalid"""
+    if not value:
+        return None, None, None
+    parts = value.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None, None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None, None, None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None, None, None
+    return parts[1], parts[2], bool(flags & 1)
+
+def clean_request_id(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    value = "".join(ch for ch in value.strip() if ch.isprintable())
+    return value[:MAX_REQUEST_ID_LENGTH] or None
+
+# -----------------------
+# exporters
+# -----------------------
+class JsonlTraceSink:
+    """Appends traces as JSON lines; rotates the file to <path>.1 past max_bytes"""
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write_batch(self, records: List[Dict[str, Any]]):
+        if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        lines = "".join(json.dumps(r, default=str) + "\n" for r in records)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(lines)
+
+    def close(self):
+        pass
+
+def exporter_from_url(url: Optional[str], max_bytes: int = 50 * 1024 * 1024) -> Optional[JsonlTraceSink]:
+    """None for the in-memory exporter only, else a file sink"""
+    if not url or url == "memory":
+        return None
+    if url.startswith("file://"):
+        return JsonlTraceSink(url[len("file://"):], max_bytes=max_bytes)
+    raise ValueError(f"Unsupported TRACE_EXPORTER: {url!r} (use memory or file:///path/to/traces.jsonl)")
+
+# -----------------------
+# tracer
+# -----------------------
+class Tracer:
+    def __init__(self, sample_rate: float = 0.01, sink: Any = None, recent: int = 200,
+                 max_spans: int = 512, buffer_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 2.0):
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.max_spans = max_spans
+        self._recent: deque = deque(maxlen=recent)
+        self.buffer = (WriteBehindBuffer(sink, max_size=buffer_size, batch_size=batch_size,
+                                         flush_interval=flush_interval, name="trace-export")
+                       if sink is not None else None)
+        self.requests = 0
+        self.sampled = 0
+
+    def start(self) -> "Tracer":
+        if self.buffer is not None:
+            self.buffer.start()
+        return self
+
+    def stop(self):
+        if self.buffer is not None:
+            self.buffer.stop()
+
+    def should_sample(self, upstream: Optional[bool] = None) -> bool:
+        if upstream:
+            return True
+        return self.sample_rate >= 1.0 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def request(self, name: str, headers: Optional[Mapping[str, str]] = None) -> Iterator[Trace]:
+        """
+        Trace one request. Always yields a Trace (for its request_id / traceparent);
+        spans are only collected and exported when it is sampled.
+        """
+        headers = headers or {}
+        trace_id, parent_id, upstream = parse_traceparent(headers.get("traceparent"))
+        request_id = clean_request_id(headers.get("x-request-id"))
+        trace_id = trace_id or uuid.uuid4().hex
+        trace = Trace(trace_id, request_id or trace_id, name, self.should_sample(upstream),
+                      parent_id=parent_id, max_spans=self.max_spans)
+        self.requests += 1
+        if not trace.sampled:
+            yield trace
+            return
+        self.sampled += 1
+        trace_token = _trace.set(trace)
+        parent_token = _parent.set(trace.root_id)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.attrs.setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            trace.duration_ms = round((time.perf_counter() - trace.t0) * 1000, 3)
+            _parent.reset(parent_token)
+            _trace.reset(trace_token)
+            self.export(trace.to_record())
+
+    def export(self, record: Dict[str, Any]):
+        self._recent.append(record)
+        if self.buffer is not None:
+            self.buffer.put(record)
+
+    # -----------------------
+    # queries
+    # -----------------------
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return list(self._recent)[-limit:][::-1]
+
+    def slowest(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return sorted(self._recent, key=lambda r: r["duration_ms"] or 0, reverse=True)[:limit]
+
+    def find(self, request_id: str) -> List[Dict[str, Any]]:
+        return [r for r in self._recent if r["request_id"] == request_id or r["trace_id"] == request_id]
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """Mean / max duration per span name over the in-memory traces"""
+        totals: Dict[str, List[float]] = {}
+        for record in list(self._recent):
+            for s in record["spans"]:
+                totals.setdefault(s["name"], []).append(s["duration_ms"])
+        return {name: {"count": len(v), "mean_ms": round(sum(v) / len(v), 3), "max_ms": round(max(v), 3)}
+                for name, v in totals.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "requests": self.requests,
+            "sampled": self.sampled,
+            "kept_in_memory": len(self._recent),
+            "export": self.buffer.stats() if self.buffer is not None else None,
+        }
+
+def tracer_from_env() -> Tracer:
+    max_bytes = int(float(os.getenv("TRACE_FILE_MAX_MB", "50")) * 1024 * 1024)
+    return Tracer(
+        sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.01")),
+        sink=exporter_from_url(os.getenv("TRACE_EXPORTER"), max_bytes=max_bytes),
+        recent=int(os.getenv("TRACE_RECENT", "200")),
+        buffer_size=int(os.getenv("TRACE_BUFFER_SIZE", "10000")),
+        flush_interval=float(os.getenv("TRACE_FLUSH_SECONDS", "2.0")),
+    )
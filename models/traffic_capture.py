@@ -0,0 +1,178 @@
+# models/traffic_capture.py
+"""
+Capture of production /predict and /predict/batch traffic for later replay.
+
+Each captured request is one compact JSON line (gzip-compressed) holding the
+arrival time, endpoint, anonymized payload, status, latency and a summary of
+the response. Files rotate by size and only the newest `max_files` are kept.
+Writes go through the same WriteBehindBuffer as the prediction log, so the
+request path only enqueues.
+
+Enable with TRAFFIC_CAPTURE_DIR (optional: TRAFFIC_CAPTURE_MAX_MB,
+TRAFFIC_CAPTURE_MAX_FILES, TRAFFIC_CAPTURE_SAMPLE). Replay with replay_traffic.py.
+"""
+import os
+import glob
+import gzip
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from prediction_store import WriteBehindBuffer
+
+# Only fields the model reads are kept; free text, user ids etc. are dropped
+ANSWER_FIELDS = ("questionId", "optionId", "value", "trait", "weight")
+
+def anonymize_answers(answers: Any) -> Any:
+    if isinstance(answers, list):
+        return [
+            {k: a[k] for k in ANSWER_FIELDS if k in a} if isinstance(a, dict) else None
+            for a in answers
+        ]
+    if isinstance(answers, dict):
+        return {
+            str(k): ({f: v[f] for f in ANSWER_FIELDS if f in v} if isinstance(v, dict) else v)
+            for k, v in answers.items()
+        }
+    return None
+
+def summarize_prediction(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The comparable part of a /predict response"""
+    if not isinstance(result, dict):
+        return None
+    prakriti = result.get("prakriti") or {}
+    return {
+        "dominant": prakriti.get("dominant"),
+        "vata": prakriti.get("vata"),
+        "pitta": prakriti.get("pitta"),
+        "kapha": prakriti.get("kapha"),
+        "confidence": result.get("confidence"),
+        "method": (result.get("features_used") or {}).get("calculation_method"),
+    }
+
+def summarize_response(endpoint: str, body: Any) -> Any:
+    if endpoint == "/predict/batch" and isinstance(body, dict):
+        return {
+            "results": {str(r["index"]): summarize_prediction(r.get("result")) for r in body.get("results", [])},
+            "errors": [e.get("index") for e in body.get("errors", [])],
+        }
+    return summarize_prediction(body)
+
+class RotatingCaptureSink:
+    """gzip JSONL files rotated by uncompressed size"""
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, max_files: int = 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._fh = None
+        self._written = 0
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        self._seq += 1
+        name = f"capture-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._seq:04d}.jsonl.gz"
+        self._fh = gzip.open(os.path.join(self.directory, name), "wt", encoding="utf-8")
+        self._written = 0
+        self._prune()
+
+    def _prune(self):
+        files = sorted(glob.glob(os.path.join(self.directory, "capture-*.jsonl.gz")), key=os.path.getmtime)
+        for old in files[:-self.max_files] if self.max_files else []:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def write_batch(self, records: List[Dict[str, Any]]):
+        for rec in records:
+            if self._fh is None or self._written >= self.max_bytes:
+                self.close()
+                self._open()
+            line = json.dumps(rec, separators=(",", ":"), default=str) + "\n"
+            self._fh.write(line)
+            self._written += len(line)
+        self._fh.flush()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+class TrafficRecorder:
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, max_files: int = 20,
+                 sample_rate: float = 1.0, max_queue: int = 10000):
+        self.sample_rate = sample_rate
+        self.buffer = WriteBehindBuffer(
+            RotatingCaptureSink(directory, max_bytes=max_bytes, max_files=max_files),
+            max_size=max_queue, batch_size=200, flush_interval=1.0,
+            convert=self._to_record, name="traffic-capture",
+        )
+
+    @staticmethod
+    def _to_record(item) -> Dict[str, Any]:
+        arrived_at, endpoint, payload, status, latency_ms, response = item
+        if endpoint == "/predict/batch":
+            payload = [{"answers": anonymize_answers(p.get("answers"))} for p in payload]
+        else:
+            payload = {"answers": anonymize_answers(payload.get("answers"))}
+        return {
+            "t": round(arrived_at, 6),
+            "endpoint": endpoint,
+            "payload": payload,
+            "status": status,
+            "latency_ms": round(latency_ms, 3),
+            "response": summarize_response(endpoint, response),
+        }
+
+    def start(self):
+        self.buffer.start()
+        return self
+
+    def capture(self, arrived_at: float, endpoint: str, payload: Any, status: int,
+                latency_ms: float, response: Any) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        return self.buffer.put((arrived_at, endpoint, payload, status, latency_ms, response))
+
+    def stop(self):
+        self.buffer.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sample_rate": self.sample_rate, **self.buffer.stats()}
+
+def recorder_from_env() -> Optional[TrafficRecorder]:
+    directory = os.getenv("TRAFFIC_CAPTURE_DIR")
+    if not directory:
+        return None
+    return TrafficRecorder(
+        directory,
+        max_bytes=int(float(os.getenv("TRAFFIC_CAPTURE_MAX_MB", "64")) * 1024 * 1024),
+        max_files=int(os.getenv("TRAFFIC_CAPTURE_MAX_FILES", "20")),
+        sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "1.0")),
+    ).start()
+
+def load_capture(paths: List[str]) -> List[Dict[str, Any]]:
+    """Load captured records from files and/or directories, oldest first"""
+    files: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(glob.glob(os.path.join(p, "capture-*.jsonl.gz")))
+        else:
+            files.append(p)
+    records: List[Dict[str, Any]] = []
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            try:
+                for line in fh:
+                    line = line.strip()
+                    if line:
+                        records.append(json.loads(line))
+            except (EOFError, json.JSONDecodeError):
+                # file still being written by a live service: keep the complete lines
+                pass
+    records.sort(key=lambda r: r["t"])
+    return records
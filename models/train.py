@@ -5,29 +5,42 @@ Train script for prakriti + mental health models.
 Usage:
   python train.py [--csv <path>] [--limit N] [--model-dir ./models_out]
   python train.py --supabase-key <key> --supabase-url <url>  # override env
+  python train.py --full-sync                                   # re-download the whole Supabase cache
+  python train.py --csv <path> --params-from models_out/xgb_hparam_leaderboard.json
+  python train.py --csv <path> --cv-folds 5 [--cv-repeats 3]   # CV metrics in the training reports
+  python train.py --csv <path> --train-workers 2                 # both models at once, cores split
 
 Env:
   SUPABASE_URL
   SUPABASE_KEY or SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY
+  SUPABASE_SYNC_DIR (local cache of synced rows, default ./.supabase_cache)
 
 Notes:
   - Use SERVICE ROLE KEY for server-side scripts (recommended).
+  - Supabase rows are synced incrementally into a local Parquet cache (supabase_sync.py);
+    --no-sync falls back to a single select capped at --limit rows.
   - If Supabase fetch fails, use --csv <file> to train from local CSV.
+  - Each target is saved as <target>.bundle (model, vocabularies, label encoder, meta; see
+    model_bundle.py) plus a readable <target>_training_report.json.
 """
 import os
 import sys
 import json
+import time
 import argparse
 import traceback
-from typing import Any, Dict, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Tuple, Optional
 
 # defensive imports (clear instruction if dependencies missing)
 try:
     import joblib
     import numpy as np
     import pandas as pd
+    import xgboost as xgb
     from xgboost import XGBClassifier
     from sklearn.model_selection import train_test_split
+    from pandas.api.types import infer_dtype, is_numeric_dtype
     from sklearn.preprocessing import LabelEncoder
     from sklearn.metrics import classification_report
 except Exception:
@@ -47,6 +60,13 @@ try:
 except Exception:
     pass
 
+from supabase_sync import SUPABASE_SYNC_DIR, sync_from_env
+from training_telemetry import TrainingTelemetry, model_thread_count
+from stage_cache import StageCache, code_fingerprint, file_digest, library_versions, rows_digest, stage_key
+from model_bundle import bundle_path, open_bundle, read_bundle_meta, remove_files, write_bundle
+from incremental import (WATERMARK_COLUMNS, compute_watermark, new_rows_mask, next_manifest, replace_booster,
+                         should_full_rebuild)
+
 def mask_key(k: Optional[str]) -> str:
     if not k:
         return "<missing>"
@@ -87,169 +107,646 @@ def normalize_answers_row(a: Any) -> List[Dict[str, Any]]:
 # -----------------------
 # build dataframe
 # -----------------------
-def build_dataframe(rows: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, Optional[pd.Series], Optional[pd.Series], Dict[str, Any]]:
-    question_set = set()
-    for r in rows:
-        normalized = normalize_answers_row(r.get("answers"))
-        for it in normalized:
-            question_set.add(it["questionId"])
-        # also recognize q_* columns
-        for k in r.keys():
-            if isinstance(k, str) and (k.startswith("q_") or k.startswith("question_") or k.startswith("q")):
-                question_set.add(k)
-
-    features = sorted(list(question_set))
-    records: List[Dict[str, Any]] = []
-    prak_labels: List[Optional[str]] = []
-    ment_labels: List[Optional[str]] = []
-
-    for r in rows:
-        row_vals: Dict[str, Any] = {f: 0 for f in features}
-        normalized = normalize_answers_row(r.get("answers"))
-        for it in normalized:
-            q = it["questionId"]
-            v = it.get("value")
-            if isinstance(v, (int, float, bool)):
-                row_vals[q] = float(v)
-            else:
-                try:
-                    row_vals[q] = float(v)
-                except Exception:
-                    row_vals[q] = str(v)
-
-        # copy q_* style columns directly if present
-        for f in features:
-            if (f not in row_vals or row_vals[f] == 0) and f in r and r[f] not in (None, ""):
-                v = r[f]
-                try:
-                    row_vals[f] = float(v)
-                except Exception:
-                    row_vals[f] = str(v)
-
-        # labels extraction (many shapes supported)
-        dominant = None
-        if "prakriti_label" in r and r["prakriti_label"]:
-            dominant = r["prakriti_label"]
-        if "dominant" in r and r["dominant"]:
-            dominant = dominant or r["dominant"]
-        scores = r.get("scores")
-        if isinstance(scores, dict) and not dominant:
-            dominant = scores.get("dominant")
-            pct = scores.get("percent")
-            if not dominant and isinstance(pct, dict):
-                try:
-                    dominant = max(pct.items(), key=lambda x: x[1])[0]
-                except Exception:
-                    dominant = dominant
-
-        mlabel = None
-        if "mental_label" in r and r["mental_label"]:
-            mlabel = r["mental_label"]
-        if "mental_health_level" in r and r["mental_health_level"]:
-            mlabel = mlabel or r["mental_health_level"]
-        mh = r.get("mental_health_score")
-        if isinstance(mh, dict) and not mlabel:
-            mlabel = mh.get("level") or mh.get("label")
-        # numeric fallback
-        if not mlabel:
+def object_array(values: Iterable[Any], count: int = -1) -> np.ndarray:
+    """1-D object array that keeps list/dict elements as single cells"""
+    if count < 0 and hasattr(values, "__len__"):
+        count = len(values)
+    return np.fromiter(values, dtype=object, count=count)
+
+def _truthy(arr: np.ndarray) -> np.ndarray:
+    return arr.astype(bool)
+
+def parse_value(v: Any) -> Any:
+    """Feature value rule: float when it converts, otherwise its string form"""
+    try:
+        return float(v)
+    except Exception:
+        return str(v)
+
+def parse_values(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    parse_value over an object array, evaluated once per distinct value.
+    Returns (numbers, is_string, strings); numbers is NaN where is_string.
+    """
+    values = values.copy()
+    values[values == None] = "None"  # noqa: E711  (factorize would fold None into NaN)
+    try:
+        codes, uniques = pd.factorize(values)
+    except TypeError:
+        # unhashable cells (lists/dicts): no dedup
+        codes, uniques = np.arange(len(values)), values
+    parsed = [parse_value(u) for u in uniques]
+    uniq_is_str = np.array([isinstance(p, str) for p in parsed] + [False], dtype=bool)
+    uniq_num = np.array([np.nan if isinstance(p, str) else p for p in parsed] + [np.nan], dtype=float)
+    uniq_str = object_array([p if isinstance(p, str) else None for p in parsed] + [None])
+    # code -1 (NaN) picks the trailing sentinel entry
+    return uniq_num[codes], uniq_is_str[codes], uniq_str[codes]
+
+def _dominant_from_scores(scores: Any) -> Any:
+    dominant = None
+    if isinstance(scores, dict):
+        dominant = scores.get("dominant")
+        pct = scores.get("percent")
+        if not dominant and isinstance(pct, dict):
             try:
-                if isinstance(mh, (int, float)):
-                    if mh < 40: mlabel = "red"
-                    elif mh < 70: mlabel = "yellow"
-                    else: mlabel = "green"
-                else:
-                    mhf = float(mh) if mh not in (None, "") else None
-                    if mhf is not None:
-                        if mhf < 40: mlabel = "red"
-                        elif mhf < 70: mlabel = "yellow"
-                        else: mlabel = "green"
+                dominant = max(pct.items(), key=lambda x: x[1])[0]
             except Exception:
                 pass
-
-        records.append(row_vals)
-        prak_labels.append(dominant)
-        ment_labels.append(mlabel)
-
-    if len(records) == 0:
+    return dominant
+
+def extract_labels(rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """prakriti and mental labels for every row, as column operations over the row fields"""
+    # prakriti: prakriti_label -> dominant -> scores.dominant -> argmax(scores.percent)
+    prak = object_array((r.get("prakriti_label") for r in rows), len(rows))
+    dom = object_array((r.get("dominant") for r in rows), len(rows))
+    dominant = np.where(_truthy(prak), prak, np.where(_truthy(dom), dom, None))
+    for i in np.flatnonzero(~_truthy(dominant)):
+        scores = rows[i].get("scores")
+        if isinstance(scores, dict):
+            dominant[i] = _dominant_from_scores(scores)
+
+    # mental: mental_label -> mental_health_level -> score dict level/label -> numeric score bands
+    ment = object_array((r.get("mental_label") for r in rows), len(rows))
+    lvl = object_array((r.get("mental_health_level") for r in rows), len(rows))
+    mlabel = np.where(_truthy(ment), ment, np.where(_truthy(lvl), lvl, None))
+    need = np.flatnonzero(~_truthy(mlabel))
+    if len(need):
+        mh = object_array((rows[i].get("mental_health_score") for i in need), len(need))
+        is_dict = np.fromiter((isinstance(v, dict) for v in mh), dtype=bool, count=len(mh))
+        for j in np.flatnonzero(is_dict):
+            mlabel[need[j]] = mh[j].get("level") or mh[j].get("label")
+        numeric = ~is_dict & (mh != None) & (mh != "")  # noqa: E711
+        nums, is_str, _ = parse_values(mh[numeric])
+        bands = np.select([nums < 40, nums < 70], ["red", "yellow"], "green").astype(object)
+        target = need[numeric]
+        # unparseable scores keep whatever label (if any) was found before
+        mlabel[target[~is_str]] = bands[~is_str]
+    return dominant, mlabel
+
+def _label_series(labels: np.ndarray) -> Optional[pd.Series]:
+    if not (labels != None).any():  # noqa: E711
+        return None
+    return pd.Series(labels.tolist())
+
+def _has_label(y: Optional[pd.Series], n: int) -> np.ndarray:
+    if y is None:
+        return np.zeros(n, dtype=bool)
+    return (y.notna() & ~y.astype(str).str.strip().isin(["", "None"])).to_numpy()
+
+def normalize_answers_bulk(answers: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    normalize_answers_row over many rows at once.
+    Returns flat (row index, questionId, value) arrays, one entry per answer.
+    """
+    item_rows: List[int] = []
+    items: List[Any] = []
+    other_rows: List[int] = []
+    other: List[Dict[str, Any]] = []
+    for i, a in enumerate(answers):
+        if isinstance(a, list):
+            items.extend(a)
+            item_rows.extend([i] * len(a))
+        elif isinstance(a, dict):
+            normalized = normalize_answers_row(a)
+            other.extend(normalized)
+            other_rows.extend([i] * len(normalized))
+
+    # list-shaped answers: same field precedence as normalize_answers_row, one field per pass
+    keep = [isinstance(it, dict) for it in items]
+    if not all(keep):
+        items = [it for it, k in zip(items, keep) if k]
+        item_rows = [r for r, k in zip(item_rows, keep) if k]
+    qids = object_array((it.get("questionId") or it.get("id") or it.get("question") or None for it in items), len(items))
+    values = object_array((it.get("value") if "value" in it else it.get("answer") for it in items), len(items))
+    missing = np.flatnonzero(values == None)  # noqa: E711
+    if len(missing):
+        values[missing] = object_array((items[j].get("optionId") or items[j].get("weight") or None for j in missing), len(missing))
+    has_qid = qids != None  # noqa: E711
+    rows_out = np.asarray(item_rows, dtype=np.int64)[has_qid]
+    qids = qids[has_qid]
+    values = values[has_qid]
+    codes, uniques = pd.factorize(qids)
+    if all(isinstance(q, str) for q in uniques):
+        # share one string object per question instead of one per answer
+        qids = uniques.astype(object)[codes]
+    else:
+        qids = object_array([str(q) for q in qids])
+
+    if other:
+        rows_out = np.concatenate([rows_out, np.asarray(other_rows, dtype=np.int64)])
+        qids = np.concatenate([qids, object_array([it["questionId"] for it in other])])
+        values = np.concatenate([values, object_array([it["value"] for it in other])])
+    return rows_out, qids, values
+
+def build_dataframe(rows: List[Dict[str, Any]], chunk_size: int = 10000) -> Tuple[pd.DataFrame, Optional[pd.Series], Optional[pd.Series], Dict[str, Any]]:
+    """
+    Feature frame + labels from raw questionnaire rows.
+
+    Answers are normalized a chunk of rows at a time, flattened to (row, question,
+    value) arrays and scattered into dense per-question column arrays through a
+    question -> column index. Cells are 0 when unanswered, the float value when
+    it converts, otherwise the string (such columns are object dtype). q* columns
+    of the row fill cells that are still 0. Rows without any label are dropped.
+    """
+    n = len(rows)
+    if n == 0:
         raise ValueError("No data rows found.")
 
-    df = pd.DataFrame(records, columns=features)
-    y_prak = pd.Series(prak_labels) if any(x is not None for x in prak_labels) else None
-    y_ment = pd.Series(ment_labels) if any(x is not None for x in ment_labels) else None
+    row_keys = set().union(*rows)
+    column_features = sorted(k for k in row_keys if isinstance(k, str) and k.startswith("q"))
+    # one set of arrays per column, so discovering a new question never copies the others
+    col_of: Dict[str, int] = {}
+    numbers: List[np.ndarray] = []
+    assigned: List[np.ndarray] = []
+    is_str: List[np.ndarray] = []
+    objects: Dict[int, np.ndarray] = {}  # columns that hold at least one string
+
+    def column_ids(names: List[str]) -> np.ndarray:
+        for q in names:
+            if q not in col_of:
+                col_of[q] = len(col_of)
+                numbers.append(np.zeros(n, dtype=float))
+                assigned.append(np.zeros(n, dtype=bool))
+                is_str.append(np.zeros(n, dtype=bool))
+        return np.fromiter((col_of[q] for q in names), dtype=np.int64, count=len(names))
+
+    def scatter(r_idx: np.ndarray, c_idx: np.ndarray, vals: np.ndarray):
+        nums, str_mask, strs = parse_values(vals)
+        order = np.argsort(c_idx, kind="stable")
+        bounds = np.flatnonzero(np.diff(c_idx[order])) + 1
+        for sel in np.split(order, bounds):
+            if not len(sel):
+                continue
+            c, r = int(c_idx[sel[0]]), r_idx[sel]
+            numbers[c][r] = nums[sel]
+            assigned[c][r] = True
+            is_str[c][r] = str_mask[sel]
+            if str_mask[sel].any():
+                if c not in objects:
+                    # unanswered cells hold int 0, like the per-row dicts used to
+                    objects[c] = np.full(n, 0, dtype=object)
+                objects[c][r[str_mask[sel]]] = strs[sel][str_mask[sel]]
+
+    column_ids(column_features)
+    for start in range(0, n, chunk_size):
+        item_rows, qids, values = normalize_answers_bulk(r.get("answers") for r in rows[start:start + chunk_size])
+        if not len(qids):
+            continue
+        codes, uniques = pd.factorize(qids)
+        item_cols = column_ids(list(uniques))[codes]
+        # a question answered twice in one row keeps its last answer
+        last = ~pd.Index(item_rows * len(col_of) + item_cols).duplicated(keep="last")
+        scatter(item_rows[last] + start, item_cols[last], values[last])
+
+    # copy q* style columns into cells that are still 0
+    for f in column_features:
+        c = col_of[f]
+        raw = object_array((r.get(f) for r in rows), n)
+        fill = (raw != None) & (raw != "") & ~is_str[c] & (numbers[c] == 0)  # noqa: E711
+        if fill.any():
+            r_idx = np.flatnonzero(fill)
+            scatter(r_idx, np.full(len(r_idx), c), raw[fill])
+
+    prak_labels, ment_labels = extract_labels(rows)
+    y_prak = _label_series(prak_labels)
+    y_ment = _label_series(ment_labels)
 
     # keep rows where at least one of the labels exists
-    keep_idx = []
-    for i in range(len(records)):
-        has_prak = (y_prak is not None and pd.notna(y_prak.iloc[i]) and str(y_prak.iloc[i]).strip() not in ("", "None"))
-        has_ment = (y_ment is not None and pd.notna(y_ment.iloc[i]) and str(y_ment.iloc[i]).strip() not in ("", "None"))
-        if has_prak or has_ment:
-            keep_idx.append(i)
-
-    if len(keep_idx) == 0:
+    keep = _has_label(y_prak, n) | _has_label(y_ment, n)
+    if not keep.any():
         raise ValueError("No rows contain any target labels (prakriti or mental).")
 
-    df = df.iloc[keep_idx].reset_index(drop=True)
+    features = sorted(col_of)
+    columns: Dict[str, Any] = {}
+    for f in features:
+        c = col_of[f]
+        if c in objects:
+            col = objects.pop(c)
+            num_idx = np.flatnonzero(assigned[c] & ~is_str[c])
+            col[num_idx] = numbers[c][num_idx].astype(object)
+            columns[f] = col[keep]
+        elif assigned[c].any():
+            columns[f] = numbers[c][keep]
+        else:
+            columns[f] = np.zeros(int(keep.sum()), dtype=np.int64)
+        numbers[c] = assigned[c] = is_str[c] = None
+    df = pd.DataFrame(columns, columns=features)
+
+    keep_idx = np.flatnonzero(keep)
     if y_prak is not None:
         y_prak = y_prak.iloc[keep_idx].reset_index(drop=True)
     if y_ment is not None:
         y_ment = y_ment.iloc[keep_idx].reset_index(drop=True)
 
-    meta: Dict[str, Any] = {"features": features, "n_rows_before": len(records), "n_rows_after": len(df)}
+    meta: Dict[str, Any] = {"features": features, "n_rows_before": n, "n_rows_after": len(df)}
     return df, y_prak, y_ment, meta
 
 # -----------------------
 # encoding + training
 # -----------------------
-def encode_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
-    encoders: Dict[str, Any] = {}
-    df2 = df.copy()
-    for col in df2.columns:
-        if df2[col].apply(lambda x: isinstance(x, (int, float, np.integer, np.floating))).all():
-            df2[col] = df2[col].astype(float).fillna(0.0)
+NAN_TOKEN = "___nan___"
+NUMERIC_INFERRED = {"integer", "floating", "mixed-integer-float", "boolean", "empty"}
+
+def is_numeric_column(s: pd.Series) -> bool:
+    """True when every cell is an int/float (NaN included); None or strings make it categorical"""
+    if is_numeric_dtype(s.dtype):
+        return True
+    kind = infer_dtype(s if s.dtype == object else s.astype(object), skipna=False)
+    if kind in NUMERIC_INFERRED:
+        return True
+    if kind == "mixed-integer":
+        # ints mixed with bools or with non-numbers: only the exact check can tell
+        return bool(s.map(lambda x: isinstance(x, (int, float, np.integer, np.floating))).all())
+    return False
+
+def category_codes(s: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """
+    Codes into the sorted string vocabulary of a column, in one factorize pass.
+    Same codes LabelEncoder gives on the stringified column.
+    """
+    strs = s.fillna(NAN_TOKEN).astype(str)
+    codes, uniques = pd.factorize(strs)
+    order = np.argsort(uniques)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[codes], uniques[order].tolist()
+
+def vocabulary(encoder: Any) -> List[str]:
+    """Vocabulary of a stored encoder: a list, or a LabelEncoder from older artifacts"""
+    return list(getattr(encoder, "classes_", encoder))
+
+def encode_dataframe(df: pd.DataFrame, dtype: Any = np.float64) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+    """
+    Numeric columns pass through (NaN -> 0), other columns become codes into a
+    sorted vocabulary. Returns the encoded frame and {column: vocabulary}.
+    dtype=np.float32 halves the frame; XGBoost trains in float32 either way.
+    """
+    vocabularies: Dict[str, List[str]] = {}
+    columns: Dict[str, np.ndarray] = {}
+    for col in df.columns:
+        s = df[col]
+        if is_numeric_column(s):
+            columns[col] = s.astype(dtype).fillna(0.0).to_numpy()
             continue
+        codes, vocabularies[col] = category_codes(s)
+        columns[col] = codes.astype(dtype)
+    return pd.DataFrame(columns, columns=df.columns, index=df.index), vocabularies
+
+DEFAULT_XGB_PARAMS: Dict[str, Any] = {"n_estimators": 80, "max_depth": 4}
+
+def load_selected_params(path: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    hparam_search leaderboard -> (target, XGBClassifier params) of the selected
+    trial (or the best one). n_estimators becomes the early-stopped tree count.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        board = json.load(fh)
+    if board.get("trainer") != "xgb":
+        raise SystemExit(f"{path} is a {board.get('trainer')} leaderboard; train.py needs an xgb one")
+    entry = board.get("selected") or board.get("best")
+    if not entry:
+        raise SystemExit(f"No successful trial in {path}")
+    params = dict(entry["params"])
+    categorical = params.pop("categorical", "ordinal")
+    if categorical != "ordinal":
+        raise SystemExit(f"Trial {entry['trial']} uses {categorical} categorical handling; "
+                         "train.py only writes ordinal vocabularies")
+    if entry.get("best_iteration"):
+        params["n_estimators"] = int(entry["best_iteration"])
+    return board.get("target", "prakriti"), params
+
+def train_model(X: pd.DataFrame, y: pd.Series, model_name: str, dtype: Any = np.float64,
+                params: Optional[Dict[str, Any]] = None, threads: Optional[int] = None,
+                latency_repeats: int = 100):
+    """Returns (model, encoders, label encoder, report); report["telemetry"] has stage costs and latency"""
+    telemetry = TrainingTelemetry()
+    with telemetry.stage("encode"):
+        X_enc, encoders = encode_dataframe(X, dtype=dtype)
         le = LabelEncoder()
-        vals = df2[col].fillna("___nan___").astype(str)
-        le.fit(vals)
-        df2[col] = le.transform(vals).astype(float)
-        encoders[col] = le
-    return df2, encoders
-
-def train_model(X: pd.DataFrame, y: pd.Series, model_name: str):
-    X_enc, encoders = encode_dataframe(X)
-    le = LabelEncoder()
-    y_enc = le.fit_transform(y.astype(str))
-    X_train, X_test, y_train, y_test = train_test_split(X_enc, y_enc, test_size=0.2, random_state=42)
+        y_enc = le.fit_transform(y.astype(str))
+    with telemetry.stage("split"):
+        X_train, X_test, y_train, y_test = train_test_split(X_enc, y_enc, test_size=0.2, random_state=42)
     print(f"Training {model_name} model on {X_train.shape[0]} rows / {X_train.shape[1]} features")
-    model = XGBClassifier(use_label_encoder=False, eval_metric="mlogloss", n_estimators=80, max_depth=4)
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
-    report = classification_report(y_test, y_pred, target_names=le.classes_, output_dict=True)
+    params = {**DEFAULT_XGB_PARAMS, **(params or {})}
+    if threads:
+        params["n_jobs"] = threads
+    model = XGBClassifier(use_label_encoder=False, eval_metric="mlogloss", **params)
+    with telemetry.stage("fit"):
+        model.fit(X_train, y_train)
+    with telemetry.stage("evaluate"):
+        y_pred = model.predict(X_test)
+        report = classification_report(y_test, y_pred, target_names=le.classes_, output_dict=True)
+    telemetry.count(rows=len(X), train_rows=len(X_train), test_rows=len(X_test), features=X.shape[1],
+                    classes=len(le.classes_))
+    telemetry.record_latency(model.predict_proba, X_test, latency_repeats)
+    report["telemetry"] = telemetry.report(model_threads=model_thread_count(model))
     return model, encoders, le, report
 
-def save_artifacts(model, encoders, label_encoder, model_basename: str, model_dir: str, meta: Dict[str, Any], report: Dict[str, Any]):
-    artifacts = {}
-    model_path = os.path.join(model_dir, f"{model_basename}_model.joblib")
-    encoders_path = os.path.join(model_dir, f"{model_basename}_feature_encoders.joblib")
-    labels_path = os.path.join(model_dir, f"{model_basename}_label_encoder.joblib")
-    meta_path = os.path.join(model_dir, f"{model_basename}_meta.json")
+def cross_validate_models(df: pd.DataFrame, labels: Dict[str, Optional[pd.Series]],
+                          model_params: Dict[str, Dict[str, Any]], n_splits: int = 5, repeats: int = 1,
+                          workers: int = 0, skip: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    k-fold CV of the prakriti and mental models in one process pool.
+    Each target's rows are encoded once; folds share the encoded matrix.
+    """
+    from evaluation import cross_validate, encode_labels, eval_task
+    tasks = {}
+    for name, y in labels.items():
+        if name in skip or y is None:
+            continue
+        mask = (y.notna() & y.astype(str).str.strip().ne("None")).to_numpy()
+        if mask.sum() < n_splits:
+            print(f"Not enough {name}-labeled rows for {n_splits}-fold CV. Skipping.")
+            continue
+        X_enc, _ = encode_dataframe(df[mask].reset_index(drop=True), dtype=np.float32)
+        y_codes, classes = encode_labels(y[mask].to_numpy())
+        params = {**DEFAULT_XGB_PARAMS, **(model_params.get(name) or {})}
+        tasks[name] = eval_task(X_enc.to_numpy(), y_codes, classes, {"trainer": "xgb", "params": params})
+    return cross_validate(tasks, n_splits, repeats, workers=workers)
+
+def _atomic_json(obj: Any, path: str, **kwargs):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(obj, fh, **kwargs)
+    os.replace(tmp, path)
+
+def save_artifacts(model, encoders, label_encoder, model_basename: str, model_dir: str, meta: Dict[str, Any],
+                   report: Dict[str, Any], telemetry: Optional[TrainingTelemetry] = None):
+    """
+    Model, vocabularies, label encoder and meta go into one <basename>.bundle (see model_bundle.py),
+    written to a temp name and renamed into place, so readers never see a partial set. The training
+    report stays a readable JSON next to it; its telemetry gets the save stage and the bundle size.
+    """
+    bundle_file = bundle_path(model_dir, model_basename)
     report_path = os.path.join(model_dir, f"{model_basename}_training_report.json")
-    joblib.dump(model, model_path)
-    joblib.dump(encoders, encoders_path)
-    joblib.dump(label_encoder, labels_path)
-    with open(meta_path, "w", encoding="utf-8") as fh:
-        json.dump(meta, fh, indent=2)
-    with open(report_path, "w", encoding="utf-8") as fh:
-        json.dump(report, fh, indent=2)
-    artifacts.update({
-        "model": model_path,
-        "encoders": encoders_path,
-        "label_encoder": labels_path,
-        "meta": meta_path,
-        "report": report_path
-    })
+    telemetry = telemetry or TrainingTelemetry()
+    with telemetry.stage("save"):
+        # {column: sorted vocabulary}; a category's code is its position in the list
+        write_bundle(bundle_file, {"model": model,
+                                   "encoders": {col: vocabulary(enc) for col, enc in encoders.items()},
+                                   "label_encoder": label_encoder}, meta)
+        remove_files(os.path.join(model_dir, f"{model_basename}_{suffix}") for suffix in LEGACY_ARTIFACT_SUFFIXES)
+    report = {**report, "telemetry": telemetry.report(artifacts={"bundle": bundle_file},
+                                                      model_threads=model_thread_count(model))}
+    _atomic_json(report, report_path, indent=2)
+    artifacts = {"bundle": bundle_file, "report": report_path}
     print(f"Saved artifacts: {artifacts}")
     return artifacts
 
+# -----------------------
+# incremental (warm-start) training
+# -----------------------
+# files of the layout before bundles; still readable, removed when a bundle replaces them
+LEGACY_ARTIFACT_SUFFIXES = ("model.joblib", "feature_vocab.json", "feature_encoders.joblib",
+                            "label_encoder.joblib", "meta.json")
+
+def load_previous_meta(model_basename: str, model_dir: str) -> Optional[Dict[str, Any]]:
+    """Meta (with the manifest) of the saved model, without loading the model itself"""
+    meta = read_bundle_meta(model_dir, model_basename)
+    if meta is not None:
+        return meta
+    meta_path = os.path.join(model_dir, f"{model_basename}_meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+def load_previous_artifacts(model_basename: str, model_dir: str) -> Optional[Tuple[Any, Dict[str, Any], Any, Dict[str, Any]]]:
+    bundle = open_bundle(model_dir, model_basename)
+    if bundle is not None:
+        with bundle:
+            return bundle.get("model"), bundle.get("encoders"), bundle.get("label_encoder"), bundle.meta
+    paths = [os.path.join(model_dir, f"{model_basename}_{suffix}") for suffix in
+             ("model.joblib", "feature_vocab.json", "label_encoder.joblib", "meta.json")]
+    if not os.path.exists(paths[1]):
+        # artifacts written before vocabularies: pickled LabelEncoders
+        paths[1] = os.path.join(model_dir, f"{model_basename}_feature_encoders.joblib")
+    if not all(os.path.exists(p) for p in paths):
+        return None
+    with open(paths[3], "r", encoding="utf-8") as fh:
+        meta = json.load(fh)
+    if paths[1].endswith(".json"):
+        with open(paths[1], "r", encoding="utf-8") as fh:
+            encoders = json.load(fh)
+    else:
+        encoders = joblib.load(paths[1])
+    return joblib.load(paths[0]), encoders, joblib.load(paths[2]), meta
+
+def apply_encoders(df: pd.DataFrame, encoders: Dict[str, Any], features: List[str]) -> pd.DataFrame:
+    """Encode new rows with previously fitted vocabularies; unseen categories become missing (NaN)"""
+    X = df.reindex(columns=features, fill_value=0)
+    for col in features:
+        if col in encoders:
+            index = {c: i for i, c in enumerate(vocabulary(encoders[col]))}
+            X[col] = X[col].fillna(NAN_TOKEN).astype(str).map(index).astype(float)
+        else:
+            X[col] = pd.to_numeric(X[col], errors="coerce").fillna(0.0)
+    return X
+
+def continue_training(model, X: pd.DataFrame, y_enc: np.ndarray, n_classes: int, rounds: int):
+    """Add `rounds` boosting rounds to an existing XGBClassifier, in place"""
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None and k != "use_label_encoder"}
+    if n_classes > 2:
+        params["num_class"] = n_classes
+    booster = xgb.train(params, xgb.DMatrix(X, label=y_enc), num_boost_round=rounds, xgb_model=model.get_booster())
+    return replace_booster(model, booster)
+
+def run_incremental(rows: List[Dict[str, Any]], model_dir: str, full_rebuild_every: int = 10,
+                    max_incremental_fraction: float = 0.5, rounds: int = 20) -> Dict[str, Any]:
+    """
+    Update existing models with rows past their data watermark.
+    Returns {target: artifacts-or-status} for targets handled here; targets that
+    need a full rebuild are left out so the caller retrains them from scratch.
+    """
+    frame = pd.DataFrame(rows, columns=list(WATERMARK_COLUMNS))
+    watermark = compute_watermark(frame)
+    handled: Dict[str, Any] = {}
+    for target in ("prakriti", "mental"):
+        previous = load_previous_artifacts(target, model_dir)
+        if previous is None:
+            print(f"No previous {target} model; it will be trained from scratch.")
+            continue
+        model, encoders, label_encoder, meta = previous
+        manifest = meta.get("manifest")
+        mask = new_rows_mask(frame, (manifest or {}).get("data_watermark"))
+        new_rows = [r for r, keep in zip(rows, mask) if keep]
+        if not new_rows:
+            print(f"No new rows for the {target} model; keeping it.")
+            handled[target] = {"status": "no_new_data"}
+            continue
+        full, reason = should_full_rebuild(manifest, len(new_rows), len(rows), full_rebuild_every, max_incremental_fraction)
+        if full:
+            print(f"Full rebuild required for {target}: {reason}")
+            continue
+        try:
+            df_new, y_p, y_m, _ = build_dataframe(new_rows)
+        except ValueError:
+            handled[target] = {"status": "no_new_labeled_rows"}
+            continue
+        y_new = y_p if target == "prakriti" else y_m
+        if y_new is None:
+            handled[target] = {"status": "no_new_labeled_rows"}
+            continue
+        labeled = (y_new.notna() & y_new.astype(str).str.strip().ne("None")).values
+        X_new = df_new[labeled].reset_index(drop=True)
+        y_new = y_new[labeled].astype(str).reset_index(drop=True)
+        if len(y_new) == 0:
+            handled[target] = {"status": "no_new_labeled_rows"}
+            continue
+        classes = list(label_encoder.classes_)
+        if not set(y_new) <= set(classes):
+            print(f"New {target} rows contain unseen labels; it will be trained from scratch.")
+            continue
+
+        telemetry = TrainingTelemetry()
+        with telemetry.stage("encode"):
+            X_enc = apply_encoders(X_new, encoders, meta["features"])
+            y_enc = label_encoder.transform(y_new)
+        # test-then-train: score the current model on the unseen rows before updating it
+        with telemetry.stage("evaluate"):
+            y_pred = model.predict(X_enc)
+            report = classification_report(y_enc, y_pred, labels=list(range(len(classes))), target_names=classes,
+                                           output_dict=True, zero_division=0)
+        report["training_mode"] = "incremental"
+        report["evaluation_note"] = "measured on the new rows before the update (test-then-train)"
+        print(f"Incremental {target} training on {len(y_new)} new rows ({rounds} boosting rounds)")
+        with telemetry.stage("fit"):
+            continue_training(model, X_enc, y_enc, len(classes), rounds)
+        telemetry.count(rows=len(rows), train_rows=len(y_new), features=X_enc.shape[1])
+        telemetry.record_latency(model.predict_proba, X_enc)
+        meta = dict(meta)
+        # the updated model no longer corresponds to a single full-training key
+        meta.pop("training_key", None)
+        meta["manifest"] = next_manifest(manifest, "incremental", watermark, len(y_new), reason,
+                                         boosting_rounds_total=model.get_booster().num_boosted_rounds())
+        handled[target] = save_artifacts(model, encoders, label_encoder, target, model_dir, meta, report, telemetry)
+    return handled
+
+def full_training_meta(meta: Dict[str, Any], model_basename: str, model_dir: str,
+                       watermark: Dict[str, Any], n_rows: int, model) -> Dict[str, Any]:
+    previous = load_previous_meta(model_basename, model_dir)
+    previous_manifest = previous.get("manifest") if previous else None
+    out = dict(meta)
+    out["manifest"] = next_manifest(previous_manifest, "full", watermark, n_rows, "full training",
+                                    boosting_rounds_total=model.get_booster().num_boosted_rounds())
+    return out
+
+# -----------------------
+# concurrent training of all targets
+# -----------------------
+TARGETS = ("prakriti", "mental")
+TRAIN_RUN_REPORT = "training_run_report.json"
+
+def _train_target(name: str, X: pd.DataFrame, y: pd.Series, dtype: Any,
+                  params: Optional[Dict[str, Any]], threads: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    model, encoders, label_encoder, report = train_model(X, y, name, dtype=dtype, params=params, threads=threads)
+    return {"name": name, "model": model, "encoders": encoders, "label_encoder": label_encoder,
+            "report": report, "train_seconds": time.perf_counter() - started}
+
+def training_keys(data_key: str, targets: Iterable[str], dtype: Any,
+                  model_params: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, str]:
+    """Fit-stage key per target: input data, settings, this file's code and library versions"""
+    code = code_fingerprint(os.path.abspath(__file__))
+    versions = library_versions("xgboost", "sklearn", "pandas", "numpy")
+    return {t: stage_key("fit", data_key, t, np.dtype(dtype).name,
+                         {**DEFAULT_XGB_PARAMS, **((model_params or {}).get(t) or {})}, code, versions)
+            for t in targets}
+
+def train_targets(df: pd.DataFrame, labels: Dict[str, Optional[pd.Series]], meta: Dict[str, Any], model_dir: str,
+                  watermark: Dict[str, Any], dtype: Any = np.float64,
+                  model_params: Optional[Dict[str, Dict[str, Any]]] = None,
+                  extra_reports: Optional[Dict[str, Dict[str, Any]]] = None,
+                  workers: int = 0, fit_keys: Optional[Dict[str, str]] = None,
+                  cache: Optional[StageCache] = None,
+                  telemetry: Optional[TrainingTelemetry] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Train one model per target at the same time. With more than one worker each
+    target trains in its own process and the CPU cores are split between them
+    (XGBoost n_jobs); artifacts are saved on a background thread as soon as a
+    model finishes. With a stage cache, a target whose fit key was trained
+    before is loaded instead of retrained. Stages already recorded in `telemetry`
+    (load, clean, ...) are shared by every target's report telemetry.
+    Returns (artifacts per target, combined run report).
+    """
+    model_params = model_params or {}
+    extra_reports = extra_reports or {}
+    fit_keys = fit_keys or {}
+    cache = cache or StageCache(enabled=False)
+    jobs: Dict[str, Tuple[pd.DataFrame, pd.Series]] = {}
+    for name, y in labels.items():
+        if y is None or y.notna().sum() == 0:
+            print(f"No {name} labels found. Skipping {name} model.")
+            continue
+        mask = y.notna() & (y.astype(str).str.strip().ne("None"))
+        if mask.sum() < 5:
+            print(f"Not enough {name}-labeled rows to train (need >=5). Skipping {name} model.")
+            continue
+        jobs[name] = (df[mask.values].reset_index(drop=True), y[mask].reset_index(drop=True))
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(jobs) or 1))
+    threads = max(1, cpus // workers)
+    run_started = time.perf_counter()
+    run_report: Dict[str, Any] = {"mode": "processes" if workers > 1 else "sequential", "workers": workers,
+                                  "threads_per_model": threads, "cpu_count": cpus, "models": {}}
+
+    def finish(result: Dict[str, Any], finished_at: float, cached: bool = False) -> Dict[str, Any]:
+        name = result["name"]
+        key = fit_keys.get(name)
+        if key and not cached:
+            cache.put("fit", key, result)
+        report = {**result["report"], **extra_reports.get(name, {})}
+        target_telemetry = TrainingTelemetry()
+        if telemetry is not None:
+            target_telemetry.merge({"stages": telemetry.stages, "counts": telemetry.counts})
+        target_telemetry.merge(report.pop("telemetry", None) or {}, cached=cached)
+        model_meta = full_training_meta(meta, name, model_dir, watermark, len(jobs[name][0]), result["model"])
+        if key:
+            model_meta["training_key"] = key
+        started = time.perf_counter()
+        artifacts = save_artifacts(result["model"], result["encoders"], result["label_encoder"], name,
+                                   model_dir, model_meta, report, target_telemetry)
+        latency = target_telemetry.latency or {}
+        run_report["models"][name] = {
+            "rows": int(len(jobs[name][0])),
+            "accuracy": round(float(report.get("accuracy", 0.0)), 6),
+            "train_seconds": round(result["train_seconds"], 3),
+            "fit_cached": cached,
+            "finished_after_seconds": round(finished_at - run_started, 3),  # from run start, in every mode
+            "save_seconds": round(time.perf_counter() - started, 3),
+            "peak_rss_mb": max((st["peak_rss_mb"] for st in target_telemetry.stages.values()
+                                if st.get("peak_rss_mb") and not st.get("cached")), default=None),
+            "single_row_p50_ms": (latency.get("single_row_ms") or {}).get("p50"),
+        }
+        return artifacts
+
+    saves: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        for name in list(jobs):
+            cached = cache.get("fit", fit_keys[name]) if name in fit_keys else None
+            if cached is not None:
+                print(f"Stage fit ({name}): cached")
+                saves[name] = writer.submit(finish, cached, time.perf_counter(), True)
+        pending = {name: job for name, job in jobs.items() if name not in saves}
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_train_target, name, X, y, dtype, model_params.get(name), threads): name
+                           for name, (X, y) in pending.items()}
+                for fut in as_completed(futures):
+                    saves[futures[fut]] = writer.submit(finish, fut.result(), time.perf_counter())
+        else:
+            for name, (X, y) in pending.items():
+                result = _train_target(name, X, y, dtype, model_params.get(name), threads)
+                saves[name] = writer.submit(finish, result, time.perf_counter())
+        artifacts = {name: fut.result() for name, fut in saves.items()}
+
+    run_report["wall_seconds"] = round(time.perf_counter() - run_started, 3)
+    run_report["sum_train_seconds"] = round(sum(m["train_seconds"] for m in run_report["models"].values()), 3)
+    if telemetry is not None:
+        run_report["telemetry"] = telemetry.report()
+    return artifacts, run_report
+
 # -----------------------
 # Supabase fetch (defensive)
 # -----------------------
@@ -276,54 +773,73 @@ def fetch_questionnaires_from_supabase(supabase_client: Any, limit: int = 2000)
 # -----------------------
 # CSV loader
 # -----------------------
+JSON_COLUMNS = ("answers", "scores", "mental_health_score")
+
+def json_loads_bulk(values: List[str], chunk_size: int = 10000) -> List[Any]:
+    """json.loads over many cells, one parser call per chunk; cells that are not valid JSON stay strings"""
+    out: List[Any] = []
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        try:
+            parsed = json.loads("[" + ",".join(chunk) + "]")
+            if len(parsed) == len(chunk):
+                out.extend(parsed)
+                continue
+        except ValueError:
+            pass
+        for v in chunk:
+            try:
+                out.append(json.loads(v))
+            except Exception:
+                out.append(v)
+    return out
+
 def load_rows_from_csv(csv_path: str) -> List[Dict[str, Any]]:
     if not os.path.exists(csv_path):
         raise FileNotFoundError(csv_path)
-    df = pd.read_csv(csv_path, dtype=str).fillna("")
-    rows: List[Dict[str, Any]] = []
-    for _, r in df.iterrows():
-        obj: Dict[str, Any] = {}
-        for col in df.columns:
-            val = r[col]
-            if val == "":
-                obj[col] = None
-                continue
-            if col in ("answers", "scores", "mental_health_score"):
-                try:
-                    obj[col] = json.loads(val)
-                except Exception:
-                    obj[col] = val
-            else:
-                obj[col] = val
-        rows.append(obj)
+    rows = rows_from_frame(pd.read_csv(csv_path, dtype=str).fillna(""))
     print(f"Loaded {len(rows)} rows from CSV: {csv_path}")
     return rows
 
+def rows_from_frame(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Export frame read as strings ("" = missing) -> row dicts with JSON columns parsed"""
+    columns: List[np.ndarray] = []
+    for col in df.columns:
+        vals = df[col].to_numpy(dtype=object)
+        present = vals != ""
+        out = np.full(len(vals), None, dtype=object)
+        if col in JSON_COLUMNS:
+            out[present] = object_array(json_loads_bulk(vals[present].tolist()))
+        else:
+            out[present] = vals[present]
+        columns.append(out)
+    names = list(df.columns)
+    return [dict(zip(names, vals)) for vals in zip(*columns)]
+
 # -----------------------
 # Main
 # -----------------------
-def main(argv=None):
-    p = argparse.ArgumentParser()
-    p.add_argument("--limit", type=int, default=2000)
-    p.add_argument("--csv", type=str, default=None)
-    p.add_argument("--model-dir", type=str, default=os.getenv("MODEL_DIR", "./models_out"))
-    p.add_argument("--supabase-url", type=str, default=None)
-    p.add_argument("--supabase-key", type=str, default=None)
-    args = p.parse_args(argv)
-
-    model_dir = args.model_dir
-    os.makedirs(model_dir, exist_ok=True)
-
-    # choose supabase url/key: CLI override -> env variables
-    supabase_url = args.supabase_url or os.getenv("SUPABASE_URL")
-    supabase_key = args.supabase_key or os.getenv("SUPABASE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-
-    print("Supabase URL:", supabase_url or "<none>")
-    print("Supabase Key (masked):", mask_key(supabase_key))
-    print("Model output dir:", model_dir)
+def load_training_rows(args: argparse.Namespace, supabase_url: Optional[str],
+                       supabase_key: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Rows from --csv, the Supabase sync cache or (--no-sync) a single capped
+    select; plus the sync report. A failed sync falls back to the capped select.
+    """
+    rows: List[Dict[str, Any]] = []
+    sync_report: Optional[Dict[str, Any]] = None
+    capped_fetch = args.no_sync
+    if args.csv is None and supabase_url and supabase_key and not args.no_sync:
+        try:
+            sync_report, frame = sync_from_env(args.sync_dir, args.full_sync, supabase_url, supabase_key)
+            rows = rows_from_frame(frame)
+            print(f"Loaded {len(rows)} rows from the sync cache {args.sync_dir}")
+        except Exception as e:
+            print(f"Supabase sync failed: {e}; falling back to a capped fetch (limit={args.limit})")
+            sync_report = {"error": str(e), "fallback": "capped_fetch"}
+            capped_fetch = True
 
     supabase_client = None
-    if supabase_url and supabase_key and create_client:
+    if args.csv is None and capped_fetch and supabase_url and supabase_key and create_client:
         try:
             supabase_client = create_client(supabase_url, supabase_key)
             # quick lightweight check (do not fail the whole run on error)
@@ -335,7 +851,6 @@ def main(argv=None):
             print("Failed to create Supabase client:", ex)
             supabase_client = None
 
-    rows: List[Dict[str, Any]] = []
     if args.csv is None and supabase_client is not None:
         try:
             rows = fetch_questionnaires_from_supabase(supabase_client, limit=args.limit)
@@ -344,12 +859,93 @@ def main(argv=None):
             rows = []
     if args.csv:
         rows = load_rows_from_csv(args.csv)
+    return rows, sync_report
 
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--limit", type=int, default=2000, help="Row cap of the --no-sync fetch")
+    p.add_argument("--csv", type=str, default=None)
+    p.add_argument("--model-dir", type=str, default=os.getenv("MODEL_DIR", "./models_out"))
+    p.add_argument("--supabase-url", type=str, default=None)
+    p.add_argument("--supabase-key", type=str, default=None)
+    p.add_argument("--sync-dir", type=str, default=SUPABASE_SYNC_DIR, help="Local cache of synced Supabase rows")
+    p.add_argument("--full-sync", action="store_true", help="Drop the sync cache and fetch every row")
+    p.add_argument("--no-sync", action="store_true",
+                   help="Fetch with a single capped select instead of the incremental sync")
+    p.add_argument("--incremental", action="store_true",
+                   help="Continue boosting existing models on rows added since their watermark")
+    p.add_argument("--full-rebuild-every", type=int, default=10,
+                   help="Force a full rebuild after this many incremental runs")
+    p.add_argument("--incremental-rounds", type=int, default=20)
+    p.add_argument("--float32", action="store_true",
+                   help="Encode features as float32 (half the memory; XGBoost trains in float32 anyway)")
+    p.add_argument("--params-from", type=str, default=None,
+                   help="hparam_search leaderboard JSON; its selected config trains the matching target")
+    p.add_argument("--cv-folds", type=int, default=0,
+                   help="Also run stratified k-fold CV of both models in parallel (0 = off)")
+    p.add_argument("--cv-repeats", type=int, default=1)
+    p.add_argument("--cv-workers", type=int, default=0, help="CV worker processes (default: one per CPU)")
+    p.add_argument("--train-workers", type=int, default=0,
+                   help="Models trained at once, one process each (default: min(targets, CPUs); 1 = sequential)")
+    p.add_argument("--force", action="store_true", help="Retrain even if data, settings and code are unchanged")
+    p.add_argument("--no-stage-cache", action="store_true", help="Recompute every stage")
+    args = p.parse_args(argv)
+
+    model_dir = args.model_dir
+    os.makedirs(model_dir, exist_ok=True)
+    feature_dtype = np.float32 if args.float32 else np.float64
+    model_params: Dict[str, Dict[str, Any]] = {}
+    if args.params_from:
+        target, params = load_selected_params(args.params_from)
+        model_params[target] = params
+        print(f"Using {target} params from {args.params_from}: {params}")
+
+    # choose supabase url/key: CLI override -> env variables
+    supabase_url = args.supabase_url or os.getenv("SUPABASE_URL")
+    supabase_key = args.supabase_key or os.getenv("SUPABASE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+
+    print("Supabase URL:", supabase_url or "<none>")
+    print("Supabase Key (masked):", mask_key(supabase_key))
+    print("Model output dir:", model_dir)
+
+    telemetry = TrainingTelemetry()
+    with telemetry.stage("load"):
+        rows, sync_report = load_training_rows(args, supabase_url, supabase_key)
+    telemetry.count(raw_rows=len(rows))
+
+    if not rows and sync_report and sync_report.get("error"):
+        raise SystemExit(f"No data for training: Supabase sync failed ({sync_report['error']}) "
+                         f"and the capped fetch returned no rows.")
     if not rows:
         raise SystemExit("No data for training. Provide --csv or valid SUPABASE env vars.")
 
+    trained_artifacts: Dict[str, Any] = {}
+    if args.incremental:
+        trained_artifacts = run_incremental(rows, model_dir, args.full_rebuild_every,
+                                            rounds=args.incremental_rounds)
+        if all(t in trained_artifacts for t in ("prakriti", "mental")):
+            print("Training finished. Trained artifacts:", json.dumps(trained_artifacts, indent=2))
+            return trained_artifacts
+    watermark = compute_watermark(pd.DataFrame(rows, columns=list(WATERMARK_COLUMNS)))
+
+    cache = StageCache(enabled=not args.no_stage_cache, refresh=args.force)
+    data_key = file_digest(args.csv) if args.csv else rows_digest(rows)
+    fit_keys = training_keys(data_key, TARGETS, feature_dtype, model_params)
+    if not args.force:
+        for name in TARGETS:
+            previous = None if name in trained_artifacts else load_previous_meta(name, model_dir)
+            if previous and previous.get("training_key") == fit_keys[name]:
+                print(f"{name.capitalize()} model: data, parameters and code unchanged; keeping it.")
+                trained_artifacts[name] = {"status": "no_change"}
+        if all(t in trained_artifacts for t in TARGETS):
+            print("Training finished. Trained artifacts:", json.dumps(trained_artifacts, indent=2))
+            return trained_artifacts
+
     try:
-        df, y_prak, y_ment, meta = build_dataframe(rows)
+        with telemetry.stage("clean"):
+            df, y_prak, y_ment, meta = cache.run(
+                "dataframe", stage_key("dataframe", data_key, code_fingerprint(os.path.abspath(__file__))),
+                lambda: build_dataframe(rows))
     except Exception as e:
         print("Failed to build dataframe from rows:", e)
         traceback.print_exc()
@@ -358,34 +954,33 @@ def main(argv=None):
     print("Dataframe shape (n_rows, n_features):", df.shape)
     print("Meta:", meta)
 
-    trained_artifacts: Dict[str, Any] = {}
-    # prakriti
-    if y_prak is not None and y_prak.notna().sum() > 0:
-        mask = y_prak.notna() & (y_prak.astype(str).str.strip().ne("None"))
-        Xp = df[mask.values].reset_index(drop=True)
-        yp = y_prak[mask].reset_index(drop=True)
-        if len(Xp) < 5:
-            print("Not enough prakriti-labeled rows to train (need >=5). Skipping prakriti model.")
-        else:
-            model_p, enc_p, le_p, report_p = train_model(Xp, yp, "prakriti")
-            artifacts_p = save_artifacts(model_p, enc_p, le_p, "prakriti", model_dir, meta, report_p)
-            trained_artifacts["prakriti"] = artifacts_p
-    else:
-        print("No prakriti labels found. Skipping prakriti model.")
-
-    # mental
-    if y_ment is not None and y_ment.notna().sum() > 0:
-        maskm = y_ment.notna() & (y_ment.astype(str).str.strip().ne("None"))
-        Xm = df[maskm.values].reset_index(drop=True)
-        ym = y_ment[maskm].reset_index(drop=True)
-        if len(Xm) < 5:
-            print("Not enough mental-labeled rows to train (need >=5). Skipping mental model.")
-        else:
-            model_m, enc_m, le_m, report_m = train_model(Xm, ym, "mental")
-            artifacts_m = save_artifacts(model_m, enc_m, le_m, "mental", model_dir, meta, report_m)
-            trained_artifacts["mental"] = artifacts_m
-    else:
-        print("No mental labels found. Skipping mental model.")
+    cv_results: Dict[str, Any] = {}
+    if args.cv_folds > 1:
+        cv_targets = [t for t in TARGETS if t not in trained_artifacts]
+        with telemetry.stage("cross_validate"):
+            cv_results = cache.run(
+                "cv", stage_key("cv", [fit_keys[t] for t in cv_targets], args.cv_folds, args.cv_repeats),
+                lambda: cross_validate_models(df, {"prakriti": y_prak, "mental": y_ment}, model_params,
+                                              args.cv_folds, args.cv_repeats, args.cv_workers,
+                                              skip=set(trained_artifacts)))
+
+    for name in TARGETS:
+        if name in trained_artifacts:
+            print(f"{name.capitalize()} model handled incrementally.")
+    labels = {name: y for name, y in (("prakriti", y_prak), ("mental", y_ment)) if name not in trained_artifacts}
+    extra_reports = {name: {"cross_validation": cv} for name, cv in cv_results.items()}
+    artifacts, run_report = train_targets(df, labels, meta, model_dir, watermark, feature_dtype, model_params,
+                                          extra_reports, workers=args.train_workers, fit_keys=fit_keys, cache=cache,
+                                          telemetry=telemetry)
+    trained_artifacts.update(artifacts)
+    if artifacts:
+        run_report["incremental"] = [t for t in TARGETS if t in trained_artifacts and t not in artifacts]
+        run_report["stages"] = cache.log
+        if sync_report:
+            run_report["supabase_sync"] = sync_report
+        _atomic_json(run_report, os.path.join(model_dir, TRAIN_RUN_REPORT), indent=2)
+        print(f"Trained {', '.join(artifacts)} in {run_report['wall_seconds']}s wall "
+              f"({run_report['mode']}, sum of model times {run_report['sum_train_seconds']}s)")
 
     if not trained_artifacts:
         raise SystemExit("No models trained. Ensure dataset contains 'prakriti_label' or 'mental_label' (or scores/mental_health_score).")
@@ -4,6 +4,7 @@ import numpy as np
 import joblib
 import json
 import os
+import hashlib
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder, LabelEncoder
 from sklearn.compose import ColumnTransformer
@@ -11,6 +12,12 @@ from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, classification_report
 import lightgbm as lgb
 from dotenv import load_dotenv
+from category_encoding import CategoryCodeEncoder
+from drift_monitor import build_reference_profile, load_reference_profile, save_reference_profile, update_reference_profile
+from stage_cache import StageCache, code_fingerprint, library_versions, stage_key
+from incremental import compute_watermark, new_rows_mask, next_manifest, replace_booster, should_full_rebuild
+from training_telemetry import TrainingTelemetry, model_thread_count
+from model_bundle import bundle_path, model_components, open_bundle, read_bundle_meta, remove_files, write_bundle
 
 load_dotenv()
 
@@ -41,19 +48,62 @@ QUESTION_MAPPING = {
     'q20': 'q_skin'       # perspiration -> skin
 }
 
-def load_and_prepare_data():
+# Bump when the cleaning logic below changes so stale caches are ignored
+LOADER_VERSION = 2
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "./.dataset_cache")
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except Exception:
+    PARQUET_AVAILABLE = False
+
+def file_content_hash(path: str) -> str:
     """
-    Load your CSV data (robust):
-      - cleans outer-quote-wrapped files
-      - strips stray quotes from column names
-      - prints detected columns
-      - auto-detects target column from common names
-      - if missing, tries to derive target from vata/pitta/kapha score or percent columns
-      - drops rows with missing target values (and warns)
+    blake2b of the file contents. The digest is memoized against (size, mtime_ns)
+    in the cache directory, so unchanged files are not re-read on every run.
     """
-    csv_path = 'prakriti_training_dataset.csv'
+    st = os.stat(path)
+    stamp = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    index_path = os.path.join(DATASET_CACHE_DIR, "hash_index.json")
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except Exception:
+            index = {}
+    if stamp in index:
+        return index[stamp]
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 22), b""):
+            digest.update(block)
+    index = {k: v for k, v in index.items() if not k.startswith(os.path.abspath(path) + "|")}
+    index[stamp] = digest.hexdigest()
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    tmp = index_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path)
+    return index[stamp]
 
-    # Read raw and perform light cleaning if file is outer-quoted
+def _needs_quote_cleaning(csv_path: str) -> bool:
+    """Same heuristics as the legacy loader, evaluated on the head/tail of the file only"""
+    with open(csv_path, 'r', encoding='utf-8', errors='replace') as fh:
+        head = fh.read(1 << 16)
+    if not head.startswith('"'):
+        return False
+    with open(csv_path, 'rb') as fh:
+        fh.seek(max(0, os.path.getsize(csv_path) - 1024))
+        tail = fh.read().decode('utf-8', errors='replace')
+    if tail.rstrip().endswith('"'):
+        return True
+    lines = head.splitlines()[:10]
+    return bool(lines) and all(l.startswith('"') and l.endswith('"') for l in lines)
+
+def _read_quote_wrapped_csv(csv_path: str) -> pd.DataFrame:
+    """Legacy path for files where the whole file or every line is wrapped in quotes"""
     with open(csv_path, 'r', encoding='utf-8', errors='replace') as fh:
         raw = fh.read()
 
@@ -77,10 +127,101 @@ def load_and_prepare_data():
 
     from io import StringIO
     if cleaned is not None:
-        df = pd.read_csv(StringIO(cleaned))
-    else:
-        df = pd.read_csv(csv_path)
+        return pd.read_csv(StringIO(cleaned))
+    return pd.read_csv(csv_path)
+
+def read_csv_frame(csv_path: str) -> pd.DataFrame:
+    """Parse the CSV once with the fastest available engine"""
+    if _needs_quote_cleaning(csv_path):
+        return _read_quote_wrapped_csv(csv_path)
+    if PARQUET_AVAILABLE:
+        try:
+            return pd.read_csv(csv_path, engine='pyarrow')
+        except Exception as e:
+            print(f"pyarrow CSV engine failed ({e}); falling back to the C engine")
+    return pd.read_csv(csv_path, encoding_errors='replace')
+
+def _cache_path(content_hash: str) -> str:
+    ext = "parquet" if PARQUET_AVAILABLE else "pkl"
+    return os.path.join(DATASET_CACHE_DIR, f"prakriti_dataset_{content_hash}_v{LOADER_VERSION}.{ext}")
+
+def _watermark_path(cache_path: str) -> str:
+    # sidecar of a cached dataset: the raw-frame watermark, which the cleaned copy cannot give
+    directory, name = os.path.split(cache_path)
+    return os.path.join(directory, "watermark_" + os.path.splitext(name)[0] + ".json")
+
+def raw_watermark(raw: pd.DataFrame):
+    """
+    Watermark of the raw CSV frame: cleaning drops unlabeled rows and the
+    timestamp columns, so neither X nor its row count can place new rows
+    """
+    return {**compute_watermark(raw), "frame": "raw"}
+
+def _categorize(X: pd.DataFrame) -> pd.DataFrame:
+    X = X.copy()
+    for col in X.columns:
+        if X[col].dtype == object:
+            X[col] = X[col].astype('category')
+    return X
+
+def load_and_prepare_data(csv_path: str = 'prakriti_training_dataset.csv', use_cache: bool = True,
+                          telemetry: TrainingTelemetry = None, return_watermark: bool = False):
+    """
+    Load the training CSV, using a cached columnar copy of the cleaned result when the
+    file contents have not changed. Returns (X, y, feature_columns), plus the raw-frame
+    watermark with return_watermark; questionnaire string columns in X use the pandas
+    'category' dtype. Records "load" and "clean" stages in `telemetry` if given.
+    """
+    telemetry = telemetry or TrainingTelemetry()
+    cache_path = None
+    if use_cache:
+        cache_path = _cache_path(file_content_hash(csv_path))
+        watermark_path = _watermark_path(cache_path)
+        if os.path.exists(cache_path) and (os.path.exists(watermark_path) or not return_watermark):
+            with telemetry.stage("load") as stage:
+                stage["dataset_cache"] = "hit"
+                cached = pd.read_parquet(cache_path) if cache_path.endswith(".parquet") else pd.read_pickle(cache_path)
+            feats = [c for c in cached.columns if c != 'prakriti_label']
+            print(f"Loaded cleaned dataset from cache: {cache_path} ({len(cached)} rows)")
+            out = (cached[feats], cached['prakriti_label'].astype(object), feats)
+            if return_watermark:
+                with open(watermark_path, "r") as f:
+                    out += (json.load(f),)
+            return out
 
+    with telemetry.stage("load"):
+        raw = read_csv_frame(csv_path)
+    telemetry.count(raw_rows=len(raw), raw_columns=raw.shape[1])
+    watermark = raw_watermark(raw)
+    with telemetry.stage("clean"):
+        X, y, feats = prepare_frame(raw)
+        del raw
+        X = _categorize(X)
+
+    if cache_path:
+        frame = X.copy()
+        frame['prakriti_label'] = y.values
+        os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+        tmp = cache_path + ".tmp"
+        if cache_path.endswith(".parquet"):
+            frame.to_parquet(tmp, index=False)
+        else:
+            frame.to_pickle(tmp)
+        os.replace(tmp, cache_path)
+        with open(_watermark_path(cache_path) + ".tmp", "w") as f:
+            json.dump(watermark, f)
+        os.replace(_watermark_path(cache_path) + ".tmp", _watermark_path(cache_path))
+    return (X, y, feats, watermark) if return_watermark else (X, y, feats)
+
+def prepare_frame(df: pd.DataFrame):
+    """
+    Clean a raw CSV frame (robust):
+      - strips stray quotes from column names
+      - prints detected columns
+      - auto-detects target column from common names
+      - if missing, tries to derive target from vata/pitta/kapha score or percent columns
+      - drops rows with missing target values (and warns)
+    """
     # Clean column names: strip whitespace, stray quotes, BOMs
     def clean_col(c):
         if not isinstance(c, str):
@@ -142,37 +283,32 @@ def load_and_prepare_data():
 
         if detected:
             print(f"Found V/P/K columns pattern: {detected} — will derive prakriti_label by argmax.")
-            # create derived label
-            def derive_label(row):
-                vals = []
-                for key in detected:
-                    matched = next((c for c in df.columns if key in c.lower()), None)
-                    if matched is None:
-                        matched = next((c for c in df.columns if c.lower().startswith(key)), None)
-                    if matched is None:
-                        vals.append(0.0)
-                        continue
-                    v = row[matched]
-                    try:
-                        vnum = float(str(v).replace('%','').strip())
-                    except Exception:
-                        vnum = 0.0
-                    vals.append(vnum)
-                idx = int(np.argmax(vals))
-                return ['vata','pitta','kapha'][idx]
-            df['prakriti_label'] = df.apply(derive_label, axis=1)
+            # create derived label (column lookup is per key, values are parsed column-wise)
+            scores = []
+            for key in detected:
+                matched = next((c for c in df.columns if key in c.lower()), None)
+                if matched is None:
+                    matched = next((c for c in df.columns if c.lower().startswith(key)), None)
+                if matched is None:
+                    scores.append(np.zeros(len(df)))
+                    continue
+                col = df[matched]
+                parsed = pd.to_numeric(col.astype(str).str.replace('%', '', regex=False).str.strip(), errors='coerce')
+                # unparseable values count as 0, missing values stay NaN (as float() treats them)
+                scores.append(parsed.where(parsed.notna() | col.isna(), 0.0).to_numpy(dtype=float))
+            idx = np.argmax(np.column_stack(scores), axis=1)
+            df['prakriti_label'] = np.array(['vata', 'pitta', 'kapha'], dtype=object)[idx]
             found_target = 'prakriti_label'
             print("Derived 'prakriti_label' from V/P/K columns.")
         else:
             # also try to detect raw numeric score columns named exactly 'vata','pitta','kapha'
             if all(any(col.lower() == k for col in df.columns) for k in ['vata','pitta','kapha']):
                 print("Found raw score columns 'vata','pitta','kapha' — deriving target label.")
-                def derive_label_raw(row):
-                    vals = [float(row[next(c for c in df.columns if c.lower() == 'vata')]),
-                            float(row[next(c for c in df.columns if c.lower() == 'pitta')]),
-                            float(row[next(c for c in df.columns if c.lower() == 'kapha')])]
-                    return ['vata','pitta','kapha'][int(np.argmax(vals))]
-                df['prakriti_label'] = df.apply(derive_label_raw, axis=1)
+                raw = np.column_stack([
+                    df[next(c for c in df.columns if c.lower() == k)].astype(float).to_numpy()
+                    for k in ['vata', 'pitta', 'kapha']
+                ])
+                df['prakriti_label'] = np.array(['vata', 'pitta', 'kapha'], dtype=object)[np.argmax(raw, axis=1)]
                 found_target = 'prakriti_label'
 
     # If still missing, raise helpful error
@@ -224,70 +360,373 @@ def load_and_prepare_data():
     return X, y, available_feats
 
 
-def train_model():
-    X, y, feature_cols = load_and_prepare_data()
+# LightGBM aliases that would override num_boost_round when continuing training
+ITERATION_PARAM_ALIASES = {
+    'num_iterations', 'num_iteration', 'n_iter', 'num_tree', 'num_trees',
+    'num_round', 'num_rounds', 'nrounds', 'num_boost_round', 'n_estimators', 'max_iter'
+}
+
+LEGACY_ARTIFACTS = ("prakriti_model.joblib", "feature_columns.json")
+
+def load_previous_meta():
+    """Metadata of the LightGBM model currently in MODEL_DIR (without loading it), or None"""
+    metadata = read_bundle_meta(MODEL_DIR, "prakriti")
+    if metadata is None:
+        meta_path = os.path.join(MODEL_DIR, "feature_columns.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r") as f:
+            metadata = json.load(f)
+    return metadata if metadata.get("model_type") == "prakriti_lgbm" else None
+
+def load_previous_model():
+    """Return (pipeline, metadata) of the model currently in MODEL_DIR, or None"""
+    bundle = open_bundle(MODEL_DIR, "prakriti")
+    if bundle is not None:
+        with bundle:
+            if bundle.meta.get("model_type") != "prakriti_lgbm":
+                return None
+            # "estimator" is the LightGBM pipeline itself; "model" may be its tree arrays
+            pipeline = bundle.get("estimator") if "estimator" in bundle else bundle.get("model")
+            metadata = bundle.meta
+    else:
+        model_path = os.path.join(MODEL_DIR, "prakriti_model.joblib")
+        metadata = load_previous_meta()
+        if metadata is None or not os.path.exists(model_path):
+            return None
+        pipeline = joblib.load(model_path)
+    if not isinstance(pipeline, Pipeline):
+        return None
+    return pipeline, metadata
+
+def save_model(pipeline, metadata, training_report, telemetry=None, extra_artifacts=None):
+    """Pipeline and metadata go into MODEL_DIR/prakriti.bundle; the report stays training_report.json"""
+    path = bundle_path(MODEL_DIR, "prakriti")
+    telemetry = telemetry or TrainingTelemetry()
+    with telemetry.stage("save"):
+        components, kinds = model_components(pipeline)
+        write_bundle(path, components, metadata, kinds)
+        remove_files(os.path.join(MODEL_DIR, name) for name in LEGACY_ARTIFACTS)
     
-    # Identify categorical features
-    categorical_features = X.select_dtypes(include=['object']).columns.tolist()
+    # the report goes last so its telemetry includes the save and the artifact sizes
+    training_report["telemetry"] = telemetry.report(
+        artifacts={"bundle": path, **(extra_artifacts or {})},
+        model_threads=model_thread_count(pipeline))
+    with open(os.path.join(MODEL_DIR, "training_report.json"), "w") as f:
+        json.dump(training_report, f, indent=2)
     
-    # Preprocessing pipeline
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
-        ],
-        remainder='passthrough'
+    print(f"Model saved to {path}")
+    return path
+
+def train_incremental(csv_path, full_rebuild_every=10, max_incremental_fraction=0.5,
+                      incremental_rounds=20, telemetry=None):
+    """
+    Continue boosting the existing LightGBM model on rows added since its watermark.
+    The watermark is placed on the raw CSV frame; only the rows past it are cleaned,
+    encoded, trained on, timed and folded into the drift profile.
+    Returns (pipeline, metadata), or None when a full rebuild is required.
+    """
+    previous = load_previous_model()
+    if previous is None:
+        print("No previous LightGBM pipeline found; running full training.")
+        return None
+    pipeline, metadata = previous
+    manifest = metadata.get("manifest")
+    watermark = (manifest or {}).get("data_watermark")
+    if not watermark or watermark.get("frame") != "raw":
+        print("The current model has no raw-frame watermark; running full training.")
+        return None
+    profile = load_reference_profile(MODEL_DIR)
+    if profile is None:
+        print("No drift reference profile to extend; running full training.")
+        return None
+
+    telemetry = telemetry or TrainingTelemetry()
+    with telemetry.stage("load"):
+        raw = read_csv_frame(csv_path)
+    n_total = len(raw)
+    mask = new_rows_mask(raw, watermark)
+    next_watermark = raw_watermark(raw)
+    raw = raw[mask].reset_index(drop=True)
+    del mask
+    telemetry.count(raw_rows=n_total, new_raw_rows=len(raw))
+    X_new = None
+    if len(raw):
+        with telemetry.stage("clean"):
+            X_new, y_new, feature_cols = prepare_frame(raw)
+            X_new = _categorize(X_new)
+    del raw
+    if X_new is None or len(X_new) == 0:
+        print("No new labeled rows since the last model; keeping the existing model.")
+        metadata["status"] = "no_new_data"
+        return pipeline, metadata
+    if metadata.get("features") != feature_cols:
+        print("Feature columns changed since the last model; running full training.")
+        return None
+    n_new = len(X_new)
+
+    full, reason = should_full_rebuild(manifest, n_new, n_total, full_rebuild_every, max_incremental_fraction)
+    if full:
+        print(f"Full rebuild required: {reason}")
+        return None
+
+    classifier = pipeline.named_steps['classifier']
+    preprocessor = pipeline.named_steps['preprocessor']
+    # native pipelines: lgb.train ignores categorical_feature in params, the Dataset has to carry it
+    native_cat = getattr(preprocessor, 'categorical_indices_', None)
+    class_index = {c: i for i, c in enumerate(classifier.classes_)}
+    if not set(y_new.unique()) <= set(class_index):
+        print("New rows contain unseen labels; running full training.")
+        return None
+
+    # test-then-train: score the current model on the unseen rows before updating it
+    with telemetry.stage("evaluate"):
+        y_pred = pipeline.predict(X_new)
+        accuracy = accuracy_score(y_new, y_pred)
+        report = classification_report(y_new, y_pred, output_dict=True, zero_division=0)
+
+    print(f"Incremental training on {n_new} new rows ({incremental_rounds} boosting rounds)...")
+    params = {k: v for k, v in classifier.booster_.params.items()
+              if k not in ITERATION_PARAM_ALIASES and k != 'categorical_feature'}
+    with telemetry.stage("encode"):
+        X_new_enc = preprocessor.transform(X_new)
+    with telemetry.stage("fit"):
+        booster = lgb.train(
+            params,
+            lgb.Dataset(X_new_enc, label=y_new.map(class_index).to_numpy(),
+                        categorical_feature=native_cat if native_cat else 'auto'),
+            num_boost_round=incremental_rounds,
+            init_model=classifier.booster_,
+            keep_training_booster=True,
+        )
+    replace_booster(classifier, booster)
+    telemetry.count(rows=n_total, train_rows=n_new, features=len(feature_cols),
+                    encoded_features=X_new_enc.shape[1])
+    telemetry.record_latency(pipeline.predict_proba, X_new)
+
+    metadata["manifest"] = next_manifest(
+        manifest, "incremental", next_watermark, n_new, reason,
+        boosting_rounds_total=booster.current_iteration(),
     )
-    
-    # Model pipeline
+    metadata.pop("status", None)
+    # the model no longer corresponds to a single full-training key
+    metadata.pop("training_key", None)
+    training_report = {
+        "training_mode": "incremental",
+        "accuracy": accuracy,
+        "accuracy_note": "measured on the new rows before the update (test-then-train)",
+        "classification_report": report,
+        "n_samples": n_total,
+        "n_new_samples": n_new,
+        "n_features": len(feature_cols)
+    }
+    # fold the new rows into the drift reference so serving compares live traffic
+    # with the data this model has now seen
+    with telemetry.stage("profile"):
+        profile_path = save_reference_profile(update_reference_profile(profile, X_new, y_new), MODEL_DIR)
+    save_model(pipeline, metadata, training_report, telemetry, extra_artifacts={"reference_profile": profile_path})
+    return pipeline, metadata
+
+CATEGORICAL_MODES = ("onehot", "native")
+
+def build_pipeline(X, categorical='onehot', params=None):
+    """
+    onehot: OneHotEncoder ColumnTransformer (one column per answer option).
+    native: CategoryCodeEncoder, one code column per question split natively by LightGBM.
+    Returns (pipeline, categorical feature names, fit params for pipeline.fit).
+    """
+    categorical_features = X.select_dtypes(include=['object', 'category']).columns.tolist()
+    classifier = lgb.LGBMClassifier(objective='multiclass', random_state=42, **(params or {}))
+    if categorical == 'native':
+        preprocessor = CategoryCodeEncoder(columns=categorical_features)
+        fit_params = {'classifier__categorical_feature': [X.columns.get_loc(c) for c in categorical_features]}
+    elif categorical == 'onehot':
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
+            ],
+            remainder='passthrough'
+        )
+        fit_params = {}
+    else:
+        raise ValueError(f"Unknown categorical handling: {categorical}")
     pipeline = Pipeline([
         ('preprocessor', preprocessor),
-        ('classifier', lgb.LGBMClassifier(objective='multiclass', random_state=42))
+        ('classifier', classifier)
     ])
+    return pipeline, categorical_features, fit_params
+
+def load_selected_params(path):
+    """lgbm hparam_search leaderboard -> (categorical handling, LGBMClassifier params) of the selected/best trial"""
+    with open(path, "r", encoding="utf-8") as f:
+        board = json.load(f)
+    if board.get("trainer") != "lgbm":
+        raise SystemExit(f"{path} is a {board.get('trainer')} leaderboard; train_csv.py needs an lgbm one")
+    entry = board.get("selected") or board.get("best")
+    if not entry:
+        raise SystemExit(f"No successful trial in {path}")
+    params = dict(entry["params"])
+    categorical = params.pop("categorical", "onehot")
+    if entry.get("best_iteration"):
+        params["n_estimators"] = int(entry["best_iteration"])
+    return categorical, params
+
+def cross_validate_pipeline(X, y, categorical='onehot', params=None, n_splits=5, repeats=1, workers=0):
+    """k-fold CV of the pipeline; the preprocessor is fit on each fold's training rows only"""
+    from evaluation import cross_validate, encode_labels, eval_task
+    pipeline, _, fit_params = build_pipeline(X, categorical, params)
+    y_codes, classes = encode_labels(y)
+    model = {"trainer": "lgbm", "params": params or {},
+             "cat_idx": fit_params.get('classifier__categorical_feature')}
+    task = eval_task(X.reset_index(drop=True), y_codes, classes, model,
+                     preprocessor=pipeline.named_steps['preprocessor'], categorical_encoding=categorical)
+    return cross_validate({"prakriti": task}, n_splits, repeats, workers=workers)["prakriti"]
+
+def training_key(csv_path, categorical='onehot', params=None):
+    """Fit-stage key: dataset contents, loader version, settings, code and library versions"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = code_fingerprint(os.path.abspath(__file__), os.path.join(here, "category_encoding.py"))
+    return stage_key("fit", file_content_hash(csv_path), LOADER_VERSION, categorical, params or {},
+                     code, library_versions("lightgbm", "sklearn", "pandas"))
+
+def fit_pipeline(X, y, categorical='onehot', params=None):
+    """Split, fit and evaluate; everything the fit stage caches (including its telemetry)"""
+    telemetry = TrainingTelemetry()
+    pipeline, categorical_features, fit_params = build_pipeline(X, categorical, params)
     
     # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    with telemetry.stage("split"):
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
     
-    # Train
-    print("Training model...")
-    pipeline.fit(X_train, y_train)
+    # Train: the preprocessor and the classifier are fitted one after the other (as
+    # Pipeline.fit does) so encoding and boosting are timed separately
+    print(f"Training model ({categorical} categorical handling)...")
+    with telemetry.stage("encode"):
+        X_train_enc = pipeline[:-1].fit_transform(X_train, y_train)
+    with telemetry.stage("fit"):
+        pipeline[-1].fit(X_train_enc, y_train,
+                         **{k.split("__", 1)[1]: v for k, v in fit_params.items()})
+    telemetry.count(rows=len(X), train_rows=len(X_train), test_rows=len(X_test), features=X.shape[1],
+                    encoded_features=X_train_enc.shape[1])
+    del X_train_enc
     
     # Evaluate
-    y_pred = pipeline.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    report = classification_report(y_test, y_pred, output_dict=True)
+    with telemetry.stage("evaluate"):
+        y_pred = pipeline.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        report = classification_report(y_test, y_pred, output_dict=True)
+    return {"pipeline": pipeline, "categorical_features": categorical_features, "accuracy": accuracy,
+            "report": report, "n_train": len(X_train), "telemetry": telemetry.report()}
+
+def train_model(csv_path='prakriti_training_dataset.csv', incremental=False, full_rebuild_every=10,
+                max_incremental_fraction=0.5, incremental_rounds=20, categorical='onehot', params=None,
+                cv_folds=0, cv_repeats=1, cv_workers=0, force=False, use_stage_cache=True):
+    fit_key = training_key(csv_path, categorical, params)
+    if not incremental and not force:
+        previous_meta = load_previous_meta()
+        previous = previous_meta and previous_meta.get("training_key") == fit_key and load_previous_model()
+        if previous:
+            print("Data, parameters and code unchanged since the current model; keeping it.")
+            pipeline, metadata = previous
+            metadata["status"] = "no_change"
+            return pipeline, metadata
     
-    print(f"Model Accuracy: {accuracy:.4f}")
+    telemetry = TrainingTelemetry()
+    reason = "full training requested"
     
-    # Save model
-    model_path = os.path.join(MODEL_DIR, "prakriti_model.joblib")
-    joblib.dump(pipeline, model_path)
+    if incremental:
+        result = train_incremental(csv_path, full_rebuild_every, max_incremental_fraction,
+                                   incremental_rounds, telemetry)
+        if result is not None:
+            return result
+        reason = "incremental training not possible"
+    X, y, feature_cols, watermark = load_and_prepare_data(csv_path, telemetry=telemetry, return_watermark=True)
+    
+    previous = load_previous_meta()
+    previous_manifest = previous.get("manifest") if previous else None
+    
+    # fit stage: reused from the stage cache when the same data/settings/code were trained before
+    cache = StageCache(enabled=use_stage_cache, refresh=force)
+    fitted = cache.run("fit", fit_key, lambda: fit_pipeline(X, y, categorical, params))
+    pipeline, categorical_features = fitted["pipeline"], fitted["categorical_features"]
+    accuracy, report = fitted["accuracy"], fitted["report"]
+    telemetry.merge(fitted.get("telemetry") or {}, cached=cache.log["fit"]["hit"])
+    telemetry.record_latency(pipeline.predict_proba, X)
+    
+    print(f"Model Accuracy: {accuracy:.4f}")
     
     # Save metadata
     metadata = {
         "features": feature_cols,
         "categorical_features": categorical_features,
+        "categorical_encoding": categorical,
         "question_mapping": QUESTION_MAPPING,
-        "model_type": "prakriti_lgbm"
+        "model_type": "prakriti_lgbm",
+        "training_key": fit_key,
+        "manifest": next_manifest(
+            previous_manifest, "full", watermark, fitted["n_train"], reason,
+            boosting_rounds_total=pipeline.named_steps['classifier'].booster_.current_iteration(),
+        )
     }
-    
-    with open(os.path.join(MODEL_DIR, "feature_columns.json"), "w") as f:
-        json.dump(metadata, f, indent=2)
+    if categorical == 'native':
+        # {column: sorted categories}; a category's code is its position in the list
+        metadata["category_vocabularies"] = pipeline.named_steps['preprocessor'].vocabularies_
     
     # Save training report
     training_report = {
+        "training_mode": "full",
+        "categorical_encoding": categorical,
         "accuracy": accuracy,
         "classification_report": report,
         "n_samples": len(X),
         "n_features": len(feature_cols)
     }
+    if cv_folds > 1:
+        with telemetry.stage("cross_validate"):
+            training_report["cross_validation"] = cache.run(
+                "cv", stage_key("cv", fit_key, cv_folds, cv_repeats),
+                lambda: cross_validate_pipeline(X, y, categorical, params, cv_folds, cv_repeats, cv_workers))
     
-    with open(os.path.join(MODEL_DIR, "training_report.json"), "w") as f:
-        json.dump(training_report, f, indent=2)
+    # Save reference profile for serving-time drift monitoring
+    here = os.path.dirname(os.path.abspath(__file__))
+    profile_key = stage_key("profile", file_content_hash(csv_path), LOADER_VERSION, QUESTION_MAPPING,
+                            code_fingerprint(os.path.join(here, "drift_monitor.py")))
+    with telemetry.stage("profile"):
+        profile = cache.run("profile", profile_key, lambda: build_reference_profile(X, y, QUESTION_MAPPING))
+    training_report["stages"] = cache.log
+    
+    profile_path = save_reference_profile(profile, MODEL_DIR)
+    save_model(pipeline, metadata, training_report, telemetry, extra_artifacts={"reference_profile": profile_path})
     
-    print(f"Model saved to {model_path}")
     return pipeline, metadata
 
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--csv", type=str, default="prakriti_training_dataset.csv")
+    p.add_argument("--incremental", action="store_true",
+                   help="Continue boosting the existing model on rows added since its watermark")
+    p.add_argument("--full-rebuild-every", type=int, default=10,
+                   help="Force a full rebuild after this many incremental runs")
+    p.add_argument("--incremental-rounds", type=int, default=20)
+    p.add_argument("--categorical", choices=CATEGORICAL_MODES, default=None,
+                   help="onehot (default) or native LightGBM categorical splits on vocabulary codes")
+    p.add_argument("--params-from", type=str, default=None,
+                   help="hparam_search lgbm leaderboard JSON; trains its selected configuration")
+    p.add_argument("--cv-folds", type=int, default=0,
+                   help="Add stratified k-fold CV metrics to training_report.json (0 = off)")
+    p.add_argument("--cv-repeats", type=int, default=1)
+    p.add_argument("--cv-workers", type=int, default=0, help="CV worker processes (default: one per CPU)")
+    p.add_argument("--force", action="store_true", help="Retrain even if data, settings and code are unchanged")
+    p.add_argument("--no-stage-cache", action="store_true", help="Recompute every stage")
+    args = p.parse_args()
+    categorical, params = "onehot", None
+    if args.params_from:
+        categorical, params = load_selected_params(args.params_from)
+        print(f"Using params from {args.params_from}: {categorical} {params}")
+    train_model(args.csv, incremental=args.incremental, full_rebuild_every=args.full_rebuild_every,
+                incremental_rounds=args.incremental_rounds, categorical=args.categorical or categorical,
+                params=params, cv_folds=args.cv_folds, cv_repeats=args.cv_repeats, cv_workers=args.cv_workers,
+                force=args.force, use_stage_cache=not args.no_stage_cache)
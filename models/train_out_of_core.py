@@ -0,0 +1,356 @@
+# models/train_out_of_core.py
+"""
+Out-of-core LightGBM training for datasets that do not fit in memory.
+
+train_csv.py / train.py load the whole dataset into pandas. This script
+streams it in chunks instead:
+
+  pass 1  read chunks, clean them like the in-memory trainers and collect the
+          schema: feature columns, category vocabularies, classes, row count
+  pass 2  read the chunks again, encode them to float32 category codes
+          (CategoryCodeEncoder) and append them to a row-major binary file on
+          disk; every --valid-every'th row goes to a validation file instead
+  train   lgb.Dataset is built from an lgb.Sequence over the binary file:
+          LightGBM samples rows to find the bin edges and then pushes the
+          file through in batches, keeping only the binned matrix (one byte
+          per cell with max_bin <= 255) in memory. The raw rows never are.
+
+Peak memory is roughly one chunk of pandas data plus the binned matrix, not
+the decoded dataset. The report records peak RSS after each stage, throughput
+(rows/s) of each pass and of training, and validation accuracy.
+
+Inputs:
+  --format flat           prakriti training CSV/Parquet (train_csv.py layout)
+  --format questionnaire  questionnaire_answers export (train.py layout), --target prakriti|mental
+
+Outputs (MODEL_DIR): <target>_ooc_model.txt (LightGBM text model),
+<target>_ooc_meta.json (features, vocabularies, classes) and
+<target>_ooc_training_report.json.
+
+Usage:
+  python train_out_of_core.py --input big_prakriti.csv
+  python train_out_of_core.py --input big_prakriti.parquet --chunk-rows 200000 --rounds 300
+  python train_out_of_core.py --input export.csv --format questionnaire --target mental
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from pandas.api.types import infer_dtype
+
+from category_encoding import CategoryCodeEncoder
+from training_telemetry import peak_rss_mb, rss_mb
+
+# column values seen as numbers in every chunk stay numeric; anything else is categorical
+NUMERIC_INFERRED = {"integer", "floating", "mixed-integer-float", "decimal", "boolean", "empty"}
+# distinct values tracked per numeric-looking column, in case a later chunk turns it categorical
+MAX_TRACKED_VALUES = 4096
+
+# -----------------------
+# chunk readers
+# -----------------------
+def iter_frames(path: str, chunk_rows: int, as_text: bool = False) -> Iterator[pd.DataFrame]:
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            frame = batch.to_pandas()
+            yield frame.astype(str).where(frame.notna(), "") if as_text else frame
+        return
+    kwargs = {"dtype": str, "keep_default_na": False} if as_text else {}
+    yield from pd.read_csv(path, chunksize=chunk_rows, **kwargs)
+
+def flat_chunks(path: str, chunk_rows: int) -> Iterator[Tuple[pd.DataFrame, pd.Series]]:
+    """train_csv.py layout; each chunk is cleaned by train_csv.prepare_frame"""
+    from train_csv import prepare_frame
+    for i, frame in enumerate(iter_frames(path, chunk_rows)):
+        # the cleaning log is printed for the first chunk only
+        with contextlib.redirect_stdout(sys.stdout if i == 0 else io.StringIO()):
+            X, y, _ = prepare_frame(frame)
+        yield X, y
+
+def questionnaire_chunks(path: str, chunk_rows: int, target: str = "prakriti") -> Iterator[Tuple[pd.DataFrame, pd.Series]]:
+    """train.py layout; each chunk goes through train.build_dataframe"""
+    from train import build_dataframe, rows_from_frame
+    for frame in iter_frames(path, chunk_rows, as_text=True):
+        try:
+            df, y_prak, y_ment, _ = build_dataframe(rows_from_frame(frame.fillna("")))
+        except ValueError:
+            continue
+        y = y_prak if target == "prakriti" else y_ment
+        if y is None:
+            continue
+        labeled = (y.notna() & y.astype(str).str.strip().ne("None")).to_numpy()
+        yield df[labeled].reset_index(drop=True), y[labeled].reset_index(drop=True)
+
+def open_chunks(path: str, fmt: str, chunk_rows: int, target: str):
+    if fmt == "questionnaire":
+        return lambda: questionnaire_chunks(path, chunk_rows, target)
+    return lambda: flat_chunks(path, chunk_rows)
+
+# -----------------------
+# pass 1: schema
+# -----------------------
+def _text_values(s: pd.Series) -> np.ndarray:
+    return s[s.notna()].astype(str).unique()
+
+def scan_schema(chunks: Iterator[Tuple[pd.DataFrame, pd.Series]]) -> Dict[str, Any]:
+    """Feature order, categorical vocabularies and class counts over every chunk"""
+    features: List[str] = []
+    categorical: set = set()
+    values: Dict[str, Optional[set]] = {}
+    class_counts: Dict[str, int] = {}
+    n_rows = 0
+    for X, y in chunks:
+        n_rows += len(X)
+        for col in X.columns:
+            if col not in values:
+                features.append(col)
+                values[col] = set()
+            s = X[col]
+            if infer_dtype(s, skipna=True) not in NUMERIC_INFERRED:
+                categorical.add(col)
+            tracked = values[col]
+            if tracked is None:
+                continue
+            tracked.update(_text_values(s).tolist())
+            if col not in categorical and len(tracked) > MAX_TRACKED_VALUES:
+                values[col] = None
+        for label, count in y.astype(str).value_counts().items():
+            class_counts[label] = class_counts.get(label, 0) + int(count)
+    vocabularies = {}
+    for col in features:
+        if col in categorical:
+            if values[col] is None:
+                raise ValueError(f"Column {col} mixes numbers and text with more than "
+                                 f"{MAX_TRACKED_VALUES} distinct values; clean it before training")
+            vocabularies[col] = sorted(values[col])
+    return {"features": features, "vocabularies": vocabularies, "classes": sorted(class_counts),
+            "class_counts": class_counts, "n_rows": n_rows}
+
+# -----------------------
+# pass 2: spill encoded rows to disk
+# -----------------------
+def spill_encoded(chunks: Iterator[Tuple[pd.DataFrame, pd.Series]], schema: Dict[str, Any], workdir: str,
+                  valid_every: int = 10, valid_max: int = 200000) -> Dict[str, Any]:
+    """Append float32 codes (row-major) and int32 labels to train/valid files"""
+    features = schema["features"]
+    encoder = CategoryCodeEncoder.from_vocabularies(features, schema["vocabularies"])
+    class_index = {c: i for i, c in enumerate(schema["classes"])}
+    counts = {"train": 0, "valid": 0}
+    handles = {f"{kind}_{part}": open(os.path.join(workdir, f"{kind}.{part}"), "wb")
+               for kind in counts for part in ("X", "y")}
+    seen = 0
+    try:
+        for X, y in chunks:
+            X = X.reindex(columns=features, fill_value=0)
+            codes = encoder.transform(X)
+            labels = y.astype(str).map(class_index).to_numpy(dtype=np.int32)
+            idx = np.arange(seen, seen + len(X))
+            seen += len(X)
+            is_valid = (idx % valid_every == 0) if valid_every > 0 else np.zeros(len(X), dtype=bool)
+            room = max(0, valid_max - counts["valid"])
+            is_valid &= np.cumsum(is_valid) <= room
+            for kind, mask in (("valid", is_valid), ("train", ~is_valid)):
+                np.ascontiguousarray(codes[mask]).tofile(handles[f"{kind}_X"])
+                labels[mask].tofile(handles[f"{kind}_y"])
+                counts[kind] += int(mask.sum())
+    finally:
+        for fh in handles.values():
+            fh.close()
+    return {"n_train": counts["train"], "n_valid": counts["valid"],
+            "categorical_indices": encoder.categorical_indices_}
+
+class BinaryRowSequence(lgb.Sequence):
+    """Random / batch access to a row-major float32 file without loading or mapping it"""
+
+    def __init__(self, path: str, n_features: int, batch_size: int = 65536):
+        self.path = path
+        self.n_features = n_features
+        self.row_bytes = 4 * n_features
+        self.n_rows = os.path.getsize(path) // self.row_bytes
+        self.batch_size = batch_size
+        self._fh = open(path, "rb")
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def _read(self, start: int, count: int) -> np.ndarray:
+        self._fh.seek(start * self.row_bytes)
+        rows = np.fromfile(self._fh, dtype=np.float32, count=count * self.n_features)
+        # stored as float32 to halve the spill; LightGBM only accepts double from a Sequence
+        return rows.reshape(count, self.n_features).astype(np.float64)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self.n_rows)
+            rows = self._read(start, max(0, stop - start))
+            return rows[::step] if step != 1 else rows
+        if idx < 0:
+            idx += self.n_rows
+        return self._read(idx, 1)[0]
+
+    def close(self):
+        self._fh.close()
+
+# -----------------------
+# training
+# -----------------------
+def booster_params(n_classes: int, args) -> Dict[str, Any]:
+    params = {
+        "learning_rate": args.learning_rate,
+        "num_leaves": args.num_leaves,
+        "max_bin": args.max_bin,
+        "bin_construct_sample_cnt": args.bin_sample,
+        "num_threads": args.threads,
+        "verbose": -1,
+        "seed": 42,
+    }
+    if n_classes > 2:
+        params.update({"objective": "multiclass", "num_class": n_classes})
+    else:
+        params["objective"] = "binary"
+    return params
+
+def predict_file(booster: lgb.Booster, seq: BinaryRowSequence, n_classes: int) -> np.ndarray:
+    """Class predictions streamed batch by batch"""
+    out = np.empty(len(seq), dtype=np.int32)
+    for start in range(0, len(seq), seq.batch_size):
+        proba = booster.predict(seq[start:start + seq.batch_size])
+        out[start:start + len(proba)] = proba.argmax(axis=1) if n_classes > 2 else (proba > 0.5)
+    return out
+
+def load_out_of_core_model(model_dir: str, target: str = "prakriti") -> Tuple[lgb.Booster, CategoryCodeEncoder, Dict[str, Any]]:
+    """(booster, encoder, meta); predict with booster.predict(encoder.transform(frame))"""
+    with open(os.path.join(model_dir, f"{target}_ooc_meta.json"), "r", encoding="utf-8") as fh:
+        meta = json.load(fh)
+    booster = lgb.Booster(model_file=os.path.join(model_dir, f"{target}_ooc_model.txt"))
+    return booster, CategoryCodeEncoder.from_vocabularies(meta["features"], meta["category_vocabularies"]), meta
+
+def train_out_of_core(args) -> Dict[str, Any]:
+    chunks = open_chunks(args.input, args.format, args.chunk_rows, args.target)
+    report: Dict[str, Any] = {"input": args.input, "format": args.format, "target": args.target,
+                              "chunk_rows": args.chunk_rows, "stages": {}}
+    started_all = time.perf_counter()
+
+    def stage(name: str, started: float, rows: int, **extra):
+        seconds = time.perf_counter() - started
+        report["stages"][name] = {"seconds": round(seconds, 3), "rows": rows,
+                                  "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+                                  "rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb(), **extra}
+        print(f"{name}: {rows:,} rows in {seconds:.2f}s, peak RSS {report['stages'][name]['peak_rss_mb']} MB")
+
+    started = time.perf_counter()
+    schema = scan_schema(chunks())
+    stage("scan", started, schema["n_rows"])
+    if schema["n_rows"] == 0 or len(schema["classes"]) < 2:
+        raise SystemExit(f"Need at least two {args.target} classes in {args.input}")
+    n_features, n_classes = len(schema["features"]), len(schema["classes"])
+
+    workdir = tempfile.mkdtemp(prefix="ooc_", dir=args.work_dir)
+    try:
+        started = time.perf_counter()
+        spilled = spill_encoded(chunks(), schema, workdir, args.valid_every, args.valid_max)
+        stage("encode", started, schema["n_rows"], spill_bytes=4 * n_features * schema["n_rows"])
+
+        train_seq = BinaryRowSequence(os.path.join(workdir, "train.X"), n_features, args.batch_rows)
+        valid_seq = BinaryRowSequence(os.path.join(workdir, "valid.X"), n_features, args.batch_rows)
+        y_train = np.fromfile(os.path.join(workdir, "train.y"), dtype=np.int32)
+        y_valid = np.fromfile(os.path.join(workdir, "valid.y"), dtype=np.int32)
+        params = booster_params(n_classes, args)
+        cat_idx = spilled["categorical_indices"]
+
+        started = time.perf_counter()
+        dataset_params = {k: params[k] for k in ("max_bin", "bin_construct_sample_cnt", "verbose")}
+        # the same categorical list everywhere, or lgb.train tries to reset it on freed data
+        categorical_feature = cat_idx or "auto"
+        feature_name = [str(f) for f in schema["features"]]
+        train_set = lgb.Dataset(train_seq, label=y_train, categorical_feature=categorical_feature,
+                                feature_name=feature_name, params=dataset_params).construct()
+        stage("bin", started, len(train_seq))
+
+        started = time.perf_counter()
+        callbacks = []
+        valid_sets = []
+        if len(valid_seq):
+            valid_sets = [lgb.Dataset(valid_seq, label=y_valid, reference=train_set, feature_name=feature_name,
+                                      categorical_feature=categorical_feature, params=dataset_params).construct()]
+            callbacks.append(lgb.early_stopping(args.early_stopping_rounds, verbose=False))
+        booster = lgb.train(params, train_set, num_boost_round=args.rounds, valid_sets=valid_sets,
+                            categorical_feature=categorical_feature, callbacks=callbacks)
+        rounds = booster.current_iteration()
+        stage("train", started, len(train_seq), boosting_rounds=rounds,
+              row_rounds_per_second=round(len(train_seq) * rounds / max(1e-9, time.perf_counter() - started), 1))
+
+        accuracy = None
+        if len(valid_seq):
+            started = time.perf_counter()
+            accuracy = float((predict_file(booster, valid_seq, n_classes) == y_valid).mean())
+            stage("evaluate", started, len(valid_seq))
+        train_seq.close()
+        valid_seq.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    model_path = os.path.join(args.model_dir, f"{args.target}_ooc_model.txt")
+    booster.save_model(model_path)
+    meta = {
+        "model_type": f"{args.target}_lgbm_out_of_core",
+        "target": args.target,
+        "features": schema["features"],
+        "categorical_features": [schema["features"][i] for i in cat_idx],
+        "category_vocabularies": schema["vocabularies"],
+        "classes": schema["classes"],
+        "params": params,
+    }
+    with open(os.path.join(args.model_dir, f"{args.target}_ooc_meta.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    report.update({
+        "n_rows": schema["n_rows"], "n_train": spilled["n_train"], "n_valid": spilled["n_valid"],
+        "n_features": n_features, "class_counts": schema["class_counts"],
+        "boosting_rounds": rounds, "valid_accuracy": accuracy, "params": params,
+        "total_seconds": round(time.perf_counter() - started_all, 3),
+        "peak_rss_mb": peak_rss_mb(), "model_bytes": os.path.getsize(model_path),
+    })
+    with open(os.path.join(args.model_dir, f"{args.target}_ooc_training_report.json"), "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Model saved to {model_path} (valid accuracy {accuracy}, peak RSS {report['peak_rss_mb']} MB)")
+    return report
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Out-of-core LightGBM training on chunked CSV/Parquet")
+    p.add_argument("--input", type=str, default="prakriti_training_dataset.csv")
+    p.add_argument("--format", choices=["flat", "questionnaire"], default="flat")
+    p.add_argument("--target", choices=["prakriti", "mental"], default="prakriti",
+                   help="questionnaire format only; flat files always train prakriti")
+    p.add_argument("--model-dir", type=str, default=os.getenv("MODEL_DIR", "./models_out"))
+    p.add_argument("--work-dir", type=str, default=None, help="Where the encoded spill files go (default: temp dir)")
+    p.add_argument("--chunk-rows", type=int, default=100000, help="Rows read and cleaned per chunk")
+    p.add_argument("--batch-rows", type=int, default=65536, help="Rows pushed into LightGBM per batch")
+    p.add_argument("--valid-every", type=int, default=10, help="Every n-th row is held out for validation (0 = none)")
+    p.add_argument("--valid-max", type=int, default=200000)
+    p.add_argument("--rounds", type=int, default=200)
+    p.add_argument("--early-stopping-rounds", type=int, default=20)
+    p.add_argument("--learning-rate", type=float, default=0.1)
+    p.add_argument("--num-leaves", type=int, default=31)
+    p.add_argument("--max-bin", type=int, default=255)
+    p.add_argument("--bin-sample", type=int, default=200000, help="Rows sampled to choose bin edges")
+    p.add_argument("--threads", type=int, default=0, help="LightGBM threads (0 = all cores)")
+    args = p.parse_args(argv)
+    if args.format == "flat":
+        args.target = "prakriti"
+    train_out_of_core(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
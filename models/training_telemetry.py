@@ -0,0 +1,207 @@
+# models/training_telemetry.py
+"""
+Performance telemetry for training runs, recorded in the training reports.
+
+  telemetry = TrainingTelemetry()
+  with telemetry.stage("load"):
+      df = read(...)
+  telemetry.count(rows=len(df), features=df.shape[1])
+  telemetry.record_latency(model.predict_proba, X_test)
+  report["telemetry"] = telemetry.report(artifacts={"model": model_path}, model_threads=4)
+
+Per stage: wall seconds, RSS at the end, RSS change and peak RSS. The peak
+is the kernel's high-water mark (VmHWM), reset at the start of the stage by
+writing 5 to /proc/self/clear_refs; "peak_scope" is "stage" when that
+worked. When the reset is unavailable, or the stage overlapped another stage
+in the same process (e.g. a background save), the peak covers more than the
+stage ("process" / "overlapping"). Without /proc (macOS) RSS fields fall back
+to getrusage or are None.
+
+The report also carries row/feature counts, thread counts (CPUs, affinity,
+BLAS/OpenMP pools via threadpoolctl, model threads), artifact sizes and the
+measured single-row and batch inference latency of the produced model, so
+training and serving cost can be tracked across releases.
+"""
+import os
+import time
+import threading
+import contextlib
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+# -----------------------
+# memory
+# -----------------------
+def _proc_status_mb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status", "r") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def rss_mb() -> Optional[float]:
+    return _proc_status_mb("VmRSS")
+
+def peak_rss_mb() -> Optional[float]:
+    """High-water mark of resident memory (VmHWM), falling back to getrusage"""
+    peak = _proc_status_mb("VmHWM")
+    if peak is None:
+        try:
+            import resource
+            peak = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        except Exception:
+            peak = None
+    return peak
+
+def reset_peak_rss() -> bool:
+    """Reset VmHWM to the current RSS (Linux >= 4.0); False if not possible"""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+_active_lock = threading.Lock()
+_active_stages = 0
+_overlap_epoch = 0  # bumped whenever a stage starts while another is running
+
+# -----------------------
+# latency
+# -----------------------
+def latency_ms(fn: Callable[[], Any], repeats: int = 200, warmup: int = 5) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 4),
+        "p99": round(float(np.percentile(samples, 99)), 4),
+    }
+
+def inference_latency(predict: Callable[[Any], Any], X: Any, repeats: int = 100,
+                      batch_size: int = 256) -> Dict[str, Any]:
+    """Single-row and batch latency of predict() on rows of X (DataFrame or array)"""
+    take = (lambda a, b: X.iloc[a:b]) if hasattr(X, "iloc") else (lambda a, b: X[a:b])
+    row, batch = take(0, 1), take(0, batch_size)
+    batch_latency = latency_ms(lambda: predict(batch), max(5, repeats // 10), warmup=2)
+    return {
+        "single_row_ms": latency_ms(lambda: predict(row), repeats),
+        "batch_ms": {**batch_latency, "batch_size": int(len(batch)),
+                     "per_row_p50": round(batch_latency["p50"] / max(1, len(batch)), 5)},
+    }
+
+# -----------------------
+# threads
+# -----------------------
+def thread_counts(model_threads: Optional[int] = None) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"cpu_count": os.cpu_count(), "python_threads": threading.active_count()}
+    try:
+        out["cpu_affinity"] = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        out["cpu_affinity"] = None
+    try:
+        from threadpoolctl import threadpool_info
+        out["native_pools"] = {f"{p['internal_api']}:{os.path.basename(p['filepath'])}": p["num_threads"]
+                               for p in threadpool_info()}
+    except Exception:
+        out["native_pools"] = {}
+    if model_threads is not None:
+        out["model_threads"] = model_threads
+    return out
+
+def model_thread_count(model: Any) -> Optional[int]:
+    """n_jobs / num_threads configured on an estimator (last step of a Pipeline)"""
+    est = model.steps[-1][1] if hasattr(model, "steps") else model
+    if not hasattr(est, "get_params"):
+        return None
+    params = est.get_params()
+    for key in ("n_jobs", "num_threads", "nthread"):
+        if params.get(key) is not None:
+            return int(params[key])
+    return None
+
+# -----------------------
+# telemetry
+# -----------------------
+class TrainingTelemetry:
+    """Stage timings, memory, counts and latency of one training run"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.counts: Dict[str, Any] = {}
+        self.latency: Optional[Dict[str, Any]] = None
+        self.threads: Optional[Dict[str, Any]] = None  # taken from a merged worker report
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        global _active_stages, _overlap_epoch
+        with _active_lock:
+            reset = _active_stages == 0 and reset_peak_rss()
+            if _active_stages > 0:
+                _overlap_epoch += 1
+            epoch = _overlap_epoch
+            overlapping = _active_stages > 0
+            _active_stages += 1
+        rss_before = rss_mb()
+        entry: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            seconds = time.perf_counter() - started
+            with _active_lock:
+                _active_stages -= 1
+                overlapping = overlapping or _overlap_epoch != epoch
+            rss_after = rss_mb()
+            entry.update({
+                "seconds": round(seconds, 4),
+                "rss_mb": rss_after,
+                "rss_delta_mb": round(rss_after - rss_before, 1) if rss_after is not None and rss_before is not None else None,
+                "peak_rss_mb": peak_rss_mb(),
+                "peak_scope": "overlapping" if overlapping else ("stage" if reset else "process"),
+            })
+            previous = self.stages.get(name)
+            if previous:
+                # repeated stage (e.g. one per chunk): total time, worst peak
+                entry["seconds"] = round(previous["seconds"] + entry["seconds"], 4)
+                entry["peak_rss_mb"] = max(filter(None, (previous["peak_rss_mb"], entry["peak_rss_mb"])), default=None)
+                entry["calls"] = previous.get("calls", 1) + 1
+            self.stages[name] = entry
+
+    def count(self, **counts: Any):
+        self.counts.update({k: int(v) if isinstance(v, (int, np.integer)) else v for k, v in counts.items()})
+
+    def merge(self, other: Dict[str, Any], cached: bool = False):
+        """Stages recorded elsewhere (a worker process, a cached stage); cached ones are marked as such"""
+        for name, entry in (other.get("stages") or {}).items():
+            self.stages[name] = {**entry, "cached": True} if cached else entry
+        self.counts.update(other.get("counts") or {})
+        if other.get("inference_latency") and self.latency is None:
+            self.latency = other["inference_latency"]
+        if other.get("threads"):
+            self.threads = other["threads"]
+
+    def record_latency(self, predict: Callable[[Any], Any], X: Any, repeats: int = 100, batch_size: int = 256):
+        if repeats > 0 and len(X):
+            self.latency = inference_latency(predict, X, repeats, batch_size)
+
+    def report(self, artifacts: Optional[Dict[str, str]] = None, model_threads: Optional[int] = None) -> Dict[str, Any]:
+        sizes = {name: os.path.getsize(p) for name, p in (artifacts or {}).items() if p and os.path.exists(p)}
+        return {
+            "stages": self.stages,
+            "stage_seconds_total": round(sum(s["seconds"] for s in self.stages.values() if not s.get("cached")), 4),
+            "peak_rss_mb": max((s["peak_rss_mb"] for s in self.stages.values() if s.get("peak_rss_mb")), default=None),
+            "counts": self.counts,
+            "threads": self.threads or thread_counts(model_threads),
+            "artifact_bytes": sizes,
+            "artifact_bytes_total": sum(sizes.values()),
+            "inference_latency": self.latency,
+        }
@@ -0,0 +1,189 @@
+# models/tree_arrays.py
+"""
+LightGBM trees as flat float32 arrays, evaluated with numpy.
+
+LightGBM serializes a model only as text with decimal doubles, so every load
+parses each threshold and leaf value again (most of the prakriti pipeline's
+load time). forest_arrays() flattens a trained booster into one node array
+that model_bundle stores raw and maps without copying; TreeArrayClassifier
+predicts from it, walking all trees one level at a time. That is faster
+than LightGBM for the single rows serving scores, and several times slower
+for large batches.
+
+Node layout (NODE_DTYPE, 17 bytes):
+  feature   split feature, -1 for a leaf
+  value     split threshold, or the leaf output (float32); for a categorical
+            split, the index of its category set in the header
+  left      child node taken when the split holds
+  right     child node otherwise
+  flags     bit 0 default left, bits 1-2 missing type (0 none, 1 zero, 2 NaN),
+            bit 3 categorical split
+
+Splits follow LightGBM's rules: NaN counts as 0 unless the missing type is
+NaN, missing values go the default way, and a categorical split sends a
+value left when its integer code is in the category set (NaN and negative
+codes go right). Rounding thresholds to float32 can only move an input lying
+between the double threshold and its float32 rounding; LightGBM places
+thresholds midway between training values, so integer-coded questionnaire
+features are unaffected. Leaf outputs are float32 too: probabilities match
+LightGBM's to about 1e-6.
+
+Binary and multiclass (softmax) objectives are supported; forest_arrays()
+raises UnsupportedForest for anything else (linear trees, averaged output,
+other objectives) and callers keep the LightGBM model.
+
+Usage:
+  nodes, header = forest_arrays(pipeline.named_steps["classifier"])
+  clf = TreeArrayClassifier(nodes, header)
+  clf.predict_proba(pipeline[:-1].transform(X))
+"""
+import itertools
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+NODE_DTYPE = np.dtype([("feature", "<i4"), ("value", "<f4"), ("left", "<i4"), ("right", "<i4"), ("flags", "u1")])
+DEFAULT_LEFT, CATEGORICAL = 1, 8
+MISSING_TYPES = {"None": 0, "Zero": 1, "NaN": 2}
+# LightGBM's kZeroThreshold: |x| at or below it counts as zero
+ZERO_THRESHOLD = 1e-35
+SUPPORTED_OBJECTIVES = ("binary", "multiclass", "softmax")
+
+class UnsupportedForest(ValueError):
+    pass
+
+def forest_arrays(estimator: Any) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """(node array, JSON header) of a fitted LGBMClassifier or lightgbm Booster"""
+    booster = getattr(estimator, "booster_", estimator)
+    dump = booster.dump_model()
+    objective = str(dump.get("objective", "")).split()
+    if not objective or objective[0] not in SUPPORTED_OBJECTIVES:
+        raise UnsupportedForest(f"objective {dump.get('objective')!r} has no array predictor")
+    if dump.get("average_output"):
+        raise UnsupportedForest("averaged (random forest) output has no array predictor")
+    sigmoid = next((float(p.split(":", 1)[1]) for p in objective[1:] if p.startswith("sigmoid:")), 1.0)
+
+    per_iteration = int(dump["num_tree_per_iteration"])
+    trees = dump["tree_info"]
+    if booster.best_iteration > 0:
+        # the sklearn wrapper predicts with the early-stopped iteration count
+        trees = trees[:booster.best_iteration * per_iteration]
+
+    rows: List[Tuple[int, float, int, int, int]] = []
+    category_sets: List[List[int]] = []
+    roots: List[int] = []
+
+    def add(node: Dict[str, Any]) -> int:
+        index = len(rows)
+        if "split_feature" not in node:
+            if "leaf_coeff" in node:
+                raise UnsupportedForest("linear trees have no array predictor")
+            rows.append((-1, float(node["leaf_value"]), index, index, 0))
+            return index
+        rows.append((0, 0.0, 0, 0, 0))  # filled once the children have indexes
+        flags = (DEFAULT_LEFT if node.get("default_left") else 0) | (MISSING_TYPES[node.get("missing_type", "None")] << 1)
+        if node["decision_type"] == "==":
+            category_sets.append(sorted(int(c) for c in str(node["threshold"]).split("||")))
+            value, flags = float(len(category_sets) - 1), flags | CATEGORICAL
+        else:
+            value = float(node["threshold"])
+        left = add(node["left_child"])
+        right = add(node["right_child"])
+        rows[index] = (int(node["split_feature"]), value, left, right, flags)
+        return index
+
+    for tree in trees:
+        roots.append(add(tree["tree_structure"]))
+    classes = getattr(estimator, "classes_", None)
+    header = {
+        "objective": "binary" if objective[0] == "binary" else "multiclass",
+        "sigmoid": sigmoid,
+        "num_class": int(dump["num_class"]),
+        "n_features": int(dump["max_feature_idx"]) + 1,
+        "classes": np.asarray(classes).tolist() if classes is not None else list(range(max(2, int(dump["num_class"])))),
+        "roots": roots,
+        "category_sets": category_sets,
+    }
+    return np.array(rows, dtype=NODE_DTYPE), header
+
+class TreeArrayClassifier:
+    """predict / predict_proba of a LightGBM classifier from forest_arrays() output"""
+
+    def __init__(self, nodes: np.ndarray, header: Dict[str, Any]):
+        self.nodes = nodes
+        self.header = header
+        self.classes_ = np.asarray(header["classes"])
+        self.n_classes_ = len(self.classes_)
+        self.n_features_in_ = int(header["n_features"])
+        self._feature = nodes["feature"].astype(np.int64)
+        self._value = nodes["value"]
+        # children interleaved (right, left) so the next node is _children[2 * node + went_left]
+        self._children = np.empty(2 * len(nodes), dtype=np.int64)
+        self._children[0::2], self._children[1::2] = nodes["right"], nodes["left"]
+        self._roots = np.asarray(header["roots"], dtype=np.int64)
+        flags = nodes["flags"]
+        missing_type = (flags >> 1) & 3
+        self._default_left = (flags & DEFAULT_LEFT) > 0
+        self._categorical = (flags & CATEGORICAL) > 0
+        self._zero_missing = missing_type == 1
+        # where NaN goes: the default way for zero/NaN missing types, right at categorical
+        # splits, and as the value 0 otherwise
+        self._nan_left = np.where(missing_type > 0, self._default_left, 0.0 <= self._value)
+        self._nan_left[self._categorical] = False
+        sets = header.get("category_sets") or []
+        codes = np.fromiter(itertools.chain.from_iterable(sets), dtype=np.int64)
+        self._category_table = np.zeros((len(sets), int(codes.max()) + 1 if len(codes) else 0), dtype=bool)
+        self._category_table[np.repeat(np.arange(len(sets)), [len(c) for c in sets]), codes] = True
+
+    def _categorical_left(self, x: np.ndarray, node: np.ndarray) -> np.ndarray:
+        code = np.trunc(x)  # LightGBM casts the value to int; NaN, negative and unknown codes go right
+        valid = (code >= 0) & (code < self._category_table.shape[1])
+        return valid & self._category_table[self._value[node].astype(np.int64), np.where(valid, code, 0).astype(np.int64)]
+
+    def raw_scores(self, X) -> np.ndarray:
+        if hasattr(X, "toarray"):
+            X = X.toarray()
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+        has_nan = bool(np.isnan(X).any())
+        zero_missing = bool(self._zero_missing.any())
+        categorical = bool(self._categorical.any())
+        flat = X.ravel()
+        node = np.tile(self._roots, len(X))
+        offsets = np.repeat(np.arange(len(X)) * X.shape[1], len(self._roots))
+        active = np.arange(len(node))
+        # one level of every unfinished (row, tree) path at a time; paths drop out at their leaf
+        while len(active):
+            at_node = node[active]
+            feature = self._feature[at_node]
+            split = feature >= 0
+            if not split.all():
+                active, at_node, feature = active[split], at_node[split], feature[split]
+            x = flat[offsets[active] + feature]
+            left = x <= self._value[at_node]
+            if zero_missing:
+                at = (np.abs(x) <= ZERO_THRESHOLD) & self._zero_missing[at_node]
+                left[at] = self._default_left[at_node[at]]
+            if categorical:
+                at = self._categorical[at_node]
+                left[at] = self._categorical_left(x[at], at_node[at])
+            if has_nan:
+                at = np.isnan(x)
+                left[at] = self._nan_left[at_node[at]]
+            node[active] = self._children[2 * at_node + left]
+        leaves = self._value[node].astype(np.float64)
+        k = max(1, int(self.header["num_class"]))
+        return leaves.reshape(len(X), -1, k).sum(axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        raw = self.raw_scores(X)
+        if self.header["objective"] == "binary":
+            p = 1.0 / (1.0 + np.exp(-self.header["sigmoid"] * raw[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        raw = raw - raw.max(axis=1, keepdims=True)
+        e = np.exp(raw)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
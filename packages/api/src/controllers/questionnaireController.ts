@@ -85,7 +85,15 @@ export const questionnaireController = {
       try {
         const mlResponse = await fetchWithTimeout(
           `${ML_SERVICE_URL}/predict`,
-          { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ answers: validAnswers }) },
+          {
+            method: 'POST',
+            headers: {
+              'Content-Type': 'application/json',
+              // Correlates this call with the ML service's trace (GET /monitor/traces?request_id=...)
+              'x-request-id': (req.headers['x-request-id'] as string) || crypto.randomUUID(),
+            },
+            body: JSON.stringify({ answers: validAnswers }),
+          },
           15000
         );
 
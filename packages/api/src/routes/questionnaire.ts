@@ -1,5 +1,6 @@
 // packages/api/src/routes/questionnaire.ts - COMPLETE UPDATED VERSION
 import { Router, Request, Response, NextFunction } from 'express';
+import { randomUUID } from 'crypto';
 import { authMiddleware } from '../middlewares/authMiddleware';
 import { supabase } from '../db/supabaseClient';
 import { prakritiService } from '../services/prakritiService';
@@ -108,7 +109,9 @@ router.post('/submit', asyncHandler(async (req: Request, res: Response, next: Ne
         method: 'POST',
         headers: { 
           'Content-Type': 'application/json',
-          'Accept': 'application/json'
+          'Accept': 'application/json',
+          // Correlates this call with the ML service's trace (GET /monitor/traces?request_id=...)
+          'x-request-id': (req.headers['x-request-id'] as string) || randomUUID()
         },
         body: JSON.stringify({ 
           answers: mlAnswers